@@ -27,16 +27,8 @@ def main() -> None:
 
     from roboToald.db.models import sso as sso_model
 
-    audit_archived, sessions_archived = sso_model.archive_old_records(
-        retention_days=config.AUDIT_RETENTION_DAYS,
-        archive_dir=config.AUDIT_ARCHIVE_DIR,
-    )
-    if audit_archived or sessions_archived:
-        logging.getLogger(__name__).info(
-            "Archived %d audit log entries and %d session records",
-            audit_archived,
-            sessions_archived,
-        )
+    # Seed the in-memory rate limiter before the API starts taking logins.
+    sso_model.load_failed_attempts()
 
     # Start API server in background thread
     server.run_api_server(
@@ -47,7 +39,12 @@ def main() -> None:
         port=config.API_PORT,
     )
 
-    discord_client.DISCORD_CLIENT.run(config.DISCORD_TOKEN)
+    try:
+        discord_client.DISCORD_CLIENT.run(config.DISCORD_TOKEN)
+    finally:
+        # Archival, DB maintenance, SSO calls and the audit / presence writers; uvicorn's shutdown
+        # hook never runs here.
+        server.stop_background_work()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""Periodic background archival of old SSO audit logs and character sessions.
+
+Started with the API server: shortly after startup and then every
+``config.AUDIT_ARCHIVE_INTERVAL_HOURS`` hours, :func:`sso_model.archive_old_records` runs on the
+loop's default executor, streaming expired rows into gzip CSV files in
+``config.AUDIT_ARCHIVE_CHUNK_SIZE`` chunks.  Logins and WebSocket traffic keep flowing during a run
+because each chunk is deleted in its own short transaction.
+
+An interval of ``0`` archives once at startup only.  :meth:`ArchiveScheduler.stop` asks a running
+pass to finish its current chunk and waits for it; :meth:`ArchiveScheduler.halt` does the same from
+a thread outside the loop, for process exit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+import threading
+import time
+
+from roboToald import config
+from roboToald.db.models import sso as sso_model
+
+logger = logging.getLogger(__name__)
+
+# Delay before the first pass, so it doesn't compete with startup work.
+STARTUP_DELAY_SEC = 30.0
+
+
+class ArchiveScheduler:
+    """Runs ``archive_old_records`` on a fixed interval in the API event loop's default executor."""
+
+    def __init__(
+        self,
+        interval_hours: float | None = None,
+        chunk_size: int | None = None,
+        startup_delay: float = STARTUP_DELAY_SEC,
+    ):
+        self._interval = (
+            interval_hours if interval_hours is not None else config.AUDIT_ARCHIVE_INTERVAL_HOURS
+        ) * 3600.0
+        self._chunk_size = chunk_size or config.AUDIT_ARCHIVE_CHUNK_SIZE
+        self._startup_delay = startup_delay
+        self._stopping = threading.Event()
+        self._task: asyncio.Task | None = None
+        self._run_lock = threading.Lock()
+
+        self.runs = 0
+        self.errors = 0
+        self.audit_archived = 0
+        self.sessions_archived = 0
+        self.last_run: datetime.datetime | None = None
+        self.last_rows = 0
+        self.last_seconds = 0.0
+
+    def stats(self) -> dict:
+        """Snapshot of run counts, totals, and the last pass's throughput."""
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "audit_archived": self.audit_archived,
+            "sessions_archived": self.sessions_archived,
+            "last_run": self.last_run,
+            "last_rows": self.last_rows,
+            "last_seconds": round(self.last_seconds, 2),
+            "rows_per_sec": round(self.last_rows / self.last_seconds) if self.last_seconds else 0,
+        }
+
+    def run_once(self) -> tuple[int, int]:
+        """Archive expired rows now (blocking). Returns (audit_count, session_count)."""
+        with self._run_lock:
+            if self._stopping.is_set():
+                return 0, 0
+            started = time.perf_counter()
+            try:
+                audit_count, session_count = sso_model.archive_old_records(
+                    retention_days=config.AUDIT_RETENTION_DAYS,
+                    archive_dir=config.AUDIT_ARCHIVE_DIR,
+                    chunk_size=self._chunk_size,
+                    stop=self._stopping,
+                )
+            except Exception:
+                self.errors += 1
+                logger.exception("Audit log archival failed")
+                return 0, 0
+            self.runs += 1
+            self.audit_archived += audit_count
+            self.sessions_archived += session_count
+            self.last_run = datetime.datetime.now()
+            self.last_rows = audit_count + session_count
+            self.last_seconds = time.perf_counter() - started
+        return audit_count, session_count
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        delay = self._startup_delay
+        while True:
+            await asyncio.sleep(delay)
+            await loop.run_in_executor(None, self.run_once)
+            if self._interval <= 0:
+                return
+            delay = self._interval
+
+    def start(self) -> None:
+        """Schedule archival passes on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(
+            "Audit log archival scheduled every %.1f h (%d-row chunks)", self._interval / 3600.0, self._chunk_size
+        )
+
+    async def stop(self) -> None:
+        """Cancel future passes; a pass already running stops after its current chunk."""
+        self._stopping.set()
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Wait for an in-flight pass that the cancelled task handed to the executor.
+        await asyncio.to_thread(self.halt)
+
+    def halt(self, timeout: float = -1) -> bool:
+        """Stop passes from any thread and wait (blocking) for a running one to finish its chunk.
+
+        Returns ``False`` if *timeout* seconds passed first.  The scheduling task is left to die with
+        its loop; any pass it starts later returns at once.
+        """
+        self._stopping.set()
+        if not self._run_lock.acquire(timeout=timeout):
+            return False
+        self._run_lock.release()
+        return True
+
+
+scheduler = ArchiveScheduler()
@@ -0,0 +1,154 @@
+"""Batched, asynchronous writer for ``sso_audit_log`` rows.
+
+Installed as the ``sso_model`` audit sink while the API server runs: ``create_audit_log`` hands
+rows to :meth:`AuditLogWriter.submit` and returns without touching the database.  A worker thread
+inserts queued rows with one ``executemany`` every ``config.AUDIT_FLUSH_MS`` milliseconds.
+
+The queue is bounded (``config.AUDIT_QUEUE_SIZE``).  When it is full, ``submit`` refuses the row
+and ``create_audit_log`` writes it inline, so callers absorb the backpressure and no row is lost.
+
+A batch whose insert fails is held and retried first on the next flush (nothing more is taken from
+the queue meanwhile).  After ``MAX_FLUSH_ATTEMPTS`` failures it is written row by row, as the inline
+path does, and only rows that fail on their own are dropped.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import time
+
+from roboToald import config
+from roboToald.api.background_writer import BackgroundWriter
+from roboToald.db.models import sso as sso_model
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany; larger backlogs are written in several transactions.
+MAX_BATCH = 500
+# Failed inserts of one batch before it is written row by row.
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class AuditLogWriter(BackgroundWriter):
+    """Bounded audit-row queue drained by a background thread."""
+
+    thread_name = "audit-writer"
+    label = "Audit log writer"
+
+    def __init__(self, max_queue: int | None = None, flush_interval_ms: int | None = None):
+        super().__init__(flush_interval_ms or config.AUDIT_FLUSH_MS)
+        self._queue: queue.Queue[dict] = queue.Queue(maxsize=max_queue or config.AUDIT_QUEUE_SIZE)
+        self._retry: list[dict] = []
+        self._retry_attempts = 0
+
+        self.overflowed = 0
+        self.written = 0
+
+    # -- Producer side (any thread) -------------------------------------------
+
+    def submit(self, row: dict) -> bool:
+        """Queue an audit row. Returns ``False`` if the queue is full (caller writes it itself)."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.overflowed += 1
+            if self.overflowed == 1 or self.overflowed % 100 == 0:
+                logger.warning("Audit log queue full; %d row(s) written inline so far", self.overflowed)
+            return False
+        self.submitted += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """:meth:`BackgroundWriter.stats` plus rows held for retry, rows written inline, and rows written."""
+        return {
+            **super().stats(),
+            "retrying": len(self._retry),
+            "overflowed": self.overflowed,
+            "written": self.written,
+        }
+
+    # -- Consumer side --------------------------------------------------------
+
+    def _take_batch(self) -> list[dict]:
+        batch = []
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[dict]) -> bool:
+        started = time.perf_counter()
+        try:
+            sso_model.insert_audit_logs(batch)
+        except Exception:
+            self.errors += 1
+            logger.exception("Audit log flush of %d row(s) failed", len(batch))
+            return False
+        self._record_flush(started)
+        self.written += len(batch)
+        return True
+
+    def _write_rows(self, batch: list[dict]) -> int:
+        """Write a batch that keeps failing one row at a time, dropping only the rows that fail alone."""
+        written = 0
+        for row in batch:
+            try:
+                sso_model.insert_audit_logs([row])
+            except Exception:
+                self.dropped += 1
+                logger.exception("Dropped audit row for %r", row.get("username"))
+                continue
+            written += 1
+        self.written += written
+        return written
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while batch := self._retry or self._take_batch():
+                if self._write(batch):
+                    written += len(batch)
+                elif self._retry_attempts + 1 < MAX_FLUSH_ATTEMPTS:
+                    self._retry_attempts += 1
+                    self._retry = batch
+                    logger.warning(
+                        "Holding %d audit row(s) for retry (attempt %d of %d)",
+                        len(batch),
+                        self._retry_attempts,
+                        MAX_FLUSH_ATTEMPTS,
+                    )
+                    break
+                else:
+                    written += self._write_rows(batch)
+                self._retry, self._retry_attempts = [], 0
+        return written
+
+    def pending(self) -> int:
+        """Rows not written yet: queued plus held for retry."""
+        return self._queue.qsize() + len(self._retry)
+
+    def _drain(self) -> None:
+        # Rows submitted while the thread was exiting, and any batch still held for retry; each
+        # flush either writes a batch or moves it closer to the row-by-row fallback.
+        while self.pending():
+            self.flush()
+
+    def start(self) -> None:
+        """Start the flush thread and install this writer as the audit sink."""
+        super().start()
+        sso_model.set_audit_sink(self.submit)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Uninstall the sink, then stop the flush thread and drain the queue."""
+        sso_model.set_audit_sink(None)
+        super().stop(timeout)
+
+
+writer = AuditLogWriter()
@@ -0,0 +1,91 @@
+"""Common base for the API's batched background writers.
+
+:class:`~roboToald.api.write_behind.PresenceWriteBehind` and :class:`~roboToald.api.audit_writer.AuditLogWriter`
+both take work from request handlers and write it from one worker thread every flush interval.
+:class:`BackgroundWriter` owns that thread, the final drain on :meth:`~BackgroundWriter.stop`, and the
+counters every writer reports; subclasses supply the queue and :meth:`~BackgroundWriter.flush`.
+"""
+
+from __future__ import annotations
+
+import abc
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter(abc.ABC):
+    """Worker thread calling :meth:`flush` every *flush_interval_ms*, plus the shared counters."""
+
+    # Worker thread name and the label used in log messages.
+    thread_name = "background-writer"
+    label = "Background writer"
+
+    def __init__(self, flush_interval_ms: int):
+        self._flush_interval = flush_interval_ms / 1000.0
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.submitted = 0
+        self.flushes = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @abc.abstractmethod
+    def queue_depth(self) -> int:
+        """Items waiting to be written."""
+
+    @abc.abstractmethod
+    def flush(self) -> int:
+        """Write what is queued now. Returns the number of items written."""
+
+    def _record_flush(self, started: float) -> None:
+        """Count a successful write that began at ``time.perf_counter()`` *started*."""
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def stats(self) -> dict:
+        """Queue depth; items submitted and dropped; successful writes, failed ones, and their latency."""
+        return {
+            "queue_depth": self.queue_depth(),
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+    def _drain(self) -> None:
+        """Final write on :meth:`stop`, after the thread has exited."""
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self._flush_interval):
+            self.flush()
+        self.flush()
+
+    def start(self) -> None:
+        """Start the flush thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+        logger.info("%s started: flush every %.0f ms", self.label, self._flush_interval * 1000)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flush thread, then write anything still queued (including items submitted meanwhile)."""
+        thread = self._thread
+        if thread is not None:
+            self._stopping.set()
+            thread.join(timeout)
+            self._thread = None
+        self._drain()
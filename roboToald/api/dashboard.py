@@ -17,8 +17,13 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 from roboToald import config
+from roboToald.db import maintenance, query_profiler
 from roboToald.db.models import sso as sso_model
 from roboToald.api.websocket import manager as ws_manager
+from roboToald.api import sso_async
+from roboToald.api.archive_scheduler import scheduler as archive_scheduler
+from roboToald.api.audit_writer import writer as audit_writer
+from roboToald.api.write_behind import writer as presence_writer
 
 logger = logging.getLogger(__name__)
 
@@ -355,6 +360,11 @@ async def partial_overview(request: Request):
             "total_groups": total_groups,
             "ws_client_count": len(all_connections),
             "active_session_count": active_session_count,
+            "write_behind": presence_writer.stats(),
+            "audit_writer": audit_writer.stats(),
+            "archiver": archive_scheduler.stats(),
+            "db_maintenance": maintenance.scheduler.stats(),
+            "sso_executor": sso_async.executor.stats(),
         },
     )
 
@@ -617,3 +627,20 @@ async def partial_rate_limited(request: Request):
             "is_super": is_super,
         },
     )
+
+
+@router.get("/partials/query_profile", response_class=HTMLResponse)
+async def partial_query_profile(request: Request):
+    session = _get_session(request)
+    if not session:
+        return Response(status_code=401)
+
+    is_super = session.get("super", False)
+    return templates.TemplateResponse(
+        request,
+        "partials/query_profile.html",
+        {
+            "report": query_profiler.profiler.report() if is_super else None,
+            "is_super": is_super,
+        },
+    )
@@ -17,14 +17,27 @@ from cryptography.hazmat.primitives.ciphers import Cipher, modes
 
 from disnake.ext import commands
 from fastapi import FastAPI, HTTPException, status, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 import uvicorn
 
 from roboToald import asyncio_default_executor
 from roboToald import config
+from roboToald import metrics
+from roboToald.db import maintenance
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.raid import eqdkp_outbox
 from roboToald.db.models import sso as sso_model
-from roboToald.db import base
-from roboToald.api.websocket import manager as ws_manager, ClientConnection
+from roboToald.api.websocket import (
+    manager as ws_manager,
+    ClientConnection,
+    WS_PROTOCOL_CHARACTER_PATCHES,
+    WS_PROTOCOL_FULL_CHARACTERS,
+)
+from roboToald.api import sso_async
+from roboToald.api.archive_scheduler import scheduler as archive_scheduler
+from roboToald.api.audit_writer import writer as audit_writer
+from roboToald.api.write_behind import PendingPresence, writer as presence_writer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -199,6 +212,114 @@ logging.getLogger("uvicorn.access").addFilter(_SuppressAdminPartials())
 # Create FastAPI app
 app = FastAPI(title="RoboToald API", description="API for RoboToald SSO services")
 
+HTTP_REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "robotoald_http_request_seconds", "HTTP request latency by route and status code.", ["route", "status"]
+)
+WS_MESSAGE_SECONDS = metrics.REGISTRY.histogram(
+    "robotoald_ws_message_seconds", "Time to handle an inbound WebSocket message, by message type.", ["type"]
+)
+RATE_LIMIT_REJECTIONS = metrics.REGISTRY.counter(
+    "robotoald_rate_limit_rejections_total", "Requests refused because the client IP is rate limited.", ["endpoint"]
+)
+metrics.REGISTRY.callback(
+    "robotoald_ws_connections",
+    "Registered /ws/accounts connections per guild.",
+    lambda: {(guild_id,): n for guild_id, n in ws_manager.connection_counts().items()},
+    ["guild_id"],
+)
+metrics.REGISTRY.callback(
+    "robotoald_ws_pending_notifications",
+    "Debounced guild delta pushes waiting to fire.",
+    lambda: {(): ws_manager.pending_notify_count()},
+)
+metrics.REGISTRY.callback(
+    "robotoald_audit_log_rows_total",
+    "SSO audit log rows by outcome: written in batches, written inline (queue full), or dropped.",
+    lambda: {
+        ("batched",): (stats := audit_writer.stats())["written"],
+        ("inline",): stats["overflowed"],
+        ("dropped",): stats["dropped"],
+    },
+    ["outcome"],
+    kind="counter",
+)
+metrics.REGISTRY.callback(
+    "robotoald_audit_log_queue_depth",
+    "SSO audit log rows waiting for the background writer.",
+    lambda: {(): audit_writer.queue_depth()},
+)
+metrics.REGISTRY.callback(
+    "robotoald_archived_rows_total",
+    "Expired rows moved to gzip CSV archives by the background archiver.",
+    lambda: {
+        ("sso_audit_log",): (stats := archive_scheduler.stats())["audit_archived"],
+        ("sso_character_session",): stats["sessions_archived"],
+    },
+    ["table"],
+    kind="counter",
+)
+metrics.REGISTRY.callback(
+    "robotoald_db_pages_reclaimed_total",
+    "Free pages returned to the filesystem by background incremental vacuum, per database file.",
+    lambda: {(database,): pages for database, pages in maintenance.scheduler.stats()["pages_reclaimed"].items()},
+    ["database"],
+    kind="counter",
+)
+metrics.REGISTRY.callback(
+    "robotoald_eqdkp_cache_lookups_total",
+    "EQdkp character/points lookups by outcome: cache hit, miss (HTTP request), or coalesced onto one in flight.",
+    lambda: {
+        ("hit",): (stats := eqdkp_client.lookup_cache.stats())["hits"],
+        ("miss",): stats["misses"],
+        ("coalesced",): stats["coalesced"],
+    },
+    ["result"],
+    kind="counter",
+)
+
+metrics.REGISTRY.callback(
+    "robotoald_eqdkp_outbox_rows_total",
+    "Queued EQdkp writes by outcome: sent, skipped, retried later, failed, or resumed after a restart.",
+    lambda: {(result,): n for result, n in eqdkp_outbox.worker.stats().items()},
+    ["result"],
+    kind="counter",
+)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording ``robotoald_http_request_seconds`` for every HTTP request.
+
+    Labelled by route template (``/auth``, ``/admin/partials/{name}``) rather than raw path, so
+    the number of series stays bounded.
+    """
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(getattr(route, "path", "unmatched"), status_code).observe(
+                time.perf_counter() - started
+            )
+
+
+app.add_middleware(RequestMetricsMiddleware)
+
 # Mount the admin dashboard router
 from roboToald.api.dashboard import router as dashboard_router  # noqa: E402
 
@@ -212,6 +333,12 @@ async def _on_startup():
     loop = asyncio.get_running_loop()
     asyncio_default_executor.install_enlarged_default_executor(loop, thread_name_prefix="api-asyncio")
     ws_manager.set_event_loop(loop)
+    presence_writer.set_on_flushed(_notify_flushed_guilds)
+    presence_writer.start()
+    audit_writer.start()
+    archive_scheduler.start()
+    if config.DB_MAINTENANCE_ENABLED:
+        maintenance.scheduler.start()
     uvicorn_logger = logging.getLogger("uvicorn.error")
     for name in ("roboToald", "roboToald.api"):
         lg = logging.getLogger(name)
@@ -219,6 +346,40 @@ async def _on_startup():
         lg.setLevel(uvicorn_logger.level)
 
 
+@app.on_event("shutdown")
+async def _on_shutdown():
+    await archive_scheduler.stop()
+    await asyncio.to_thread(stop_background_work)
+
+
+# Longest wait for an archive pass to finish its current chunk on exit.
+ARCHIVE_STOP_TIMEOUT_SEC = 60.0
+
+
+def stop_background_work() -> None:
+    """Stop the API's background work in dependency order (blocking, safe to call twice).
+
+    Archival and DB maintenance finish the chunk / database they are on, SSO calls already running
+    complete (so their audit rows and presence updates are queued), then the presence write-behind
+    and the audit log writer are drained.
+
+    uvicorn runs in a daemon thread without signal handlers, so ``_on_shutdown`` does not run when
+    the bot exits; ``batphone.main`` calls this once the Discord client has returned.
+    """
+    if not archive_scheduler.halt(ARCHIVE_STOP_TIMEOUT_SEC):
+        logger.warning("Audit log archival still running after %.0fs; exiting anyway", ARCHIVE_STOP_TIMEOUT_SEC)
+    maintenance.scheduler.stop()
+    sso_async.executor.shutdown()
+    presence_writer.stop()
+    audit_writer.stop()
+
+
+def _notify_flushed_guilds(guild_ids: set[int]) -> None:
+    """Write-behind callback: schedule a debounced delta push for each guild that changed."""
+    for guild_id in guild_ids:
+        ws_manager.notify_guild(guild_id)
+
+
 def run_api_server(discord_client, certfile, keyfile, host, port):
     """
     Start the API server in a background thread, injecting the Discord client.
@@ -246,6 +407,7 @@ def run_api_server(discord_client, certfile, keyfile, host, port):
             "log_config": log_config,
             "proxy_headers": True,
             "forwarded_allow_ips": config.FORWARDED_ALLOW_IPS,
+            "ws_per_message_deflate": config.WS_PER_MESSAGE_DEFLATE,
         }
 
         # Add SSL parameters if certificates are provided
@@ -327,6 +489,10 @@ class LoginAuthResult:
     error_status: int = 401
 
 
+# Picks per tag login before giving up when other logins keep claiming the chosen account first.
+TAG_PICK_ATTEMPTS = 3
+
+
 def _perform_login_auth(
     username: str,
     guild_id: int,
@@ -344,7 +510,36 @@ def _perform_login_auth(
     rate limiting, revocation, and client version/settings enforcement.
 
     *auth_source* is ``"http"`` or ``"websocket"`` for server logs.
+
+    Blocking (database I/O); async callers run it via ``sso_async.run``.
     """
+    # A tag login picks an inactive account, which only becomes busy once last_login is stamped.
+    # Logins run concurrently on the SSO executor, so the stamp is conditional on the last_login
+    # that was picked; a login that loses the race picks again instead of sharing the account.
+    for _ in range(TAG_PICK_ATTEMPTS):
+        try:
+            return _attempt_login_auth(
+                username, guild_id, discord_user_id, client_ip, client_ver, discord_client, auth_source=auth_source
+            )
+        except sso_model.SSOAccountClaimedError:
+            continue
+    return LoginAuthResult(
+        success=False,
+        error_detail="Tag is empty (possibly temporarily, due to inactivity requirements)",
+        error_status=410,
+    )
+
+
+def _attempt_login_auth(
+    username: str,
+    guild_id: int,
+    discord_user_id: int,
+    client_ip: str,
+    client_ver: str | None,
+    discord_client=None,
+    *,
+    auth_source: str,
+) -> LoginAuthResult:
     try:
         account = sso_model.find_account_by_username(username, guild_id, inactive_only=True)
     except sso_model.SSOTagTemporarilyEmptyError:
@@ -384,6 +579,7 @@ def _perform_login_auth(
     login_name = _resolve_display_name(discord_client, guild_id, discord_user_id)
     input_name = username.lower()
     real_username = account.real_user
+    via_tag = False
     if input_name == real_username:
         auth_detail = "Authentication successful (account name)"
     elif any(c.name.lower() == input_name for c in account.characters):
@@ -392,6 +588,7 @@ def _perform_login_auth(
         auth_detail = f"Authentication successful via alias {username}"
     else:
         auth_detail = f"Authentication successful via tag {username}"
+        via_tag = True
 
     sso_model.update_last_login_and_log(
         account_id=account.id,
@@ -402,6 +599,7 @@ def _perform_login_auth(
         guild_id=guild_id,
         details=auth_detail,
         client_version=client_ver,
+        expected_last_login=account.last_login if via_tag else None,
     )
     ws_manager.notify_guild(guild_id, immediate=True)
 
@@ -424,6 +622,15 @@ def _perform_login_auth(
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus text-format metrics; only served to ``config.METRICS_ALLOW_IPS``."""
+    allowed = config.METRICS_ALLOW_IPS
+    if "*" not in allowed and (request.client is None or request.client.host not in allowed):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.post(
     "/auth",
     response_model=Union[SSOResponse, ErrorResponse],
@@ -459,18 +666,19 @@ async def authenticate(auth_data: AuthRequest, request: Request):
     client_ver = request.headers.get("X-Client-Version")
 
     # Check if the IP is rate limited
-    if sso_model.is_ip_rate_limited(client_ip, config.RATE_LIMIT_MAX_ATTEMPTS, config.RATE_LIMIT_WINDOW_MINUTES):
+    if await sso_async.is_ip_rate_limited(client_ip, config.RATE_LIMIT_MAX_ATTEMPTS, config.RATE_LIMIT_WINDOW_MINUTES):
         logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        RATE_LIMIT_REJECTIONS.labels("auth").inc()
         raise_auth_failed()
 
     # Find the discord_user_id associated with the provided password
-    access_key = sso_model.get_access_key_by_key(auth_data.password)
+    access_key = await sso_async.get_access_key_by_key(auth_data.password)
     if not access_key:
         # Log failed authentication attempt
         details = "Invalid access key"
         logger.warning(f"Authentication failed: {details} [account: {auth_data.username}]")
         # Create audit log entry before raising exception
-        sso_model.create_audit_log(
+        await sso_async.create_audit_log(
             username=auth_data.username,
             ip_address=client_ip,
             success=False,
@@ -485,9 +693,9 @@ async def authenticate(auth_data: AuthRequest, request: Request):
     discord_user_id = access_key.discord_user_id
     guild_id = access_key.guild_id
 
-    if sso_model.is_user_access_revoked(guild_id, discord_user_id):
+    if await sso_async.is_user_access_revoked(guild_id, discord_user_id):
         logger.warning(f"Authentication failed: Access revoked for user {discord_user_id}")
-        sso_model.create_audit_log(
+        await sso_async.create_audit_log(
             username=auth_data.username,
             ip_address=client_ip,
             success=False,
@@ -538,7 +746,8 @@ async def authenticate(auth_data: AuthRequest, request: Request):
             detail=settings_error,
         )
 
-    result = _perform_login_auth(
+    result = await sso_async.run(
+        _perform_login_auth,
         username=auth_data.username,
         guild_id=guild_id,
         discord_user_id=discord_user_id,
@@ -596,17 +805,20 @@ async def websocket_accounts(websocket: WebSocket):
 
     client_host = websocket.client.host if websocket.client else "unknown"
 
-    if sso_model.is_ip_rate_limited(client_host, config.RATE_LIMIT_MAX_ATTEMPTS, config.RATE_LIMIT_WINDOW_MINUTES):
+    if await sso_async.is_ip_rate_limited(
+        client_host, config.RATE_LIMIT_MAX_ATTEMPTS, config.RATE_LIMIT_WINDOW_MINUTES
+    ):
         logger.warning("WebSocket rejected: rate limit exceeded for IP %s", client_host)
+        RATE_LIMIT_REJECTIONS.labels("websocket").inc()
         await _ws_close(websocket, 4003, "Invalid access key")
         return
 
     ws_client_ver = msg.get("client_version")
 
-    access_key = sso_model.get_access_key_by_key(msg["access_key"])
+    access_key = await sso_async.get_access_key_by_key(msg["access_key"])
     if not access_key:
         logger.warning("WebSocket auth failed: invalid access key from %s", client_host)
-        sso_model.create_audit_log(
+        await sso_async.create_audit_log(
             username="ws_auth",
             ip_address=client_host,
             success=False,
@@ -642,7 +854,7 @@ async def websocket_accounts(websocket: WebSocket):
     session_ctx = _session_context_log(guild_label, user_label, client_ver, client_host)
 
     # --- Check revocation ---
-    if sso_model.is_user_access_revoked(guild_id, discord_user_id):
+    if await sso_async.is_user_access_revoked(guild_id, discord_user_id):
         logger.warning("WebSocket rejected: access revoked | %s", session_ctx)
         await _ws_close(websocket, 4003, "Access revoked")
         return
@@ -670,27 +882,33 @@ async def websocket_accounts(websocket: WebSocket):
 
     # --- Phase 2: send full state ---
     account_tree = await ws_manager.build_full_state(guild_id, discord_user_id)
-    dynamic_tag_zones, dynamic_tag_classes = sso_model.get_dynamic_tags()
+    dynamic_tag_zones, dynamic_tag_classes = await sso_async.get_dynamic_tags()
 
     conn = ClientConnection(
         websocket=websocket,
         guild_id=guild_id,
         discord_user_id=discord_user_id,
-        last_sent_state=account_tree,
+        sent_fingerprints=ws_manager.sent_fingerprints(guild_id, account_tree),
         client_version=msg.get("client_version", "unknown"),
         client_ip=client_host,
+        snapshot_version=ws_manager.snapshot_version(guild_id),
+        role_key=ws_manager.role_key(guild_id, discord_user_id),
+        compact_keys=bool(msg.get("compact_keys")),
+        protocol=_ws_protocol(msg.get("client_version", "0.0.0")),
     )
     ws_manager.register(conn)
 
     try:
-        await websocket.send_json(
-            {
-                "type": "full_state",
-                "account_tree": account_tree,
-                "count": len(account_tree),
-                "dynamic_tag_zones": list(dynamic_tag_zones.keys()),
-                "dynamic_tag_classes": list(dynamic_tag_classes.keys()),
-            }
+        await websocket.send_text(
+            ws_manager.full_state_frame(
+                guild_id,
+                account_tree,
+                compact=conn.compact_keys,
+                count=len(account_tree),
+                protocol=conn.protocol,
+                dynamic_tag_zones=list(dynamic_tag_zones.keys()),
+                dynamic_tag_classes=list(dynamic_tag_classes.keys()),
+            )
         )
         logger.info("WebSocket connected | %s | accounts=%d", session_ctx, len(account_tree))
 
@@ -718,21 +936,12 @@ async def _ws_message_loop(websocket: WebSocket, conn: ClientConnection):
             msg_type = msg.get("type")
             if msg_type == "ping":
                 await websocket.send_json({"type": "pong"})
+                continue
 
-            elif msg_type == "heartbeat":
-                await _ws_handle_heartbeat(conn, msg)
-
-            elif msg_type == "update_location":
-                await _ws_handle_update_location(conn, msg)
-
-            elif msg_type == "login_auth":
-                await _ws_handle_login_auth(conn, msg)
-
-            elif msg_type == "fte":
-                await _ws_handle_fte(conn, msg)
-
-            elif msg_type == "mob_death":
-                await _ws_handle_mob_death(conn, msg)
+            handler = _WS_HANDLERS.get(msg_type)
+            if handler is not None:
+                with WS_MESSAGE_SECONDS.time(msg_type):
+                    await handler(conn, msg)
     finally:
         ping_task.cancel()
         try:
@@ -741,55 +950,67 @@ async def _ws_message_loop(websocket: WebSocket, conn: ClientConnection):
             pass
 
 
+async def _ws_accessible_account(conn: ClientConnection, character_name: str):
+    """Resolve *character_name* to an account the connection's user may access (off the event loop)."""
+    account = await sso_async.find_account_by_character(conn.guild_id, character_name)
+    if not account:
+        return None
+    accessible = await sso_async.run(
+        user_has_access_to_accounts, ws_manager._discord_client, conn.discord_user_id, conn.guild_id, [account.id]
+    )
+    return account if accessible else None
+
+
 async def _ws_handle_heartbeat(conn: ClientConnection, msg: dict):
-    """Process a heartbeat message: update last_login, then push delta."""
+    """Process a heartbeat message: queue last_login / session writes; the flush pushes the delta."""
     character_name = msg.get("character_name")
     if not character_name:
         return
-    account = sso_model.find_account_by_character(conn.guild_id, character_name)
+    account = await _ws_accessible_account(conn, character_name)
     if not account:
         return
 
-    if not user_has_access_to_accounts(ws_manager._discord_client, conn.discord_user_id, conn.guild_id, [account.id]):
-        return
-
-    login_name = _resolve_display_name(ws_manager._discord_client, conn.guild_id, conn.discord_user_id)
-    sso_model.update_last_login(account.id, login_by=login_name)
-    sso_model.record_heartbeat_session(conn.guild_id, account.id, character_name, conn.discord_user_id)
-    sso_model.expire_other_sessions(conn.guild_id, conn.discord_user_id, account.id)
-    await ws_manager.notify_guild_async(conn.guild_id)
+    presence_writer.submit(
+        PendingPresence(
+            guild_id=conn.guild_id,
+            character_name=character_name,
+            account_id=account.id,
+            discord_user_id=conn.discord_user_id,
+            login_by=_resolve_display_name(ws_manager._discord_client, conn.guild_id, conn.discord_user_id),
+            notify=True,
+        )
+    )
 
 
 async def _ws_handle_update_location(conn: ClientConnection, msg: dict):
-    """Process an update_location message: update character, then push delta."""
+    """Process an update_location message: queue character writes; the flush pushes a delta if anything changed."""
     character_name = msg.get("character_name")
     if not character_name:
         return
-    account = sso_model.find_account_by_character(conn.guild_id, character_name)
+    account = await _ws_accessible_account(conn, character_name)
     if not account:
         return
 
-    if not user_has_access_to_accounts(ws_manager._discord_client, conn.discord_user_id, conn.guild_id, [account.id]):
-        return
-
-    login_name = _resolve_display_name(ws_manager._discord_client, conn.guild_id, conn.discord_user_id)
-    sso_model.update_last_login(account.id, login_by=login_name)
-    sso_model.record_heartbeat_session(conn.guild_id, account.id, character_name, conn.discord_user_id)
-    sso_model.expire_other_sessions(conn.guild_id, conn.discord_user_id, account.id)
-    kw = {
-        "guild_id": conn.guild_id,
-        "name": character_name,
+    fields = {
         "bind_location": msg.get("bind_location"),
         "park_location": msg.get("park_location"),
         "level": msg.get("level"),
     }
     merged = sso_model.merge_keys_and_items_message(msg)
     if merged:
-        kw.update(sso_model.merged_wires_to_character_kwargs(merged))
-    character_changed = sso_model.update_account_character(**kw)
-    key_marked = sso_model.mark_key_from_park_zone(conn.guild_id, character_name, msg.get("park_location"))
-    if character_changed or key_marked:
-        await ws_manager.notify_guild_async(conn.guild_id)
+        fields.update(sso_model.merged_wires_to_character_kwargs(merged))
+    park_location = msg.get("park_location")
+    presence_writer.submit(
+        PendingPresence(
+            guild_id=conn.guild_id,
+            character_name=character_name,
+            account_id=account.id,
+            discord_user_id=conn.discord_user_id,
+            login_by=_resolve_display_name(ws_manager._discord_client, conn.guild_id, conn.discord_user_id),
+            character_fields=fields,
+            park_zone_keys=[park_location] if park_location else [],
+        )
+    )
 
 
 async def _ws_handle_fte(conn: ClientConnection, msg: dict):
@@ -803,10 +1024,7 @@ async def _ws_handle_fte(conn: ClientConnection, msg: dict):
     parsed_log = _verify_eq_log_time_skew(eq_log_time, "fte", conn.guild_id)
     if parsed_log is None:
         return
-    account = sso_model.find_account_by_character(conn.guild_id, character_name)
-    if not account:
-        return
-    if not user_has_access_to_accounts(ws_manager._discord_client, conn.discord_user_id, conn.guild_id, [account.id]):
+    if not await _ws_accessible_account(conn, character_name):
         return
     if _tod_dedup(conn.guild_id, "fte", mob):
         return
@@ -824,10 +1042,7 @@ async def _ws_handle_mob_death(conn: ClientConnection, msg: dict):
     parsed_log = _verify_eq_log_time_skew(eq_log_time, "mob_death", conn.guild_id)
     if parsed_log is None:
         return
-    account = sso_model.find_account_by_character(conn.guild_id, character_name)
-    if not account:
-        return
-    if not user_has_access_to_accounts(ws_manager._discord_client, conn.discord_user_id, conn.guild_id, [account.id]):
+    if not await _ws_accessible_account(conn, character_name):
         return
     if _tod_dedup(conn.guild_id, "death", mob):
         return
@@ -852,7 +1067,8 @@ async def _ws_handle_login_auth(conn: ClientConnection, msg: dict):
         return
 
     discord_client = ws_manager._discord_client
-    result = _perform_login_auth(
+    result = await sso_async.run(
+        _perform_login_auth,
         username=username,
         guild_id=conn.guild_id,
         discord_user_id=conn.discord_user_id,
@@ -883,6 +1099,16 @@ async def _ws_handle_login_auth(conn: ClientConnection, msg: dict):
         )
 
 
+# Inbound client message types (other than ``ping``) and their handlers.
+_WS_HANDLERS = {
+    "heartbeat": _ws_handle_heartbeat,
+    "update_location": _ws_handle_update_location,
+    "login_auth": _ws_handle_login_auth,
+    "fte": _ws_handle_fte,
+    "mob_death": _ws_handle_mob_death,
+}
+
+
 async def _ws_ping_loop(websocket: WebSocket):
     """Send application-level pings at a regular interval.
 
@@ -920,6 +1146,14 @@ def _parse_version(ver: str) -> tuple:
     return tuple(parts)
 
 
+def _ws_protocol(client_ver: str) -> int:
+    """Delta protocol version for a client, from its reported version and ``ws_character_patch_min_version``."""
+    min_ver = config.WS_CHARACTER_PATCH_MIN_VERSION
+    if min_ver and _parse_version(client_ver) >= _parse_version(min_ver):
+        return WS_PROTOCOL_CHARACTER_PATCHES
+    return WS_PROTOCOL_FULL_CHARACTERS
+
+
 async def _ws_close(websocket: WebSocket, code: int, reason: str):
     """Send an error message and close the WebSocket."""
     try:
@@ -1034,48 +1268,18 @@ def raise_tag_temporarily_empty():
 
 def user_has_access_to_accounts(
     discord_client: commands.Bot, discord_user_id: int, guild_id: int, account_ids: list[int]
-) -> list[sso_model.SSOAccount]:
+) -> list[int]:
     """Return the subset of *account_ids* accessible to the Discord user.
 
-    Uses a single bulk query instead of per-account/per-group lookups.
+    Answered from the guild's cached access index (``sso_model.get_access_index``); only the first
+    check after a group or membership change touches the database.
     """
-    import sqlalchemy.orm
-
     role_ids = _get_user_role_ids(discord_client, guild_id, discord_user_id)
     if not role_ids or not account_ids:
         return []
 
-    with base.get_session() as session:
-        try:
-            accessible_ids = {
-                row[0]
-                for row in session.query(sso_model.account_group_mapping.c.account_id)
-                .join(
-                    sso_model.SSOAccountGroup,
-                    sso_model.account_group_mapping.c.group_id == sso_model.SSOAccountGroup.id,
-                )
-                .filter(
-                    sso_model.account_group_mapping.c.account_id.in_(account_ids),
-                    sso_model.SSOAccountGroup.guild_id == guild_id,
-                    sso_model.SSOAccountGroup.role_id.in_(role_ids),
-                )
-                .all()
-            }
-            if not accessible_ids:
-                return []
-            accounts = (
-                session.query(sso_model.SSOAccount)
-                .options(
-                    sqlalchemy.orm.joinedload(sso_model.SSOAccount.groups),
-                    sqlalchemy.orm.joinedload(sso_model.SSOAccount.characters),
-                    sqlalchemy.orm.joinedload(sso_model.SSOAccount.tags),
-                    sqlalchemy.orm.joinedload(sso_model.SSOAccount.aliases),
-                )
-                .filter(sso_model.SSOAccount.id.in_(accessible_ids))
-                .all()
-            )
-            session.expunge_all()
-            return accounts
-        except Exception as e:
-            logger.error(f"Error checking user access: {e}")
-            return []
+    try:
+        return sso_model.accessible_account_ids(guild_id, role_ids, account_ids)
+    except Exception as e:
+        logger.error(f"Error checking user access: {e}")
+        return []
@@ -0,0 +1,135 @@
+"""Executor-backed async facade over the SSO model for the API's request paths.
+
+``roboToald.db.models.sso`` is synchronous SQLAlchemy over SQLite.  Calling it from an ``async def``
+handler runs the query (and any commit waiting on the SQLite write lock) on the uvicorn event loop,
+stalling every WebSocket on the server for its duration.  The coroutines here run those calls on a
+dedicated, bounded thread pool (``config.SSO_DB_EXECUTOR_WORKERS``) instead, so ``/auth``,
+``websocket_accounts`` and ``login_auth`` await their database work off the loop.
+
+A separate pool, rather than the loop's default executor, keeps a login rush from queueing behind
+(or starving) snapshot refreshes and other ``asyncio.to_thread`` users, and gives the dashboard a
+queue depth and latency for just the SSO path.
+
+Model functions are looked up on ``sso_model`` at call time, so tests that monkeypatch
+``roboToald.api.server.sso_model.<name>`` keep working through the facade.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+from roboToald import config
+from roboToald.db.models import sso as sso_model
+
+T = TypeVar("T")
+
+
+class SSOExecutor:
+    """Bounded thread pool for blocking SSO model calls, with queue/latency counters."""
+
+    def __init__(self, max_workers: int | None = None):
+        self._max_workers = max_workers or config.SSO_DB_EXECUTOR_WORKERS
+        self._pool: concurrent.futures.ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.last_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.max_call_ms = 0.0
+
+    def _get_pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="sso-db"
+                )
+            return self._pool
+
+    async def run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Run ``func(*args, **kwargs)`` on the pool and await its result."""
+        submitted = time.perf_counter()
+        timing = {}
+
+        def call():
+            started = time.perf_counter()
+            timing["wait"] = started - submitted
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timing["call"] = time.perf_counter() - started
+
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), call)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            if "wait" in timing:
+                self.last_wait_ms = timing["wait"] * 1000.0
+                self.max_wait_ms = max(self.max_wait_ms, self.last_wait_ms)
+            if "call" in timing:
+                self.max_call_ms = max(self.max_call_ms, timing["call"] * 1000.0)
+
+    def stats(self) -> dict:
+        """Snapshot of pool size, in-flight calls, and queue wait / call latency counters."""
+        return {
+            "max_workers": self._max_workers,
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "last_wait_ms": round(self.last_wait_ms, 2),
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "max_call_ms": round(self.max_call_ms, 2),
+        }
+
+    def shutdown(self) -> None:
+        """Wait for running calls and release the worker threads (a later ``run`` starts a new pool)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+# Process-wide executor used by the API server.
+executor = SSOExecutor()
+
+
+async def run(func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Run a blocking SSO call on the shared executor."""
+    return await executor.run(func, *args, **kwargs)
+
+
+async def is_ip_rate_limited(ip_address: str, max_attempts: int, minutes: int) -> bool:
+    return await run(sso_model.is_ip_rate_limited, ip_address, max_attempts, minutes)
+
+
+async def get_access_key_by_key(key: str):
+    return await run(sso_model.get_access_key_by_key, key)
+
+
+async def is_user_access_revoked(guild_id: int, discord_user_id: int) -> bool:
+    return await run(sso_model.is_user_access_revoked, guild_id, discord_user_id)
+
+
+async def create_audit_log(**kwargs):
+    return await run(sso_model.create_audit_log, **kwargs)
+
+
+async def get_dynamic_tags():
+    return await run(sso_model.get_dynamic_tags)
+
+
+async def find_account_by_character(guild_id: int, character_name: str):
+    return await run(sso_model.find_account_by_character, guild_id, character_name)
@@ -2,20 +2,50 @@
 
 import asyncio
 import datetime
+import json
 import logging
 import threading
+import time
+from collections import deque
 from dataclasses import dataclass, field
 
 from fastapi import WebSocket
 from starlette.websockets import WebSocketDisconnect, WebSocketState
 
+from roboToald import metrics
+from roboToald.db import invalidation
 from roboToald.db.models import sso as sso_model
 
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 # Coalesce rapid notify_guild calls (heartbeats, location updates) into one delta push per guild.
 WS_NOTIFY_DEBOUNCE_SEC = 3.0
 
+# Guild snapshots are kept current by ``sso_model`` change listeners; reload them in full this often
+# anyway so writes that bypass the model helpers (scripts, manual SQL) still reach clients.
+WS_SNAPSHOT_MAX_AGE_SEC = 300.0
+
+NOTIFY_GUILD_SECONDS = metrics.REGISTRY.histogram(
+    "robotoald_ws_notify_guild_seconds", "Time to refresh a guild snapshot and push deltas to its clients."
+)
+BUILD_FULL_STATE_SECONDS = metrics.REGISTRY.histogram(
+    "robotoald_ws_build_full_state_seconds", "Time to build a client's full_state account tree."
+)
+
+# How many snapshot versions of changed account names to keep for connections that fall behind.
+WS_SNAPSHOT_HISTORY = 32
+
+# Delta protocol versions, chosen per connection from its ``client_version`` (see ``ws_character_patch_min_version``).
+# 1: ``characters.update`` carries the full character entry.
+# 2: changed characters go in ``characters.patch`` with only the changed fields and item keys.
+WS_PROTOCOL_FULL_CHARACTERS = 1
+WS_PROTOCOL_CHARACTER_PATCHES = 2
+
 # Temporary: also emit legacy ``keys`` (seb/vp/st only) on each character for old login-proxy builds.
 # Set False and remove ``_legacy_keys_subset`` usage to drop outbound ``keys``.
 INCLUDE_LEGACY_KEYS_ON_ACCOUNT_TREE = True
@@ -77,29 +107,104 @@ def build_account_tree(accessible_accounts, active_characters: dict[int, str] |
     """
     if active_characters is None:
         active_characters = {}
-    tree = {}
-    for account in accessible_accounts:
-        tree[account.real_user] = {
-            "aliases": [alias.alias for alias in account.aliases],
-            "tags": [tag.tag for tag in account.tags],
-            "characters": {char.name: _build_character_tree_entry(char) for char in account.characters},
-            "last_login": (
-                account.last_login.astimezone(datetime.timezone.utc).isoformat()
-                if account.last_login and account.last_login.year > 1
-                else None
-            ),
-            "last_login_by": account.last_login_by,
-            "active_character": active_characters.get(account.id),
-        }
-    return tree
-
-
-def compute_diff(old_tree: dict, new_tree: dict) -> list[dict]:
+    return {
+        account.real_user: _build_account_tree_entry(account, active_characters.get(account.id))
+        for account in accessible_accounts
+    }
+
+
+def _build_account_tree_entry(account, active_character: str | None) -> dict:
+    return {
+        "aliases": [alias.alias for alias in account.aliases],
+        "tags": [tag.tag for tag in account.tags],
+        "characters": {char.name: _build_character_tree_entry(char) for char in account.characters},
+        "last_login": (
+            account.last_login.astimezone(datetime.timezone.utc).isoformat()
+            if account.last_login and account.last_login.year > 1
+            else None
+        ),
+        "last_login_by": account.last_login_by,
+        "active_character": active_character,
+    }
+
+
+def _encode_message(message) -> str:
+    """Serialize a message once so the same frame can be sent to many sockets.
+
+    Uses ``orjson`` when installed; output matches ``WebSocket.send_json`` (compact separators, UTF-8).
+    """
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+# Short field names for clients that send ``"compact_keys": true`` in their auth message.
+COMPACT_ACCOUNT_KEYS = {
+    "aliases": "a",
+    "tags": "t",
+    "characters": "c",
+    "last_login": "ll",
+    "last_login_by": "lb",
+    "active_character": "ac",
+}
+COMPACT_CHARACTER_KEYS = {"class": "k", "bind": "b", "park": "p", "level": "l", "items": "i"}
+
+
+def _compact_character(entry: dict) -> dict:
+    # Compact clients are new enough to read ``items``; the legacy ``keys`` copy is dropped.
+    return {COMPACT_CHARACTER_KEYS[k]: v for k, v in entry.items() if k in COMPACT_CHARACTER_KEYS}
+
+
+def _compact_characters_diff(char_diff: dict) -> dict:
+    out = dict(char_diff)
+    for op in ("add", "update", "patch"):
+        if op in out:
+            out[op] = {name: _compact_character(c) for name, c in out[op].items()}
+    return out
+
+
+def _compact_account(entry: dict) -> dict:
+    out = {}
+    for key, value in entry.items():
+        if key == "characters":
+            value = {name: _compact_character(c) for name, c in value.items()}
+        out[COMPACT_ACCOUNT_KEYS.get(key, key)] = value
+    return out
+
+
+def compact_tree(tree: dict) -> dict:
+    """``account_tree`` with compact field names (account and character names are unchanged)."""
+    return {name: _compact_account(entry) for name, entry in tree.items()}
+
+
+def compact_changes(changes: list[dict]) -> list[dict]:
+    """Delta ``changes`` with compact field names inside ``data`` and ``fields``."""
+    out = []
+    for change in changes:
+        change = dict(change)
+        if "data" in change:
+            change["data"] = _compact_account(change["data"])
+        if "fields" in change:
+            fields = {}
+            for key, value in change["fields"].items():
+                if key == "characters":
+                    value = _compact_characters_diff(value)
+                fields[COMPACT_ACCOUNT_KEYS.get(key, key)] = value
+            change["fields"] = fields
+        out.append(change)
+    return out
+
+
+def _encode_tree(tree: dict, compact: bool) -> str:
+    return _encode_message(compact_tree(tree) if compact else tree)
+
+
+def compute_diff(old_tree: dict, new_tree: dict, protocol: int = WS_PROTOCOL_FULL_CHARACTERS) -> list[dict]:
     """Compute granular changes between two account_tree dicts.
 
     Handles:
       - aliases/tags as sets (add/remove)
-      - characters as dicts (add/remove/update with full entry)
+      - characters as dicts (add/remove/update with full entry, or patch under protocol 2)
       - last_login as a scalar
     """
     changes: list[dict] = []
@@ -107,83 +212,337 @@ def compute_diff(old_tree: dict, new_tree: dict) -> list[dict]:
     new_keys = set(new_tree.keys())
 
     for key in sorted(new_keys - old_keys):
-        changes.append(
-            {
-                "action": "add",
-                "entity": "account",
-                "account": key,
-                "data": new_tree[key],
-            }
-        )
+        changes.append(_add_change(key, new_tree[key]))
 
     for key in sorted(old_keys - new_keys):
-        changes.append(
-            {
-                "action": "remove",
-                "entity": "account",
-                "account": key,
-            }
-        )
+        changes.append(_remove_change(key))
 
     for key in sorted(old_keys & new_keys):
         old_data = old_tree[key]
         new_data = new_tree[key]
         if old_data == new_data:
             continue
+        change = _update_change(key, old_data, new_data, protocol)
+        if change:
+            changes.append(change)
+
+    return changes
+
+
+def _add_change(key: str, data: dict) -> dict:
+    return {"action": "add", "entity": "account", "account": key, "data": data}
+
+
+def _remove_change(key: str) -> dict:
+    return {"action": "remove", "entity": "account", "account": key}
+
+
+def _character_patch(old: dict, new: dict) -> dict:
+    """Fields of character entry *new* that differ from *old*, with ``items`` reduced to changed keys.
+
+    The legacy ``keys`` copy is left out; clients that accept patches read ``items``.
+    """
+    patch = {}
+    for name, value in new.items():
+        if name == "keys":
+            continue
+        old_value = old.get(name)
+        if value == old_value:
+            continue
+        if name == "items" and isinstance(old_value, dict):
+            value = {k: v for k, v in value.items() if old_value.get(k) != v}
+            value.update((k, None) for k in old_value.keys() - new["items"].keys())
+        patch[name] = value
+    return patch
+
+
+def _update_change(
+    key: str, old_data: dict, new_data: dict, protocol: int = WS_PROTOCOL_FULL_CHARACTERS
+) -> dict | None:
+    """Field-level ``update`` change for one account, or ``None`` if no field differs.
 
-        fields: dict = {}
-
-        # Set-based fields
-        for f in ("aliases", "tags"):
-            old_set = set(old_data.get(f, []))
-            new_set = set(new_data.get(f, []))
-            added = sorted(new_set - old_set)
-            removed = sorted(old_set - new_set)
-            if added or removed:
-                fields[f] = {"add": added, "remove": removed}
-
-        # Dict-based characters field
-        old_chars = old_data.get("characters", {})
-        new_chars = new_data.get("characters", {})
-        if old_chars != new_chars:
-            char_diff = {}
-            old_ckeys = set(old_chars.keys())
-            new_ckeys = set(new_chars.keys())
-
-            added_chars = {k: new_chars[k] for k in sorted(new_ckeys - old_ckeys)}
-            removed_chars = sorted(old_ckeys - new_ckeys)
-            updated_chars = {}
-            for ck in sorted(old_ckeys & new_ckeys):
-                if old_chars[ck] != new_chars[ck]:
+    With :data:`WS_PROTOCOL_CHARACTER_PATCHES`, changed characters are sent as ``patch`` entries
+    (see :func:`_character_patch`) instead of full ``update`` entries.
+    """
+    fields: dict = {}
+
+    # Set-based fields
+    for f in ("aliases", "tags"):
+        old_set = set(old_data.get(f, []))
+        new_set = set(new_data.get(f, []))
+        added = sorted(new_set - old_set)
+        removed = sorted(old_set - new_set)
+        if added or removed:
+            fields[f] = {"add": added, "remove": removed}
+
+    # Dict-based characters field
+    old_chars = old_data.get("characters", {})
+    new_chars = new_data.get("characters", {})
+    if old_chars != new_chars:
+        char_diff = {}
+        old_ckeys = set(old_chars.keys())
+        new_ckeys = set(new_chars.keys())
+
+        added_chars = {k: new_chars[k] for k in sorted(new_ckeys - old_ckeys)}
+        removed_chars = sorted(old_ckeys - new_ckeys)
+        updated_chars = {}
+        for ck in sorted(old_ckeys & new_ckeys):
+            if old_chars[ck] != new_chars[ck]:
+                if protocol >= WS_PROTOCOL_CHARACTER_PATCHES:
+                    updated_chars[ck] = _character_patch(old_chars[ck], new_chars[ck])
+                else:
                     updated_chars[ck] = new_chars[ck]
 
-            if added_chars:
-                char_diff["add"] = added_chars
-            if removed_chars:
-                char_diff["remove"] = removed_chars
-            if updated_chars:
-                char_diff["update"] = updated_chars
-            if char_diff:
-                fields["characters"] = char_diff
-
-        # Scalar fields
-        for scalar in ("last_login", "last_login_by", "active_character"):
-            old_val = old_data.get(scalar)
-            new_val = new_data.get(scalar)
-            if old_val != new_val:
-                fields[scalar] = new_val
-
-        if fields:
-            changes.append(
-                {
-                    "action": "update",
-                    "entity": "account",
-                    "account": key,
-                    "fields": fields,
-                }
+        if added_chars:
+            char_diff["add"] = added_chars
+        if removed_chars:
+            char_diff["remove"] = removed_chars
+        if updated_chars:
+            char_diff["patch" if protocol >= WS_PROTOCOL_CHARACTER_PATCHES else "update"] = updated_chars
+        if char_diff:
+            fields["characters"] = char_diff
+
+    # Scalar fields
+    for scalar in ("last_login", "last_login_by", "active_character"):
+        old_val = old_data.get(scalar)
+        new_val = new_data.get(scalar)
+        if old_val != new_val:
+            fields[scalar] = new_val
+
+    if not fields:
+        return None
+    return {"action": "update", "entity": "account", "account": key, "fields": fields}
+
+
+class TreeEntry(dict):
+    """An ``account_tree`` entry tagged with a fingerprint of its content.
+
+    Serializes like a plain dict.  The fingerprint is the hash of the entry's encoded JSON, computed
+    once when the snapshot builds the entry; equal fingerprints mean equal content, so delta pushes
+    compare fingerprints and only descend into accounts whose fingerprint moved.
+    """
+
+    __slots__ = ("fingerprint",)
+
+    def __init__(self, data: dict):
+        super().__init__(data)
+        self.fingerprint = hash(_encode_message(data))
+
+
+class GuildSnapshot:
+    """Versioned in-memory copy of one guild's accounts and their prebuilt tree entries.
+
+    SSO mutators report changed account IDs through :meth:`mark_changed` (any thread); the next
+    :meth:`refresh` reloads only those accounts plus the active-character map and bumps
+    :attr:`version`.  Tree entries are :class:`TreeEntry` dicts that are replaced, never mutated.
+    Connections remember only the fingerprint of each entry they were sent; entries replaced within
+    the last ``WS_SNAPSHOT_HISTORY`` versions stay reachable through :meth:`entry_for` so a changed
+    account can still be diffed field by field.
+
+    Trees are cached per *role key*: the frozenset of a member's role IDs that grant access to at
+    least one account, per the guild's access index (``sso_model.get_access_index``, the same one
+    ``/auth`` checks).  Members with the same role key see the same tree; a new access index bumps
+    :attr:`version` like an account change.
+    """
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.version = 0
+        self.accounts: dict[int, object] = {}
+        self.entries: dict[int, TreeEntry] = {}
+        self.active_characters: dict[int, str] = {}
+        self.access_index: sso_model.AccessIndex | None = None
+        self.group_role_ids: frozenset[int] = frozenset()
+        self.loaded_at = 0.0
+        self._trees: dict[frozenset[int], dict] = {}
+        self._fingerprint_maps: dict[frozenset[int], dict[str, int]] = {}
+        # Current and recently replaced entries by fingerprint, and (version, fingerprint) of each
+        # replacement so old entries can be dropped once no connection can still hold them.
+        self._by_fingerprint: dict[int, TreeEntry] = {}
+        self._retired: deque[tuple[int, int]] = deque()
+        self._encoded_trees: dict[tuple[frozenset[int], bool], str] = {}
+        # (version, real_user names whose entry changed in that version)
+        self._history: deque[tuple[int, frozenset[str]]] = deque(maxlen=WS_SNAPSHOT_HISTORY)
+        self._dirty: set[int] = set()
+        self._reload_all = True
+        self._dirty_lock = threading.Lock()
+
+    def mark_changed(self, account_ids: set[int] | None) -> None:
+        """Flag accounts for reload on the next refresh (``None`` reloads the whole guild)."""
+        with self._dirty_lock:
+            if account_ids is None:
+                self._reload_all = True
+            else:
+                self._dirty |= account_ids
+
+    def changed_since(self, version: int) -> frozenset[str] | None:
+        """Account names changed after *version*, or ``None`` if the history no longer covers it."""
+        if version == self.version:
+            return frozenset()
+        if not self._history or version < self._history[0][0] - 1:
+            return None
+        names: set[str] = set()
+        for v, changed in self._history:
+            if v > version:
+                names |= changed
+        return frozenset(names)
+
+    def refresh(self) -> bool:
+        """Reload dirty accounts from the database. Blocking; run via ``asyncio.to_thread``.
+
+        Returns ``True`` if the snapshot changed (and :attr:`version` was bumped).
+        """
+        with self._dirty_lock:
+            reload_all = self._reload_all or time.monotonic() - self.loaded_at > WS_SNAPSHOT_MAX_AGE_SEC
+            dirty, self._dirty = self._dirty, set()
+            self._reload_all = False
+
+        try:
+            active_characters = sso_model.get_active_characters(self.guild_id)
+            if reload_all:
+                loaded = sso_model.list_accounts(self.guild_id)
+            elif dirty:
+                loaded = sso_model.list_accounts(self.guild_id, account_ids=dirty)
+            else:
+                loaded = []
+            access_index = sso_model.get_access_index(self.guild_id)
+        except Exception:
+            self.mark_changed(None if reload_all else dirty)
+            raise
+
+        if reload_all:
+            accounts = {a.id: a for a in loaded}
+            self.loaded_at = time.monotonic()
+            changed_ids = set(accounts) | set(self.accounts)
+        else:
+            accounts = dict(self.accounts)
+            for account_id in dirty:
+                accounts.pop(account_id, None)
+            accounts.update((a.id, a) for a in loaded)
+            changed_ids = set(dirty)
+            for account_id in set(active_characters) | set(self.active_characters):
+                if active_characters.get(account_id) != self.active_characters.get(account_id):
+                    changed_ids.add(account_id)
+
+        entries = dict(self.entries)
+        changed_names: set[str] = set()
+        retired: list[int] = []
+        for account_id in changed_ids:
+            old = self.accounts.get(account_id)
+            new = accounts.get(account_id)
+            current = entries.get(account_id)
+            if old is not None:
+                changed_names.add(old.real_user)
+            if new is None:
+                if current is not None:
+                    retired.append(entries.pop(account_id).fingerprint)
+                continue
+            entry = TreeEntry(_build_account_tree_entry(new, active_characters.get(account_id)))
+            if (
+                old is None
+                or old.real_user != new.real_user
+                or current is None
+                or current.fingerprint != entry.fingerprint
+            ):
+                if current is not None:
+                    retired.append(current.fingerprint)
+                entries[account_id] = self._by_fingerprint[entry.fingerprint] = entry
+                changed_names.add(new.real_user)
+            else:
+                changed_names.discard(old.real_user)
+
+        if access_index is not self.access_index:
+            # Group grants changed: any account may have become visible or hidden to a role.
+            changed_names |= {a.real_user for a in self.accounts.values()}
+            changed_names |= {a.real_user for a in accounts.values()}
+            self.access_index = access_index
+            self.group_role_ids = frozenset(
+                role_id
+                for role_id, group_ids in access_index.role_groups.items()
+                if any(access_index.group_accounts.get(group_id) for group_id in group_ids)
             )
 
-    return changes
+        self.accounts = accounts
+        self.entries = entries
+        self.active_characters = active_characters
+        if not changed_names:
+            return False
+        self._trees = {}
+        self._fingerprint_maps = {}
+        self._encoded_trees = {}
+        self.version += 1
+        self._history.append((self.version, frozenset(changed_names)))
+        self._retired.extend((self.version, fp) for fp in retired)
+        self._prune_retired()
+        return True
+
+    def _prune_retired(self) -> None:
+        # A connection diffed against the history holds a version >= the oldest history version - 1,
+        # so it can only reference entries replaced after that.
+        cutoff = self.version - WS_SNAPSHOT_HISTORY - 1
+        if not self._retired or self._retired[0][0] > cutoff:
+            return
+        live = {entry.fingerprint for entry in self.entries.values()}
+        while self._retired and self._retired[0][0] <= cutoff:
+            fp = self._retired.popleft()[1]
+            if fp not in live:
+                self._by_fingerprint.pop(fp, None)
+
+    def entry_for(self, fingerprint: int) -> TreeEntry | None:
+        """The current or recently replaced entry with *fingerprint* (``None`` once it has aged out)."""
+        return self._by_fingerprint.get(fingerprint)
+
+    def role_key(self, member_role_ids) -> frozenset[int]:
+        """Reduce a member's roles to the ones that grant access to any account group."""
+        return self.group_role_ids.intersection(member_role_ids)
+
+    def tree_for_roles(self, role_key: frozenset[int]) -> dict:
+        """Account tree visible to *role_key*, built once per snapshot version.
+
+        The returned dict is shared between callers and must not be mutated.
+        """
+        tree = self._trees.get(role_key)
+        if tree is None:
+            allowed = self.access_index.account_ids_for_roles(role_key) if role_key else set()
+            tree = self._trees[role_key] = {
+                a.real_user: self.entries[a.id] for a in self.accounts.values() if a.id in allowed
+            }
+        return tree
+
+    def fingerprints_for_roles(self, role_key: frozenset[int]) -> dict[str, int]:
+        """``{real_user: fingerprint}`` for :meth:`tree_for_roles`, built once per snapshot version.
+
+        The returned dict is shared between connections and must not be mutated.
+        """
+        fingerprints = self._fingerprint_maps.get(role_key)
+        if fingerprints is None:
+            fingerprints = self._fingerprint_maps[role_key] = tree_fingerprints(self.tree_for_roles(role_key))
+        return fingerprints
+
+    def sent_fingerprints(self, tree: dict) -> dict[str, int]:
+        """Fingerprints of *tree*, shared when it is one of this version's role-key trees."""
+        for role_key, cached in self._trees.items():
+            if cached is tree:
+                return self.fingerprints_for_roles(role_key)
+        return tree_fingerprints(tree)
+
+    def encoded_tree(self, tree: dict, compact: bool) -> str:
+        """JSON for *tree*, cached when it is one of this version's role-key trees."""
+        for role_key, cached in self._trees.items():
+            if cached is tree:
+                encoded = self._encoded_trees.get((role_key, compact))
+                if encoded is None:
+                    encoded = self._encoded_trees[(role_key, compact)] = _encode_tree(tree, compact)
+                return encoded
+        return _encode_tree(tree, compact)
+
+
+def tree_fingerprints(tree: dict) -> dict[str, int]:
+    """``{real_user: fingerprint}`` for an account tree (plain-dict entries are fingerprinted here)."""
+    return {
+        name: entry.fingerprint if isinstance(entry, TreeEntry) else TreeEntry(entry).fingerprint
+        for name, entry in tree.items()
+    }
 
 
 @dataclass
@@ -191,10 +550,19 @@ class ClientConnection:
     websocket: WebSocket
     guild_id: int
     discord_user_id: int
-    last_sent_state: dict = field(default_factory=dict)
+    # ``{real_user: TreeEntry.fingerprint}`` of the account tree this client holds.
+    sent_fingerprints: dict[str, int] = field(default_factory=dict)
     connected_at: datetime.datetime = field(default_factory=datetime.datetime.now)
     client_version: str = "unknown"
     client_ip: str = ""
+    # GuildSnapshot.version that ``sent_fingerprints`` reflects; -1 forces a full diff on the next push.
+    snapshot_version: int = -1
+    # GuildSnapshot.role_key that ``sent_fingerprints`` was built for; None until known.
+    role_key: frozenset[int] | None = None
+    # Client asked for compact field names (see ``COMPACT_ACCOUNT_KEYS``).
+    compact_keys: bool = False
+    # Delta protocol version (``WS_PROTOCOL_*``) negotiated from ``client_version``.
+    protocol: int = WS_PROTOCOL_FULL_CHARACTERS
 
 
 class ConnectionManager:
@@ -206,6 +574,8 @@ class ConnectionManager:
         self._loop: asyncio.AbstractEventLoop | None = None
         self._discord_client = None
         self._pending_guild_handles: dict[int, asyncio.TimerHandle] = {}
+        self._snapshots: dict[int, GuildSnapshot] = {}
+        self._snapshot_locks: dict[int, asyncio.Lock] = {}
 
     def set_event_loop(self, loop: asyncio.AbstractEventLoop):
         self._loop = loop
@@ -221,6 +591,18 @@ class ConnectionManager:
         with self._lock:
             self._connections = [c for c in self._connections if c.websocket is not websocket]
 
+    def connection_counts(self) -> dict[int, int]:
+        """Number of registered connections per guild."""
+        counts: dict[int, int] = {}
+        with self._lock:
+            for conn in self._connections:
+                counts[conn.guild_id] = counts.get(conn.guild_id, 0) + 1
+        return counts
+
+    def pending_notify_count(self) -> int:
+        """Debounced guild notifications scheduled but not yet fired."""
+        return len(self._pending_guild_handles)
+
     def _get_connections_for_guild(self, guild_id: int) -> list[ClientConnection]:
         with self._lock:
             return [c for c in self._connections if c.guild_id == guild_id]
@@ -328,34 +710,112 @@ class ConnectionManager:
         self._cancel_debounce(guild_id)
         self._pending_guild_handles[guild_id] = loop.call_later(WS_NOTIFY_DEBOUNCE_SEC, fire)
 
-    # -- Internal -------------------------------------------------------------
+    def mark_accounts_changed(self, guild_id: int, account_ids: set[int] | None) -> None:
+        """Flag accounts for the next snapshot refresh (fed by :meth:`on_accounts_changed`).
 
-    def _filter_accessible(self, discord_user_id: int, guild_id: int, accounts: list) -> list:
-        """Filter accounts to those accessible by the user's Discord roles.
-
-        Relies on the ``groups`` relationship already being loaded on each
-        account (e.g. via ``joinedload``), so this does **no** DB queries.
+        Safe to call from any thread.  Does not schedule a push; callers still use :meth:`notify_guild`.
         """
+        self._get_snapshot(guild_id).mark_changed(account_ids)
+
+    def on_accounts_changed(self, event: invalidation.AccountsChanged) -> None:
+        """Invalidation-bus subscriber for :class:`~roboToald.db.invalidation.AccountsChanged`."""
+        self.mark_accounts_changed(event.guild_id, None if event.account_ids is None else set(event.account_ids))
+
+    def role_key(self, guild_id: int, discord_user_id: int) -> frozenset[int]:
+        """Access-granting role IDs for a member against the current guild snapshot."""
+        return self._get_snapshot(guild_id).role_key(self._member_role_ids(guild_id, discord_user_id))
+
+    def snapshot_version(self, guild_id: int) -> int:
+        """Current snapshot version for *guild_id* (``-1`` if not loaded yet)."""
+        with self._lock:
+            snapshot = self._snapshots.get(guild_id)
+        return snapshot.version if snapshot is not None and snapshot.loaded_at else -1
+
+    # -- Internal -------------------------------------------------------------
+
+    def _get_snapshot(self, guild_id: int) -> GuildSnapshot:
+        with self._lock:
+            snapshot = self._snapshots.get(guild_id)
+            if snapshot is None:
+                snapshot = self._snapshots[guild_id] = GuildSnapshot(guild_id)
+            return snapshot
+
+    async def _refreshed_snapshot(self, guild_id: int) -> GuildSnapshot:
+        """Bring the guild snapshot up to date. Must be called with the guild's snapshot lock held."""
+        snapshot = self._get_snapshot(guild_id)
+        await asyncio.to_thread(snapshot.refresh)
+        return snapshot
+
+    def _snapshot_lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._snapshot_locks.get(guild_id)
+        if lock is None:
+            lock = self._snapshot_locks[guild_id] = asyncio.Lock()
+        return lock
+
+    def _member_role_ids(self, guild_id: int, discord_user_id: int) -> set[int]:
+        """Role IDs of a guild member from the Discord cache (empty if unknown)."""
         if not self._discord_client:
-            return []
+            return set()
         guild = self._discord_client.get_guild(guild_id)
         member = guild.get_member(discord_user_id) if guild else None
         if member is None:
-            return []
-        role_ids = {role.id for role in member.roles}
-        return [a for a in accounts if any(g.role_id in role_ids for g in a.groups)]
+            return set()
+        return {role.id for role in member.roles}
 
     async def _notify_guild_async(self, guild_id: int):
         connections = self._get_connections_for_guild(guild_id)
         if not connections:
             return
 
-        all_accounts = await asyncio.to_thread(sso_model.list_accounts, guild_id)
-        active_characters = await asyncio.to_thread(sso_model.get_active_characters, guild_id)
+        with NOTIFY_GUILD_SECONDS.time():
+            async with self._snapshot_lock(guild_id):
+                snapshot = await self._refreshed_snapshot(guild_id)
+                await self._push_snapshot(guild_id, snapshot, connections)
+
+    async def _push_snapshot(self, guild_id: int, snapshot: GuildSnapshot, connections: list[ClientConnection]):
+        # Connections with the same previous role key, current role key and snapshot version hold the
+        # same ``sent_fingerprints``, so they share one diff (per delta protocol) and one serialized frame.  Connections whose
+        # state can't be vouched for (new, or too far behind the snapshot history) are diffed alone.
+        groups: dict[tuple, tuple[frozenset[int], list[ClientConnection]]] = {}
+        for conn in connections:
+            if conn.websocket.client_state != WebSocketState.CONNECTED:
+                self.unregister(conn.websocket)
+                continue
+            role_key = snapshot.role_key(self._member_role_ids(guild_id, conn.discord_user_id))
+            if conn.role_key is None or snapshot.changed_since(conn.snapshot_version) is None:
+                group_key = (id(conn), role_key)
+            else:
+                group_key = (conn.role_key, role_key, conn.snapshot_version, conn.protocol)
+            groups.setdefault(group_key, (role_key, []))[1].append(conn)
+
+        await asyncio.gather(
+            *[self._push_group(guild_id, snapshot, role_key, conns) for role_key, conns in groups.values()]
+        )
 
-        async def _safe_push(conn: ClientConnection):
+    async def _push_group(
+        self, guild_id: int, snapshot: GuildSnapshot, role_key: frozenset[int], connections: list[ClientConnection]
+    ):
+        changes, sent = self._diff_for(connections[0], snapshot, role_key)
+        for conn in connections:
+            conn.snapshot_version = snapshot.version
+            conn.role_key = role_key
+            conn.sent_fingerprints = sent
+        if not changes:
+            return
+        # Serialized once per encoding, shared by every socket in the group.
+        frames: dict[bool, str] = {}
+
+        def _frame(compact: bool) -> str:
+            frame = frames.get(compact)
+            if frame is None:
+                frame = frames[compact] = _encode_message(
+                    {"type": "delta", "changes": compact_changes(changes) if compact else changes}
+                )
+            return frame
+
+        async def _safe_send(conn: ClientConnection):
             try:
-                await self._push_delta(conn, guild_id, all_accounts, active_characters)
+                await conn.websocket.send_text(_frame(conn.compact_keys))
             except WebSocketDisconnect:
                 logger.info(
                     "WS client disconnected during delta push guild=%s user=%s",
@@ -372,29 +832,91 @@ class ConnectionManager:
                 )
                 self.unregister(conn.websocket)
 
-        await asyncio.gather(*[_safe_push(conn) for conn in connections])
+        await asyncio.gather(*[_safe_send(conn) for conn in connections])
 
-    async def _push_delta(self, conn: ClientConnection, guild_id: int, all_accounts, active_characters: dict[int, str]):
-        if conn.websocket.client_state != WebSocketState.CONNECTED:
-            self.unregister(conn.websocket)
-            return
+    @staticmethod
+    def _diff_for(
+        conn: ClientConnection, snapshot: GuildSnapshot, role_key: frozenset[int]
+    ) -> tuple[list, dict[str, int]]:
+        """Changes to bring *conn* up to *snapshot* for *role_key*, and the fingerprints it will then hold.
 
-        accessible = self._filter_accessible(conn.discord_user_id, guild_id, all_accounts)
-        new_tree = build_account_tree(accessible, active_characters)
-        changes = compute_diff(conn.last_sent_state, new_tree)
+        Accounts whose fingerprint is unchanged are skipped without looking at their content.
+        """
+        new_tree = snapshot.tree_for_roles(role_key)
+        new_fps = snapshot.fingerprints_for_roles(role_key)
+        sent = conn.sent_fingerprints
+        changed = snapshot.changed_since(conn.snapshot_version)
+        full = changed is None or conn.role_key is None
+        if full:
+            names = sent.keys() | new_fps.keys()
+        else:
+            # Only accounts that changed since this client's last push, or whose visibility changed.
+            names = set(changed) | (new_fps.keys() ^ sent.keys())
+        moved = sorted(n for n in names if sent.get(n) != new_fps.get(n))
+        if not moved:
+            return [], sent
+
+        added: list[dict] = []
+        removed: list[dict] = []
+        updated: list[dict] = []
+        for name in moved:
+            old_fp = sent.get(name)
+            if old_fp is None:
+                added.append(_add_change(name, new_tree[name]))
+            elif name not in new_tree:
+                removed.append(_remove_change(name))
+            else:
+                old_entry = snapshot.entry_for(old_fp)
+                if old_entry is None:
+                    # The entry this client holds has aged out; replace the account wholesale.
+                    updated += [_remove_change(name), _add_change(name, new_tree[name])]
+                else:
+                    change = _update_change(name, old_entry, new_tree[name], conn.protocol)
+                    if change:
+                        updated.append(change)
+        if full:
+            return added + removed + updated, new_fps
+        sent_state = dict(sent)
+        for name in moved:
+            if name in new_fps:
+                sent_state[name] = new_fps[name]
+            else:
+                sent_state.pop(name, None)
+        return added + removed + updated, sent_state
 
-        if changes:
-            conn.last_sent_state = new_tree
-            await conn.websocket.send_json({"type": "delta", "changes": changes})
+    async def _push_delta(self, conn: ClientConnection, snapshot: GuildSnapshot):
+        """Push a delta to a single connection (see :meth:`_push_snapshot` for the grouped path)."""
+        await self._push_snapshot(conn.guild_id, snapshot, [conn])
 
     async def build_full_state(self, guild_id: int, discord_user_id: int) -> dict:
         """Build the full account_tree for a user (used on initial WS auth)."""
-        all_accounts, active_characters = await asyncio.gather(
-            asyncio.to_thread(sso_model.list_accounts, guild_id),
-            asyncio.to_thread(sso_model.get_active_characters, guild_id),
-        )
-        accessible = self._filter_accessible(discord_user_id, guild_id, all_accounts)
-        return build_account_tree(accessible, active_characters)
+        with BUILD_FULL_STATE_SECONDS.time():
+            async with self._snapshot_lock(guild_id):
+                snapshot = await self._refreshed_snapshot(guild_id)
+                role_key = snapshot.role_key(self._member_role_ids(guild_id, discord_user_id))
+                # Shared with the snapshot (and other connections); callers must not mutate it.
+                return snapshot.tree_for_roles(role_key)
+
+    def sent_fingerprints(self, guild_id: int, account_tree: dict) -> dict[str, int]:
+        """``ClientConnection.sent_fingerprints`` for a tree from :meth:`build_full_state`.
+
+        Shared across connections that share a role key and snapshot version.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(guild_id)
+        return snapshot.sent_fingerprints(account_tree) if snapshot else tree_fingerprints(account_tree)
+
+    def full_state_frame(self, guild_id: int, account_tree: dict, compact: bool = False, **fields) -> str:
+        """Serialized ``full_state`` message for *account_tree* plus extra top-level *fields*.
+
+        The tree JSON is reused across connections that share a role key and snapshot version.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(guild_id)
+        tree_json = snapshot.encoded_tree(account_tree, compact) if snapshot else _encode_tree(account_tree, compact)
+        rest = _encode_message(fields)[1:] if fields else "}"
+        return '{"type":"full_state","account_tree":' + tree_json + ("," + rest if fields else rest)
 
 
 manager = ConnectionManager()
+invalidation.subscribe(invalidation.AccountsChanged, manager.on_accounts_changed)
@@ -0,0 +1,170 @@
+"""Write-behind pipeline for WebSocket heartbeat / ``update_location`` persistence.
+
+Handlers on the uvicorn loop enqueue a :class:`PendingPresence` and return immediately.
+Entries are coalesced per ``(guild_id, character_name)`` and flushed in a single
+transaction by a worker thread every ``config.WS_WRITE_BEHIND_FLUSH_MS`` milliseconds.
+A failed flush (e.g. ``SQLITE_BUSY``) puts the batch back, under anything queued since, and is
+retried on the next flush; an entry is dropped only after ``MAX_FLUSH_ATTEMPTS`` failures.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from roboToald import config
+from roboToald.api.background_writer import BackgroundWriter
+from roboToald.db.models import sso as sso_model
+
+logger = logging.getLogger(__name__)
+
+# ``update_account_character`` treats empty strings as "not reported" for these fields.
+_FALSY_IS_UNSET = frozenset({"klass", "bind_location", "park_location"})
+# Failed flushes an entry survives before it is dropped.
+MAX_FLUSH_ATTEMPTS = 5
+
+
+def _merge_character_fields(old: dict, new: dict) -> dict:
+    """Overlay *new* on *old*, skipping values ``update_account_character`` would ignore."""
+    merged = dict(old)
+    for key, value in new.items():
+        if value is None or (key in _FALSY_IS_UNSET and not value):
+            continue
+        merged[key] = value
+    return merged
+
+
+@dataclass
+class PendingPresence:
+    """One coalesced presence write for a character."""
+
+    guild_id: int
+    character_name: str
+    account_id: int
+    discord_user_id: int
+    login_by: str | None = None
+    seen_at: datetime.datetime = field(default_factory=datetime.datetime.now)
+    # Keyword arguments for ``sso_model.update_account_character`` (minus guild_id / name).
+    character_fields: dict = field(default_factory=dict)
+    park_zone_keys: list[str] = field(default_factory=list)
+    # Heartbeats always refresh ``last_login`` on clients; location updates only when the row changed.
+    notify: bool = False
+    # Failed flushes this entry has been part of.
+    attempts: int = 0
+
+    def absorb(self, newer: PendingPresence) -> None:
+        """Fold a later entry for the same character into this one."""
+        self.account_id = newer.account_id
+        self.discord_user_id = newer.discord_user_id
+        if newer.login_by is not None:
+            self.login_by = newer.login_by
+        self.seen_at = max(self.seen_at, newer.seen_at)
+        self.character_fields = _merge_character_fields(self.character_fields, newer.character_fields)
+        for zone_key in newer.park_zone_keys:
+            if zone_key not in self.park_zone_keys:
+                self.park_zone_keys.append(zone_key)
+        self.notify = self.notify or newer.notify
+
+
+class PresenceWriteBehind(BackgroundWriter):
+    """Coalescing write-behind queue drained by a background thread."""
+
+    thread_name = "ws-write-behind"
+    label = "Presence write-behind"
+
+    def __init__(self, flush_interval_ms: int | None = None):
+        super().__init__(flush_interval_ms or config.WS_WRITE_BEHIND_FLUSH_MS)
+        self._pending: dict[tuple[int, str], PendingPresence] = {}
+        self._lock = threading.Lock()
+        self._on_flushed: Callable[[set[int]], None] | None = None
+
+        self.coalesced = 0
+        self.flushed_entries = 0
+
+    def set_on_flushed(self, callback: Callable[[set[int]], None] | None) -> None:
+        """Register a callback receiving the guild IDs to notify after each flush."""
+        self._on_flushed = callback
+
+    # -- Producer side (any thread) -------------------------------------------
+
+    def submit(self, entry: PendingPresence) -> None:
+        key = (entry.guild_id, entry.character_name)
+        with self._lock:
+            self.submitted += 1
+            existing = self._pending.pop(key, None)
+            if existing is not None:
+                existing.absorb(entry)
+                entry = existing
+                self.coalesced += 1
+            # Re-insert so flush order follows the most recent update.
+            self._pending[key] = entry
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        """:meth:`BackgroundWriter.stats` plus entries merged into a queued one and entries written."""
+        return {**super().stats(), "coalesced": self.coalesced, "flushed_entries": self.flushed_entries}
+
+    # -- Consumer side --------------------------------------------------------
+
+    def flush(self) -> int:
+        """Write everything queued so far in one transaction. Returns the number of entries written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending.values())
+                self._pending = {}
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                changed_guilds = sso_model.apply_presence_updates(batch)
+            except Exception:
+                self.errors += 1
+                dropped = self._requeue(batch)
+                logger.exception(
+                    "Write-behind flush failed; requeued %d presence update(s), dropped %d",
+                    len(batch) - dropped,
+                    dropped,
+                )
+                return 0
+            self._record_flush(started)
+            self.flushed_entries += len(batch)
+
+        notify_guilds = changed_guilds | {e.guild_id for e in batch if e.notify}
+        if notify_guilds and self._on_flushed is not None:
+            try:
+                self._on_flushed(notify_guilds)
+            except Exception:
+                logger.exception("Write-behind flush callback failed")
+        return len(batch)
+
+    def _requeue(self, batch: list[PendingPresence]) -> int:
+        """Put a failed *batch* back ahead of newer entries, which still win when merged. Returns drops."""
+        requeued: dict[tuple[int, str], PendingPresence] = {}
+        dropped = 0
+        for entry in batch:
+            entry.attempts += 1
+            if entry.attempts >= MAX_FLUSH_ATTEMPTS:
+                dropped += 1
+                continue
+            requeued[(entry.guild_id, entry.character_name)] = entry
+        with self._lock:
+            for key, newer in self._pending.items():
+                entry = requeued.pop(key, None)
+                if entry is not None:
+                    entry.absorb(newer)
+                    newer = entry
+                requeued[key] = newer
+            self._pending = requeued
+        self.dropped += dropped
+        return dropped
+
+
+writer = PresenceWriteBehind()
@@ -63,6 +63,22 @@ for _section in CONF.sections():
             "adjustment_event_id": CONF.getint(_section, "adjustment_event_id", fallback=0),
         }
 
+# Shared EQdkp HTTP client tuning (eqdkp/client.py): pooled keep-alive connections per base URL.
+EQDKP_MAX_CONNECTIONS = CONF.getint("eqdkp", "max_connections", fallback=8)
+EQDKP_TIMEOUT_SEC = CONF.getfloat("eqdkp", "timeout_sec", fallback=15.0)
+EQDKP_KEEPALIVE_SEC = CONF.getfloat("eqdkp", "keepalive_sec", fallback=30.0)
+EQDKP_MAX_RETRIES = CONF.getint("eqdkp", "max_retries", fallback=3)
+EQDKP_RETRY_BACKOFF_MS = CONF.getint("eqdkp", "retry_backoff_ms", fallback=250)
+EQDKP_RETRY_MAX_BACKOFF_MS = CONF.getint("eqdkp", "retry_max_backoff_ms", fallback=4000)
+# Read-through lookup cache: found characters / Discord links, points, and "not found" answers.
+EQDKP_CACHE_HIT_TTL_SEC = CONF.getfloat("eqdkp", "cache_hit_ttl_sec", fallback=600.0)
+EQDKP_CACHE_POINTS_TTL_SEC = CONF.getfloat("eqdkp", "cache_points_ttl_sec", fallback=60.0)
+EQDKP_CACHE_MISS_TTL_SEC = CONF.getfloat("eqdkp", "cache_miss_ttl_sec", fallback=30.0)
+# Durable outbox for EQdkp writes (raid/eqdkp_outbox.py).
+EQDKP_OUTBOX_POLL_SEC = CONF.getfloat("eqdkp", "outbox_poll_sec", fallback=15.0)
+EQDKP_OUTBOX_MAX_ATTEMPTS = CONF.getint("eqdkp", "outbox_max_attempts", fallback=5)
+EQDKP_OUTBOX_RETRY_SEC = CONF.getfloat("eqdkp", "outbox_retry_sec", fallback=30.0)
+
 # Per-guild Pushsafer settings — parsed from [pushsafer.<guild_id>] sections
 PUSHSAFER_SETTINGS: dict[int, dict] = {}
 for _section in CONF.sections():
@@ -90,13 +106,57 @@ RATE_LIMIT_MAX_ATTEMPTS = CONF.getint("sso", "rate_limit_max_attempts", fallback
 RATE_LIMIT_WINDOW_MINUTES = CONF.getint("sso", "rate_limit_window_minutes", fallback=30)
 AUDIT_RETENTION_DAYS = CONF.getint("sso", "audit_retention_days", fallback=180)
 AUDIT_ARCHIVE_DIR = CONF.get("sso", "audit_archive_dir", fallback="audit_archives")
+# Expired rows are archived in the background (api/archive_scheduler.py); 0 = once at startup only.
+AUDIT_ARCHIVE_INTERVAL_HOURS = CONF.getfloat("sso", "audit_archive_interval_hours", fallback=24.0)
+AUDIT_ARCHIVE_CHUNK_SIZE = CONF.getint("sso", "audit_archive_chunk_size", fallback=1000)
 DASHBOARD_BASE_URL = CONF.get("sso", "dashboard_base_url", fallback=None)
 DASHBOARD_SUPER_ADMINS: set[int] = {
     int(x.strip()) for x in CONF.get("sso", "dashboard_super_admins", fallback="").split(",") if x.strip()
 }
 REQUIRE_KEYS_FOR_DYNAMIC_TAGS = CONF.getboolean("sso", "require_keys_for_dynamic_tags", fallback=False)
+# Write-behind flush interval for WebSocket heartbeat / update_location persistence.
+WS_WRITE_BEHIND_FLUSH_MS = CONF.getint("sso", "write_behind_flush_ms", fallback=250)
+# Audit log rows are queued and inserted in batches by a background thread (api/audit_writer.py).
+AUDIT_FLUSH_MS = CONF.getint("sso", "audit_flush_ms", fallback=250)
+AUDIT_QUEUE_SIZE = CONF.getint("sso", "audit_queue_size", fallback=10000)
+# Negotiate permessage-deflate on /ws/accounts (smaller account_tree frames for some CPU per send).
+WS_PER_MESSAGE_DEFLATE = CONF.getboolean("sso", "ws_per_message_deflate", fallback=True)
+# First client_version that receives field-level character patches in deltas (empty = nobody).
+WS_CHARACTER_PATCH_MIN_VERSION = CONF.get("sso", "ws_character_patch_min_version", fallback="").strip()
 # Default asyncio thread pool for asyncio.to_thread / run_in_executor (Python default is min(32, cpu+4)).
 ASYNCIO_DEFAULT_THREAD_POOL_MAX_WORKERS = CONF.getint("sso", "asyncio_default_thread_pool_max_workers", fallback=64)
+# Dedicated pool for SSO database calls made by /auth and the WebSocket handlers (api/sso_async.py).
+SSO_DB_EXECUTOR_WORKERS = CONF.getint("sso", "db_executor_workers", fallback=16)
+# Client IPs allowed to scrape /metrics ("*" = anyone).
+METRICS_ALLOW_IPS = {
+    x.strip() for x in CONF.get("sso", "metrics_allow_ips", fallback="127.0.0.1, ::1").split(",") if x.strip()
+}
+
+# SQLite tuning applied on connect to the main database and every per-guild raid database
+# (db.base.create_sqlite_engine).  WAL lets readers run alongside the writer; busy_timeout makes
+# writers wait for the lock instead of failing with "database is locked".
+DB_JOURNAL_MODE = CONF.get("database", "journal_mode", fallback="WAL")
+DB_SYNCHRONOUS = CONF.get("database", "synchronous", fallback="NORMAL")
+DB_BUSY_TIMEOUT_MS = CONF.getint("database", "busy_timeout_ms", fallback=5000)
+DB_MMAP_SIZE = CONF.getint("database", "mmap_size", fallback=256 * 1024 * 1024)
+DB_CACHE_SIZE = CONF.getint("database", "cache_size", fallback=-16000)  # negative = KiB per connection
+DB_POOL_SIZE = CONF.getint("database", "pool_size", fallback=8)
+DB_MAX_OVERFLOW = CONF.getint("database", "max_overflow", fallback=24)
+DB_POOL_TIMEOUT = CONF.getint("database", "pool_timeout", fallback=30)
+# Opt-in query profiler (db/query_profiler.py): statement fingerprints, per-session query counts,
+# N+1 / slow statement reports on the admin dashboard.  Off by default; adds per-query overhead.
+DB_QUERY_PROFILING = CONF.getboolean("database", "query_profiling", fallback=False)
+DB_SLOW_QUERY_MS = CONF.getint("database", "slow_query_ms", fallback=100)
+DB_SESSION_QUERY_THRESHOLD = CONF.getint("database", "session_query_threshold", fallback=50)
+DB_REPEAT_QUERY_THRESHOLD = CONF.getint("database", "repeat_query_threshold", fallback=10)
+# Background maintenance (db/maintenance.py): PRAGMA optimize / ANALYZE, incremental vacuum and a WAL
+# checkpoint on every database, at most once per interval and only inside the windows (HH:MM-HH:MM,
+# comma-separated, in maintenance_zone) so it never runs during raid prime time.
+DB_MAINTENANCE_ENABLED = CONF.getboolean("database", "maintenance", fallback=True)
+DB_MAINTENANCE_WINDOWS = CONF.get("database", "maintenance_windows", fallback="05:00-11:00")
+DB_MAINTENANCE_ZONE = zoneinfo.ZoneInfo(CONF.get("database", "maintenance_zone", fallback="America/New_York"))
+DB_MAINTENANCE_INTERVAL_HOURS = CONF.getfloat("database", "maintenance_interval_hours", fallback=24.0)
+DB_MAINTENANCE_VACUUM_PAGES = CONF.getint("database", "maintenance_vacuum_pages", fallback=0)  # 0 = all free pages
 
 WAKEUP_CHANNELS = {}
 GUILD_SETTINGS = {}
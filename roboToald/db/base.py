@@ -2,9 +2,13 @@ import contextlib
 import logging
 
 import sqlalchemy
+import sqlalchemy.event
 import sqlalchemy.orm
 
+from roboToald import config
 from roboToald import exceptions
+from roboToald import metrics
+from roboToald.db import query_profiler
 
 logger = logging.getLogger(__name__)
 
@@ -31,10 +35,64 @@ class MyBase:
             session.commit()
 
 
+def sqlite_pragmas() -> list[str]:
+    """PRAGMA statements run on every new SQLite connection, from the ``[database]`` config section."""
+    return [
+        f"PRAGMA journal_mode={config.DB_JOURNAL_MODE}",
+        f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA synchronous={config.DB_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={int(config.DB_MMAP_SIZE)}",
+        f"PRAGMA cache_size={int(config.DB_CACHE_SIZE)}",
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(path: str) -> sqlalchemy.engine.Engine:
+    """Create a pooled engine for the SQLite file at *path* with the configured pragmas applied on connect.
+
+    Queries are timed into ``robotoald_db_query_seconds`` (see :mod:`roboToald.metrics`).
+    """
+    engine = sqlalchemy.create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        future=True,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+    )
+    sqlalchemy.event.listen(engine, "connect", _apply_sqlite_pragmas)
+    metrics.instrument_engine(engine)
+    if config.DB_QUERY_PROFILING:
+        query_profiler.instrument_engine(engine, path)
+    return engine
+
+
+def create_tables(metadata: sqlalchemy.MetaData, engine: sqlalchemy.engine.Engine) -> None:
+    """``metadata.create_all`` on *engine*, switching a new (table-less) database to incremental auto-vacuum first.
+
+    Connecting in WAL mode has already written the database header, so the mode change needs a
+    ``VACUUM`` (instant on an empty file).  Existing databases are converted by migration.  It lets
+    :mod:`roboToald.db.maintenance` return free pages to the OS.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not sqlalchemy.inspect(conn).get_table_names():
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+    metadata.create_all(engine)
+
+
 # get_engine returns a Singleton engine object
 def get_engine(store={}) -> sqlalchemy.engine.Engine:
     if not store:
-        store["engine"] = sqlalchemy.create_engine("sqlite:///data/alerts.db", echo=False, future=True)
+        store["engine"] = create_sqlite_engine("data/alerts.db")
     return store["engine"]
 
 
@@ -49,14 +107,14 @@ def initialize_database(run_migrations=True):
     engine = get_engine()
 
     if not run_migrations:
-        Base.metadata.create_all(engine)
+        create_tables(Base.metadata, engine)
         return
 
     try:
         from roboToald.db.migrations import upgrade_database, stamp_database
     except ImportError:
         logger.info("Alembic not available — falling back to create_all().")
-        Base.metadata.create_all(engine)
+        create_tables(Base.metadata, engine)
         return
 
     inspector = sqlalchemy.inspect(engine)
@@ -66,7 +124,7 @@ def initialize_database(run_migrations=True):
 
     if not has_app_tables:
         logger.info("Fresh database detected — creating tables and stamping head.")
-        Base.metadata.create_all(engine)
+        create_tables(Base.metadata, engine)
         stamp_database()
     elif not has_alembic:
         logger.info("Pre-Alembic database detected — stamping head.")
@@ -80,5 +138,5 @@ def initialize_database(run_migrations=True):
 
 @contextlib.contextmanager
 def get_session(autocommit=False) -> sqlalchemy.orm.Session:
-    with sqlalchemy.orm.Session(get_engine(), autocommit=autocommit) as SESSION:
+    with sqlalchemy.orm.Session(get_engine(), autocommit=autocommit) as SESSION, query_profiler.profile_session():
         yield SESSION
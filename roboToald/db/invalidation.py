@@ -0,0 +1,115 @@
+"""In-process invalidation bus for caches shared by the Discord bot and API threads.
+
+Model mutators publish a typed event after they commit; every in-process cache subscribes to the
+event types it depends on and updates only the affected entries:
+
+===========================  ==========================================================
+Event                        Subscribers
+===========================  ==========================================================
+:class:`AccessKeyChanged`    access-key cache (one key swapped, nothing re-decrypted)
+:class:`RevocationAdded`     revocation cache (entry appended)
+:class:`RevocationsRemoved`  revocation cache (user's entry dropped)
+:class:`NamesChanged`        name-resolution index (and dynamic-tag index for characters)
+:class:`GroupsChanged`       ACL index
+:class:`AccountsChanged`     WebSocket guild snapshots (accounts reloaded on next push)
+===========================  ==========================================================
+
+Handlers run synchronously on the publishing thread, so a mutator returns only after every cache
+has seen its change.  Handlers must therefore be quick and thread-safe; a failing handler is logged
+and does not stop the others.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AccessKeyChanged:
+    """A member's access key was created, reset (*record* holds the new key) or deleted (*record* is None)."""
+
+    guild_id: int
+    discord_user_id: int
+    record: Any = None
+
+
+@dataclass(frozen=True)
+class RevocationAdded:
+    guild_id: int
+    discord_user_id: int
+    expiry_days: int
+    timestamp: datetime.datetime
+
+
+@dataclass(frozen=True)
+class RevocationsRemoved:
+    """All active revocations for a member were lifted."""
+
+    guild_id: int
+    discord_user_id: int
+
+
+@dataclass(frozen=True)
+class NamesChanged:
+    """Account names, aliases, tags or (with *characters*) characters were added, renamed or removed."""
+
+    guild_id: int
+    characters: bool = False
+
+
+@dataclass(frozen=True)
+class GroupsChanged:
+    """Groups or group membership changed in a guild."""
+
+    guild_id: int
+
+
+@dataclass(frozen=True)
+class AccountsChanged:
+    """What ``sso.list_accounts`` returns for *account_ids* changed (``None``: the whole guild)."""
+
+    guild_id: int
+    account_ids: frozenset[int] | None = None
+
+
+E = TypeVar("E")
+
+
+class InvalidationBus:
+    """Type-keyed publish/subscribe, safe to use from any thread."""
+
+    def __init__(self):
+        self._handlers: dict[type, tuple[Callable, ...]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type: type[E], handler: Callable[[E], None]) -> None:
+        with self._lock:
+            handlers = self._handlers.get(event_type, ())
+            if handler not in handlers:
+                self._handlers[event_type] = (*handlers, handler)
+
+    def unsubscribe(self, event_type: type, handler: Callable) -> None:
+        with self._lock:
+            self._handlers[event_type] = tuple(h for h in self._handlers.get(event_type, ()) if h != handler)
+
+    def subscribers(self, event_type: type) -> tuple[Callable, ...]:
+        return self._handlers.get(event_type, ())
+
+    def publish(self, event) -> None:
+        for handler in self._handlers.get(type(event), ()):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Invalidation handler %r failed for %r", handler, event)
+
+
+bus = InvalidationBus()
+subscribe = bus.subscribe
+unsubscribe = bus.unsubscribe
+publish = bus.publish
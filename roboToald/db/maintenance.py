@@ -0,0 +1,219 @@
+"""Background SQLite maintenance for the main database and every per-guild raid database.
+
+Audit logs, character sessions and raid attendance grow without bound, and nothing else refreshes
+the planner's statistics or returns freed pages to the filesystem.  Each pass visits the engine
+from ``base.get_engine`` and ``raid_base.get_raid_engine`` for every raid guild and runs:
+
+1. ``PRAGMA optimize`` (or a full ``ANALYZE`` the first time, while ``sqlite_stat1`` is missing),
+2. ``PRAGMA incremental_vacuum`` to release free pages (databases use ``auto_vacuum=INCREMENTAL``,
+   set on creation by ``base.create_tables`` and on existing files by migration),
+3. ``PRAGMA wal_checkpoint(TRUNCATE)`` so the ``-wal`` file shrinks back to zero.
+
+:class:`MaintenanceScheduler` runs a pass at most every ``DB_MAINTENANCE_INTERVAL_HOURS``, and only
+while the local time in ``DB_MAINTENANCE_ZONE`` is inside one of ``DB_MAINTENANCE_WINDOWS``, so the
+brief write locks these statements take never land in raid prime time.  Time spent and pages
+reclaimed are logged per database and shown on the admin dashboard.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import sqlalchemy
+
+from roboToald import config
+from roboToald.db import base, raid_base
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA auto_vacuum value for INCREMENTAL.
+AUTO_VACUUM_INCREMENTAL = 2
+# How often the scheduler thread wakes to check whether a pass is due.
+CHECK_INTERVAL_SEC = 60.0
+
+
+@dataclass
+class MaintenanceResult:
+    database: str
+    seconds: float
+    analyzed: bool  # full ANALYZE rather than PRAGMA optimize
+    pages_reclaimed: int
+    free_pages: int  # still on the freelist afterwards
+    wal_frames: int  # frames checkpointed into the database
+    checkpoint_busy: bool  # readers kept the checkpoint from completing
+
+
+def parse_windows(text: str) -> list[tuple[datetime.time, datetime.time]]:
+    """Parse ``"HH:MM-HH:MM, ..."`` into (start, end) pairs; a window may wrap past midnight."""
+    windows = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            start, end = (datetime.time.fromisoformat(t.strip()) for t in part.split("-"))
+        except ValueError as e:
+            raise ValueError(f"Invalid maintenance window {part!r} (expected HH:MM-HH:MM)") from e
+        windows.append((start, end))
+    return windows
+
+
+def in_window(now: datetime.time, windows: list[tuple[datetime.time, datetime.time]]) -> bool:
+    for start, end in windows:
+        if start <= end:
+            if start <= now < end:
+                return True
+        elif now >= start or now < end:
+            return True
+    return False
+
+
+def maintain_engine(engine: sqlalchemy.engine.Engine, vacuum_pages: int = 0) -> MaintenanceResult:
+    """Optimize, incrementally vacuum (*vacuum_pages* at most, 0 = all free pages) and checkpoint *engine*."""
+    started = time.perf_counter()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        analyzed = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first() is None
+        conn.exec_driver_sql("ANALYZE" if analyzed else "PRAGMA optimize")
+
+        free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        reclaimed = 0
+        if free_pages and conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL:
+            # sqlite3's execute() steps a statement only once, and incremental_vacuum frees one page
+            # per step; executescript() steps it to completion.
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+            remaining = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            reclaimed, free_pages = free_pages - remaining, remaining
+
+        busy, _log_frames, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+    return MaintenanceResult(
+        database=os.path.basename(engine.url.database or ""),
+        seconds=time.perf_counter() - started,
+        analyzed=analyzed,
+        pages_reclaimed=reclaimed,
+        free_pages=free_pages,
+        wal_frames=max(checkpointed, 0),
+        checkpoint_busy=bool(busy),
+    )
+
+
+def engines() -> list[sqlalchemy.engine.Engine]:
+    """The main database engine followed by each configured raid guild's engine."""
+    return [base.get_engine(), *(raid_base.get_raid_engine(gid) for gid in config.raid_guild_ids())]
+
+
+class MaintenanceScheduler:
+    """Background thread running :func:`maintain_engine` over :func:`engines` inside the configured windows."""
+
+    def __init__(
+        self,
+        windows: str | None = None,
+        interval_hours: float | None = None,
+        vacuum_pages: int | None = None,
+        zone: datetime.tzinfo | None = None,
+        check_interval: float = CHECK_INTERVAL_SEC,
+    ):
+        self._windows = parse_windows(windows if windows is not None else config.DB_MAINTENANCE_WINDOWS)
+        self._interval = (
+            interval_hours if interval_hours is not None else config.DB_MAINTENANCE_INTERVAL_HOURS
+        ) * 3600.0
+        self._vacuum_pages = vacuum_pages if vacuum_pages is not None else config.DB_MAINTENANCE_VACUUM_PAGES
+        self._zone = zone or config.DB_MAINTENANCE_ZONE
+        self._check_interval = check_interval
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_started: float | None = None
+
+        self.runs = 0
+        self.errors = 0
+        self.last_run: datetime.datetime | None = None
+        self.last_seconds = 0.0
+        self.last_results: list[MaintenanceResult] = []
+        self.pages_reclaimed: dict[str, int] = {}
+
+    def stats(self) -> dict:
+        """Snapshot of run counts, pages reclaimed per database, and the last pass's results."""
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "last_seconds": round(self.last_seconds, 2),
+            "last_pages_reclaimed": sum(r.pages_reclaimed for r in self.last_results),
+            "pages_reclaimed": dict(self.pages_reclaimed),
+            "last_results": [asdict(r) for r in self.last_results],
+        }
+
+    def due(self, now: datetime.datetime | None = None) -> bool:
+        """Whether *now* (default: the current time) is inside a window and the interval has elapsed."""
+        now = now or datetime.datetime.now(self._zone)
+        if not in_window(now.time(), self._windows):
+            return False
+        return self._last_started is None or time.monotonic() - self._last_started >= self._interval
+
+    def run_once(self) -> list[MaintenanceResult]:
+        """Maintain every database now. A database that fails is logged and skipped."""
+        self._last_started = time.monotonic()
+        started = time.perf_counter()
+        results = []
+        for engine in engines():
+            if self._stopping.is_set():
+                break
+            try:
+                result = maintain_engine(engine, self._vacuum_pages)
+            except Exception:
+                self.errors += 1
+                logger.exception("Maintenance of %s failed", engine.url.database)
+                continue
+            results.append(result)
+            self.pages_reclaimed[result.database] = (
+                self.pages_reclaimed.get(result.database, 0) + result.pages_reclaimed
+            )
+            logger.info(
+                "Maintained %s in %.1f ms: %s, %d page(s) reclaimed (%d free), %d WAL frame(s) checkpointed%s",
+                result.database,
+                result.seconds * 1000.0,
+                "ANALYZE" if result.analyzed else "optimize",
+                result.pages_reclaimed,
+                result.free_pages,
+                result.wal_frames,
+                " (busy)" if result.checkpoint_busy else "",
+            )
+        self.runs += 1
+        self.last_run = datetime.datetime.now()
+        self.last_seconds = time.perf_counter() - started
+        self.last_results = results
+        return results
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self._check_interval):
+            if self.due():
+                self.run_once()
+
+    def start(self) -> None:
+        """Start the scheduler thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Database maintenance scheduled every %.1f h within %s (%s)",
+            self._interval / 3600.0,
+            ", ".join(f"{s:%H:%M}-{e:%H:%M}" for s, e in self._windows) or "no windows",
+            self._zone,
+        )
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Stop the thread; a pass in progress finishes the database it is on."""
+        thread = self._thread
+        if thread is not None:
+            self._stopping.set()
+            thread.join(timeout)
+            self._thread = None
+
+
+scheduler = MaintenanceScheduler()
@@ -1,9 +1,13 @@
-from typing import List
+import logging
+import re
+from typing import List, NamedTuple
 
 import sqlalchemy.orm
 
 from roboToald.db import base
 
+logger = logging.getLogger(__name__)
+
 
 class Alert(base.Base, base.MyBase):
     __tablename__ = "alerts"
@@ -70,13 +74,54 @@ def get_alerts_for_user(user_id: int, guild_id: int = None) -> List[Alert]:
     return alerts
 
 
-def get_registered_channels():
+class AlertRule(NamedTuple):
+    """What ``on_message`` needs to decide whether an alert fires, with its regex precompiled."""
+
+    id: int
+    user_id: int
+    guild_id: int
+    pattern: re.Pattern | None
+    role_id: int | None
+    alert_url: str
+
+
+# channel_id -> rules, loaded on first use and dropped by invalidate_alert_index() whenever
+# alerts are created or deleted.  Counters are not cached; fetch the Alert by id to send it.
+_alert_index: dict[int, list[AlertRule]] | None = None
+
+
+def _load_alert_index() -> dict[int, list[AlertRule]]:
+    global _alert_index
+    index: dict[int, list[AlertRule]] = {}
     with base.get_session() as session:
-        result = session.execute(sqlalchemy.select(Alert.channel_id))
-        channels = set()
-        for row in result:
-            channels.add(row[0])
-    return channels
+        for alert in session.query(Alert).order_by(Alert.id):
+            pattern = None
+            if alert.alert_regex:
+                try:
+                    pattern = re.compile(alert.alert_regex, flags=re.IGNORECASE)
+                except re.error:
+                    logger.warning("Alert #%s has an invalid regex, ignoring: `%s`", alert.id, alert.alert_regex)
+                    continue
+            index.setdefault(alert.channel_id, []).append(
+                AlertRule(alert.id, alert.user_id, alert.guild_id, pattern, alert.alert_role, alert.alert_url)
+            )
+    _alert_index = index
+    return index
+
+
+def invalidate_alert_index() -> None:
+    global _alert_index
+    _alert_index = None
+
+
+def get_alert_rules_for_channel(channel: int) -> List[AlertRule]:
+    index = _alert_index if _alert_index is not None else _load_alert_index()
+    return index.get(channel, [])
+
+
+def get_registered_channels():
+    index = _alert_index if _alert_index is not None else _load_alert_index()
+    return set(index)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,17 @@
 import base64
+import bisect
+import csv
 import datetime
+import gzip
 import hashlib
 import itertools
 import logging
+import os
 import secrets
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, NamedTuple
 
 import sqlalchemy
 import sqlalchemy.exc
@@ -14,6 +22,7 @@ import enum
 
 from roboToald import config
 from roboToald.db import base
+from roboToald.db import invalidation
 from roboToald import words
 
 _log = logging.getLogger(__name__)
@@ -60,6 +69,17 @@ def ip_country_flag(ip_address: str) -> str:
     return "".join(chr(0x1F1E6 + ord(c) - ord("A")) for c in cc.upper())
 
 
+# --- Account change events ---
+# Published on the invalidation bus as ``AccountsChanged(guild_id, account_ids)`` after a commit that
+# changes what :func:`list_accounts` returns for those accounts.  ``account_ids=None`` means the change
+# is not attributable to specific accounts and subscribers should reload the whole guild.
+def _accounts_changed(guild_id: int, account_ids: Iterable[int] | None = None) -> None:
+    ids = None if account_ids is None else frozenset(account_ids)
+    if ids is not None and not ids:
+        return
+    invalidation.publish(invalidation.AccountsChanged(guild_id, ids))
+
+
 class CachedEncryptedType(sqlalchemy_utils.EncryptedType):
     cache_ok = True
 
@@ -119,6 +139,12 @@ class SSOTagTemporarilyEmptyError(Exception):
     pass
 
 
+class SSOAccountClaimedError(Exception):
+    """Raised when a tag-picked account was logged into by someone else before its last_login was stamped"""
+
+    pass
+
+
 class CharacterClass(enum.Enum):
     Bard = "Bard"
     Cleric = "Cleric"
@@ -200,6 +226,10 @@ def create_account(guild_id: int, real_user: str, real_pass: str, group: str = N
         )
 
         session.expunge_all()
+    invalidation.publish(invalidation.NamesChanged(guild_id))
+    if group:
+        invalidation.publish(invalidation.GroupsChanged(guild_id))
+    _accounts_changed(guild_id, {account.id})
     return account
 
 
@@ -274,62 +304,119 @@ def _account_eager_opts():
     )
 
 
-def find_account_by_username(username: str, guild_id: int = None, inactive_only: bool = False) -> SSOAccount or None:
-    """Find an account by username, trying resolution in priority order:
-    account name > character > alias > tag > dynamic tag."""
-    username = username.lower()
+# --- Name resolution index ---
+# Per guild: lowercased name -> (kind, account ids) for every name find_account_by_username resolves
+# before dynamic tags.  Built lazily from the name columns only; mutators that add, rename or remove
+# account names, characters, aliases or tags publish NamesChanged, which drops the guild's entry.
+_name_index: dict[int, dict[str, tuple[str, tuple[int, ...]]]] = {}
+_name_index_lock = threading.Lock()
+_name_index_generation = 0
+
+
+def _load_name_index(guild_id: int) -> dict[str, tuple[str, tuple[int, ...]]]:
+    """Build and cache the name index for one guild."""
+    generation = _name_index_generation
+    tags: dict[str, list[int]] = {}
+    aliases: dict[str, int] = {}
+    characters: dict[str, int] = {}
+    accounts: dict[str, int] = {}
     with base.get_session() as session:
-        # Try to find the account directly by real_user
-        account = (
-            session.query(SSOAccount)
-            .options(*_account_eager_opts())
-            .filter(SSOAccount.real_user == username, SSOAccount.guild_id == guild_id)
-            .one_or_none()
-        )
+        for tag, account_id in (
+            session.query(SSOTag.tag, SSOTag.account_id).filter(SSOTag.guild_id == guild_id).order_by(SSOTag.id)
+        ):
+            tags.setdefault(tag, []).append(account_id)
+        for alias, account_id in session.query(SSOAccountAlias.alias, SSOAccountAlias.account_id).filter(
+            SSOAccountAlias.guild_id == guild_id
+        ):
+            aliases[alias] = account_id
+        for name, account_id in (
+            session.query(SSOAccountCharacter.name, SSOAccountCharacter.account_id)
+            .filter(SSOAccountCharacter.guild_id == guild_id)
+            .order_by(SSOAccountCharacter.id)
+        ):
+            characters.setdefault(name.lower(), account_id)
+        for real_user, account_id in session.query(SSOAccount.real_user, SSOAccount.id).filter(
+            SSOAccount.guild_id == guild_id
+        ):
+            accounts[real_user] = account_id
+
+    # Lowest priority first so higher-priority kinds overwrite clashing names.
+    index = {name: ("tag", tuple(ids)) for name, ids in tags.items()}
+    index.update((name, ("alias", (account_id,))) for name, account_id in aliases.items())
+    index.update((name, ("character", (account_id,))) for name, account_id in characters.items())
+    index.update((name, ("account", (account_id,))) for name, account_id in accounts.items())
+
+    with _name_index_lock:
+        # Don't cache a build that raced with a mutation; the next lookup rebuilds.
+        if generation == _name_index_generation:
+            _name_index[guild_id] = index
+    return index
+
+
+def invalidate_name_index(guild_id: int | None = None) -> None:
+    """Drop the name index for *guild_id*, or for every guild when ``None``."""
+    global _name_index_generation
+    with _name_index_lock:
+        _name_index_generation += 1
+        if guild_id is None:
+            _name_index.clear()
+        else:
+            _name_index.pop(guild_id, None)
 
-        if account:
-            session.expunge(account)
-            return account
 
-        # Try by character name (single query via join)
-        account = (
-            session.query(SSOAccount)
-            .join(SSOAccountCharacter, SSOAccountCharacter.account_id == SSOAccount.id)
-            .options(*_account_eager_opts())
-            .filter(
-                sqlalchemy_func.lower(SSOAccountCharacter.name) == username,
-                SSOAccountCharacter.guild_id == guild_id,
-            )
-            .first()
-        )
+def _on_names_changed(event: invalidation.NamesChanged) -> None:
+    invalidate_name_index(event.guild_id)
 
-        if account:
-            session.expunge(account)
-            return account
 
-        # Try by alias (single query via join)
-        account = (
-            session.query(SSOAccount)
-            .join(SSOAccountAlias, SSOAccountAlias.account_id == SSOAccount.id)
-            .options(*_account_eager_opts())
-            .filter(SSOAccountAlias.alias == username, SSOAccountAlias.guild_id == guild_id)
-            .first()
-        )
+invalidation.subscribe(invalidation.NamesChanged, _on_names_changed)
+
+
+def resolve_name(guild_id: int, username: str) -> tuple[str, tuple[int, ...]] | None:
+    """Return ``(kind, account_ids)`` for *username* in *guild_id*, or ``None`` if it names nothing.
+
+    ``kind`` is one of ``"account"``, ``"character"``, ``"alias"`` or ``"tag"``; dynamic tags are not indexed.
+    """
+    index = _name_index.get(guild_id)
+    if index is None:
+        index = _load_name_index(guild_id)
+    return index.get(username.lower())
 
-        if account:
-            session.expunge(account)
-            return account
 
-        # Try by traditional tag (single query, sort in Python)
+def _fetch_resolved_accounts(session, guild_id: int, username: str) -> tuple[str, list[SSOAccount]] | None:
+    for _ in range(2):
+        resolution = resolve_name(guild_id, username)
+        if resolution is None:
+            return None
+        kind, account_ids = resolution
         accounts = (
             session.query(SSOAccount)
-            .join(SSOTag, SSOTag.account_id == SSOAccount.id)
             .options(*_account_eager_opts())
-            .filter(SSOTag.tag == username, SSOTag.guild_id == guild_id)
+            .filter(SSOAccount.id.in_(account_ids), SSOAccount.guild_id == guild_id)
             .all()
         )
+        if len(accounts) == len(account_ids):
+            return kind, accounts
+        # Stale entry (rows changed outside the SSO helpers): rebuild once.
+        invalidate_name_index(guild_id)
+    return (kind, accounts) if accounts else None
+
+
+def find_account_by_username(username: str, guild_id: int = None, inactive_only: bool = False) -> SSOAccount or None:
+    """Find an account by username, trying resolution in priority order:
+    account name > character > alias > tag > dynamic tag.
+
+    Everything but dynamic tags is resolved through the per-guild name index, so a hit costs one
+    dict lookup plus a primary-key fetch.
+    """
+    username = username.lower()
+    with base.get_session() as session:
+        resolved = _fetch_resolved_accounts(session, guild_id, username)
+        if resolved is not None:
+            kind, accounts = resolved
+            if kind != "tag":
+                session.expunge(accounts[0])
+                return accounts[0]
 
-        if accounts:
             now = datetime.datetime.now()
             if inactive_only:
                 inactivity_time = now - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
@@ -341,52 +428,39 @@ def find_account_by_username(username: str, guild_id: int = None, inactive_only:
             return accounts[0]
 
         # Try by dynamic tag
-        dt_zones, dt_classes = _dynamic_tags
-        dt_list = _dynamic_tag_list
-        if username in dt_list:
-            zone_matches = [(z, lst) for z, lst in dt_zones.items() if username.startswith(z)]
-            zone_matches.sort(key=lambda x: len(x[0]), reverse=True)
-            class_matches = [(c, v) for c, v in dt_classes.items() if username.endswith(c)]
-            class_matches.sort(key=lambda x: len(x[0]), reverse=True)
-            zones = zone_matches[0][1] if zone_matches else None
-            dt_zone_prefix = zone_matches[0][0] if zone_matches else None
-            klass = class_matches[0][1] if class_matches else None
-            if not zones or not klass:
-                raise SSOTagTemporarilyEmptyError(f"Tag '{username}' is temporarily empty")
-
+        target = _dynamic_tag_targets.get(username)
+        if target is not None:
+            dt_zone_prefix, zones, klass = target
             required_key_column = None
-            if config.REQUIRE_KEYS_FOR_DYNAMIC_TAGS and dt_zone_prefix:
+            if config.REQUIRE_KEYS_FOR_DYNAMIC_TAGS:
                 required_key_column = DYNAMIC_TAG_KEY_REQUIREMENTS.get(dt_zone_prefix)
 
-            characters = list_account_characters_by_class_zone(
-                guild_id, klass, zones, required_key_column=required_key_column
-            )
-            if not characters:
-                raise SSOTagTemporarilyEmptyError(f"Tag '{username}' is temporarily empty")
-            char_level_by_account = {c.account_id: (c.level or 0) for c in characters}
-            unique_accounts = list({c.account for c in characters})
-            now = datetime.datetime.now()
-            unique_accounts.sort(
-                key=lambda a: _login_sort_key(a, now, lambda acct: char_level_by_account.get(acct.id, 0))
-            )
-            if not unique_accounts:
-                raise SSOTagTemporarilyEmptyError(f"Tag '{username}' is temporarily empty")
-            # Re-query with full eager loads (the accounts from
-            # list_account_characters_by_class_zone only have the
-            # account relationship, not groups/tags/characters/aliases)
-            account = (
-                session.query(SSOAccount)
-                .options(*_account_eager_opts())
-                .filter(SSOAccount.id == unique_accounts[0].id)
-                .one()
-            )
-            session.expunge(account)
-            return account
+            inactive_before = datetime.datetime.now() - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
+            for _ in range(2):
+                account_id = pick_dynamic_tag_account(guild_id, zones, klass, required_key_column)
+                if account_id is None:
+                    break
+                account = (
+                    session.query(SSOAccount)
+                    .options(*_account_eager_opts())
+                    .filter(SSOAccount.id == account_id)
+                    .one_or_none()
+                )
+                if account is not None and account.last_login < inactive_before:
+                    session.expunge(account)
+                    return account
+                # The pool was stale (rows changed outside the SSO helpers): rebuild once.
+                invalidate_dynamic_tag_index(guild_id)
+            raise SSOTagTemporarilyEmptyError(f"Tag '{username}' is temporarily empty")
 
 
-def list_accounts(guild_id: int, group: str = None, tag: str = None) -> list[SSOAccount]:
+def list_accounts(
+    guild_id: int, group: str = None, tag: str = None, account_ids: Iterable[int] = None
+) -> list[SSOAccount]:
     with base.get_session() as session:
         query = session.query(SSOAccount).filter(SSOAccount.guild_id == guild_id)
+        if account_ids is not None:
+            query = query.filter(SSOAccount.id.in_(list(account_ids)))
         if group:
             query = query.join(SSOAccount.groups).filter(SSOAccountGroup.group_name == group)
         if tag:
@@ -485,6 +559,17 @@ _dynamic_tag_list = frozenset(
     "{}{}".format(a, b) for a, b in itertools.product(list(_dynamic_tags[0]), list(_dynamic_tags[1]))
 )
 
+
+def _dynamic_tag_target(tag: str) -> tuple[str, list[str], CharacterClass]:
+    """Split a dynamic tag into (zone prefix, zones, class), preferring the longest prefix and suffix."""
+    dt_zones, dt_classes = _dynamic_tags
+    zone_prefix = max((z for z in dt_zones if tag.startswith(z)), key=len)
+    class_suffix = max((c for c in dt_classes if tag.endswith(c)), key=len)
+    return zone_prefix, dt_zones[zone_prefix], dt_classes[class_suffix]
+
+
+_dynamic_tag_targets = {tag: _dynamic_tag_target(tag) for tag in _dynamic_tag_list}
+
 # When require_keys_for_dynamic_tags is enabled, dynamic tag resolution requires these columns True.
 DYNAMIC_TAG_KEY_REQUIREMENTS: dict[str, str] = {
     "seb": "key_seb",
@@ -595,10 +680,18 @@ def update_last_login(account_id: int, login_by: str | None = None) -> None:
     with base.get_session() as session:
         account = session.query(SSOAccount).filter(SSOAccount.id == account_id).one_or_none()
         if account:
-            account.last_login = datetime.datetime.now()
-            if login_by is not None:
-                account.last_login_by = login_by
+            now = datetime.datetime.now()
+            guild_id = account.guild_id
+            _touch_last_login(account, now, login_by)
             session.commit()
+            _dynamic_tag_logins_changed(guild_id, {account_id: now})
+            _accounts_changed(guild_id, {account_id})
+
+
+def _touch_last_login(account: SSOAccount, when: datetime.datetime, login_by: str | None) -> None:
+    account.last_login = when
+    if login_by is not None:
+        account.last_login_by = login_by
 
 
 def update_last_login_and_log(
@@ -610,14 +703,34 @@ def update_last_login_and_log(
     guild_id: int,
     details: str,
     client_version: str | None = None,
+    expected_last_login: datetime.datetime | None = None,
 ) -> "SSOAuditLog":
-    """Combine update_last_login + create_audit_log into a single DB session."""
+    """Combine update_last_login + create_audit_log into a single DB session.
+
+    With *expected_last_login* the stamp is conditional: if the account's ``last_login`` no longer
+    has that value (another login claimed it since it was picked), nothing is written and
+    :class:`SSOAccountClaimedError` is raised so the caller can pick again.
+    """
     with base.get_session() as session:
-        account = session.query(SSOAccount).filter(SSOAccount.id == account_id).one_or_none()
-        if account:
-            account.last_login = datetime.datetime.now()
+        now = datetime.datetime.now()
+        if expected_last_login is not None:
+            values = {SSOAccount.last_login: now}
             if login_by is not None:
-                account.last_login_by = login_by
+                values[SSOAccount.last_login_by] = login_by
+            claimed = (
+                session.query(SSOAccount)
+                .filter(SSOAccount.id == account_id, SSOAccount.last_login == expected_last_login)
+                .update(values, synchronize_session=False)
+            )
+            if not claimed:
+                session.rollback()
+                raise SSOAccountClaimedError(f"Account {account_id} was claimed by another login")
+            stamped = True
+        else:
+            account = session.query(SSOAccount).filter(SSOAccount.id == account_id).one_or_none()
+            stamped = account is not None
+            if stamped:
+                _touch_last_login(account, now, login_by)
 
         audit_log = SSOAuditLog(
             username=username,
@@ -632,6 +745,9 @@ def update_last_login_and_log(
         session.add(audit_log)
         session.commit()
         session.expunge(audit_log)
+    if stamped:
+        _dynamic_tag_logins_changed(guild_id, {account_id: now})
+        _accounts_changed(guild_id, {account_id})
     return audit_log
 
 
@@ -644,10 +760,14 @@ def delete_account(guild_id: int, real_user: str) -> None:
                 .filter(SSOAccount.guild_id == guild_id, SSOAccount.real_user == real_user)
                 .one()
             )
+            account_id = account.id
             session.delete(account)
             session.commit()
         except sqlalchemy.exc.NoResultFound:
             raise SSOAccountNotFoundError(f"Account '{real_user}' not found in guild {guild_id}")
+    invalidation.publish(invalidation.NamesChanged(guild_id, characters=True))
+    invalidation.publish(invalidation.GroupsChanged(guild_id))
+    _accounts_changed(guild_id, {account_id})
 
 
 class SSOAccountGroup(base.Base):
@@ -681,6 +801,7 @@ def create_account_group(guild_id: int, group_name: str, role_id: int) -> SSOAcc
             .one()
         )
         session.expunge_all()
+    invalidation.publish(invalidation.GroupsChanged(guild_id))
     return group
 
 
@@ -740,10 +861,13 @@ def delete_account_group(guild_id: int, group_name: str) -> None:
                 .filter(SSOAccountGroup.guild_id == guild_id, SSOAccountGroup.group_name == group_name)
                 .one()
             )
+            member_ids = {a.id for a in group.accounts}
             session.delete(group)
             session.commit()
         except sqlalchemy.exc.NoResultFound:
             raise SSOAccountGroupNotFoundError(f"Group '{group_name}' not found in guild {guild_id}")
+    invalidation.publish(invalidation.GroupsChanged(guild_id))
+    _accounts_changed(guild_id, member_ids)
 
 
 def add_account_to_group(guild_id: int, group_name: str, real_user: str) -> None:
@@ -769,6 +893,9 @@ def add_account_to_group(guild_id: int, group_name: str, real_user: str) -> None
 
         account.groups.append(group)
         session.commit()
+        account_id = account.id
+    invalidation.publish(invalidation.GroupsChanged(guild_id))
+    _accounts_changed(guild_id, {account_id})
 
 
 def remove_account_from_group(guild_id: int, group_name: str, real_user: str) -> None:
@@ -796,6 +923,94 @@ def remove_account_from_group(guild_id: int, group_name: str, real_user: str) ->
             raise sqlalchemy.exc.IntegrityError(None, None, "Account is not in this group")
         account.groups.remove(group)
         session.commit()
+        account_id = account.id
+    invalidation.publish(invalidation.GroupsChanged(guild_id))
+    _accounts_changed(guild_id, {account_id})
+
+
+# --- Access (RBAC) index ---
+# Per guild: role_id -> group ids and group id -> account ids, from sso_account_group and the mapping
+# table only.  Built lazily; the group and membership mutators above publish GroupsChanged, which drops
+# the guild's entry, so "may this member touch account X" is a set intersection.
+
+
+class AccessIndex(NamedTuple):
+    role_groups: dict[int, frozenset[int]]
+    group_accounts: dict[int, frozenset[int]]
+
+    def account_ids_for_roles(self, role_ids: Iterable[int]) -> set[int]:
+        """IDs of every account in a group granted to any of *role_ids*."""
+        ids: set[int] = set()
+        for role_id in role_ids:
+            for group_id in self.role_groups.get(role_id, ()):
+                ids |= self.group_accounts.get(group_id, frozenset())
+        return ids
+
+
+_access_index: dict[int, AccessIndex] = {}
+_access_index_lock = threading.Lock()
+_access_index_generation = 0
+
+
+def _load_access_index(guild_id: int) -> AccessIndex:
+    """Build and cache the access index for one guild."""
+    generation = _access_index_generation
+    role_groups: dict[int, set[int]] = {}
+    group_accounts: dict[int, set[int]] = {}
+    with base.get_session() as session:
+        for group_id, role_id in session.query(SSOAccountGroup.id, SSOAccountGroup.role_id).filter(
+            SSOAccountGroup.guild_id == guild_id
+        ):
+            role_groups.setdefault(role_id, set()).add(group_id)
+            group_accounts[group_id] = set()
+        for group_id, account_id in (
+            session.query(account_group_mapping.c.group_id, account_group_mapping.c.account_id)
+            .join(SSOAccountGroup, account_group_mapping.c.group_id == SSOAccountGroup.id)
+            .filter(SSOAccountGroup.guild_id == guild_id)
+        ):
+            group_accounts[group_id].add(account_id)
+
+    index = AccessIndex(
+        role_groups={role_id: frozenset(ids) for role_id, ids in role_groups.items()},
+        group_accounts={group_id: frozenset(ids) for group_id, ids in group_accounts.items()},
+    )
+    with _access_index_lock:
+        # Don't cache a build that raced with a mutation; the next lookup rebuilds.
+        if generation == _access_index_generation:
+            _access_index[guild_id] = index
+    return index
+
+
+def invalidate_access_index(guild_id: int | None = None) -> None:
+    """Drop the access index for *guild_id*, or for every guild when ``None``."""
+    global _access_index_generation
+    with _access_index_lock:
+        _access_index_generation += 1
+        if guild_id is None:
+            _access_index.clear()
+        else:
+            _access_index.pop(guild_id, None)
+
+
+def _on_groups_changed(event: invalidation.GroupsChanged) -> None:
+    invalidate_access_index(event.guild_id)
+
+
+invalidation.subscribe(invalidation.GroupsChanged, _on_groups_changed)
+
+
+def get_access_index(guild_id: int) -> AccessIndex:
+    """The (cached) role -> group -> account index for *guild_id*."""
+    index = _access_index.get(guild_id)
+    if index is None:
+        index = _load_access_index(guild_id)
+    return index
+
+
+def accessible_account_ids(guild_id: int, role_ids: Iterable[int], account_ids: Iterable[int]) -> list[int]:
+    """The subset of *account_ids* (in order) reachable through a group granted to any of *role_ids*."""
+    allowed = get_access_index(guild_id).account_ids_for_roles(role_ids)
+    return [account_id for account_id in account_ids if account_id in allowed]
 
 
 class SSOAccessKey(base.Base):
@@ -834,28 +1049,37 @@ def get_access_key_by_user(guild_id: int, discord_user_id: int) -> SSOAccessKey:
             .filter(SSOAccessKey.guild_id == guild_id, SSOAccessKey.discord_user_id == discord_user_id)
             .one_or_none()
         )
+        created = False
         while access_key is None:
             # Create a new access key
             access_key = SSOAccessKey(guild_id=guild_id, discord_user_id=discord_user_id)
             try:
                 session.add(access_key)
                 session.commit()
-                invalidate_access_key_cache()
                 session.expunge(access_key)
                 access_key = (
                     session.query(SSOAccessKey)
                     .filter(SSOAccessKey.guild_id == guild_id, SSOAccessKey.discord_user_id == discord_user_id)
                     .one()
                 )
+                created = True
             except sqlalchemy.exc.IntegrityError:
                 access_key = None
                 session.rollback()
 
         session.expunge_all()
+    if created:
+        invalidation.publish(invalidation.AccessKeyChanged(guild_id, discord_user_id, access_key))
     return access_key
 
 
+# --- Access key cache ---
+# Plaintext key -> detached SSOAccessKey, plus (guild_id, discord_user_id) -> plaintext key so an
+# AccessKeyChanged event can swap one member's entry.  None means not loaded yet.
 _access_key_cache: dict[str, SSOAccessKey] | None = None
+_access_key_by_user: dict[tuple[int, int], str] = {}
+_access_key_lock = threading.Lock()
+_access_key_generation = 0
 
 
 def _load_access_key_cache() -> dict[str, SSOAccessKey]:
@@ -863,19 +1087,51 @@ def _load_access_key_cache() -> dict[str, SSOAccessKey]:
 
     EncryptedType decrypts on attribute access, so after expunge the Python
     attribute holds the plaintext.  This turns every subsequent lookup from a
-    full-table-scan-with-decrypt into a dict lookup.
+    full-table-scan-with-decrypt into a dict lookup.  Only the first lookup (or
+    one after :func:`invalidate_access_key_cache`) pays for decrypting every key;
+    later changes arrive as :class:`~roboToald.db.invalidation.AccessKeyChanged`.
     """
-    global _access_key_cache
+    global _access_key_cache, _access_key_by_user
+    generation = _access_key_generation
     with base.get_session() as session:
         all_keys = session.query(SSOAccessKey).all()
         session.expunge_all()
-    _access_key_cache = {k.access_key: k for k in all_keys}
-    return _access_key_cache
+    cache = {k.access_key: k for k in all_keys}
+    with _access_key_lock:
+        # Don't cache a load that raced with a change; the next lookup reloads.
+        if generation == _access_key_generation:
+            _access_key_cache = cache
+            _access_key_by_user = {(k.guild_id, k.discord_user_id): k.access_key for k in all_keys}
+    return cache
 
 
 def invalidate_access_key_cache() -> None:
-    global _access_key_cache
-    _access_key_cache = None
+    global _access_key_cache, _access_key_generation
+    with _access_key_lock:
+        _access_key_generation += 1
+        _access_key_cache = None
+        _access_key_by_user.clear()
+
+
+def _on_access_key_changed(event: invalidation.AccessKeyChanged) -> None:
+    global _access_key_cache, _access_key_generation
+    with _access_key_lock:
+        _access_key_generation += 1
+        if _access_key_cache is None:
+            return
+        # Copy-on-write: readers use the dict without taking the lock.
+        cache = dict(_access_key_cache)
+        user = (event.guild_id, event.discord_user_id)
+        old_key = _access_key_by_user.pop(user, None)
+        if old_key is not None:
+            cache.pop(old_key, None)
+        if event.record is not None:
+            cache[event.record.access_key] = event.record
+            _access_key_by_user[user] = event.record.access_key
+        _access_key_cache = cache
+
+
+invalidation.subscribe(invalidation.AccessKeyChanged, _on_access_key_changed)
 
 
 def get_access_key_by_key(access_key: str) -> SSOAccessKey or None:
@@ -895,7 +1151,6 @@ def reset_access_key(guild_id: int, discord_user_id: int) -> SSOAccessKey:
 
         access_key.access_key = generate_access_key()
         session.commit()
-        invalidate_access_key_cache()
         session.expunge(access_key)
         access_key = (
             session.query(SSOAccessKey)
@@ -903,6 +1158,7 @@ def reset_access_key(guild_id: int, discord_user_id: int) -> SSOAccessKey:
             .one()
         )
         session.expunge_all()
+    invalidation.publish(invalidation.AccessKeyChanged(guild_id, discord_user_id, access_key))
     return access_key
 
 
@@ -915,7 +1171,7 @@ def delete_access_key(guild_id: int, discord_user_id: int) -> None:
         )
         session.delete(access_key)
         session.commit()
-        invalidate_access_key_cache()
+    invalidation.publish(invalidation.AccessKeyChanged(guild_id, discord_user_id))
 
 
 class SSOTag(base.Base):
@@ -958,6 +1214,8 @@ def tag_account(guild_id: int, real_user: str, tag: str) -> SSOTag:
         tag_obj = SSOTag(guild_id=guild_id, tag=tag, account_id=account.id)
         session.add(tag_obj)
         session.commit()
+        invalidation.publish(invalidation.NamesChanged(guild_id))
+        _accounts_changed(guild_id, {account.id})
 
         try:
             tag_obj = (
@@ -992,6 +1250,8 @@ def untag_account(guild_id: int, real_user: str, tag: str) -> None:
             session.commit()
         except sqlalchemy.exc.NoResultFound:
             raise SSOAccountTagNotFoundError(f"Tag '{tag}' not found for account '{real_user}'")
+        invalidation.publish(invalidation.NamesChanged(guild_id))
+        _accounts_changed(guild_id, {account.id})
 
 
 def list_tags(guild_id: int) -> dict[str, list[str]]:
@@ -1058,6 +1318,9 @@ def update_tag(guild_id: int, tag: str, new_name: str = None, new_ui_macro_data:
             session.commit()
         except sqlalchemy.exc.NoResultFound:
             raise SSOAccountTagNotFoundError(f"Tag '{tag}' not found in guild {guild_id}")
+        if new_name is not None:
+            invalidation.publish(invalidation.NamesChanged(guild_id))
+            _accounts_changed(guild_id, {t.account_id for t in tag_objs})
 
 
 class SSOTagUIMacro(base.Base):
@@ -1110,10 +1373,13 @@ def create_account_alias(guild_id: int, real_user: str, alias: str) -> SSOAccoun
             )
         except sqlalchemy.exc.NoResultFound:
             raise SSOAccountNotFoundError(f"Account '{real_user}' not found in guild {guild_id}")
-        alias = SSOAccountAlias(guild_id=guild_id, alias=alias, account_id=account.id)
+        account_id = account.id
+        alias = SSOAccountAlias(guild_id=guild_id, alias=alias, account_id=account_id)
         session.add(alias)
         session.commit()
         session.expunge_all()
+    invalidation.publish(invalidation.NamesChanged(guild_id))
+    _accounts_changed(guild_id, {account_id})
     return alias
 
 
@@ -1154,10 +1420,13 @@ def delete_account_alias(guild_id: int, alias: str) -> str:
                 .one()
             )
             account_name = alias.account.real_user
+            account_id = alias.account_id
             session.delete(alias)
             session.commit()
         except sqlalchemy.exc.NoResultFound:
             raise SSOAccountAliasNotFoundError(f"Alias '{alias}' not found in guild {guild_id}")
+    invalidation.publish(invalidation.NamesChanged(guild_id))
+    _accounts_changed(guild_id, {account_id})
     return account_name
 
 
@@ -1198,25 +1467,54 @@ class SSORevocation(base.Base):
 
 # --- Revocation cache ---
 # Maps (guild_id, discord_user_id) -> list of (expiry_days, timestamp) for active revocations.
-# None means the cache hasn't been loaded yet.
+# None means the cache hasn't been loaded yet.  Kept current by RevocationAdded / RevocationsRemoved.
 _revocation_cache: dict[tuple[int, int], list[tuple[int, datetime.datetime]]] | None = None
+_revocation_lock = threading.Lock()
+_revocation_generation = 0
 
 
 def _load_revocation_cache() -> dict[tuple[int, int], list[tuple[int, datetime.datetime]]]:
     global _revocation_cache
+    generation = _revocation_generation
     cache: dict[tuple[int, int], list[tuple[int, datetime.datetime]]] = {}
     with base.get_session() as session:
         rows = session.query(SSORevocation).filter(SSORevocation.active == sqlalchemy.true()).all()
         for r in rows:
             key = (r.guild_id, r.discord_user_id)
             cache.setdefault(key, []).append((r.expiry_days, r.timestamp))
-    _revocation_cache = cache
+    with _revocation_lock:
+        if generation == _revocation_generation:
+            _revocation_cache = cache
     return cache
 
 
 def invalidate_revocation_cache():
-    global _revocation_cache
-    _revocation_cache = None
+    global _revocation_cache, _revocation_generation
+    with _revocation_lock:
+        _revocation_generation += 1
+        _revocation_cache = None
+
+
+def _on_revocation_added(event: invalidation.RevocationAdded) -> None:
+    global _revocation_generation
+    with _revocation_lock:
+        _revocation_generation += 1
+        if _revocation_cache is not None:
+            key = (event.guild_id, event.discord_user_id)
+            # Replace the list rather than appending so concurrent readers see old or new, never partial.
+            _revocation_cache[key] = [*_revocation_cache.get(key, ()), (event.expiry_days, event.timestamp)]
+
+
+def _on_revocations_removed(event: invalidation.RevocationsRemoved) -> None:
+    global _revocation_generation
+    with _revocation_lock:
+        _revocation_generation += 1
+        if _revocation_cache is not None:
+            _revocation_cache.pop((event.guild_id, event.discord_user_id), None)
+
+
+invalidation.subscribe(invalidation.RevocationAdded, _on_revocation_added)
+invalidation.subscribe(invalidation.RevocationsRemoved, _on_revocations_removed)
 
 
 def revoke_user_access(guild_id: int, discord_user_id: int, expiry_days: int, details: str = None) -> SSORevocation:
@@ -1224,10 +1522,11 @@ def revoke_user_access(guild_id: int, discord_user_id: int, expiry_days: int, de
         revocation = SSORevocation(
             guild_id=guild_id, discord_user_id=discord_user_id, expiry_days=expiry_days, details=details
         )
+        timestamp = revocation.timestamp
         session.add(revocation)
         session.commit()
         session.expunge_all()
-    invalidate_revocation_cache()
+    invalidation.publish(invalidation.RevocationAdded(guild_id, discord_user_id, expiry_days, timestamp))
     return revocation
 
 
@@ -1274,7 +1573,7 @@ def remove_access_revocation(guild_id: int, discord_user_id: int) -> None:
         for revocation in revocations:
             revocation.active = False
         session.commit()
-    invalidate_revocation_cache()
+    invalidation.publish(invalidation.RevocationsRemoved(guild_id, discord_user_id))
 
 
 class SSOAuditLog(base.Base):
@@ -1331,6 +1630,16 @@ class SSOAuditLog(base.Base):
         self.timestamp = timestamp or datetime.datetime.now()
 
 
+# Optional asynchronous writer for audit rows (see ``roboToald.api.audit_writer``).  Called with the
+# row as a column dict; returns False when it can't take the row, which is then written inline.
+_audit_sink: Callable[[dict], bool] | None = None
+
+
+def set_audit_sink(sink: Callable[[dict], bool] | None) -> None:
+    global _audit_sink
+    _audit_sink = sink
+
+
 def create_audit_log(
     username,
     ip_address=None,
@@ -1342,25 +1651,81 @@ def create_audit_log(
     rate_limit=True,
     client_version=None,
 ) -> SSOAuditLog:
-    """Create an audit log entry for an SSO authentication attempt."""
+    """Create an audit log entry for an SSO authentication attempt.
+
+    With an audit sink installed the row is queued and the returned entry is transient (no ``id``).
+    Failed attempts count towards the IP rate limit immediately either way.
+    """
+    audit_log = SSOAuditLog(
+        username=username,
+        ip_address=ip_address,
+        success=success,
+        discord_user_id=discord_user_id,
+        account_id=account_id,
+        guild_id=guild_id,
+        details=details,
+        rate_limit=rate_limit,
+        client_version=client_version,
+    )
+    timestamp = audit_log.timestamp
+    counts_for_rate_limit = bool(ip_address and not success and rate_limit)
+
+    sink = _audit_sink
+    if sink is not None:
+        if counts_for_rate_limit:
+            # Not in the audit log yet, so seeding the window can't pick it up.
+            _record_failed_attempt(ip_address, timestamp, persisted=False)
+        if sink(_audit_log_row(audit_log)):
+            return audit_log
+        # Sink full: write inline (the caller absorbs the backpressure); already counted above.
+        counts_for_rate_limit = False
+
     with base.get_session() as session:
-        audit_log = SSOAuditLog(
-            username=username,
-            ip_address=ip_address,
-            success=success,
-            discord_user_id=discord_user_id,
-            account_id=account_id,
-            guild_id=guild_id,
-            details=details,
-            rate_limit=rate_limit,
-            client_version=client_version,
-        )
         session.add(audit_log)
         session.commit()
         session.expunge(audit_log)
+    if counts_for_rate_limit:
+        _record_failed_attempt(ip_address, timestamp)
     return audit_log
 
 
+def _audit_log_row(audit_log: SSOAuditLog) -> dict:
+    return {
+        "timestamp": audit_log.timestamp,
+        "ip_address": audit_log.ip_address,
+        "username": audit_log.username,
+        "success": audit_log.success,
+        "discord_user_id": audit_log.discord_user_id,
+        "guild_id": audit_log.guild_id,
+        "account_id": audit_log.account_id,
+        "rate_limit": audit_log.rate_limit,
+        "details": audit_log.details,
+        "client_version": audit_log.client_version,
+    }
+
+
+def insert_audit_logs(rows: list[dict]) -> int:
+    """Insert many audit rows (``_audit_log_row`` dicts) in one executemany and commit.
+
+    Rows queued before :func:`clear_rate_limit` cleared their IP are written with ``rate_limit=False``,
+    as the clear would have marked them had they been in the table already.
+    """
+    if not rows:
+        return 0
+    with _rate_limit_clears_lock:
+        if _rate_limit_clears:
+            rows = [
+                {**row, "rate_limit": False}
+                if row["ip_address"] in _rate_limit_clears and row["timestamp"] <= _rate_limit_clears[row["ip_address"]]
+                else row
+                for row in rows
+            ]
+        with base.get_session() as session:
+            session.execute(sqlalchemy.insert(SSOAuditLog), rows)
+            session.commit()
+    return len(rows)
+
+
 def get_audit_logs_for_user_id(discord_user_id: int, limit=100, offset=0, include_list=False) -> list[SSOAuditLog]:
     """Get audit logs for a specific Discord user ID."""
     with base.get_session() as session:
@@ -1416,10 +1781,94 @@ def get_audit_logs(
     return logs
 
 
+# --- In-memory failed-attempt windows ---
+# Timestamps of rate-limited failed auth attempts per IP, covering the last
+# ``_FAILED_ATTEMPT_HORIZON`` only.  Seeded from sso_audit_log on first use (or by
+# :func:`load_failed_attempts` at startup), appended to by :func:`create_audit_log` and
+# dropped by :func:`clear_rate_limit`.  The audit log remains the durable record.
+_FAILED_ATTEMPT_HORIZON = datetime.timedelta(minutes=max(60, config.RATE_LIMIT_WINDOW_MINUTES))
+# More than any sane threshold; caps memory per IP during a flood.
+_FAILED_ATTEMPT_MAX_PER_IP = 1000
+_FAILED_ATTEMPT_SWEEP_EVERY = 1024
+_failed_attempts: dict[str, deque[datetime.datetime]] | None = None
+_failed_attempts_lock = threading.Lock()
+_failed_attempts_since_sweep = 0
+
+
+def load_failed_attempts() -> dict[str, deque[datetime.datetime]]:
+    """(Re)seed the in-memory failed-attempt windows from the audit log."""
+    global _failed_attempts
+    cutoff = datetime.datetime.now() - _FAILED_ATTEMPT_HORIZON
+    with base.get_session() as session:
+        rows = (
+            session.query(SSOAuditLog.ip_address, SSOAuditLog.timestamp)
+            .filter(
+                SSOAuditLog.ip_address.isnot(None),
+                SSOAuditLog.success == sqlalchemy.false(),
+                SSOAuditLog.timestamp >= cutoff,
+                SSOAuditLog.rate_limit != sqlalchemy.false(),
+            )
+            .order_by(SSOAuditLog.timestamp)
+            .all()
+        )
+    windows: dict[str, deque[datetime.datetime]] = {}
+    for ip_address, timestamp in rows:
+        windows.setdefault(ip_address, deque(maxlen=_FAILED_ATTEMPT_MAX_PER_IP)).append(timestamp)
+    with _failed_attempts_lock:
+        _failed_attempts = windows
+    return windows
+
+
+def invalidate_failed_attempts_cache() -> None:
+    global _failed_attempts
+    with _failed_attempts_lock:
+        _failed_attempts = None
+
+
+def _get_failed_attempts() -> dict[str, deque[datetime.datetime]]:
+    windows = _failed_attempts
+    return windows if windows is not None else load_failed_attempts()
+
+
+def _record_failed_attempt(ip_address: str, timestamp: datetime.datetime, persisted: bool = True) -> None:
+    """Add a failed attempt to the IP's window. *persisted*: the attempt is already in the audit log."""
+    global _failed_attempts_since_sweep
+    windows = _failed_attempts
+    if windows is None:
+        windows = load_failed_attempts()
+        if persisted:
+            # Seeding read the audit log, which already holds this attempt.
+            return
+    with _failed_attempts_lock:
+        window = windows.get(ip_address)
+        if window is None:
+            window = windows[ip_address] = deque(maxlen=_FAILED_ATTEMPT_MAX_PER_IP)
+        window.append(timestamp)
+        _failed_attempts_since_sweep += 1
+        if _failed_attempts_since_sweep >= _FAILED_ATTEMPT_SWEEP_EVERY:
+            _failed_attempts_since_sweep = 0
+            cutoff = datetime.datetime.now() - _FAILED_ATTEMPT_HORIZON
+            for ip in [ip for ip, w in windows.items() if not w or w[-1] < cutoff]:
+                del windows[ip]
+
+
+def _pruned_failed_window(windows: dict, ip_address: str) -> deque[datetime.datetime] | None:
+    """The IP's failed-attempt window with entries past the horizon dropped. Call with the lock held."""
+    window = windows.get(ip_address)
+    if not window:
+        return None
+    horizon = datetime.datetime.now() - _FAILED_ATTEMPT_HORIZON
+    while window and window[0] < horizon:
+        window.popleft()
+    return window or None
+
+
 def count_failed_attempts(ip_address: str, minutes: int = 60) -> int:
     """
     Count the number of failed authentication attempts from an IP address within a time period.
 
+    Served from the in-memory window when *minutes* fits inside it; otherwise counted in the audit log.
+
     Args:
         ip_address: The IP address to check
         minutes: The number of minutes to look back (default: 60)
@@ -1430,6 +1879,20 @@ def count_failed_attempts(ip_address: str, minutes: int = 60) -> int:
     if not ip_address:
         return 0
 
+    if datetime.timedelta(minutes=minutes) <= _FAILED_ATTEMPT_HORIZON:
+        threshold = datetime.datetime.now() - datetime.timedelta(minutes=minutes)
+        windows = _get_failed_attempts()
+        with _failed_attempts_lock:
+            window = _pruned_failed_window(windows, ip_address)
+            if window is None or window[0] >= threshold:
+                return len(window or ())
+            count = 0
+            for ts in reversed(window):
+                if ts < threshold:
+                    break
+                count += 1
+            return count
+
     with base.get_session() as session:
         # Calculate the time threshold
         time_threshold = datetime.datetime.now() - datetime.timedelta(minutes=minutes)
@@ -1470,19 +1933,34 @@ def get_rate_limited_ips(max_attempts: int = 20, minutes: int = 30) -> list[tupl
     return rows
 
 
+# IP -> when clear_rate_limit last ran, so failed attempts still queued in the audit sink are written
+# as cleared.  Guarded together with the batch insert so a batch lands entirely before or after a clear.
+_rate_limit_clears: dict[str, datetime.datetime] = {}
+_rate_limit_clears_lock = threading.Lock()
+
+
 def clear_rate_limit(ip_address: str) -> int:
-    with base.get_session() as session:
-        updated = (
-            session.query(SSOAuditLog)
-            .filter(
-                SSOAuditLog.ip_address == ip_address,
-                SSOAuditLog.success == sqlalchemy.false(),
-                SSOAuditLog.rate_limit != sqlalchemy.false(),
+    now = datetime.datetime.now()
+    with _rate_limit_clears_lock:
+        for ip, cleared_at in list(_rate_limit_clears.items()):
+            if now - cleared_at > _FAILED_ATTEMPT_HORIZON:
+                del _rate_limit_clears[ip]
+        _rate_limit_clears[ip_address] = now
+        with base.get_session() as session:
+            updated = (
+                session.query(SSOAuditLog)
+                .filter(
+                    SSOAuditLog.ip_address == ip_address,
+                    SSOAuditLog.success == sqlalchemy.false(),
+                    SSOAuditLog.rate_limit != sqlalchemy.false(),
+                )
+                .update({SSOAuditLog.rate_limit: False})
             )
-            .update({SSOAuditLog.rate_limit: False})
-        )
-        session.commit()
-        return updated
+            session.commit()
+    with _failed_attempts_lock:
+        if _failed_attempts is not None:
+            _failed_attempts.pop(ip_address, None)
+    return updated
 
 
 def is_ip_rate_limited(ip_address: str, max_attempts: int = 20, minutes: int = 30) -> bool:
@@ -1500,6 +1978,14 @@ def is_ip_rate_limited(ip_address: str, max_attempts: int = 20, minutes: int = 3
     if not ip_address:
         return False
 
+    if max_attempts > 0 and datetime.timedelta(minutes=minutes) <= _FAILED_ATTEMPT_HORIZON:
+        # Limited iff the max_attempts-th most recent failure is still inside the window.
+        threshold = datetime.datetime.now() - datetime.timedelta(minutes=minutes)
+        windows = _get_failed_attempts()
+        with _failed_attempts_lock:
+            window = _pruned_failed_window(windows, ip_address)
+            return window is not None and len(window) >= max_attempts and window[-max_attempts] >= threshold
+
     failed_attempts = count_failed_attempts(ip_address, minutes)
     return failed_attempts >= max_attempts
 
@@ -1556,6 +2042,14 @@ class SSOAccountCharacter(base.Base):
     __table_args__ = (sqlalchemy.UniqueConstraint("name", "guild_id", name="uq_name_guild"),)
 
 
+# Case-insensitive character lookups (``lower(name) = ?``) within a guild.
+sqlalchemy.Index(
+    "ix_character_guild_lower_name",
+    SSOAccountCharacter.guild_id,
+    sqlalchemy_func.lower(SSOAccountCharacter.name),
+)
+
+
 def add_account_character(guild_id: int, real_user: str, name: str, klass: CharacterClass) -> SSOAccountCharacter:
     """Add a character/class to an account."""
     account = find_account_by_username(real_user, guild_id)
@@ -1577,6 +2071,8 @@ def add_account_character(guild_id: int, real_user: str, name: str, klass: Chara
         character = session.query(SSOAccountCharacter).filter(SSOAccountCharacter.id == character.id).one()
 
         session.expunge_all()
+    invalidation.publish(invalidation.NamesChanged(guild_id, characters=True))
+    _accounts_changed(guild_id, {account.id})
     return character
 
 
@@ -1625,17 +2121,295 @@ def list_account_characters_by_class_zone(
     return characters
 
 
+# --- Dynamic tag candidate pools ---
+# Per guild, the characters a dynamic tag such as "vpclr" can log into, grouped by
+# (zone group, class, required key column).  Each pool keeps its accounts ordered by last_login and
+# by level, so picking the account _login_sort_key prefers needs no database scan.  Character and
+# last_login mutators push their changes after commit; adding or removing characters or accounts
+# drops the guild's index, which is rebuilt on the next lookup.
+_POOL_KEY_COLUMNS = frozenset(DYNAMIC_TAG_KEY_REQUIREMENTS.values())
+_COLD_LOGIN_AGE = datetime.timedelta(seconds=1200)  # matches the sentinel bucket in _login_sort_key
+
+
+class _PoolCharacter(NamedTuple):
+    """The fields of one character that decide which dynamic tag pools it belongs to."""
+
+    account_id: int
+    klass: CharacterClass
+    bind_location: str | None
+    park_location: str | None
+    level: int
+    keys: frozenset[str]
+
+    @classmethod
+    def from_row(cls, character) -> "_PoolCharacter":
+        return cls(
+            character.account_id,
+            character.klass,
+            character.bind_location,
+            character.park_location,
+            character.level or 0,
+            frozenset(column for column in _POOL_KEY_COLUMNS if getattr(character, column)),
+        )
+
+    def matches(self, key: tuple[frozenset[str], CharacterClass, str | None]) -> bool:
+        zones, klass, key_column = key
+        return (
+            self.klass == klass
+            and (self.bind_location in zones or self.park_location in zones)
+            and (key_column is None or key_column in self.keys)
+        )
+
+
+def _sorted_remove(items: list, item) -> None:
+    i = bisect.bisect_left(items, item)
+    if i < len(items) and items[i] == item:
+        del items[i]
+
+
+class _DynamicTagPool:
+    """Accounts with at least one eligible character for one dynamic tag key."""
+
+    def __init__(self):
+        self.characters: dict[int, dict[int, int]] = {}  # account_id -> {character_id: level}
+        self.levels: dict[int, int] = {}  # account_id -> best eligible character level
+        self.by_login: list[tuple[datetime.datetime, int]] = []
+        self.by_level: list[tuple[int, datetime.datetime, int]] = []  # (-level, last_login, account_id)
+
+    def _unlink(self, account_id: int, last_login: datetime.datetime) -> None:
+        level = self.levels.pop(account_id, None)
+        if level is not None:
+            _sorted_remove(self.by_login, (last_login, account_id))
+            _sorted_remove(self.by_level, (-level, last_login, account_id))
+
+    def _link(self, account_id: int, last_login: datetime.datetime) -> None:
+        characters = self.characters.get(account_id)
+        if characters:
+            level = max(characters.values())
+            self.levels[account_id] = level
+            bisect.insort(self.by_login, (last_login, account_id))
+            bisect.insort(self.by_level, (-level, last_login, account_id))
+
+    def set_character(
+        self, account_id: int, character_id: int, level: int | None, last_login: datetime.datetime
+    ) -> None:
+        """Add or re-level a character, or remove it when *level* is ``None``."""
+        self._unlink(account_id, last_login)
+        characters = self.characters.setdefault(account_id, {})
+        if level is None:
+            characters.pop(character_id, None)
+        else:
+            characters[character_id] = level
+        if not characters:
+            del self.characters[account_id]
+        self._link(account_id, last_login)
+
+    def move(self, account_id: int, old_login: datetime.datetime, new_login: datetime.datetime) -> None:
+        if account_id in self.levels:
+            self._unlink(account_id, old_login)
+            self._link(account_id, new_login)
+
+    def pick(self, now: datetime.datetime, inactive_before: datetime.datetime) -> int | None:
+        """Return the account _login_sort_key ranks first among those idle since *inactive_before*."""
+        eligible = bisect.bisect_left(self.by_login, (inactive_before,))
+        if not eligible:
+            return None
+        cold_before = now - _COLD_LOGIN_AGE
+        if self.by_login[0][0] <= cold_before:
+            # All cold accounts share the top bucket, so the highest level wins.
+            for _, last_login, account_id in self.by_level:
+                if last_login <= cold_before and last_login < inactive_before:
+                    return account_id
+        # Otherwise the oldest 30-second bucket wins; walk it and keep the highest level.
+        best = None
+        best_bucket = int((now - self.by_login[0][0]).total_seconds() // 30)
+        for last_login, account_id in itertools.islice(self.by_login, eligible):
+            if int((now - last_login).total_seconds() // 30) != best_bucket:
+                break
+            if best is None or self.levels[account_id] > self.levels[best]:
+                best = account_id
+        return best
+
+
+class _DynamicTagIndex:
+    """All dynamic tag pools for one guild, built lazily per key from a snapshot of its characters."""
+
+    def __init__(self, characters: dict[int, _PoolCharacter], last_login: dict[int, datetime.datetime]):
+        self.characters = characters
+        self.last_login = last_login
+        self.pools: dict[tuple, _DynamicTagPool] = {}
+
+    def pool(self, key: tuple[frozenset[str], CharacterClass, str | None]) -> _DynamicTagPool:
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = _DynamicTagPool()
+            for character_id, record in self.characters.items():
+                if record.matches(key):
+                    last_login = self.last_login.get(record.account_id, datetime.datetime.min)
+                    pool.set_character(record.account_id, character_id, record.level, last_login)
+            self.pools[key] = pool
+        return pool
+
+    def update_character(self, character_id: int, record: _PoolCharacter) -> None:
+        old = self.characters.get(character_id)
+        if old == record:
+            return
+        self.characters[character_id] = record
+        last_login = self.last_login.get(record.account_id, datetime.datetime.min)
+        for key, pool in self.pools.items():
+            if record.matches(key):
+                pool.set_character(record.account_id, character_id, record.level, last_login)
+            elif old is not None and old.matches(key):
+                pool.set_character(old.account_id, character_id, None, last_login)
+
+    def update_login(self, account_id: int, when: datetime.datetime) -> None:
+        old = self.last_login.get(account_id)
+        if old is None or old == when:
+            return
+        self.last_login[account_id] = when
+        for pool in self.pools.values():
+            pool.move(account_id, old, when)
+
+
+_dynamic_tag_indexes: dict[int, _DynamicTagIndex] = {}
+_dynamic_tag_lock = threading.Lock()
+_dynamic_tag_generation = 0
+
+
+def _load_dynamic_tag_index(guild_id: int) -> _DynamicTagIndex:
+    generation = _dynamic_tag_generation
+    with base.get_session() as session:
+        rows = (
+            session.query(
+                SSOAccountCharacter.id,
+                SSOAccountCharacter.account_id,
+                SSOAccountCharacter.klass,
+                SSOAccountCharacter.bind_location,
+                SSOAccountCharacter.park_location,
+                SSOAccountCharacter.level,
+                *(getattr(SSOAccountCharacter, column) for column in sorted(_POOL_KEY_COLUMNS)),
+            )
+            .filter(SSOAccountCharacter.guild_id == guild_id)
+            .all()
+        )
+        last_login = dict(session.query(SSOAccount.id, SSOAccount.last_login).filter(SSOAccount.guild_id == guild_id))
+    index = _DynamicTagIndex({row.id: _PoolCharacter.from_row(row) for row in rows}, last_login)
+    with _dynamic_tag_lock:
+        # Don't cache a build that raced with a mutation; the next lookup rebuilds.
+        if generation == _dynamic_tag_generation:
+            _dynamic_tag_indexes[guild_id] = index
+    return index
+
+
+def invalidate_dynamic_tag_index(guild_id: int | None = None) -> None:
+    """Drop the dynamic tag pools for *guild_id*, or for every guild when ``None``."""
+    global _dynamic_tag_generation
+    with _dynamic_tag_lock:
+        _dynamic_tag_generation += 1
+        if guild_id is None:
+            _dynamic_tag_indexes.clear()
+        else:
+            _dynamic_tag_indexes.pop(guild_id, None)
+
+
+def _on_dynamic_tag_names_changed(event: invalidation.NamesChanged) -> None:
+    if event.characters:
+        invalidate_dynamic_tag_index(event.guild_id)
+
+
+invalidation.subscribe(invalidation.NamesChanged, _on_dynamic_tag_names_changed)
+
+
+def _dynamic_tag_logins_changed(guild_id: int, logins: dict[int, datetime.datetime]) -> None:
+    global _dynamic_tag_generation
+    with _dynamic_tag_lock:
+        _dynamic_tag_generation += 1
+        index = _dynamic_tag_indexes.get(guild_id)
+        if index is not None:
+            for account_id, when in logins.items():
+                index.update_login(account_id, when)
+
+
+def _dynamic_tag_characters_changed(guild_id: int, records: dict[int, _PoolCharacter]) -> None:
+    global _dynamic_tag_generation
+    with _dynamic_tag_lock:
+        _dynamic_tag_generation += 1
+        index = _dynamic_tag_indexes.get(guild_id)
+        if index is not None:
+            for character_id, record in records.items():
+                index.update_character(character_id, record)
+
+
+def pick_dynamic_tag_account(
+    guild_id: int, zones: Iterable[str], klass: CharacterClass, required_key_column: str | None = None
+) -> int | None:
+    """Return the id of the account a dynamic tag should log into, or ``None`` if none is idle.
+
+    Same choice as sorting the eligible, inactive accounts by :func:`_login_sort_key` using the
+    level of their best matching character.
+    """
+    key = (frozenset(zones), klass, required_key_column)
+    now = datetime.datetime.now()
+    inactive_before = now - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
+    index = _dynamic_tag_indexes.get(guild_id)
+    if index is None:
+        index = _load_dynamic_tag_index(guild_id)
+    with _dynamic_tag_lock:
+        return index.pool(key).pick(now, inactive_before)
+
+
 def remove_account_character(guild_id: int, name: str) -> bool:
     """Remove a character/class from an account."""
     with base.get_session() as session:
         character = session.query(SSOAccountCharacter).filter_by(name=name, guild_id=guild_id).first()
         if not character:
             return False
+        account_id = character.account_id
         session.delete(character)
         session.commit()
+    invalidation.publish(invalidation.NamesChanged(guild_id, characters=True))
+    _accounts_changed(guild_id, {account_id})
     return True
 
 
+def _apply_character_update(
+    character: "SSOAccountCharacter",
+    klass: CharacterClass = None,
+    bind_location: str = None,
+    park_location: str = None,
+    level: int = None,
+    **items,
+) -> bool:
+    """Apply ``update_account_character`` semantics to a loaded row. Returns True if any field changed.
+
+    *items* are ``WIRE_KEY_TO_ATTR`` column names; ``None`` means "not reported" and is skipped.
+    """
+    changed = False
+    if klass:
+        if character.klass != klass:
+            character.klass = klass
+            changed = True
+    if bind_location:
+        if character.bind_location != bind_location:
+            character.bind_location = bind_location
+            changed = True
+    if park_location:
+        if character.park_location != park_location:
+            character.park_location = park_location
+            changed = True
+    if level is not None:
+        if character.level != level:
+            character.level = level
+            changed = True
+    for attr in WIRE_KEY_TO_ATTR.values():
+        value = items.get(attr)
+        if value is not None:
+            setattr(character, attr, value)
+            _touch_field_updated_at(character, attr)
+            changed = True
+    return changed
+
+
 def update_account_character(
     guild_id: int,
     name: str,
@@ -1663,84 +2437,45 @@ def update_account_character(
         character = session.query(SSOAccountCharacter).filter_by(name=name, guild_id=guild_id).first()
         if not character:
             return False
-        changed = False
-        if klass:
-            if character.klass != klass:
-                character.klass = klass
-                changed = True
-        if bind_location:
-            if character.bind_location != bind_location:
-                character.bind_location = bind_location
-                changed = True
-        if park_location:
-            if character.park_location != park_location:
-                character.park_location = park_location
-                changed = True
-        if level is not None:
-            if character.level != level:
-                character.level = level
-                changed = True
-        if key_seb is not None:
-            character.key_seb = key_seb
-            _touch_field_updated_at(character, "key_seb")
-            changed = True
-        if key_vp is not None:
-            character.key_vp = key_vp
-            _touch_field_updated_at(character, "key_vp")
-            changed = True
-        if key_st is not None:
-            character.key_st = key_st
-            _touch_field_updated_at(character, "key_st")
-            changed = True
-        if item_void is not None:
-            character.item_void = item_void
-            _touch_field_updated_at(character, "item_void")
-            changed = True
-        if item_neck is not None:
-            character.item_neck = item_neck
-            _touch_field_updated_at(character, "item_neck")
-            changed = True
-        if item_lizard is not None:
-            character.item_lizard = item_lizard
-            _touch_field_updated_at(character, "item_lizard")
-            changed = True
-        if item_thurg is not None:
-            character.item_thurg = item_thurg
-            _touch_field_updated_at(character, "item_thurg")
-            changed = True
-        if item_reaper is not None:
-            character.item_reaper = item_reaper
-            _touch_field_updated_at(character, "item_reaper")
-            changed = True
-        if item_brass_idol is not None:
-            character.item_brass_idol = item_brass_idol
-            _touch_field_updated_at(character, "item_brass_idol")
-            changed = True
-        if item_pearl is not None:
-            character.item_pearl = item_pearl
-            _touch_field_updated_at(character, "item_pearl")
-            changed = True
-        if item_peridot is not None:
-            character.item_peridot = item_peridot
-            _touch_field_updated_at(character, "item_peridot")
-            changed = True
-        if item_mb3 is not None:
-            character.item_mb3 = item_mb3
-            _touch_field_updated_at(character, "item_mb3")
-            changed = True
-        if item_mb4 is not None:
-            character.item_mb4 = item_mb4
-            _touch_field_updated_at(character, "item_mb4")
-            changed = True
-        if item_mb5 is not None:
-            character.item_mb5 = item_mb5
-            _touch_field_updated_at(character, "item_mb5")
-            changed = True
+        changed = _apply_character_update(
+            character,
+            klass=klass,
+            bind_location=bind_location,
+            park_location=park_location,
+            level=level,
+            key_seb=key_seb,
+            key_vp=key_vp,
+            key_st=key_st,
+            item_void=item_void,
+            item_neck=item_neck,
+            item_lizard=item_lizard,
+            item_thurg=item_thurg,
+            item_reaper=item_reaper,
+            item_brass_idol=item_brass_idol,
+            item_pearl=item_pearl,
+            item_peridot=item_peridot,
+            item_mb3=item_mb3,
+            item_mb4=item_mb4,
+            item_mb5=item_mb5,
+        )
         if changed:
+            character_id, record = character.id, _PoolCharacter.from_row(character)
             session.commit()
+            _dynamic_tag_characters_changed(guild_id, {character_id: record})
+            _accounts_changed(guild_id, {record.account_id})
         return changed
 
 
+def _mark_key_on_character(character: "SSOAccountCharacter", park_zone_key: str | None) -> bool:
+    """Set the key column for a keyed *park_zone_key* on a loaded row. Returns True if it flipped to True."""
+    column = KEY_ZONE_TO_COLUMN.get(park_zone_key) if park_zone_key else None
+    if not column or getattr(character, column):
+        return False
+    setattr(character, column, True)
+    _touch_field_updated_at(character, column)
+    return True
+
+
 def mark_key_from_park_zone(guild_id: int, name: str, park_zone_key: str | None) -> bool:
     """If park_zone_key is a keyed zone, set the corresponding key column to True.
 
@@ -1748,18 +2483,18 @@ def mark_key_from_park_zone(guild_id: int, name: str, park_zone_key: str | None)
     """
     if not park_zone_key:
         return False
-    column = KEY_ZONE_TO_COLUMN.get(park_zone_key)
-    if not column:
+    if not KEY_ZONE_TO_COLUMN.get(park_zone_key):
         return False
     with base.get_session() as session:
         character = session.query(SSOAccountCharacter).filter_by(name=name, guild_id=guild_id).first()
         if not character:
             return False
-        if getattr(character, column):
+        if not _mark_key_on_character(character, park_zone_key):
             return False
-        setattr(character, column, True)
-        _touch_field_updated_at(character, column)
+        character_id, record = character.id, _PoolCharacter.from_row(character)
         session.commit()
+    _dynamic_tag_characters_changed(guild_id, {character_id: record})
+    _accounts_changed(guild_id, {record.account_id})
     return True
 
 
@@ -1777,7 +2512,10 @@ def set_character_item(guild_id: int, name: str, wire_key: str, value: bool | No
             return False
         setattr(character, column, value)
         _touch_field_updated_at(character, column)
+        character_id, record = character.id, _PoolCharacter.from_row(character)
         session.commit()
+    _dynamic_tag_characters_changed(guild_id, {character_id: record})
+    _accounts_changed(guild_id, {record.account_id})
     return True
 
 
@@ -1799,6 +2537,8 @@ def set_character_stack_item(guild_id: int, name: str, wire_key: str, value: int
         setattr(character, column, value)
         _touch_field_updated_at(character, column)
         session.commit()
+        account_id = character.account_id
+    _accounts_changed(guild_id, {account_id})
     return True
 
 
@@ -1845,57 +2585,142 @@ class SSOCharacterSession(base.Base):
     account = sqlalchemy.orm.relationship("SSOAccount")
 
 
+def _record_heartbeat_session(
+    session: sqlalchemy.orm.Session,
+    guild_id: int,
+    account_id: int,
+    character_name: str,
+    discord_user_id: int,
+    now: datetime.datetime,
+) -> None:
+    threshold = now - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
+    active = (
+        session.query(SSOCharacterSession)
+        .filter(
+            SSOCharacterSession.guild_id == guild_id,
+            SSOCharacterSession.character_name == character_name,
+            SSOCharacterSession.last_seen >= threshold,
+        )
+        .first()
+    )
+    if active:
+        active.last_seen = now
+        active.discord_user_id = discord_user_id
+    else:
+        session.add(
+            SSOCharacterSession(
+                guild_id=guild_id,
+                account_id=account_id,
+                character_name=character_name,
+                discord_user_id=discord_user_id,
+                first_seen=now,
+                last_seen=now,
+            )
+        )
+
+
 def record_heartbeat_session(guild_id: int, account_id: int, character_name: str, discord_user_id: int) -> None:
     """Record a heartbeat, extending an active session or creating a new one."""
-    now = datetime.datetime.now()
-    threshold = now - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
     with base.get_session() as session:
-        active = (
-            session.query(SSOCharacterSession)
-            .filter(
-                SSOCharacterSession.guild_id == guild_id,
-                SSOCharacterSession.character_name == character_name,
-                SSOCharacterSession.last_seen >= threshold,
-            )
-            .first()
+        _record_heartbeat_session(
+            session, guild_id, account_id, character_name, discord_user_id, datetime.datetime.now()
         )
-        if active:
-            active.last_seen = now
-            active.discord_user_id = discord_user_id
-        else:
-            session.add(
-                SSOCharacterSession(
-                    guild_id=guild_id,
-                    account_id=account_id,
-                    character_name=character_name,
-                    discord_user_id=discord_user_id,
-                    first_seen=now,
-                    last_seen=now,
-                )
-            )
         session.commit()
 
 
+def _expire_other_sessions(
+    session: sqlalchemy.orm.Session,
+    guild_id: int,
+    discord_user_id: int,
+    keep_account_id: int,
+    now: datetime.datetime,
+) -> int:
+    threshold = now - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
+    expired_time = threshold - datetime.timedelta(seconds=1)
+    return (
+        session.query(SSOCharacterSession)
+        .filter(
+            SSOCharacterSession.guild_id == guild_id,
+            SSOCharacterSession.discord_user_id == discord_user_id,
+            SSOCharacterSession.account_id != keep_account_id,
+            SSOCharacterSession.last_seen >= threshold,
+        )
+        .update({SSOCharacterSession.last_seen: expired_time})
+    )
+
+
 def expire_other_sessions(guild_id: int, discord_user_id: int, keep_account_id: int) -> int:
     """Expire active sessions for a user on all accounts except keep_account_id.
     Returns the number of sessions expired."""
-    threshold = datetime.datetime.now() - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
-    expired_time = threshold - datetime.timedelta(seconds=1)
     with base.get_session() as session:
-        count = (
-            session.query(SSOCharacterSession)
-            .filter(
-                SSOCharacterSession.guild_id == guild_id,
-                SSOCharacterSession.discord_user_id == discord_user_id,
-                SSOCharacterSession.account_id != keep_account_id,
-                SSOCharacterSession.last_seen >= threshold,
-            )
-            .update({SSOCharacterSession.last_seen: expired_time})
-        )
+        count = _expire_other_sessions(session, guild_id, discord_user_id, keep_account_id, datetime.datetime.now())
         session.commit()
     return count
 
 
+def apply_presence_updates(updates) -> set[int]:
+    """Persist a batch of coalesced heartbeat / ``update_location`` entries in one transaction.
+
+    Each entry is applied in order with the same semantics as calling :func:`update_last_login`,
+    :func:`record_heartbeat_session`, :func:`expire_other_sessions`, :func:`update_account_character`
+    and :func:`mark_key_from_park_zone` back to back.  Entries must provide ``guild_id``,
+    ``account_id``, ``character_name``, ``discord_user_id``, ``login_by``, ``seen_at``,
+    ``character_fields`` (keyword arguments for ``update_account_character``) and ``park_zone_keys``.
+
+    Returns the guild IDs whose character rows changed.
+    """
+    updates = list(updates)
+    if not updates:
+        return set()
+    changed_guilds: set[int] = set()
+    with base.get_session() as session:
+        account_ids = {u.account_id for u in updates}
+        accounts = {a.id: a for a in session.query(SSOAccount).filter(SSOAccount.id.in_(account_ids)).all()}
+
+        names_by_guild: dict[int, set[str]] = {}
+        for u in updates:
+            if u.character_fields or u.park_zone_keys:
+                names_by_guild.setdefault(u.guild_id, set()).add(u.character_name)
+        characters: dict[tuple[int, str], SSOAccountCharacter] = {}
+        for guild_id, names in names_by_guild.items():
+            rows = (
+                session.query(SSOAccountCharacter)
+                .filter(SSOAccountCharacter.guild_id == guild_id, SSOAccountCharacter.name.in_(names))
+                .all()
+            )
+            for row in rows:
+                characters[(guild_id, row.name)] = row
+
+        for u in updates:
+            account = accounts.get(u.account_id)
+            if account is not None:
+                _touch_last_login(account, u.seen_at, u.login_by)
+            _record_heartbeat_session(session, u.guild_id, u.account_id, u.character_name, u.discord_user_id, u.seen_at)
+            _expire_other_sessions(session, u.guild_id, u.discord_user_id, u.account_id, u.seen_at)
+            character = characters.get((u.guild_id, u.character_name))
+            if character is None:
+                continue
+            changed = _apply_character_update(character, **u.character_fields) if u.character_fields else False
+            for zone_key in u.park_zone_keys:
+                changed = _mark_key_on_character(character, zone_key) or changed
+            if changed:
+                changed_guilds.add(u.guild_id)
+        records: dict[int, dict[int, _PoolCharacter]] = {}
+        for (guild_id, _), character in characters.items():
+            if guild_id in changed_guilds:
+                records.setdefault(guild_id, {})[character.id] = _PoolCharacter.from_row(character)
+        session.commit()
+    for guild_id, guild_records in records.items():
+        _dynamic_tag_characters_changed(guild_id, guild_records)
+    logins: dict[int, dict[int, datetime.datetime]] = {}
+    for u in updates:
+        logins.setdefault(u.guild_id, {})[u.account_id] = u.seen_at
+    for guild_id, guild_logins in logins.items():
+        _dynamic_tag_logins_changed(guild_id, guild_logins)
+        _accounts_changed(guild_id, guild_logins)
+    return changed_guilds
+
+
 def get_active_characters(guild_id: int) -> dict[int, str]:
     """Return a mapping of account_id -> character_name for currently active sessions."""
     threshold = datetime.datetime.now() - datetime.timedelta(seconds=config.SSO_INACTIVITY_SECONDS)
@@ -1939,123 +2764,87 @@ def get_sessions_in_range(guild_id: int, start: datetime.datetime, end: datetime
     return sessions
 
 
-def archive_old_records(retention_days: int = 90, archive_dir: str = "audit_archives") -> tuple[int, int]:
-    """Export audit logs and character sessions older than *retention_days* to
-    CSV files, then delete them from the database.
+# Rows read, written and deleted per transaction by archive_old_records.
+ARCHIVE_CHUNK_SIZE = 1000
 
-    Returns (audit_count, session_count) of archived rows.
-    """
-    import csv
-    import logging
-    import os
-
-    logger = logging.getLogger(__name__)
-    cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
 
-    audit_count = 0
-    session_count = 0
+def _archive_table(
+    table: sqlalchemy.Table,
+    age_column: sqlalchemy.Column,
+    cutoff: datetime.datetime,
+    path: str,
+    chunk_size: int,
+    stop: threading.Event | None = None,
+) -> int:
+    """Move rows of *table* with *age_column* before *cutoff* into the gzip CSV at *path*.
 
-    with base.get_session() as session:
-        old_audits = (
-            session.query(SSOAuditLog)
-            .filter(
-                SSOAuditLog.timestamp < cutoff,
-            )
-            .order_by(SSOAuditLog.timestamp)
-            .all()
-        )
-
-        old_sessions = (
-            session.query(SSOCharacterSession)
-            .filter(
-                SSOCharacterSession.last_seen < cutoff,
-            )
-            .order_by(SSOCharacterSession.first_seen)
-            .all()
-        )
+    Rows are paged by primary key, *chunk_size* at a time; each chunk is appended to the file and
+    then deleted in its own short transaction, so memory stays flat and writers are never blocked
+    for long.  A chunk is only deleted after it has been written, so an interrupted run can at worst
+    archive a chunk twice.  The file is created on the first row.  Returns the number of rows moved.
+    """
+    columns = list(table.columns)
+    page = sqlalchemy.select(*columns).where(age_column < cutoff).order_by(table.c.id).limit(chunk_size)
+    archived = 0
+    last_id = 0
+    out = None
+    try:
+        while stop is None or not stop.is_set():
+            with base.get_session() as session:
+                rows = session.execute(page.where(table.c.id > last_id)).all()
+                if not rows:
+                    break
+                if out is None:
+                    out = gzip.open(path, "wt", newline="", encoding="utf-8")
+                    writer = csv.writer(out)
+                    writer.writerow([c.name for c in columns])
+                writer.writerows(rows)
+                out.flush()
+                first_id, last_id = rows[0].id, rows[-1].id
+                session.execute(
+                    sqlalchemy.delete(table).where(table.c.id.between(first_id, last_id), age_column < cutoff)
+                )
+                session.commit()
+            archived += len(rows)
+    finally:
+        if out is not None:
+            out.close()
+    return archived
+
+
+def archive_old_records(
+    retention_days: int = 90,
+    archive_dir: str = "audit_archives",
+    chunk_size: int = ARCHIVE_CHUNK_SIZE,
+    stop: threading.Event | None = None,
+) -> tuple[int, int]:
+    """Move audit logs and character sessions older than *retention_days* into gzip-compressed CSV
+    files under *archive_dir* (``audit_log_<ts>.csv.gz``, ``character_session_<ts>.csv.gz``).
+
+    Streams in chunks of *chunk_size* rows (see :func:`_archive_table`); setting *stop* ends the
+    run after the current chunk.  Returns (audit_count, session_count) of archived rows.
+    """
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+    os.makedirs(archive_dir, exist_ok=True)
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        if not old_audits and not old_sessions:
-            return 0, 0
-
-        os.makedirs(archive_dir, exist_ok=True)
-        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        if old_audits:
-            path = os.path.join(archive_dir, f"audit_log_{ts}.csv")
-            audit_cols = [
-                "id",
-                "timestamp",
-                "ip_address",
-                "username",
-                "success",
-                "discord_user_id",
-                "guild_id",
-                "account_id",
-                "rate_limit",
-                "details",
-            ]
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(audit_cols)
-                for row in old_audits:
-                    writer.writerow(
-                        [
-                            row.id,
-                            row.timestamp,
-                            row.ip_address,
-                            row.username,
-                            row.success,
-                            row.discord_user_id,
-                            row.guild_id,
-                            row.account_id,
-                            row.rate_limit,
-                            row.details,
-                        ]
-                    )
-            audit_count = len(old_audits)
-            audit_ids = [row.id for row in old_audits]
-            session.query(SSOAuditLog).filter(
-                SSOAuditLog.id.in_(audit_ids),
-            ).delete(synchronize_session="fetch")
-            logger.info("Archived %d audit log rows to %s", audit_count, path)
-
-        if old_sessions:
-            path = os.path.join(archive_dir, f"character_session_{ts}.csv")
-            session_cols = [
-                "id",
-                "guild_id",
-                "account_id",
-                "character_name",
-                "discord_user_id",
-                "first_seen",
-                "last_seen",
-            ]
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(session_cols)
-                for row in old_sessions:
-                    writer.writerow(
-                        [
-                            row.id,
-                            row.guild_id,
-                            row.account_id,
-                            row.character_name,
-                            row.discord_user_id,
-                            row.first_seen,
-                            row.last_seen,
-                        ]
-                    )
-            session_count = len(old_sessions)
-            sess_ids = [row.id for row in old_sessions]
-            session.query(SSOCharacterSession).filter(
-                SSOCharacterSession.id.in_(sess_ids),
-            ).delete(synchronize_session="fetch")
-            logger.info(
-                "Archived %d character session rows to %s",
-                session_count,
+    counts = []
+    for table, age_column, name in (
+        (SSOAuditLog.__table__, SSOAuditLog.__table__.c.timestamp, "audit_log"),
+        (SSOCharacterSession.__table__, SSOCharacterSession.__table__.c.last_seen, "character_session"),
+    ):
+        path = os.path.join(archive_dir, f"{name}_{ts}.csv.gz")
+        started = time.perf_counter()
+        count = _archive_table(table, age_column, cutoff, path, chunk_size, stop)
+        elapsed = time.perf_counter() - started
+        if count:
+            _log.info(
+                "Archived %d %s rows to %s in %.1fs (%.0f rows/s)",
+                count,
+                name,
                 path,
+                elapsed,
+                count / elapsed if elapsed > 0 else 0.0,
             )
-
-        session.commit()
-
-    return audit_count, session_count
+        counts.append(count)
+    return counts[0], counts[1]
@@ -0,0 +1,262 @@
+"""Opt-in query profiler: statement fingerprints, per-session query counts, N+1 and slow-query reports.
+
+Enabled with ``[database] query_profiling = true``.  When on, every engine made by
+``base.create_sqlite_engine`` (the main database and each per-guild raid database) times its
+statements, and ``base.get_session`` / ``raid_base.get_raid_session`` open a :class:`SessionProfile`
+for their duration.  Each statement is reduced to a fingerprint (literals, numbers and ``IN`` lists
+collapsed), then counted globally and against the innermost open session.
+
+When a session closes it is flagged if it ran ``DB_SESSION_QUERY_THRESHOLD`` queries or more, or ran
+one fingerprint ``DB_REPEAT_QUERY_THRESHOLD`` times or more (the usual shape of an N+1 loop).
+Statements slower than ``DB_SLOW_QUERY_MS`` are logged with the function that issued them.
+:meth:`QueryProfiler.report` feeds the admin dashboard's Queries tab.
+
+When profiling is off no listeners are attached and ``profile_session`` is a no-op.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import contextvars
+import datetime
+import functools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+import sqlalchemy
+
+from roboToald import config
+
+logger = logging.getLogger(__name__)
+
+# Frames from these modules are plumbing; the "caller" is the first frame outside them.
+_PLUMBING = ("contextlib", "sqlalchemy", "roboToald.db.base", "roboToald.db.raid_base", __name__)
+# Flagged sessions from the same caller are logged at most this often.
+LOG_INTERVAL_SEC = 60.0
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """*statement* with literals replaced by ``?`` and ``IN (?, ?, ...)`` lists collapsed to ``(?+)``."""
+    fp = _WHITESPACE.sub(" ", statement).strip()
+    fp = _STRING.sub("?", fp)
+    fp = _NUMBER.sub("?", fp)
+    return _IN_LIST.sub("(?+)", fp)
+
+
+def _caller() -> str:
+    """``module.function:line`` of the nearest frame outside the database plumbing."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_PLUMBING):
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "unknown"
+
+
+@dataclass
+class SessionProfile:
+    """Queries run while one ``get_session`` / ``get_raid_session`` block was open."""
+
+    caller: str
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    elapsed: float = 0.0
+    databases: set[str] = field(default_factory=set)
+    fingerprints: collections.Counter = field(default_factory=collections.Counter)
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    caller: str = ""
+
+
+class QueryProfiler:
+    """Process-wide aggregates of profiled statements and flagged sessions."""
+
+    def __init__(
+        self,
+        slow_ms: int | None = None,
+        session_threshold: int | None = None,
+        repeat_threshold: int | None = None,
+        max_statements: int = 1000,
+        history: int = 100,
+    ):
+        self.slow = (slow_ms if slow_ms is not None else config.DB_SLOW_QUERY_MS) / 1000.0
+        self.session_threshold = session_threshold or config.DB_SESSION_QUERY_THRESHOLD
+        self.repeat_threshold = repeat_threshold or config.DB_REPEAT_QUERY_THRESHOLD
+        self._max_statements = max_statements
+        self._history = history
+        self._current: contextvars.ContextVar[SessionProfile | None] = contextvars.ContextVar(
+            "query_profile", default=None
+        )
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.statements: dict[str, StatementStats] = {}
+            self.flagged_callers: dict[str, dict] = {}
+            self.recent_flagged: collections.deque[dict] = collections.deque(maxlen=self._history)
+            self.recent_slow: collections.deque[dict] = collections.deque(maxlen=self._history)
+            self.sessions = 0
+            self.queries = 0
+            self._last_logged: dict[str, float] = {}
+
+    # -- Recording ----------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def session(self):
+        """Attribute statements run inside the block to a new :class:`SessionProfile`."""
+        profile = SessionProfile(caller=_caller())
+        token = self._current.set(profile)
+        try:
+            yield profile
+        finally:
+            self._current.reset(token)
+            self._finish(profile)
+
+    def record(self, statement: str, elapsed: float, database: str) -> None:
+        """Account one executed statement (called from the engine's cursor events)."""
+        fp = fingerprint(statement)
+        profile = self._current.get()
+        if profile is not None:
+            profile.queries += 1
+            profile.elapsed += elapsed
+            profile.databases.add(database)
+            profile.fingerprints[fp] += 1
+        slow = elapsed >= self.slow
+        caller = _caller() if slow or fp not in self.statements else None
+        with self._lock:
+            self.queries += 1
+            stats = self.statements.get(fp)
+            if stats is None:
+                if len(self.statements) >= self._max_statements:
+                    return
+                stats = self.statements[fp] = StatementStats(caller=caller or "")
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            if slow:
+                self.recent_slow.append(
+                    {
+                        "when": datetime.datetime.now(),
+                        "ms": round(elapsed * 1000.0, 1),
+                        "caller": caller,
+                        "database": database,
+                        "fingerprint": fp,
+                    }
+                )
+        if slow:
+            logger.warning("Slow query (%.1f ms, %s) from %s: %s", elapsed * 1000.0, database, caller, fp[:300])
+
+    def _finish(self, profile: SessionProfile) -> None:
+        worst_fp, worst_count = (profile.fingerprints.most_common(1) or [("", 0)])[0]
+        too_many = profile.queries >= self.session_threshold
+        repeated = worst_count >= self.repeat_threshold
+        with self._lock:
+            self.sessions += 1
+            if not (too_many or repeated):
+                return
+            entry = {
+                "when": datetime.datetime.now(),
+                "caller": profile.caller,
+                "databases": ", ".join(sorted(profile.databases)),
+                "queries": profile.queries,
+                "ms": round(profile.elapsed * 1000.0, 1),
+                "fingerprint": worst_fp,
+                "repeats": worst_count,
+                "reason": "repeated statement" if repeated else "query count",
+            }
+            self.recent_flagged.append(entry)
+            summary = self.flagged_callers.setdefault(
+                profile.caller, {"caller": profile.caller, "times": 0, "max_queries": 0, "max_repeats": 0}
+            )
+            summary["times"] += 1
+            summary["max_queries"] = max(summary["max_queries"], profile.queries)
+            if worst_count >= summary["max_repeats"]:
+                summary["max_repeats"] = worst_count
+                summary["fingerprint"] = worst_fp
+            now = time.monotonic()
+            if now - self._last_logged.get(profile.caller, -LOG_INTERVAL_SEC) < LOG_INTERVAL_SEC:
+                return
+            self._last_logged[profile.caller] = now
+        logger.warning(
+            "Query-heavy session from %s: %d queries in %.1f ms; most repeated (%dx): %s",
+            profile.caller,
+            profile.queries,
+            profile.elapsed * 1000.0,
+            worst_count,
+            worst_fp[:300],
+        )
+
+    # -- Reporting ----------------------------------------------------------------
+
+    def report(self, top: int = 25) -> dict:
+        """Top statements by total time, flagged callers, and recent flagged / slow entries."""
+        with self._lock:
+            statements = [
+                {
+                    "fingerprint": fp,
+                    "count": s.count,
+                    "total_ms": round(s.total * 1000.0, 1),
+                    "avg_ms": round(s.total * 1000.0 / s.count, 2),
+                    "max_ms": round(s.max * 1000.0, 1),
+                    "caller": s.caller,
+                }
+                for fp, s in self.statements.items()
+            ]
+            flagged = sorted(self.flagged_callers.values(), key=lambda f: f["times"], reverse=True)
+            return {
+                "enabled": config.DB_QUERY_PROFILING,
+                "sessions": self.sessions,
+                "queries": self.queries,
+                "slow_ms": round(self.slow * 1000.0),
+                "session_threshold": self.session_threshold,
+                "repeat_threshold": self.repeat_threshold,
+                "top_statements": sorted(statements, key=lambda s: s["total_ms"], reverse=True)[:top],
+                "flagged_callers": [dict(f) for f in flagged[:top]],
+                "recent_flagged": list(reversed(self.recent_flagged)),
+                "recent_slow": list(reversed(self.recent_slow)),
+            }
+
+
+profiler = QueryProfiler()
+
+
+def profile_session():
+    """Context manager used by ``get_session`` / ``get_raid_session`` (no-op unless profiling is enabled)."""
+    if not config.DB_QUERY_PROFILING:
+        return contextlib.nullcontext()
+    return profiler.session()
+
+
+def instrument_engine(engine: sqlalchemy.engine.Engine, path: str) -> None:
+    """Feed every statement *engine* runs to :data:`profiler`, labelled by the database file name."""
+    database = os.path.basename(path)
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._profiler_started = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_profiler_started", None)
+        if started is not None:
+            profiler.record(statement, time.perf_counter() - started, database)
+
+    sqlalchemy.event.listen(engine, "before_cursor_execute", before)
+    sqlalchemy.event.listen(engine, "after_cursor_execute", after)
@@ -5,6 +5,8 @@ import sqlalchemy
 import sqlalchemy.orm
 
 from roboToald import config
+from roboToald.db import query_profiler
+from roboToald.db.base import create_sqlite_engine, create_tables
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +21,7 @@ def _db_path(guild_id: int) -> str:
 
 def get_raid_engine(guild_id: int) -> sqlalchemy.engine.Engine:
     if guild_id not in _engines:
-        _engines[guild_id] = sqlalchemy.create_engine(
-            f"sqlite:///{_db_path(guild_id)}",
-            echo=False,
-            future=True,
-        )
+        _engines[guild_id] = create_sqlite_engine(_db_path(guild_id))
     return _engines[guild_id]
 
 
@@ -38,14 +36,14 @@ def initialize_raid_database(guild_id: int, run_migrations=True):
     engine = get_raid_engine(guild_id)
 
     if not run_migrations:
-        RaidBase.metadata.create_all(engine)
+        create_tables(RaidBase.metadata, engine)
         return
 
     try:
         from roboToald.db.raid_migrations import upgrade_raid_database, stamp_raid_database
     except ImportError:
         logger.info("Alembic not available for raid DB — falling back to create_all().")
-        RaidBase.metadata.create_all(engine)
+        create_tables(RaidBase.metadata, engine)
         return
 
     db_path = _db_path(guild_id)
@@ -61,7 +59,7 @@ def initialize_raid_database(guild_id: int, run_migrations=True):
             guild_id,
             db_path,
         )
-        RaidBase.metadata.create_all(engine)
+        create_tables(RaidBase.metadata, engine)
         stamp_raid_database(db_path=db_path)
     elif not has_alembic:
         logger.info("Pre-Alembic raid database detected (guild_id=%s, path=%s) — stamping head.", guild_id, db_path)
@@ -75,5 +73,8 @@ def initialize_raid_database(guild_id: int, run_migrations=True):
 
 @contextlib.contextmanager
 def get_raid_session(guild_id: int, autocommit=False) -> sqlalchemy.orm.Session:
-    with sqlalchemy.orm.Session(get_raid_engine(guild_id), autocommit=autocommit) as session:
+    with (
+        sqlalchemy.orm.Session(get_raid_engine(guild_id), autocommit=autocommit) as session,
+        query_profiler.profile_session(),
+    ):
         yield session
@@ -10,3 +10,4 @@ from roboToald.db.raid_models.raid import (  # noqa: F401
 from roboToald.db.raid_models.tracking import Tracking  # noqa: F401
 from roboToald.db.raid_models.loot import EventLoot, Loot, Item, LootTable  # noqa: F401
 from roboToald.db.raid_models.permission import Permission  # noqa: F401
+from roboToald.db.raid_models.outbox import EqdkpOutbox  # noqa: F401
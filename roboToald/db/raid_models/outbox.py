@@ -0,0 +1,41 @@
+import json
+
+import sqlalchemy as sa
+
+from roboToald.db.raid_base import RaidBase
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_DONE = "done"
+OUTBOX_FAILED = "failed"
+OUTBOX_SKIPPED = "skipped"  # completed without sending anything (e.g. the character is not in EQdkp)
+
+
+class EqdkpOutbox(RaidBase):
+    """One EQdkp write waiting to be sent (or already sent) by ``roboToald.raid.eqdkp_outbox``.
+
+    ``idempotency_key`` names the write itself (e.g. ``submit:12:item:40``), so enqueuing the same
+    submit twice adds nothing.  Rows of one ``batch`` run in ``stage`` order: a row is only sent once
+    every lower-stage row of its batch is done.
+    """
+
+    __tablename__ = "eqdkp_outbox"
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    idempotency_key = sa.Column(sa.String, nullable=False, unique=True)
+    batch = sa.Column(sa.String, nullable=False, index=True)
+    stage = sa.Column(sa.Integer, nullable=False, default=0)
+    kind = sa.Column(sa.String, nullable=False)
+    label = sa.Column(sa.String)
+    payload = sa.Column(sa.Text, nullable=False, default="{}")
+    status = sa.Column(sa.String, nullable=False, default=OUTBOX_PENDING, index=True)
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    result_id = sa.Column(sa.Integer)
+    last_error = sa.Column(sa.Text)
+    next_attempt_at = sa.Column(sa.DateTime)
+    created_at = sa.Column(sa.DateTime)
+    completed_at = sa.Column(sa.DateTime)
+
+    @property
+    def data(self) -> dict:
+        return json.loads(self.payload or "{}")
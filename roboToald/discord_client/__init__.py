@@ -5,9 +5,10 @@ import time
 
 import disnake
 
-from roboToald import asyncio_default_executor
+from roboToald import asyncio_default_executor, config
 from roboToald.discord_client import commands
 from roboToald.discord_client.base import DISCORD_CLIENT
+from roboToald.raid import eqdkp_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +47,8 @@ async def on_ready():
     SUBSCRIPTION_TASK = asyncio.create_task(announce_subscriptions_task())
     asyncio.ensure_future(SUBSCRIPTION_TASK)
     logger.info("Started Subscription Notifier.")
+    if config.raid_guild_ids():
+        eqdkp_outbox.worker.start()
 
 
 @DISCORD_CLIENT.listen("on_button_click")
@@ -1,11 +1,12 @@
 import logging
-import re
 
 import disnake
 from disnake.ext import commands
 
 from roboToald import config
 from roboToald.db.models import alert as alert_model
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.raid import eqdkp_outbox
 from roboToald.discord_client.wakeup import wakeup
 from roboToald import utils
 
@@ -39,47 +40,59 @@ DISCORD_INTENTS.guild_messages = True
 DISCORD_INTENTS.members = True
 DISCORD_SYNC_FLAGS = disnake.ext.commands.CommandSyncFlags.all()
 # DISCORD_SYNC_FLAGS.sync_commands_debug = True
-DISCORD_CLIENT = commands.Bot(command_prefix="!", command_sync_flags=DISCORD_SYNC_FLAGS, intents=DISCORD_INTENTS)
+
+
+class Bot(commands.Bot):
+    async def close(self) -> None:
+        # Also runs when disnake cancels the runner on SIGINT/SIGTERM.
+        await eqdkp_outbox.worker.stop()
+        await eqdkp_client.close_pools()
+        await super().close()
+
+
+DISCORD_CLIENT = Bot(command_prefix="!", command_sync_flags=DISCORD_SYNC_FLAGS, intents=DISCORD_INTENTS)
 DISCORD_CLIENT.load_extension("roboToald.discord_client.commands.cmd_sso")
 
 
 def find_match(channel, message):
     alerts_sent = set()
-    for alert in alert_model.get_alerts_for_channel(channel):
+    mentioned_roles = None
+    for rule in alert_model.get_alert_rules_for_channel(channel):
         matches_filter = True
-        if alert.alert_regex:
-            matches_filter = re.match(alert.alert_regex, message.clean_content, flags=re.IGNORECASE)
+        if rule.pattern is not None:
+            matches_filter = rule.pattern.match(message.clean_content)
         matches_role = True
-        if alert.alert_role:
-            matches_role = False
-            for mention in message.role_mentions:
+        if rule.role_id:
+            if mentioned_roles is None:
                 # TODO: This doesn't work for @everyone because it is treated
                 # differently than other roles...
-                if mention.id == alert.alert_role:
-                    matches_role = True
-                    break
+                mentioned_roles = {mention.id for mention in message.role_mentions}
+            matches_role = rule.role_id in mentioned_roles
             # handle if the role is @everyone
-            if message.mention_everyone:
-                role_name = message.guild.get_role(alert.alert_role).mention
+            if not matches_role and message.mention_everyone:
+                role_name = message.guild.get_role(rule.role_id).mention
                 if role_name == "@everyone":
                     matches_role = True
         if matches_filter and matches_role:
             # Check to make sure the user has the right role to see this alert
-            if not is_user_authorized(message.guild, alert.user_id, config.get_member_role(message.guild.id)):
-                logger.info("Skipping alert #%s, user not authorized", alert.id)
-            elif alert.alert_url not in alerts_sent:
-                logger.info("Sending alert #%s", alert.id)
-                owner_display = resolve_alert_owner_display_name(message.guild, alert.user_id)
-                guild_display = resolve_guild_display_name(message.guild, alert.guild_id)
+            if not is_user_authorized(message.guild, rule.user_id, config.get_member_role(message.guild.id)):
+                logger.info("Skipping alert #%s, user not authorized", rule.id)
+            elif rule.alert_url not in alerts_sent:
+                alert = alert_model.get_alert(rule.id)
+                if alert is None:
+                    continue
+                logger.info("Sending alert #%s", rule.id)
+                owner_display = resolve_alert_owner_display_name(message.guild, rule.user_id)
+                guild_display = resolve_guild_display_name(message.guild, rule.guild_id)
                 utils.send_alert(
                     alert,
                     message.clean_content,
                     alert_owner_display_name=owner_display,
                     guild_name=guild_display,
                 )
-                alerts_sent.add(alert.alert_url)
+                alerts_sent.add(rule.alert_url)
             else:
-                logger.info("Skipping alert #%s, already triggered for this URL", alert.id)
+                logger.info("Skipping alert #%s, already triggered for this URL", rule.id)
 
 
 def is_user_authorized(guild: disnake.Guild, user_id: int, role_id: int) -> bool:
@@ -98,7 +111,7 @@ async def on_message(message):
         return
 
     # Search for matches to registered alerts
-    if message.channel.id in alert_model.get_registered_channels():
+    if alert_model.get_alert_rules_for_channel(message.channel.id):
         find_match(channel=message.channel.id, message=message)
 
     await wakeup.process_message(message)
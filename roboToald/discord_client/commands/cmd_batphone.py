@@ -104,6 +104,7 @@ async def register(
             await inter.response.send_message("Alert already exists.", ephemeral=True)
             return
         session.flush()
+        alert_model.invalidate_alert_index()
         logger.info("Registered Alert ID: `%s`", alert.id)
     await inter.response.send_message(
         f"Stored alert for <#{alert.channel_id}>: `{alert.alert_regex}` \u2192 {alert.alert_url}", ephemeral=True
@@ -150,6 +151,7 @@ async def list(inter: disnake.ApplicationCommandInteraction):
             if action == constants.DELETE_EMOJI:
                 logger.info("Removing alert %s!", that_alert.id)
                 that_alert.delete()
+                alert_model.invalidate_alert_index()
                 test_button.disabled = True
                 delete_button.disabled = True
                 clear_count_button.disabled = True
@@ -22,15 +22,26 @@ import sqlalchemy as sa
 
 from roboToald import config
 from roboToald.db.raid_base import get_raid_session
-from roboToald.db.raid_models.raid import Event, Attendee, Removal, Fte, EqdkpEvent
+from roboToald.db.raid_models.raid import Event, Attendee, Removal, Fte
 from roboToald.db.raid_models.target import Target, TargetAlias, Tier
 from roboToald.db.raid_models.tracking import Tracking
 from roboToald.db.raid_models.loot import EventLoot, Loot, Item, LootTable
 from roboToald.db.raid_models.character import Character
+from roboToald.db.raid_models.outbox import EqdkpOutbox
 from roboToald.db.raid_models.permission import Permission
 from roboToald.discord_client import base
 from roboToald.eqdkp.client import EqdkpClient
 from roboToald.raid import permissions as perms
+from roboToald.raid.eqdkp_outbox import retry_failed, worker as outbox_worker
+from roboToald.raid.eqdkp_submit import (
+    SubmitError,
+    SubmitProgress,
+    batch_progress,
+    build_submit_embed,
+    enqueue_submit,
+    submit_batch,
+    watch_batch,
+)
 from roboToald.raid.event_helpers import (
     resolve_target,
     get_shortest_alias,
@@ -668,6 +679,17 @@ async def _handle_log_parse(message: disnake.Message):
         if not evt:
             return
 
+        if eqdkp_client:
+            # Look up every unlinked name at once; the loop below then reads from the cache.
+            known = {
+                name.lower(): (name, member_id)
+                for name, member_id in session.query(Character.name, Character.eqdkp_member_id).filter(
+                    sa.func.lower(Character.name).in_([p.name.lower() for p in players])
+                )
+            }
+            lookups = [known.get(p.name.lower(), (p.name, None)) for p in players]
+            await eqdkp_client.prefetch_characters([name for name, member_id in lookups if not member_id])
+
         num_added = 0
         for p in players:
             member = None
@@ -961,6 +983,10 @@ async def _cmd_status(message: disnake.Message, _args: str):
     await message.channel.send(embed=embed)
 
 
+# Background tasks following queued submits (kept referenced until they finish).
+_SUBMIT_WATCHERS: set[asyncio.Task] = set()
+
+
 @_dollar("submit")
 async def _cmd_submit(message: disnake.Message, args: str):
     guild_id = message.guild.id
@@ -968,183 +994,114 @@ async def _cmd_submit(message: disnake.Message, args: str):
     if args_lower == "reset":
         await _cmd_submit_reset(message)
         return
+    if args_lower == "status":
+        await _cmd_submit_status(message)
+        return
+    if args_lower == "retry":
+        await _cmd_submit_retry(message)
+        return
 
     if not perms.can(message.author, "submit", guild_id):
         await message.channel.send("```diff\n- You do not have permission to access that command.```")
         return
 
     force = args_lower == "force"
-    async with message.channel.typing():
-        from roboToald.eqdkp.client import EqdkpClient
+    with get_raid_session(guild_id) as session:
+        evt = _get_event(session, str(message.channel.id))
+        if not evt:
+            await message.channel.send("```diff\n- No event here.```")
+            return
+        if evt.eqdkp_event_id and evt.eqdkp_raid_id:
+            await message.channel.send("```diff\n- Already submitted. Use $submit reset first.```")
+            return
+        if evt.killed is None:
+            await message.channel.send("```diff\n- Use $kill or $nokill first.```")
+            return
+        if evt.killed and not force and (evt.dkp or 0) == 0:
+            await message.channel.send("```fix\nDKP is 0. Use $submit force or set DKP with $dkp.```")
+            return
+        try:
+            batch = enqueue_submit(session, evt)
+        except SubmitError as exc:
+            await message.channel.send(f"```diff\n- {exc}```")
+            return
+        session.commit()
 
-        eqdkp = EqdkpClient(guild_id)
+    outbox_worker.notify()
+    await _follow_submit(message, batch)
 
-        with get_raid_session(guild_id) as session:
-            evt = _get_event(session, str(message.channel.id))
-            if not evt:
-                await message.channel.send("```diff\n- No event here.```")
-                return
-            if evt.eqdkp_event_id and evt.eqdkp_raid_id:
-                await message.channel.send("```diff\n- Already submitted. Use $submit reset first.```")
-                return
-            if evt.killed is None:
-                await message.channel.send("```diff\n- Use $kill or $nokill first.```")
-                return
-            if evt.killed and not force and (evt.dkp or 0) == 0:
-                await message.channel.send("```fix\nDKP is 0. Use $submit force or set DKP with $dkp.```")
-                return
 
-            try:
-                tgt = session.query(Target).get(evt.target_id) if evt.target_id else None
-                event_name = tgt.name if tgt else evt.name
-
-                eqdkp_evt = session.query(EqdkpEvent).filter(EqdkpEvent.name.ilike(event_name)).first()
-                if not eqdkp_evt or not eqdkp_evt.eqdkp_event_id:
-                    new_id = await eqdkp.create_event(event_name, evt.dkp_value or 0)
-                    if not eqdkp_evt:
-                        eqdkp_evt = EqdkpEvent(name=event_name, eqdkp_event_id=str(new_id))
-                        session.add(eqdkp_evt)
-                    else:
-                        eqdkp_evt.eqdkp_event_id = str(new_id)
-                    session.flush()
-                evt.eqdkp_event_id = int(eqdkp_evt.eqdkp_event_id)
-
-                attendees = session.query(Attendee).filter_by(event_id=evt.id, tracking_id=None).all()
-                characters = []
-                for att in attendees:
-                    char = (
-                        session.query(Character).filter_by(id=int(att.character_id)).first()
-                        if att.character_id
-                        else None
-                    )
-                    if char:
-                        char = await eqdkp.create_member(char, session=session)
-                        characters.append(char)
-
-                members_by_user = list({c.eqdkp_user_id: c for c in characters if c.eqdkp_member_id}.values())
-
-                # batphone-bot eqdkp_publisher: if no attendees and DKP is 0, use loot buyers as raid members.
-                if not members_by_user and (evt.dkp_value or 0) == 0:
-                    for el in session.query(EventLoot).filter_by(event_id=evt.id).all():
-                        char = (
-                            session.query(Character).filter_by(id=int(el.character_id)).first()
-                            if el.character_id
-                            else None
-                        )
-                        if char:
-                            char = await eqdkp.create_member(char, session=session)
-                            characters.append(char)
-                    members_by_user = list({c.eqdkp_user_id: c for c in characters if c.eqdkp_member_id}.values())
-
-                raid_roster_from_fte_merge = False
-                if not members_by_user:
-                    for fte_rec in session.query(Fte).filter_by(event_id=evt.id).all():
-                        char = session.query(Character).get(fte_rec.character_id) if fte_rec.character_id else None
-                        if char:
-                            char = await eqdkp.create_member(char, session=session)
-                            characters.append(char)
-                    members_by_user = list({c.eqdkp_user_id: c for c in characters if c.eqdkp_member_id}.values())
-                    if members_by_user:
-                        raid_roster_from_fte_merge = True
-
-                if not members_by_user:
-                    await message.channel.send(
-                        "```diff\n- EQdkp requires at least one raid member. "
-                        "Add attendees, loot with a buyer, or FTE before submitting.```"
-                    )
-                    return
+async def _follow_submit(message: disnake.Message, batch: str):
+    """Post the live submit embed and follow *batch* in the background."""
+    progress_msg = await message.channel.send(embed=build_submit_embed(SubmitProgress()))
+    task = asyncio.create_task(_watch_submit(message, batch, progress_msg))
+    _SUBMIT_WATCHERS.add(task)
+    task.add_done_callback(_SUBMIT_WATCHERS.discard)
 
-                raid_value = 0 if raid_roster_from_fte_merge else (evt.dkp_value or 0)
 
-                kill_msg = "Killed" if evt.killed else "Not Killed"
-                raid_note = (
-                    f"{evt.created_at.strftime('%Y%m%d-%I%M')}-{evt.name} {kill_msg}" if evt.created_at else evt.name
-                )
-                raid_id = await eqdkp.create_raid(
-                    evt.eqdkp_event_id,
-                    raid_value,
-                    raid_note,
-                    [c.eqdkp_member_id for c in members_by_user],
-                )
-                evt.eqdkp_raid_id = raid_id
+async def _watch_submit(message: disnake.Message, batch: str, progress_msg: disnake.Message):
+    guild_id = message.guild.id
 
-                rte_attendees = (
-                    session.query(Attendee).filter(Attendee.event_id == evt.id, Attendee.tracking_id.isnot(None)).all()
-                )
-                for att in rte_attendees:
-                    char = (
-                        session.query(Character).filter_by(id=int(att.character_id)).first()
-                        if att.character_id
-                        else None
-                    )
-                    if not char:
-                        continue
-                    char = await eqdkp.create_member(char, session=session)
-                    other_chars = session.query(Character).filter_by(eqdkp_user_id=char.eqdkp_user_id).all()
-                    other_ids = [str(c.id) for c in other_chars]
-                    other_att = (
-                        session.query(Attendee)
-                        .filter(
-                            Attendee.event_id == evt.id,
-                            Attendee.id != att.id,
-                            Attendee.character_id.in_(other_ids),
-                        )
-                        .first()
-                    )
-                    if not other_att and char.eqdkp_member_id:
-                        await eqdkp.add_adjustment(
-                            char.eqdkp_member_id,
-                            evt.dkp_value or 0,
-                            f"RTE {evt.target_name}",
-                            raid_id=raid_id,
-                        )
-
-                ftes = session.query(Fte).filter_by(event_id=evt.id).all()
-                for fte_rec in ftes:
-                    char = session.query(Character).get(fte_rec.character_id) if fte_rec.character_id else None
-                    if char:
-                        char = await eqdkp.create_member(char, session=session)
-                        if char.eqdkp_member_id:
-                            await eqdkp.add_adjustment(
-                                char.eqdkp_member_id,
-                                fte_rec.dkp,
-                                f"FTE {evt.target_name}",
-                                raid_id=raid_id,
-                            )
-
-                event_loots = session.query(EventLoot).filter_by(event_id=evt.id).all()
-                for el in event_loots:
-                    if el.eqdkp_item_id:
-                        continue
-                    loot_rec = session.query(Loot).get(el.loot_id) if el.loot_id else None
-                    char = session.query(Character).get(el.character_id) if el.character_id else None
-                    if loot_rec and char:
-                        char = await eqdkp.create_member(char, session=session)
-                        if char.eqdkp_member_id:
-                            item_id = await eqdkp.add_item(
-                                loot_rec.name,
-                                el.dkp or 0,
-                                char.eqdkp_member_id,
-                                raid_id,
-                                item_date=el.created_at,
-                            )
-                            el.eqdkp_item_id = item_id
+    async def show_progress(progress: SubmitProgress) -> None:
+        await progress_msg.edit(embed=build_submit_embed(progress))
 
-                session.commit()
-                await message.channel.send("```diff\n+ Event submitted to EQdkp.```")
+    try:
+        progress = await watch_batch(guild_id, batch, show_progress)
+        if progress.error or progress.failed:
+            await message.channel.send(
+                f"```diff\n- EQdkp submit finished with {len(progress.failed)} failure(s). "
+                "Check EQdkp, then use $submit retry.```"
+            )
+            return
+        await message.channel.send("```diff\n+ Event submitted to EQdkp.```")
+
+        uploaded_ch_id = config.get_raid_setting(guild_id, "uploaded_events_channel_id")
+        uploaded_ch = message.guild.get_channel(uploaded_ch_id) if uploaded_ch_id else None
+        if uploaded_ch:
+            with get_raid_session(guild_id) as session:
+                evt = _get_event(session, str(message.channel.id))
+                if not evt:
+                    return
+                emoji = "\U0001f480" if evt.killed else "\u26d4"
+                name = f"{emoji}{evt.channel_name}"
+            msg = await uploaded_ch.send(name)
+            thread = await msg.create_thread(name=name, auto_archive_duration=60)
+            embed = build_raid_status_embed(str(message.channel.id), guild_id)
+            await thread.send(embed=embed)
+    except Exception:
+        logger.exception("Following EQdkp submit %s failed", batch)
+
+
+async def _cmd_submit_status(message: disnake.Message):
+    guild_id = message.guild.id
+    with get_raid_session(guild_id) as session:
+        evt = _get_event(session, str(message.channel.id))
+        if not evt:
+            return
+        progress = batch_progress(session, submit_batch(evt.id))
+    if not progress.items:
+        await message.channel.send("```diff\n- This event has not been submitted.```")
+        return
+    await message.channel.send(embed=build_submit_embed(progress))
 
-                uploaded_ch_id = config.get_raid_setting(guild_id, "uploaded_events_channel_id")
-                uploaded_ch = message.guild.get_channel(uploaded_ch_id) if uploaded_ch_id else None
-                if uploaded_ch:
-                    emoji = "\U0001f480" if evt.killed else "\u26d4"
-                    msg = await uploaded_ch.send(f"{emoji}{evt.channel_name}")
-                    thread = await msg.create_thread(name=f"{emoji}{evt.channel_name}", auto_archive_duration=60)
-                    embed = build_raid_status_embed(str(message.channel.id), guild_id)
-                    await thread.send(embed=embed)
 
-            except Exception as exc:
-                logger.exception("EQdkp submission failed")
-                await message.channel.send(f"```diff\n- Error submitting to EQdkp: {exc}```")
+async def _cmd_submit_retry(message: disnake.Message):
+    guild_id = message.guild.id
+    if not perms.can(message.author, "submit", guild_id):
+        await message.channel.send("```diff\n- You do not have permission to access that command.```")
+        return
+    with get_raid_session(guild_id) as session:
+        evt = _get_event(session, str(message.channel.id))
+        if not evt:
+            return
+        batch = submit_batch(evt.id)
+        retried = retry_failed(session, batch)
+        session.commit()
+    if not retried:
+        await message.channel.send("```diff\n- Nothing to retry.```")
+        return
+    outbox_worker.notify()
+    await _follow_submit(message, batch)
 
 
 async def _cmd_submit_reset(message: disnake.Message):
@@ -1157,6 +1114,7 @@ async def _cmd_submit_reset(message: disnake.Message):
         if evt:
             evt.eqdkp_raid_id = None
             evt.eqdkp_event_id = None
+            session.query(EqdkpOutbox).filter_by(batch=submit_batch(evt.id)).delete()
             session.commit()
     await message.channel.send(
         "```diff\n+ Event reset. Make sure to delete the existing raid in EQdkp before resubmitting.```"
@@ -1484,9 +1442,11 @@ _HELP_TEXTS: dict[str, str] = {
     ),
     "status": ("```\n$status\n\nShow the current tracking and readiness status.\n\nExamples:\n\n$status\n```"),
     "submit": (
-        "```\n$submit\n$submit reset\n$submit force\n\n"
-        "Submits this event to EQdkp. Use 'reset' to clear EQdkp IDs for "
-        "resubmission, or 'force' to submit even if DKP is 0.\n```"
+        "```\n$submit\n$submit status\n$submit retry\n$submit reset\n$submit force\n\n"
+        "Queues this event for EQdkp; it is sent in the background, even across restarts. "
+        "Use 'status' to see what has been sent, 'retry' to resend failed steps, 'reset' to clear "
+        "EQdkp IDs for resubmission, or 'force' to submit even if DKP is 0. A character EQdkp keeps "
+        "failing to look up is skipped, along with its loot and adjustments.\n```"
     ),
     "delete-event": ("```\n$delete-event\n\nDeletes this event channel.\n```"),
     "clear": (
@@ -21,8 +21,9 @@ from roboToald.db.raid_models.tracking import Tracking, RTE_ROLES
 from roboToald.db.raid_models.character import Character
 from roboToald.discord_client import base
 from roboToald.raid import permissions as perms
-from roboToald.raid.dkp_calculator import dkp_from_duration
-from roboToald.raid.event_helpers import resolve_target, _time_ago_in_words
+from roboToald.raid import eqdkp_outbox as outbox
+from roboToald.raid.eqdkp_submit import enqueue_rte_submit
+from roboToald.raid.event_helpers import resolve_target, _fmt_duration, _time_ago_in_words
 
 logger = logging.getLogger(__name__)
 
@@ -386,57 +387,18 @@ async def submit(
             await inter.followup.send("```diff\n- Target not found or ambiguous.```", ephemeral=True)
             return
 
-        tgt = targets[0]
-        try:
-            from roboToald.eqdkp.client import EqdkpClient
-
-            eqdkp = EqdkpClient(guild_id)
-
-            trackings = (
-                session.query(Tracking)
-                .filter_by(adjustment_id=None, target_id=tgt.id)
-                .filter(Tracking.end_time.isnot(None))
-                .all()
-            )
-
-            groups: dict[tuple, list[Tracking]] = {}
-            for t in trackings:
-                char = session.query(Character).get(t.character_id)
-                if not char:
-                    continue
-                key = (char.id, tgt.id, t.rate_per_hour)
-                groups.setdefault(key, []).append(t)
-
-            for (char_id, _, rate), items in groups.items():
-                char = session.query(Character).get(char_id)
-                if not char:
-                    continue
-                char = await eqdkp.create_member(char, session=session)
-                if not char.eqdkp_member_id:
-                    continue
-
-                total_duration = sum(i.duration or 0 for i in items)
-                total_dkp = dkp_from_duration(rate, total_duration)
-
-                role_names = ", ".join(set(i.role_name for i in items if i.role_name))
-                min_start = min(i.start_time for i in items if i.start_time)
-                max_end = max(i.end_time for i in items if i.end_time)
-                reason = f"RTE {tgt.name} as {role_names} for {_fmt_duration(total_duration)} (Start: {min_start.strftime('%Y-%m-%d %I:%M %p')})"
-
-                adj_id = await eqdkp.add_adjustment(
-                    char.eqdkp_member_id,
-                    total_dkp,
-                    reason,
-                    time=max_end,
-                )
-                for i in items:
-                    i.adjustment_id = adj_id
+        adjustments, retried = enqueue_rte_submit(session, targets[0])
+        session.commit()
 
-            session.commit()
-            await inter.followup.send("```diff\n+ RTE submitted to EQdkp.```")
-        except Exception as exc:
-            logger.exception("RTE submission failed")
-            await inter.followup.send(f"```diff\n- Error submitting RTE: {exc}```")
+    if not adjustments and not retried:
+        await inter.followup.send("```diff\n- No closed trackings to submit.```")
+        return
+    outbox.worker.notify()
+    retry_note = f" Retrying {retried} failed step(s)." if retried else ""
+    await inter.followup.send(
+        f"```diff\n+ Queued {adjustments} RTE adjustment(s) for EQdkp.{retry_note} "
+        "They are sent in the background; /rte pending shows what is left.```"
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -637,17 +599,6 @@ async def _handle_remove_tracking_time(message: disnake.Message):
 # ---------------------------------------------------------------------------
 
 
-def _fmt_duration(seconds: float | None) -> str:
-    if seconds is None or seconds <= 0:
-        return "0m"
-    total = int(seconds)
-    hours, remainder = divmod(total, 3600)
-    minutes, _ = divmod(remainder, 60)
-    if hours > 0:
-        return f"{hours}h {minutes}m"
-    return f"{minutes}m"
-
-
 # ---------------------------------------------------------------------------
 # Autocomplete handlers (registered after all subcommands are defined)
 # ---------------------------------------------------------------------------
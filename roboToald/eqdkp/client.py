@@ -1,18 +1,51 @@
-"""Async EQdkp Plus API client. Port of Ruby EqdkpPublisher."""
+"""Async EQdkp Plus API client. Port of Ruby EqdkpPublisher.
+
+Requests go through one long-lived ``httpx.AsyncClient`` per base URL and event loop, so a
+``$submit`` or log parse that makes dozens of calls reuses keep-alive connections (HTTP/2 when the
+``h2`` package is installed) instead of paying a TCP+TLS handshake per call.  In-flight requests
+per pool are capped at ``config.EQDKP_MAX_CONNECTIONS``.
+
+Failed requests are retried up to ``config.EQDKP_MAX_RETRIES`` times with capped exponential
+backoff.  GETs retry on 5xx and any transport error or timeout.  POSTs create raids, items and
+adjustments, so they are retried only when EQdkp cannot have applied them: the connection was never
+made, or the server answered 503 without handling it.  A 502 is not retried: the proxy may have
+passed the request on before the upstream connection broke.  :func:`close_pools` closes the clients
+on bot shutdown.
+
+Character, Discord-link and points lookups are read through :data:`lookup_cache`, shared by every
+client: results are kept for ``EQDKP_CACHE_HIT_TTL_SEC`` (points: ``EQDKP_CACHE_POINTS_TTL_SEC``),
+"not found" for ``EQDKP_CACHE_MISS_TTL_SEC``, and concurrent identical lookups share one request.
+Writes invalidate what they change.  Cached values are shared, so callers must not mutate them.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import random
+import time
 from datetime import datetime
+from typing import Awaitable, Callable
 
 import httpx
 
 from roboToald import config
 
+try:
+    import h2  # noqa: F401 — lets httpx negotiate HTTP/2
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 API_PATH = "/api.php"
 
+_GET_RETRY_STATUSES = frozenset({500, 502, 503, 504})
+_POST_RETRY_STATUSES = frozenset({503})
+_POST_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
 
 class EqdkpApiError(RuntimeError):
     """EQdkp API returned status 0 or an error payload (HTTP may still be 200)."""
@@ -28,6 +61,165 @@ def _values_with_prefix(d: dict, prefix: str) -> list[dict]:
     return [v for k, v in d.items() if isinstance(v, dict) and k.startswith(prefix)]
 
 
+class _Pool:
+    """Keep-alive client and in-flight request limit shared by every EqdkpClient for one base URL."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        limit = config.EQDKP_MAX_CONNECTIONS
+        self.client = httpx.AsyncClient(
+            verify=False,
+            http2=HTTP2_AVAILABLE,
+            timeout=config.EQDKP_TIMEOUT_SEC,
+            limits=httpx.Limits(
+                max_connections=limit,
+                max_keepalive_connections=limit,
+                keepalive_expiry=config.EQDKP_KEEPALIVE_SEC,
+            ),
+            transport=transport,
+        )
+        self.semaphore = asyncio.Semaphore(limit)
+        self.requests = 0
+        self.retries = 0
+
+
+# httpx clients are bound to the loop their connections were opened on, so pools are per loop.
+_pools: dict[tuple[str, asyncio.AbstractEventLoop], _Pool] = {}
+
+
+def _pool(base_url: str) -> _Pool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get((base_url, loop))
+    if pool is None:
+        for key in [key for key in _pools if key[1].is_closed()]:
+            del _pools[key]
+        pool = _pools[(base_url, loop)] = _Pool()
+    return pool
+
+
+async def close_pools() -> None:
+    """Close the pooled clients opened on the running event loop."""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _pools if key[1] is loop]:
+        await _pools.pop(key).client.aclose()
+
+
+def _backoff(attempt: int) -> float:
+    """Seconds to wait before retry *attempt* (0-based): exponential, capped, with jitter."""
+    delay_ms = min(config.EQDKP_RETRY_BACKOFF_MS * 2**attempt, config.EQDKP_RETRY_MAX_BACKOFF_MS)
+    return delay_ms / 1000.0 * random.uniform(0.5, 1.0)
+
+
+class _LoadCancelled(Exception):
+    """Set on a coalesced lookup whose loading task was cancelled; its waiters load for themselves."""
+
+
+class LookupCache:
+    """TTL read-through cache of EQdkp lookups keyed by ``(guild_id, kind, key)``, with request coalescing."""
+
+    def __init__(self, max_entries: int = 10000):
+        self._max_entries = max_entries
+        self._entries: dict[tuple, tuple[float, object]] = {}
+        self._inflight: dict[tuple, tuple[tuple, asyncio.Future]] = {}
+        # Bumped by invalidate() per guild, (guild, kind) and full key, and by clear() via _epoch, so
+        # a load that started before an invalidation neither stores its result nor gets shared.
+        self._generations: dict[tuple, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
+
+    def _generation(self, key: tuple) -> tuple[int, ...]:
+        guild_id, kind = key[:2]
+        scopes = ((guild_id,), (guild_id, kind), key)
+        return (self._epoch, *(self._generations.get(scope, 0) for scope in scopes))
+
+    async def get(self, key: tuple, load: Callable[[], Awaitable], hit_ttl: float, miss_ttl: float):
+        """Cached value for *key*, else ``await load()`` (cached for *miss_ttl* if falsy, else *hit_ttl*).
+
+        A load overtaken by :meth:`invalidate` still returns its result to its callers, but it is
+        not cached and later lookups do not wait on it.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        loop = asyncio.get_running_loop()
+        inflight_key = (loop, key)
+        generation = self._generation(key)
+        pending = self._inflight.get(inflight_key)
+        if pending is not None and pending[0] == generation:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending[1])
+            except _LoadCancelled:
+                return await self.get(key, load, hit_ttl, miss_ttl)
+
+        self.misses += 1
+        future = loop.create_future()
+        self._inflight[inflight_key] = (generation, future)
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every waiter along with this task.
+            future.set_exception(_LoadCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved; waiters still receive it
+            raise
+        else:
+            ttl = hit_ttl if value else miss_ttl
+            if ttl > 0 and self._generation(key) == generation:
+                if len(self._entries) >= self._max_entries:
+                    self._evict()
+                self._entries[key] = (time.monotonic() + ttl, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(inflight_key, (None, None))[1] is future:
+                del self._inflight[inflight_key]
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in expired or list(self._entries)[: max(1, self._max_entries // 10)]:
+            del self._entries[key]
+
+    def invalidate(self, guild_id: int, kind: str | None = None, key: str | None = None) -> None:
+        """Drop *guild_id*'s entries, optionally only those of *kind* (and *key*)."""
+        self.invalidations += 1
+        scope = (guild_id,) if kind is None else (guild_id, kind) if key is None else (guild_id, kind, key)
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        if kind is not None and key is not None:
+            self._entries.pop((guild_id, kind, key), None)
+            return
+        for cached in [k for k in self._entries if k[0] == guild_id and (kind is None or k[1] == kind)]:
+            del self._entries[cached]
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        self._entries.clear()
+        self._generations.clear()
+        self._epoch += 1
+        self.hits = self.misses = self.coalesced = self.invalidations = 0
+
+
+lookup_cache = LookupCache()
+
+
 class EqdkpClient:
     def __init__(self, guild_id: int):
         self.guild_id = guild_id
@@ -42,30 +234,76 @@ class EqdkpClient:
     def _headers(self) -> dict:
         return {"Content-Type": "application/json", "Host": self.host}
 
-    async def _get(self, function: str, **extra) -> dict:
-        async with httpx.AsyncClient(verify=False) as client:
-            resp = await client.get(
-                f"{self.base_url}{API_PATH}",
-                params=self._params(function, **extra),
-                headers=self._headers(),
+    async def _request(self, method: str, params: dict, **kwargs) -> httpx.Response:
+        pool = _pool(self.base_url)
+        if method == "GET":
+            retry_statuses, retry_errors = _GET_RETRY_STATUSES, httpx.TransportError
+        else:
+            retry_statuses, retry_errors = _POST_RETRY_STATUSES, _POST_RETRY_ERRORS
+        attempt = 0
+        while True:
+            pool.requests += 1
+            try:
+                async with pool.semaphore:
+                    resp = await pool.client.request(
+                        method, f"{self.base_url}{API_PATH}", params=params, headers=self._headers(), **kwargs
+                    )
+            except retry_errors as e:
+                if attempt >= config.EQDKP_MAX_RETRIES:
+                    raise
+                reason = repr(e)
+            else:
+                if resp.status_code not in retry_statuses or attempt >= config.EQDKP_MAX_RETRIES:
+                    resp.raise_for_status()
+                    return resp
+                reason = f"HTTP {resp.status_code}"
+            delay = _backoff(attempt)
+            logger.warning(
+                "EQdkp %s %s failed (%s); retry %d/%d in %.2fs",
+                method,
+                params.get("function"),
+                reason,
+                attempt + 1,
+                config.EQDKP_MAX_RETRIES,
+                delay,
             )
-            resp.raise_for_status()
-            return resp.json()
+            pool.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _get(self, function: str, **extra) -> dict:
+        resp = await self._request("GET", self._params(function, **extra))
+        return resp.json()
 
     async def _post(self, function: str, body: dict) -> dict:
-        async with httpx.AsyncClient(verify=False) as client:
-            resp = await client.post(
-                f"{self.base_url}{API_PATH}",
-                params=self._params(function),
-                headers=self._headers(),
-                json=body,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            _raise_if_eqdkp_error(data)
-            return data
+        resp = await self._request("POST", self._params(function), json=body)
+        data = resp.json()
+        _raise_if_eqdkp_error(data)
+        return data
+
+    async def _cached(self, kind: str, key: str, load: Callable[[], Awaitable], hit_ttl: float | None = None):
+        return await lookup_cache.get(
+            (self.guild_id, kind, key),
+            load,
+            hit_ttl if hit_ttl is not None else config.EQDKP_CACHE_HIT_TTL_SEC,
+            config.EQDKP_CACHE_MISS_TTL_SEC,
+        )
+
+    def invalidate_cache(self, kind: str | None = None, key: str | None = None) -> None:
+        """Forget cached lookups for this guild (``kind``: ``"character"``, ``"discord"`` or ``"points"``)."""
+        lookup_cache.invalidate(self.guild_id, kind, key)
 
     async def find_character(self, char_name: str) -> dict | None:
+        return await self._cached("character", char_name, lambda: self._fetch_character(char_name))
+
+    async def prefetch_characters(self, names: list[str]) -> None:
+        """Warm the cache for *names* concurrently (bounded by the pool), so a loop over them is all hits.
+
+        Lookup errors are left for the caller's own ``find_character`` to hit and report.
+        """
+        await asyncio.gather(*(self.find_character(name) for name in dict.fromkeys(names)), return_exceptions=True)
+
+    async def _fetch_character(self, char_name: str) -> dict | None:
         data = await self._get("search", **{"in": "charname", "for": char_name})
         logger.debug("find_character(%s) raw: %s", char_name, data)
         direct = data.get("direct", {})
@@ -82,6 +320,9 @@ class EqdkpClient:
         discord_id: str | int,
     ) -> list[dict]:
         """Look up EQdkp characters linked to a Discord user via auth_account."""
+        return await self._cached("discord", str(discord_id), lambda: self._fetch_characters_by_discord_id(discord_id))
+
+    async def _fetch_characters_by_discord_id(self, discord_id: str | int) -> list[dict]:
         data = await self._get(
             "search",
             **{"in": "auth_account", "for": str(discord_id)},
@@ -96,6 +337,11 @@ class EqdkpClient:
         return [m for m in members if m.get("name")]
 
     async def find_points(self, user_id: str | int) -> str | None:
+        return await self._cached(
+            "points", str(user_id), lambda: self._fetch_points(user_id), config.EQDKP_CACHE_POINTS_TTL_SEC
+        )
+
+    async def _fetch_points(self, user_id: str | int) -> str | None:
         data = await self._get("points", filter="user", filterid=str(user_id))
         players = _values_with_prefix(data.get("players", {}), "player:")
         if not players:
@@ -119,8 +365,18 @@ class EqdkpClient:
 
     async def create_character(self, name: str) -> dict | None:
         await self._post("character", {"name": name})
+        self.invalidate_cache("character", name)
         return await self.find_character(name)
 
+    async def resolve_member(self, name: str) -> dict | None:
+        """Find the EQdkp member for character *name*, creating the character first if it is missing."""
+        member = await self.find_character(name)
+        if not member:
+            await self._post("character", {"name": name})
+            self.invalidate_cache("character", name)
+            member = await self.find_character(name)
+        return member
+
     async def create_member(self, character, session=None):
         """Find or create an EQdkp member for a Character, updating IDs.
 
@@ -129,10 +385,7 @@ class EqdkpClient:
         """
         from roboToald.db.raid_base import get_raid_session
 
-        member = await self.find_character(character.name)
-        if not member:
-            await self._post("character", {"name": character.name})
-            member = await self.find_character(character.name)
+        member = await self.resolve_member(character.name)
         if member:
             if session is not None:
                 char = session.merge(character)
@@ -171,6 +424,7 @@ class EqdkpClient:
                 "raid_attendees": {"member": member_ids},
             },
         )
+        self.invalidate_cache("points")
         return data["raid_id"]
 
     async def add_item(
@@ -195,6 +449,7 @@ class EqdkpClient:
                 "item_itempool_id": 1,
             },
         )
+        self.invalidate_cache("points")
         return data["item_id"]
 
     async def add_adjustment(
@@ -217,4 +472,5 @@ class EqdkpClient:
         if raid_id:
             body["adjustment_raid_id"] = raid_id
         data = await self._post("add_adjustment", body)
+        self.invalidate_cache("points")
         return data["adjustment_id"][0]
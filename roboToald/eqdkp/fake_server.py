@@ -0,0 +1,262 @@
+"""In-process stand-in for the EQdkp Plus ``/api.php`` functions used by :mod:`roboToald.eqdkp.client`.
+
+:class:`FakeEqdkp` keeps members, events, raids, items and adjustments in memory and answers
+``search`` (``in=charname`` and ``in=auth_account``), ``points``, ``character``, ``add_event``,
+``add_raid``, ``add_item`` and ``add_adjustment`` in EQdkp's response shapes, including
+``{"status": 0, "error": ...}`` for writes that reference unknown events, raids or members.  It is
+an ``httpx`` transport handler: :meth:`FakeEqdkp.install` points the client pool for a base URL at
+it, so ``EqdkpClient`` (retries, pooling, lookup cache) runs unchanged without sockets.
+
+To look like a real server under load it can add:
+
+* ``latency`` (plus up to ``jitter``) seconds per request;
+* random failures: ``error_rate`` of requests answered with ``error_status``;
+* scripted failures: :meth:`FakeEqdkp.inject` queues responses for the next calls of a function;
+* rate limiting: a token bucket of ``rate_limit`` requests per second (``burst`` deep), answering the
+  excess with ``rate_limit_status`` (503, as nginx ``limit_req`` does).
+
+Failed requests are rejected before anything is applied.  ``calls``, ``statuses``, ``rate_limited``
+and ``peak_in_flight`` record what the client sent.  Used by the tests and
+``scripts/bench_eqdkp_submit.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+from roboToald.eqdkp import client as eqdkp_client
+
+# Injected in place of a status: the connection is refused, so nothing reaches the server.
+CONNECT_ERROR = "connect"
+
+
+@dataclass
+class FakeMember:
+    id: int
+    user_id: int
+    name: str
+    main_id: int | None = None
+
+    def as_search_result(self) -> dict:
+        return {"id": self.id, "user_id": str(self.user_id), "main_id": self.main_id or self.id, "name": self.name}
+
+
+@dataclass
+class FakeRaid:
+    id: int
+    event_id: int
+    value: int
+    note: str
+    member_ids: list[int] = field(default_factory=list)
+
+
+class FakeEqdkp:
+    """Fake EQdkp server state plus the ``httpx.MockTransport`` handler serving it."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        rate_limit: float = 0.0,
+        burst: int = 10,
+        rate_limit_status: int = 503,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.rate_limit_status = rate_limit_status
+        self._random = random.Random(seed)
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._injected: dict[str, collections.deque] = collections.defaultdict(collections.deque)
+        self._ids = itertools.count(1)
+
+        self.members: dict[str, FakeMember] = {}  # lower-cased name -> member
+        self.discord_links: dict[str, set[str]] = collections.defaultdict(set)  # Discord id -> member names
+        self.events: dict[int, dict] = {}
+        self.raids: dict[int, FakeRaid] = {}
+        self.items: dict[int, dict] = {}
+        self.adjustments: dict[int, dict] = {}
+
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.statuses: collections.Counter[int] = collections.Counter()
+        self.rate_limited = 0
+        self.in_flight = self.peak_in_flight = 0
+
+    # -- setup --------------------------------------------------------------------------------
+
+    def add_member(self, name: str, user_id: int | None = None, discord_id: str | int | None = None) -> FakeMember:
+        """Create a character; without *user_id* it belongs to a new EQdkp user of its own."""
+        member_id = next(self._ids)
+        member = FakeMember(member_id, user_id if user_id is not None else member_id, name)
+        self.members[name.lower()] = member
+        if discord_id is not None:
+            self.discord_links[str(discord_id)].add(name.lower())
+        return member
+
+    def inject(self, function: str, *statuses: int | str) -> None:
+        """Answer the next calls of *function* with *statuses* in order (0: EQdkp error, ``CONNECT_ERROR``)."""
+        self._injected[function].extend(statuses)
+
+    def install(self, base_url: str) -> eqdkp_client._Pool:
+        """Serve *base_url* from this fake for clients on the running event loop."""
+        pool = eqdkp_client._Pool(transport=httpx.MockTransport(self))
+        eqdkp_client._pools[(base_url, asyncio.get_running_loop())] = pool
+        return pool
+
+    @property
+    def requests(self) -> int:
+        return sum(self.calls.values())
+
+    def points(self, user_id: int) -> int:
+        """Current points of an EQdkp user over all of its characters."""
+        ids = {m.id for m in self.members.values() if m.user_id == user_id}
+        earned = sum(r.value for r in self.raids.values() if ids & set(r.member_ids))
+        spent = sum(i["value"] for i in self.items.values() if i["member_id"] in ids)
+        adjusted = sum(a["value"] for a in self.adjustments.values() if a["member_id"] in ids)
+        return earned - spent + adjusted
+
+    # -- transport ----------------------------------------------------------------------------
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        function = request.url.params.get("function", "")
+        self.calls[function] += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+            response = self._respond(function, request)
+        finally:
+            self.in_flight -= 1
+        self.statuses[response.status_code] += 1
+        return response
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _respond(self, function: str, request: httpx.Request) -> httpx.Response:
+        if not self._take_token():
+            self.rate_limited += 1
+            return httpx.Response(self.rate_limit_status, text="rate limited")
+        if self._injected[function]:
+            status = self._injected[function].popleft()
+            if status == CONNECT_ERROR:
+                raise httpx.ConnectError("injected connection failure", request=request)
+            if status == 0:
+                return httpx.Response(200, json={"status": 0, "error": "injected error"})
+            return httpx.Response(status, text="injected")
+        if self.error_rate and self._random.random() < self.error_rate:
+            return httpx.Response(self.error_status, text="injected")
+
+        handler = {
+            "search": self._search,
+            "points": self._points,
+            "character": self._character,
+            "add_event": self._add_event,
+            "add_raid": self._add_raid,
+            "add_item": self._add_item,
+            "add_adjustment": self._add_adjustment,
+        }.get(function)
+        if handler is None:
+            return httpx.Response(200, json={"status": 0, "error": "function not found"})
+        body = json.loads(request.content) if request.method == "POST" and request.content else {}
+        try:
+            return httpx.Response(200, json=handler(request.url.params, body))
+        except KeyError as e:
+            return httpx.Response(200, json={"status": 0, "error": f"required data missing: {e}"})
+
+    # -- api.php functions --------------------------------------------------------------------
+
+    def _member(self, member_id: int) -> FakeMember:
+        for member in self.members.values():
+            if member.id == member_id:
+                return member
+        raise KeyError(f"member {member_id}")
+
+    def _search(self, params, body) -> dict:
+        term = params["for"]
+        if params.get("in") == "auth_account":
+            found = [self.members[name] for name in sorted(self.discord_links.get(term, ()))]
+        else:
+            found = [m for m in (self.members.get(term.lower()),) if m]
+        return {"direct": {f"member:{i}": m.as_search_result() for i, m in enumerate(found, 1)}}
+
+    def _points(self, params, body) -> dict:
+        user_id = int(params["filterid"])
+        if not any(m.user_id == user_id for m in self.members.values()):
+            return {"players": {}}
+        mdkp = {"multidkp_points:1": {"points_current_with_twink": str(self.points(user_id))}}
+        return {"players": {f"player:{user_id}": {"id": user_id, "points": mdkp}}}
+
+    def _character(self, params, body) -> dict:
+        name = body["name"]
+        member = self.members.get(name.lower()) or self.add_member(name)
+        return {"status": 1, "character_id": member.id}
+
+    def _add_event(self, params, body) -> dict:
+        event_id = next(self._ids)
+        self.events[event_id] = {"name": body["event_name"], "value": body["event_value"]}
+        return {"status": 1, "event_id": event_id}
+
+    def _add_raid(self, params, body) -> dict:
+        if body["raid_event_id"] not in self.events:
+            raise KeyError(f"event {body['raid_event_id']}")
+        member_ids = body["raid_attendees"]["member"]
+        for member_id in member_ids:
+            self._member(member_id)
+        raid_id = next(self._ids)
+        self.raids[raid_id] = FakeRaid(
+            raid_id, body["raid_event_id"], body["raid_value"], body["raid_note"], member_ids
+        )
+        return {"status": 1, "raid_id": raid_id}
+
+    def _add_item(self, params, body) -> dict:
+        if body["item_raid_id"] not in self.raids:
+            raise KeyError(f"raid {body['item_raid_id']}")
+        [member_id] = body["item_buyers"]["member"]
+        self._member(member_id)
+        item_id = next(self._ids)
+        self.items[item_id] = {
+            "name": body["item_name"],
+            "value": body["item_value"],
+            "member_id": member_id,
+            "raid_id": body["item_raid_id"],
+        }
+        return {"status": 1, "item_id": item_id}
+
+    def _add_adjustment(self, params, body) -> dict:
+        [member_id] = body["adjustment_members"]["member"]
+        self._member(member_id)
+        if body.get("adjustment_raid_id") and body["adjustment_raid_id"] not in self.raids:
+            raise KeyError(f"raid {body['adjustment_raid_id']}")
+        adjustment_id = next(self._ids)
+        self.adjustments[adjustment_id] = {
+            "reason": body["adjustment_reason"],
+            "value": body["adjustment_value"],
+            "member_id": member_id,
+            "raid_id": body.get("adjustment_raid_id"),
+        }
+        return {"status": 1, "adjustment_id": [adjustment_id]}
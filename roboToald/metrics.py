@@ -0,0 +1,310 @@
+"""Process-wide metrics in the Prometheus text exposition format.
+
+A small, dependency-free subset of the ``prometheus_client`` model: counters and histograms with
+optional labels, plus callback metrics whose values are read from existing state at scrape time
+(connection counts, background writer stats).  Recording a sample is a dict lookup, a bisect and a
+couple of additions under a per-series lock, so instrumentation is cheap enough to leave on.
+
+:func:`instrument_engine` attaches SQLAlchemy cursor events that time every query and label it with
+the ``roboToald`` module that issued it (e.g. ``roboToald.db.models.sso``).
+
+The API server exposes :func:`render` at ``/metrics``.
+"""
+
+from __future__ import annotations
+
+import abc
+import bisect
+import sys
+import threading
+import time
+from typing import Callable, Iterable
+
+import sqlalchemy
+
+# Latency buckets in seconds (Prometheus' defaults plus finer sub-10ms resolution).
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Series keyed by stringified label values (rendered), and a lookup cache keyed by the
+        # values exactly as passed, so the hot path is one dict hit with no conversion.
+        self._children: dict[tuple, object] = {}
+        self._lookup: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The series for these label values (created on first use)."""
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._lookup[values] = child
+        return child
+
+    def _series(self) -> list[tuple[tuple, object]]:
+        with self._lock:
+            return sorted(self._children.items(), key=lambda item: item[0])
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A new, empty series."""
+
+    @abc.abstractmethod
+    def _samples(self) -> list[str]:
+        """Exposition lines for every series."""
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_number(child.value)}" for key, child in self._series()
+        ]
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _HistogramValue):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (seconds, for latencies) in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self, *label_values) -> _Timer:
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self.labels(*label_values))
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, child in self._series():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Gauge or counter whose series are produced by *callback* at scrape time.
+
+    *callback* returns ``{label_values_tuple: value}`` (``{(): value}`` when unlabelled).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], dict[tuple, float]],
+        labelnames: Iterable[str] = (),
+        kind: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._callback = callback
+
+    def _new_child(self):
+        raise TypeError(f"{self.name} series come from its callback, not labels()")
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_label_text(self.labelnames, tuple(key))} {_number(value)}"
+            for key, value in sorted(self._callback().items())
+        ]
+
+
+class Registry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], dict[tuple, float]],
+        labelnames: Iterable[str] = (),
+        kind: str = "gauge",
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, labelnames, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    """The process registry in Prometheus text format (version 0.0.4)."""
+    return REGISTRY.render()
+
+
+# -- SQLAlchemy instrumentation ----------------------------------------------------
+
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "robotoald_db_query_seconds",
+    "SQL statement execution time, by the roboToald module that issued it.",
+    ["module"],
+)
+
+# Frames in these modules are plumbing, not the caller we want to attribute a query to.
+_SKIP_MODULES = ("roboToald.metrics", "roboToald.db.base", "roboToald.db.raid_base")
+_caller_cache: dict[object, str] = {}
+
+
+def _query_module() -> str:
+    """Nearest ``roboToald`` module on the stack (the code that ran the query)."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        module = _caller_cache.get(code)
+        if module is None:
+            name = frame.f_globals.get("__name__", "")
+            module = name if name.startswith("roboToald") and name not in _SKIP_MODULES else ""
+            _caller_cache[code] = module
+        if module:
+            return module
+        frame = frame.f_back
+    return "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is not None:
+        DB_QUERY_SECONDS.labels(_query_module()).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: sqlalchemy.engine.Engine) -> None:
+    """Record per-module query counts and latency for *engine* in ``robotoald_db_query_seconds``."""
+    sqlalchemy.event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    sqlalchemy.event.listen(engine, "after_cursor_execute", _after_cursor_execute)
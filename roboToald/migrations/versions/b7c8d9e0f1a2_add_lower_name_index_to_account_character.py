@@ -0,0 +1,31 @@
+"""Add a lower(name) index on sso_account_character
+
+Revision ID: b7c8d9e0f1a2
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7c8d9e0f1a2"
+down_revision: Union[str, None] = "a1b2c3d4e5f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_character_guild_lower_name",
+        "sso_account_character",
+        ["guild_id", sa.text("lower(name)")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_character_guild_lower_name", table_name="sso_account_character")
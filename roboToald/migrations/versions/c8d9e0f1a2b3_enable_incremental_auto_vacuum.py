@@ -0,0 +1,37 @@
+"""Switch the database to auto_vacuum=INCREMENTAL
+
+Revision ID: c8d9e0f1a2b3
+Revises: b7c8d9e0f1a2
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8d9e0f1a2b3"
+down_revision: Union[str, None] = "b7c8d9e0f1a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INCREMENTAL = 2
+
+
+def _set_auto_vacuum(mode: str) -> None:
+    # An existing database only changes auto_vacuum mode through a full VACUUM, which cannot run
+    # inside a transaction.
+    with op.get_context().autocommit_block():
+        op.execute(f"PRAGMA auto_vacuum={mode}")
+        op.execute("VACUUM")
+
+
+def upgrade() -> None:
+    if op.get_bind().exec_driver_sql("PRAGMA auto_vacuum").scalar() != INCREMENTAL:
+        _set_auto_vacuum("INCREMENTAL")
+
+
+def downgrade() -> None:
+    _set_auto_vacuum("NONE")
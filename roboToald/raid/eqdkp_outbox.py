@@ -0,0 +1,488 @@
+"""Durable outbox for EQdkp writes, drained in the background by :data:`worker`.
+
+``$submit`` and ``/rte submit`` no longer talk to EQdkp while the command waits.  They insert rows
+into the guild's ``eqdkp_outbox`` table (:class:`EqdkpOutbox`, see ``raid.eqdkp_submit`` for what a
+submit enqueues) and return.  :class:`OutboxWorker`, started from the bot's ``on_ready``, sends
+them:
+
+* rows of a batch run in ``stage`` order; rows of the same stage run concurrently, at most
+  ``[eqdkp] max_connections`` per guild;
+* a row is marked ``sending`` and committed before its request goes out, then ``done`` together with
+  its local side effect (``Character`` member ids, ``Event.eqdkp_raid_id``, ``EventLoot.eqdkp_item_id``,
+  ``Tracking.adjustment_id``).
+
+Member lookups find before they create, so any failure is retried.  A raid, item or adjustment POST
+is retried only when EQdkp cannot have applied it (connection refused, 503), with backoff from
+``[eqdkp] outbox_retry_sec`` for up to ``outbox_max_attempts`` tries; anything else fails the row.
+A member lookup that runs out of tries is skipped rather than failed, so it does not hold back the
+rest of its batch; that character's items and adjustments then skip with "no EQdkp member".
+When the worker starts it resumes what a restart interrupted: ``sending`` member lookups go back to
+``pending``, while a ``sending`` POST may already exist in EQdkp and is failed with a note to check
+before ``$submit retry`` sends it again.  Stopping the worker takes no new rows and waits (up to a
+timeout) for requests already out, so a clean shutdown leaves nothing ``sending``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+import httpx
+import sqlalchemy.orm
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from roboToald import config
+from roboToald.db.raid_base import get_raid_session
+from roboToald.db.raid_models.character import Character
+from roboToald.db.raid_models.loot import EventLoot, Loot
+from roboToald.db.raid_models.outbox import (
+    OUTBOX_DONE,
+    OUTBOX_FAILED,
+    OUTBOX_PENDING,
+    OUTBOX_SENDING,
+    OUTBOX_SKIPPED,
+    EqdkpOutbox,
+)
+from roboToald.db.raid_models.raid import Attendee, EqdkpEvent, Event, Fte
+from roboToald.db.raid_models.tracking import Tracking
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.eqdkp.client import EqdkpClient
+
+logger = logging.getLogger(__name__)
+
+SETTLED = frozenset({OUTBOX_DONE, OUTBOX_SKIPPED})
+# Longest wait between retries of one row.
+MAX_RETRY_DELAY_SEC = 900.0
+INTERRUPTED = "Interrupted while sending; check EQdkp before retrying"
+
+
+class OutboxError(RuntimeError):
+    """A row cannot be sent as queued; it is failed without retrying."""
+
+
+class Skip(Exception):
+    """Nothing to send for this row; it completes as ``skipped`` with this reason."""
+
+
+@dataclass
+class Op:
+    """A row to enqueue: ``key`` is appended to the batch to form its idempotency key."""
+
+    key: str
+    stage: int
+    kind: str
+    label: str
+    payload: dict
+
+
+def enqueue(session: sqlalchemy.orm.Session, batch: str, ops: list[Op]) -> int:
+    """Insert *ops* into the outbox (not committed); rows whose idempotency key exists are skipped."""
+    if not ops:
+        return 0
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    stmt = (
+        sqlite_insert(EqdkpOutbox)
+        .values(
+            [
+                {
+                    "idempotency_key": f"{batch}:{op.key}",
+                    "batch": batch,
+                    "stage": op.stage,
+                    "kind": op.kind,
+                    "label": op.label,
+                    "payload": json.dumps(op.payload),
+                    "status": OUTBOX_PENDING,
+                    "attempts": 0,
+                    "created_at": now,
+                }
+                for op in ops
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+    return session.execute(stmt).rowcount
+
+
+def retry_failed(session: sqlalchemy.orm.Session, batch: str) -> int:
+    """Queue *batch*'s failed rows again (not committed). Returns how many were requeued."""
+    return (
+        session.query(EqdkpOutbox)
+        .filter(EqdkpOutbox.batch == batch, EqdkpOutbox.status == OUTBOX_FAILED)
+        .update(
+            {"status": OUTBOX_PENDING, "attempts": 0, "next_attempt_at": None, "last_error": None},
+            synchronize_session=False,
+        )
+    )
+
+
+def queued_tracking_ids(session: sqlalchemy.orm.Session) -> set[int]:
+    """Trackings covered by an RTE adjustment that is queued, being sent, or failed."""
+    rows = session.query(EqdkpOutbox.payload).filter(
+        EqdkpOutbox.kind == "adjustment", EqdkpOutbox.status.notin_(SETTLED), EqdkpOutbox.batch.like("rte:%")
+    )
+    return {tracking_id for (payload,) in rows for tracking_id in json.loads(payload).get("tracking_ids", ())}
+
+
+def blocked_stage(rows: list[EqdkpOutbox]) -> int | None:
+    """Lowest stage of *rows* (one batch) that is not yet settled, or None when all are."""
+    return min((r.stage for r in rows if r.status not in SETTLED), default=None)
+
+
+def ready_rows(session: sqlalchemy.orm.Session, now: datetime.datetime) -> list[EqdkpOutbox]:
+    """Pending rows whose earlier stages are all settled and whose retry time has come."""
+    rows = session.query(EqdkpOutbox).filter(EqdkpOutbox.status.notin_(SETTLED)).order_by(EqdkpOutbox.id).all()
+    by_batch: dict[str, list[EqdkpOutbox]] = {}
+    for row in rows:
+        by_batch.setdefault(row.batch, []).append(row)
+    stage = {batch: blocked_stage(batch_rows) for batch, batch_rows in by_batch.items()}
+    return [
+        r
+        for r in rows
+        if r.status == OUTBOX_PENDING
+        and r.stage == stage[r.batch]
+        and (r.next_attempt_at is None or r.next_attempt_at <= now)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Handlers: each reads what it needs and returns (request, apply).  The request is awaited with no
+# transaction open; apply(result) records the local side effect and returns the row's result id.
+# ---------------------------------------------------------------------------
+
+Prepared = tuple[Callable[[], Awaitable[Any]], Callable[[Any], int | None]]
+
+
+def _event(session: sqlalchemy.orm.Session, event_id: int) -> Event:
+    evt = session.get(Event, event_id)
+    if evt is None:
+        raise OutboxError(f"Event {event_id} no longer exists")
+    return evt
+
+
+def _member_id(session: sqlalchemy.orm.Session, character_id: int | None) -> int:
+    char = session.get(Character, character_id) if character_id else None
+    if char is None or not char.eqdkp_member_id:
+        raise Skip("no EQdkp member")
+    return char.eqdkp_member_id
+
+
+def _roster(chars) -> list[Character]:
+    """One character per EQdkp user (the last seen wins), skipping characters without a member."""
+    return list({c.eqdkp_user_id: c for c in chars if c is not None and c.eqdkp_member_id}.values())
+
+
+def _prepare_event(eqdkp: EqdkpClient, session, data: dict) -> Prepared:
+    existing = session.query(EqdkpEvent).filter(EqdkpEvent.name.ilike(data["name"])).first()
+    existing_id = int(existing.eqdkp_event_id) if existing and existing.eqdkp_event_id else None
+
+    async def request() -> int:
+        if existing_id is not None:  # created by another submit since this one was queued
+            return existing_id
+        return await eqdkp.create_event(data["name"], data["value"])
+
+    def apply(new_id: int) -> int:
+        eqdkp_evt = session.query(EqdkpEvent).filter(EqdkpEvent.name.ilike(data["name"])).first()
+        if not eqdkp_evt:
+            session.add(EqdkpEvent(name=data["name"], eqdkp_event_id=str(new_id)))
+        else:
+            eqdkp_evt.eqdkp_event_id = str(new_id)
+        _event(session, data["event_id"]).eqdkp_event_id = int(new_id)
+        return new_id
+
+    return request, apply
+
+
+def _prepare_member(eqdkp: EqdkpClient, session, data: dict) -> Prepared:
+    char = session.get(Character, data["character_id"])
+    if char is None:
+        raise Skip("character deleted")
+    name = char.name
+
+    def apply(member: dict | None) -> int:
+        if not member:
+            raise Skip("not found in EQdkp")
+        char = session.get(Character, data["character_id"])
+        char.eqdkp_member_id = member.get("id")
+        char.eqdkp_user_id = member.get("user_id")
+        char.eqdkp_main_id = member.get("main_id")
+        return char.eqdkp_member_id
+
+    return lambda: eqdkp.resolve_member(name), apply
+
+
+def _prepare_raid(eqdkp: EqdkpClient, session, data: dict) -> Prepared:
+    evt = _event(session, data["event_id"])
+    if not evt.eqdkp_event_id:
+        raise OutboxError("The EQdkp event was not created")
+
+    attendees = session.query(Attendee).filter_by(event_id=evt.id, tracking_id=None).all()
+    loots = session.query(EventLoot).filter_by(event_id=evt.id).all()
+    ftes = session.query(Fte).filter_by(event_id=evt.id).all()
+    members = _roster(session.get(Character, int(a.character_id)) for a in attendees if a.character_id)
+    # batphone-bot eqdkp_publisher: if no attendees and DKP is 0, use loot buyers as raid members.
+    if not members and (evt.dkp_value or 0) == 0:
+        members = _roster(session.get(Character, el.character_id) for el in loots if el.character_id)
+    raid_roster_from_fte_merge = False
+    if not members:
+        members = _roster(session.get(Character, f.character_id) for f in ftes if f.character_id)
+        raid_roster_from_fte_merge = bool(members)
+    if not members:
+        raise OutboxError(
+            "EQdkp requires at least one raid member. Add attendees, loot with a buyer, or FTE, "
+            "then $submit reset and submit again."
+        )
+
+    raid_value = 0 if raid_roster_from_fte_merge else (evt.dkp_value or 0)
+    kill_msg = "Killed" if evt.killed else "Not Killed"
+    raid_note = f"{evt.created_at.strftime('%Y%m%d-%I%M')}-{evt.name} {kill_msg}" if evt.created_at else evt.name
+    args = (evt.eqdkp_event_id, raid_value, raid_note, [c.eqdkp_member_id for c in members])
+
+    def apply(raid_id: int) -> int:
+        _event(session, data["event_id"]).eqdkp_raid_id = raid_id
+        return raid_id
+
+    return lambda: eqdkp.create_raid(*args), apply
+
+
+def _raid_id(session, event_id: int) -> int:
+    raid_id = _event(session, event_id).eqdkp_raid_id
+    if not raid_id:
+        raise OutboxError("The EQdkp raid was not created")
+    return raid_id
+
+
+def _prepare_item(eqdkp: EqdkpClient, session, data: dict) -> Prepared:
+    el = session.get(EventLoot, data["event_loot_id"])
+    if el is None:
+        raise Skip("loot removed")
+    if el.eqdkp_item_id:
+        raise Skip("already in EQdkp")
+    loot_rec = session.get(Loot, el.loot_id) if el.loot_id else None
+    if loot_rec is None:
+        raise Skip("loot removed")
+    args = (loot_rec.name, el.dkp or 0, _member_id(session, el.character_id), _raid_id(session, el.event_id))
+    item_date = el.created_at
+
+    def apply(item_id: int) -> int:
+        session.get(EventLoot, data["event_loot_id"]).eqdkp_item_id = item_id
+        return item_id
+
+    return lambda: eqdkp.add_item(*args, item_date=item_date), apply
+
+
+def _prepare_adjustment(eqdkp: EqdkpClient, session, data: dict) -> Prepared:
+    member_id = _member_id(session, data["character_id"])
+    if attendee_id := data.get("unless_attended"):
+        # An RTE tracker who also attended (on any character of the same EQdkp user) already earns the raid DKP.
+        user_id = session.get(Character, data["character_id"]).eqdkp_user_id
+        for att in session.query(Attendee).filter(Attendee.event_id == data["event_id"], Attendee.id != attendee_id):
+            other = session.get(Character, int(att.character_id)) if att.character_id else None
+            if other is not None and other.eqdkp_user_id == user_id:
+                raise Skip("attended the raid")
+    raid_id = _raid_id(session, data["event_id"]) if data.get("event_id") else None
+    time = datetime.datetime.fromisoformat(data["time"]) if data.get("time") else None
+
+    def apply(adjustment_id: int) -> int:
+        if data.get("tracking_ids"):
+            session.query(Tracking).filter(Tracking.id.in_(data["tracking_ids"])).update(
+                {"adjustment_id": adjustment_id}, synchronize_session=False
+            )
+        return adjustment_id
+
+    return (
+        lambda: eqdkp.add_adjustment(member_id, data["value"], data["reason"], raid_id=raid_id, time=time),
+        apply,
+    )
+
+
+HANDLERS: dict[str, Callable[[EqdkpClient, sqlalchemy.orm.Session, dict], Prepared]] = {
+    "event": _prepare_event,
+    "member": _prepare_member,
+    "raid": _prepare_raid,
+    "item": _prepare_item,
+    "adjustment": _prepare_adjustment,
+}
+
+
+def _retryable(kind: str, exc: Exception) -> bool:
+    if isinstance(exc, OutboxError):
+        return False
+    if kind == "member":
+        return True
+    if isinstance(exc, eqdkp_client._POST_RETRY_ERRORS):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in eqdkp_client._POST_RETRY_STATUSES
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class OutboxWorker:
+    """Sends every raid guild's outbox rows on the bot's event loop."""
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        poll_interval: float | None = None,
+        max_attempts: int | None = None,
+        retry_delay: float | None = None,
+    ):
+        self._concurrency = concurrency or config.EQDKP_MAX_CONNECTIONS
+        self._poll_interval = poll_interval if poll_interval is not None else config.EQDKP_OUTBOX_POLL_SEC
+        self._max_attempts = max_attempts or config.EQDKP_OUTBOX_MAX_ATTEMPTS
+        self._retry_delay = retry_delay if retry_delay is not None else config.EQDKP_OUTBOX_RETRY_SEC
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+        self.sent = 0
+        self.skipped = 0
+        self.retried = 0
+        self.failed = 0
+        self.resumed = 0
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "retried": self.retried,
+            "failed": self.failed,
+            "resumed": self.resumed,
+        }
+
+    def notify(self) -> None:
+        """Wake the worker after rows were enqueued (call from the bot's event loop)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def recover(self, guild_id: int) -> int:
+        """Resolve rows left ``sending`` by a restart. Returns how many were found."""
+        with get_raid_session(guild_id) as session:
+            rows = session.query(EqdkpOutbox).filter_by(status=OUTBOX_SENDING).all()
+            for row in rows:
+                if row.kind == "member":
+                    row.status = OUTBOX_PENDING
+                else:
+                    row.status, row.last_error = OUTBOX_FAILED, INTERRUPTED
+                    logger.warning("EQdkp outbox %s was interrupted while sending", row.idempotency_key)
+            session.commit()
+        self.resumed += len(rows)
+        return len(rows)
+
+    async def drain(self, guild_id: int) -> int:
+        """Send every row of *guild_id* that is ready, stage after stage. Returns rows attempted."""
+        eqdkp = EqdkpClient(guild_id)
+        limit = asyncio.Semaphore(self._concurrency)
+        attempted = 0
+        while not self._stopping:
+            with get_raid_session(guild_id) as session:
+                row_ids = [r.id for r in ready_rows(session, _utcnow())]
+            if not row_ids:
+                return attempted
+            attempted += len(row_ids)
+            await asyncio.gather(*(self._send(eqdkp, guild_id, row_id, limit) for row_id in row_ids))
+        return attempted
+
+    async def _send(self, eqdkp: EqdkpClient, guild_id: int, row_id: int, limit: asyncio.Semaphore) -> None:
+        async with limit:
+            if self._stopping:
+                return
+            with get_raid_session(guild_id) as session:
+                row = session.get(EqdkpOutbox, row_id)
+                if row is None or row.status != OUTBOX_PENDING:
+                    return
+                kind, key, data = row.kind, row.idempotency_key, row.data
+                try:
+                    request, apply = HANDLERS[kind](eqdkp, session, data)
+                    row.status = OUTBOX_SENDING
+                    row.attempts += 1
+                    session.commit()
+                    result = apply(await request())
+                except Skip as e:
+                    session.rollback()
+                    row.status, row.last_error = OUTBOX_SKIPPED, str(e)
+                    self.skipped += 1
+                except Exception as e:
+                    session.rollback()
+                    if row.status == OUTBOX_PENDING:  # failed before the request went out
+                        row.attempts += 1
+                    row.last_error = str(e) or type(e).__name__
+                    if _retryable(kind, e) and row.attempts < self._max_attempts:
+                        delay = min(self._retry_delay * 2 ** (row.attempts - 1), MAX_RETRY_DELAY_SEC)
+                        row.status, row.next_attempt_at = OUTBOX_PENDING, _utcnow() + datetime.timedelta(seconds=delay)
+                        self.retried += 1
+                        logger.warning("EQdkp outbox %s failed (%s); retrying in %.0fs", key, row.last_error, delay)
+                    elif kind == "member":
+                        row.status = OUTBOX_SKIPPED
+                        row.last_error = f"lookup failed {row.attempts} time(s): {row.last_error}"
+                        self.skipped += 1
+                        logger.warning("EQdkp outbox %s skipped: %s", key, row.last_error)
+                    else:
+                        row.status = OUTBOX_FAILED
+                        self.failed += 1
+                        logger.warning("EQdkp outbox %s failed: %s", key, row.last_error)
+                else:
+                    row.status, row.result_id, row.last_error = OUTBOX_DONE, result, None
+                    self.sent += 1
+                if row.status != OUTBOX_PENDING:
+                    row.completed_at = _utcnow()
+                session.commit()
+
+    async def _run(self) -> None:
+        guild_ids = config.raid_guild_ids()
+        for guild_id in guild_ids:
+            try:
+                if n := self.recover(guild_id):
+                    logger.info("Resumed %d interrupted EQdkp outbox row(s) for guild %s", n, guild_id)
+            except Exception:
+                logger.exception("EQdkp outbox recovery failed for guild %s", guild_id)
+        while not self._stopping:
+            self._wake.clear()
+            for guild_id in guild_ids:
+                try:
+                    await self.drain(guild_id)
+                except Exception:
+                    logger.exception("EQdkp outbox drain failed for guild %s", guild_id)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Resume and drain the outboxes on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("EQdkp outbox worker started")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Take no new rows and wait up to *timeout* seconds for requests in flight, then cancel.
+
+        Rows still ``sending`` after a cancel are resolved by :meth:`recover` on the next start.
+        """
+        task = self._task
+        self._task = None
+        if task is None:
+            return
+        self._stopping = True
+        self.notify()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+            return
+        except asyncio.TimeoutError:
+            logger.warning("EQdkp outbox worker still sending after %.0fs; cancelling", timeout)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+worker = OutboxWorker()
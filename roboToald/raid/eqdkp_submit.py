@@ -0,0 +1,308 @@
+"""Phased submission of a raid event to EQdkp (``$submit``) through the durable outbox.
+
+Submitting used to walk attendees, RTE trackers, FTEs and loot one row at a time, awaiting a
+find/create/find round trip for each character before posting its item, so a large raid held its
+channel for minutes and a restart halfway left the raid half-posted.  :func:`enqueue_submit` now
+only records the writes, as one outbox batch (``raid.eqdkp_outbox``) in four stages:
+
+1. **event** - create the EQdkp event for the target, unless it is already known;
+2. **members** - find or create every character the event references, concurrently.  A lookup
+   that still fails after ``outbox_max_attempts`` tries is skipped, and with it only that
+   character's loot and adjustments; the raid goes ahead without them;
+3. **raid** - create the raid once with the deduplicated roster;
+4. **items** - loot and RTE/FTE adjustments, concurrently.  Each is its own row: a failure is
+   recorded on that row and the rest carry on.
+
+:func:`enqueue_rte_submit` does the same for ``/rte submit``: a member lookup and an adjustment per
+character and DKP rate.  The outbox worker sends the batches in the background; :func:`watch_batch`
+follows one for the live ``$submit`` embed rendered by :func:`build_submit_embed`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import disnake
+import sqlalchemy.orm
+
+from roboToald.db.raid_base import get_raid_session
+from roboToald.db.raid_models.character import Character
+from roboToald.db.raid_models.loot import EventLoot, Loot
+from roboToald.db.raid_models.outbox import OUTBOX_DONE, OUTBOX_FAILED, OUTBOX_SKIPPED, EqdkpOutbox
+from roboToald.db.raid_models.raid import Attendee, EqdkpEvent, Event, Fte
+from roboToald.db.raid_models.target import Target
+from roboToald.db.raid_models.tracking import Tracking
+from roboToald.raid.dkp_calculator import dkp_from_duration
+from roboToald.raid.eqdkp_outbox import SETTLED, Op, blocked_stage, enqueue, queued_tracking_ids, retry_failed
+from roboToald.raid.event_helpers import _fmt_duration
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+_ITEM_STATUS = {OUTBOX_DONE: OK, OUTBOX_FAILED: FAILED, OUTBOX_SKIPPED: SKIPPED}
+
+STAGE_EVENT, STAGE_MEMBERS, STAGE_RAID, STAGE_ITEMS = range(4)
+
+# Seconds between progress checks while following a batch (Discord rate-limits message edits).
+PROGRESS_INTERVAL_SEC = 1.5
+
+PHASE_BY_KIND = {"event": "event", "member": "members", "raid": "raid", "item": "items", "adjustment": "items"}
+PHASE_TEXT = {
+    "event": "Looking up the EQdkp event...",
+    "members": "Resolving raid members...",
+    "raid": "Creating the raid...",
+    "items": "Posting loot and adjustments...",
+}
+# Embed field title per item kind, in display order.
+KIND_TITLES = {"member": "Members", "raid": "Raid", "item": "Loot", "adjustment": "Adjustments"}
+# Embed field values are capped at 1024 characters.
+FAILURES_FIELD_LEN = 900
+
+
+class SubmitError(RuntimeError):
+    """The event cannot be queued for submission."""
+
+
+@dataclass
+class SubmitItem:
+    kind: str  # "event", "member", "raid", "item" or "adjustment"
+    label: str
+    status: str = PENDING
+    error: str | None = None
+    eqdkp_id: int | None = None
+
+
+@dataclass
+class SubmitProgress:
+    phase: str = "event"
+    items: list[SubmitItem] = field(default_factory=list)
+    raid_id: int | None = None
+    error: str | None = None
+    done: bool = False
+
+    def add(self, kind: str, label: str, status: str = PENDING, error: str | None = None) -> SubmitItem:
+        item = SubmitItem(kind, label, status, error)
+        self.items.append(item)
+        return item
+
+    def count(self, kind: str, status: str | None = None) -> int:
+        return sum(1 for i in self.items if i.kind == kind and (status is None or i.status == status))
+
+    @property
+    def failed(self) -> list[SubmitItem]:
+        return [i for i in self.items if i.status == FAILED]
+
+
+def submit_batch(event_id: int) -> str:
+    """Outbox batch name for an event's submit."""
+    return f"submit:{event_id}"
+
+
+def enqueue_submit(session: sqlalchemy.orm.Session, evt: Event) -> str:
+    """Queue every EQdkp write for *evt* (not committed) and return the batch name.
+
+    Raises :class:`SubmitError` if the event is already queued.
+    """
+    batch = submit_batch(evt.id)
+    if session.query(EqdkpOutbox.id).filter_by(batch=batch).first():
+        raise SubmitError("This event is already queued for EQdkp. Use $submit status, $submit retry or $submit reset.")
+
+    ops = []
+    tgt = session.get(Target, evt.target_id) if evt.target_id else None
+    event_name = tgt.name if tgt else evt.name
+    eqdkp_evt = session.query(EqdkpEvent).filter(EqdkpEvent.name.ilike(event_name)).first()
+    if eqdkp_evt and eqdkp_evt.eqdkp_event_id:
+        evt.eqdkp_event_id = int(eqdkp_evt.eqdkp_event_id)
+    else:
+        payload = {"event_id": evt.id, "name": event_name, "value": evt.dkp_value or 0}
+        ops.append(Op("event", STAGE_EVENT, "event", event_name, payload))
+
+    attendees = session.query(Attendee).filter_by(event_id=evt.id).all()
+    ftes = session.query(Fte).filter_by(event_id=evt.id).all()
+    loots = session.query(EventLoot).filter_by(event_id=evt.id).all()
+    char_ids = (
+        {int(a.character_id) for a in attendees if a.character_id}
+        | {f.character_id for f in ftes if f.character_id}
+        | {el.character_id for el in loots if el.character_id}
+    )
+    chars = {c.id: c for c in session.query(Character).filter(Character.id.in_(char_ids))} if char_ids else {}
+
+    def char_of(character_id) -> Character | None:
+        return chars.get(int(character_id)) if character_id else None
+
+    for char in chars.values():
+        ops.append(Op(f"member:{char.id}", STAGE_MEMBERS, "member", char.name, {"character_id": char.id}))
+    ops.append(Op("raid", STAGE_RAID, "raid", evt.name, {"event_id": evt.id}))
+
+    target_name = evt.target_name
+    for att in attendees:
+        if att.tracking_id is None or not (char := char_of(att.character_id)):
+            continue
+        payload = {
+            "character_id": char.id,
+            "value": evt.dkp_value or 0,
+            "reason": f"RTE {target_name}",
+            "event_id": evt.id,
+            "unless_attended": att.id,
+        }
+        ops.append(Op(f"rte:{att.id}", STAGE_ITEMS, "adjustment", f"RTE {char.name}", payload))
+    for fte_rec in ftes:
+        if not (char := char_of(fte_rec.character_id)):
+            continue
+        payload = {"character_id": char.id, "value": fte_rec.dkp, "reason": f"FTE {target_name}", "event_id": evt.id}
+        ops.append(Op(f"fte:{fte_rec.id}", STAGE_ITEMS, "adjustment", f"FTE {char.name}", payload))
+    for el in loots:
+        if el.eqdkp_item_id:
+            continue
+        loot_rec = session.get(Loot, el.loot_id) if el.loot_id else None
+        char = char_of(el.character_id)
+        if loot_rec and char:
+            label = f"{loot_rec.name} ({char.name})"
+            ops.append(Op(f"item:{el.id}", STAGE_ITEMS, "item", label, {"event_loot_id": el.id}))
+
+    enqueue(session, batch, ops)
+    return batch
+
+
+def enqueue_rte_submit(session: sqlalchemy.orm.Session, tgt: Target) -> tuple[int, int]:
+    """Queue one adjustment per character and rate for *tgt*'s closed, unsubmitted trackings (not committed).
+
+    Failed adjustments from earlier ``/rte submit`` runs are requeued, and skipped ones (no EQdkp
+    member at the time) are dropped so their trackings are queued afresh.  Returns the number of
+    adjustments queued and of failed rows requeued.
+    """
+    batches = EqdkpOutbox.batch.like(f"rte:{tgt.id}:%")
+    retried = sum(
+        retry_failed(session, batch) for (batch,) in session.query(EqdkpOutbox.batch).filter(batches).distinct().all()
+    )
+    session.query(EqdkpOutbox).filter(batches, EqdkpOutbox.status == OUTBOX_SKIPPED).delete(synchronize_session=False)
+
+    queued = queued_tracking_ids(session)
+    trackings = (
+        session.query(Tracking)
+        .filter_by(adjustment_id=None, target_id=tgt.id)
+        .filter(Tracking.end_time.isnot(None))
+        .all()
+    )
+    trackings = [t for t in trackings if t.id not in queued]
+
+    groups: dict[tuple, list[Tracking]] = {}
+    for t in trackings:
+        if t.character_id and session.get(Character, t.character_id):
+            groups.setdefault((t.character_id, t.rate_per_hour), []).append(t)
+
+    ops = []
+    for (char_id, rate), items in groups.items():
+        char = session.get(Character, char_id)
+        total_duration = sum(i.duration or 0 for i in items)
+        role_names = ", ".join(set(i.role_name for i in items if i.role_name))
+        min_start = min(i.start_time for i in items if i.start_time)
+        max_end = max(i.end_time for i in items if i.end_time)
+        reason = (
+            f"RTE {tgt.name} as {role_names} for {_fmt_duration(total_duration)} "
+            f"(Start: {min_start.strftime('%Y-%m-%d %I:%M %p')})"
+        )
+        tracking_ids = sorted(i.id for i in items)
+        payload = {
+            "character_id": char.id,
+            "value": dkp_from_duration(rate, total_duration),
+            "reason": reason,
+            "time": max_end.isoformat(),
+            "tracking_ids": tracking_ids,
+        }
+        ops.append(Op(f"member:{char.id}", 0, "member", char.name, {"character_id": char.id}))
+        ops.append(Op("adjustment:" + "-".join(map(str, tracking_ids)), 1, "adjustment", f"RTE {char.name}", payload))
+
+    if ops:
+        enqueue(session, f"rte:{tgt.id}:{min(t.id for t in trackings)}", ops)
+    return len(groups), retried
+
+
+def batch_progress(session: sqlalchemy.orm.Session, batch: str) -> SubmitProgress:
+    """Progress of an outbox batch, one :class:`SubmitItem` per row."""
+    rows = session.query(EqdkpOutbox).filter_by(batch=batch).order_by(EqdkpOutbox.id).all()
+    progress = SubmitProgress(
+        items=[
+            SubmitItem(r.kind, r.label or r.kind, _ITEM_STATUS.get(r.status, PENDING), r.last_error, r.result_id)
+            for r in rows
+        ]
+    )
+    progress.raid_id = next((r.result_id for r in rows if r.kind == "raid" and r.status == OUTBOX_DONE), None)
+    stage = blocked_stage(rows)
+    if stage is None:
+        progress.phase, progress.done = "items", True
+        return progress
+    current = [r for r in rows if r.stage == stage]
+    progress.phase = PHASE_BY_KIND.get(next(r.kind for r in current if r.status not in SETTLED), "items")
+    # Nothing more can happen without $submit retry once the lowest unsettled stage has only failures left.
+    if all(r.status in SETTLED or r.status == OUTBOX_FAILED for r in current):
+        progress.done = True
+        if waiting := sum(1 for r in rows if r.stage > stage):
+            progress.error = f"{len(progress.failed)} step(s) failed; {waiting} more are waiting for $submit retry."
+    return progress
+
+
+async def watch_batch(
+    guild_id: int,
+    batch: str,
+    on_progress: Callable[[SubmitProgress], Awaitable[None]],
+    interval: float = PROGRESS_INTERVAL_SEC,
+) -> SubmitProgress:
+    """Await *on_progress* whenever *batch*'s progress changes, until it is done; return the final progress."""
+    last = None
+    while True:
+        with get_raid_session(guild_id) as session:
+            progress = batch_progress(session, batch)
+        if progress != last:
+            last = progress
+            try:
+                await on_progress(progress)
+            except Exception:
+                logger.warning("EQdkp submit progress update failed", exc_info=True)
+        if progress.done:
+            return progress
+        await asyncio.sleep(interval)
+
+
+def build_submit_embed(progress: SubmitProgress) -> disnake.Embed:
+    """Render *progress* as the live ``$submit`` status embed."""
+    submitted = f"Submitted as raid {progress.raid_id}" if progress.raid_id else "Submitted"
+    if not progress.done:
+        description, color = PHASE_TEXT.get(progress.phase, progress.phase), disnake.Color.blurple()
+    elif progress.error:
+        description, color = progress.error, disnake.Color.red()
+    elif progress.failed:
+        description, color = f"{submitted} with {len(progress.failed)} failure(s).", disnake.Color.orange()
+    else:
+        description, color = f"{submitted}.", disnake.Color.green()
+
+    embed = disnake.Embed(title="EQdkp Submit", description=description, color=color)
+    for kind, title in KIND_TITLES.items():
+        total = progress.count(kind)
+        if not total:
+            continue
+        value = f"{progress.count(kind, OK)}/{total} done"
+        for status in (FAILED, SKIPPED):
+            if n := progress.count(kind, status):
+                value += f", {n} {status}"
+        if retrying := sum(1 for i in progress.items if i.kind == kind and i.status == PENDING and i.error):
+            value += f", {retrying} retrying"
+        embed.add_field(name=title, value=value, inline=True)
+
+    failed = progress.failed
+    if failed:
+        text = ""
+        for shown, item in enumerate(failed):
+            line = f"- {item.label}: {item.error}"[:120] + "\n"
+            if len(text + line) > FAILURES_FIELD_LEN:
+                text += f"- ...and {len(failed) - shown} more\n"
+                break
+            text += line
+        embed.add_field(name="Failures", value=f"```diff\n{text}```", inline=False)
+    return embed
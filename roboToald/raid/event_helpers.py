@@ -53,6 +53,18 @@ def _time_ago_in_words(dt: datetime) -> str:
     return ", ".join(parts[:-1]) + " and " + parts[-1]
 
 
+def _fmt_duration(seconds: float | None) -> str:
+    """Short duration such as ``2h 5m`` or ``40m``."""
+    if seconds is None or seconds <= 0:
+        return "0m"
+    total = int(seconds)
+    hours, remainder = divmod(total, 3600)
+    minutes, _ = divmod(remainder, 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
 def resolve_target(name: str, session: Session) -> tuple[list[Target], list[TargetAlias]]:
     """Resolve a target by name or alias, returning (targets, aliases).
 
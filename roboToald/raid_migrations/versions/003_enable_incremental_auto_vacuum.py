@@ -0,0 +1,35 @@
+"""Switch the raid database to auto_vacuum=INCREMENTAL.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INCREMENTAL = 2
+
+
+def _set_auto_vacuum(mode: str) -> None:
+    # An existing database only changes auto_vacuum mode through a full VACUUM, which cannot run
+    # inside a transaction.
+    with op.get_context().autocommit_block():
+        op.execute(f"PRAGMA auto_vacuum={mode}")
+        op.execute("VACUUM")
+
+
+def upgrade() -> None:
+    if op.get_bind().exec_driver_sql("PRAGMA auto_vacuum").scalar() != INCREMENTAL:
+        _set_auto_vacuum("INCREMENTAL")
+
+
+def downgrade() -> None:
+    _set_auto_vacuum("NONE")
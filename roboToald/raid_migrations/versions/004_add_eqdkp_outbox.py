@@ -0,0 +1,45 @@
+"""Add eqdkp_outbox for durable, resumable EQdkp submissions.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "eqdkp_outbox",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("idempotency_key", sa.String, nullable=False, unique=True),
+        sa.Column("batch", sa.String, nullable=False),
+        sa.Column("stage", sa.Integer, nullable=False),
+        sa.Column("kind", sa.String, nullable=False),
+        sa.Column("label", sa.String),
+        sa.Column("payload", sa.Text, nullable=False),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("result_id", sa.Integer),
+        sa.Column("last_error", sa.Text),
+        sa.Column("next_attempt_at", sa.DateTime),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("completed_at", sa.DateTime),
+    )
+    op.create_index("ix_eqdkp_outbox_batch", "eqdkp_outbox", ["batch"])
+    op.create_index("ix_eqdkp_outbox_status", "eqdkp_outbox", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_eqdkp_outbox_status", table_name="eqdkp_outbox")
+    op.drop_index("ix_eqdkp_outbox_batch", table_name="eqdkp_outbox")
+    op.drop_table("eqdkp_outbox")
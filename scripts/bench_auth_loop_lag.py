@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+Benchmark event-loop lag on the API loop while a burst of ``/auth`` logins is in flight.
+
+Seeds a scratch SSO database (accounts, one character each, a group mapped to a role, one access key
+per user), then drives ``POST /auth`` through the real FastAPI app on this process's event loop
+(``httpx.ASGITransport``, no sockets) twice:
+
+    - inline:   every SSO model call runs on the event loop (the pre-``sso_async`` behaviour)
+    - executor: SSO model calls run on ``roboToald.api.sso_async``'s thread pool
+
+A ticker task sleeps ``--tick-ms`` in a loop and records how late each wakeup is; that overshoot is
+the lag every WebSocket on the server would see.  A background thread can hold the SQLite write lock
+for ``--lock-ms`` every ``--lock-every-ms`` to mimic a slow commit elsewhere in the process.
+
+Reports logins per second, login p50/p95/p99 latency, and loop lag p50/p99/max.
+
+Usage:
+    python scripts/bench_auth_loop_lag.py [--accounts 200] [--logins 400] [--concurrency 50] [--lock-ms 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import roboToald modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from bench_stats import percentile
+from roboToald import config
+from roboToald.api import server, sso_async
+from roboToald.db import base
+from roboToald.db.models import sso as sso_model
+
+GUILD_ID = 1
+ROLE_ID = 10
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark API event-loop lag during concurrent /auth logins.")
+    parser.add_argument("--accounts", type=int, default=200, help="Accounts (and users) in the scratch guild")
+    parser.add_argument("--logins", type=int, default=400, help="Logins per mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="Logins in flight at once")
+    parser.add_argument("--tick-ms", type=float, default=5.0, help="Ticker sleep used to sample loop lag")
+    parser.add_argument("--lock-ms", type=float, default=50.0, help="How long the lock holder keeps the write lock")
+    parser.add_argument("--lock-every-ms", type=float, default=500.0, help="Interval between lock holds (0 = off)")
+    return parser.parse_args()
+
+
+class FakeDiscord:
+    """Just enough of ``disnake.Client`` for RBAC and log labels: every user holds ``ROLE_ID``."""
+
+    def __init__(self):
+        role = SimpleNamespace(id=ROLE_ID)
+        self._guild = SimpleNamespace(
+            name="bench",
+            get_member=lambda uid: SimpleNamespace(roles=[role], display_name=f"user{uid}"),
+        )
+
+    def get_guild(self, guild_id):
+        return self._guild if guild_id == GUILD_ID else None
+
+    def is_ready(self):
+        return True
+
+
+def seed(n_accounts: int) -> list[tuple[str, str]]:
+    """Create accounts/characters/keys; return ``(character_name, access_key)`` login pairs."""
+    base.Base.metadata.create_all(base.get_engine())
+    sso_model.create_account_group(GUILD_ID, "bench", ROLE_ID)
+    logins = []
+    for i in range(n_accounts):
+        sso_model.create_account(GUILD_ID, f"acct{i}", "hunter2", group="bench")
+        sso_model.add_account_character(GUILD_ID, f"acct{i}", f"Benchchar{i}", sso_model.CharacterClass.Warrior)
+        key = sso_model.get_access_key_by_user(GUILD_ID, 1000 + i)
+        logins.append((f"Benchchar{i}", key.access_key))
+    return logins
+
+
+def lock_holder(stop: threading.Event, hold: float, every: float) -> None:
+    """Periodically take the SQLite write lock, like a long commit from another thread."""
+    engine = base.get_engine()
+    while not stop.wait(every):
+        with engine.connect() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            time.sleep(hold)
+            conn.rollback()
+
+
+async def run_mode(label: str, logins: list[tuple[str, str]], args) -> None:
+    tick = args.tick_ms / 1000.0
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append((time.perf_counter() - started - tick) * 1000.0)
+
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=server.app, client=("198.51.100.7", 1234))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def login(username: str, key: str):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/auth", json={"username": username, "password": key})
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                if response.status_code != 200:
+                    failures += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(*logins[i % len(logins)]) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await ticker_task
+
+    print(
+        f"{label:9} {args.logins / elapsed:7.0f} logins/s  "
+        f"login p50 {percentile(latencies, 50):7.1f} p95 {percentile(latencies, 95):7.1f} "
+        f"p99 {percentile(latencies, 99):7.1f} ms  |  "
+        f"loop lag p50 {percentile(lags, 50):6.1f} p99 {percentile(lags, 99):7.1f} max {max(lags, default=0):7.1f} ms"
+        + (f"  ({failures} failed)" if failures else "")
+    )
+
+
+async def run_inline(func, /, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def main_async(args, logins) -> None:
+    server.ws_manager.set_event_loop(asyncio.get_running_loop())
+    real_run = sso_async.executor.run
+    sso_async.executor.run = run_inline
+    try:
+        await run_mode("inline", logins, args)
+    finally:
+        sso_async.executor.run = real_run
+    await run_mode("executor", logins, args)
+    print(f"\nexecutor stats: {sso_async.executor.stats()}")
+    sso_async.executor.shutdown()
+
+
+def main() -> None:
+    args = parse_arguments()
+    # Generous limits so the benchmark measures logins, not rejections.
+    config.RATE_LIMIT_MAX_ATTEMPTS = 1_000_000
+    server.app.state.discord_client = FakeDiscord()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.mkdir("data")
+        logins = seed(args.accounts)
+        print(
+            f"{args.accounts} accounts, {args.logins} logins per mode, concurrency {args.concurrency}, "
+            f"executor workers {sso_async.executor.stats()['max_workers']}, "
+            f"lock hold {args.lock_ms:.0f} ms every {args.lock_every_ms:.0f} ms\n"
+        )
+        stop = threading.Event()
+        holder = None
+        if args.lock_every_ms > 0 and args.lock_ms > 0:
+            holder = threading.Thread(
+                target=lock_holder, args=(stop, args.lock_ms / 1000.0, args.lock_every_ms / 1000.0), daemon=True
+            )
+            holder.start()
+        try:
+            asyncio.run(main_async(args, logins))
+        finally:
+            stop.set()
+            if holder:
+                holder.join()
+            base.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Benchmark the pooled EQdkp client in ``roboToald.eqdkp.client`` against a local fake EQdkp server.
+
+Starts a minimal ``/api.php`` (Starlette + uvicorn, optionally over TLS with a throwaway
+self-signed certificate) that answers ``search`` lookups after ``--latency-ms``, then times:
+
+    - fresh:      a new ``httpx.AsyncClient`` per call (the client's old behaviour), sequential
+    - pooled:     ``EqdkpClient.find_character`` over the shared keep-alive pool, sequential
+    - concurrent: the same calls gathered, bounded by ``[eqdkp] max_connections``
+
+Usage:
+    python scripts/bench_eqdkp_client.py [--requests 200] [--latency-ms 5] [--tls]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path so we can import roboToald modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from roboToald import config
+from roboToald.eqdkp import client as eqdkp_client
+
+GUILD_ID = 1
+
+
+def _fake_eqdkp(latency: float) -> Starlette:
+    async def api(request):
+        await asyncio.sleep(latency)
+        name = request.query_params.get("for", "")
+        return JSONResponse({"status": 1, "direct": {"member:1": {"id": 1, "user_id": "1", "name": name}}})
+
+    return Starlette(routes=[Route("/api.php", api, methods=["GET", "POST"])])
+
+
+def _self_signed_cert(directory: str) -> tuple[str, str]:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            )
+        )
+    return certfile, keyfile
+
+
+def _start_server(latency: float, tls_dir: str | None) -> tuple[uvicorn.Server, str]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    certfile = keyfile = None
+    if tls_dir:
+        certfile, keyfile = _self_signed_cert(tls_dir)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            _fake_eqdkp(latency),
+            host="127.0.0.1",
+            port=port,
+            log_level="warning",
+            ssl_certfile=certfile,
+            ssl_keyfile=keyfile,
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"{'https' if tls_dir else 'http'}://127.0.0.1:{port}"
+
+
+async def _fresh(url: str, n: int) -> None:
+    client = eqdkp_client.EqdkpClient(GUILD_ID)
+    for i in range(n):
+        async with httpx.AsyncClient(verify=False) as http:
+            resp = await http.get(
+                f"{url}{eqdkp_client.API_PATH}",
+                params=client._params("search", **{"in": "charname", "for": f"C{i}"}),
+                headers=client._headers(),
+            )
+            resp.raise_for_status()
+
+
+async def _pooled(n: int) -> None:
+    client = eqdkp_client.EqdkpClient(GUILD_ID)
+    for i in range(n):
+        await client.find_character(f"C{i}")
+
+
+async def _concurrent(n: int) -> None:
+    client = eqdkp_client.EqdkpClient(GUILD_ID)
+    await asyncio.gather(*(client.find_character(f"C{i}") for i in range(n)))
+
+
+async def _bench(url: str, n: int) -> None:
+    config.EQDKP_SETTINGS[GUILD_ID] = {"url": url, "host": url.split("://", 1)[1], "api_key": "bench"}
+    print(f"{n} requests to {url} (HTTP/2 available: {eqdkp_client.HTTP2_AVAILABLE})")
+    for label, run in (
+        ("fresh client per call", lambda: _fresh(url, n)),
+        ("pooled, sequential", lambda: _pooled(n)),
+        (f"pooled, concurrent ({config.EQDKP_MAX_CONNECTIONS} in flight)", lambda: _concurrent(n)),
+    ):
+        await run()  # warm up (pool connections, server code paths)
+        started = time.perf_counter()
+        await run()
+        elapsed = time.perf_counter() - started
+        print(f"  {label:<36} {elapsed * 1000:8.1f} ms  {n / elapsed:8.0f} req/s  {elapsed * 1000 / n:6.2f} ms/req")
+    await eqdkp_client.close_pools()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Fake server processing time per request")
+    parser.add_argument("--tls", action="store_true", help="Serve over HTTPS with a self-signed certificate")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tls_dir:
+        server, url = _start_server(args.latency_ms / 1000.0, tls_dir if args.tls else None)
+        try:
+            asyncio.run(_bench(url, args.requests))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of ``$submit`` and ``/rte submit`` against the in-process fake EQdkp server.
+
+For each ``--concurrency`` level, a scratch raid database (in a temporary directory) is seeded with:
+
+    - a killed event of ``--attendees`` characters, ``--rte`` of them joined from RTE trackings,
+      plus ``--ftes`` FTE awards and ``--loot`` items bought by random attendees
+    - ``--trackings`` closed RTE trackings on the same target, not yet submitted
+    - a fake EQdkp (``roboToald.eqdkp.fake_server``) that already knows ``--known`` of the characters,
+      answering after ``--latency-ms`` (+ up to ``--jitter-ms``), failing ``--error-rate`` of requests
+      and rate-limiting to ``--rate-limit`` requests per second
+
+Both submits are enqueued exactly as the commands do (``enqueue_submit``, ``enqueue_rte_submit``),
+then ``OutboxWorker.drain`` sends everything with that concurrency through the real ``EqdkpClient``.
+Reports wall time, requests by function, client and outbox retries, and the final row statuses.
+Concurrency 1 is the old one-request-at-a-time behaviour.
+
+Usage:
+    python scripts/bench_eqdkp_submit.py [--concurrency 1,4,8] [--attendees 72] [--latency-ms 40]
+        [--error-rate 0.02] [--rate-limit 50]
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add parent directory to path so we can import roboToald modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roboToald import config
+from roboToald.db import raid_base
+from roboToald.db.base import create_sqlite_engine
+from roboToald.db.raid_base import RaidBase, get_raid_session
+from roboToald.db.raid_models.character import Character
+from roboToald.db.raid_models.loot import EventLoot, Loot
+from roboToald.db.raid_models.outbox import OUTBOX_PENDING, EqdkpOutbox
+from roboToald.db.raid_models.raid import Attendee, Event, Fte
+from roboToald.db.raid_models.target import Target
+from roboToald.db.raid_models.tracking import RTE_ROLES, Tracking
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.eqdkp.fake_server import FakeEqdkp
+from roboToald.raid.eqdkp_outbox import OutboxWorker
+from roboToald.raid.eqdkp_submit import enqueue_rte_submit, enqueue_submit
+
+GUILD_ID = 1
+URL = "http://eqdkp.bench"
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark $submit and /rte submit against a fake EQdkp.")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels to run")
+    parser.add_argument("--attendees", type=int, default=72, help="Characters in the raid")
+    parser.add_argument("--rte", type=int, default=6, help="Attendees joined from RTE trackings")
+    parser.add_argument("--ftes", type=int, default=3, help="FTE awards")
+    parser.add_argument("--loot", type=int, default=20, help="Looted items")
+    parser.add_argument("--trackings", type=int, default=24, help="Closed trackings for /rte submit")
+    parser.add_argument("--known", type=float, default=0.8, help="Fraction of characters already in EQdkp")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Fake EQdkp time per request")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Extra random time per request, up to")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second before 503s (0 = off)")
+    parser.add_argument("--burst", type=int, default=10, help="Rate limiter bucket size")
+    parser.add_argument("--outbox-retry-sec", type=float, default=0.5, help="Outbox backoff base for the run")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def seed(args, rng: random.Random, server: FakeEqdkp) -> None:
+    start = datetime.datetime(2026, 10, 1, 20, 0)
+    with get_raid_session(GUILD_ID) as session:
+        tgt = Target(name="Vulak`Aerr", value=10, rate_per_hour=4)
+        session.add(tgt)
+        n_chars = args.attendees + args.ftes
+        chars = [Character(name=f"Raider{i:03d}") for i in range(n_chars)]
+        session.add_all(chars)
+        session.flush()
+        for char in chars:
+            if rng.random() < args.known:
+                server.add_member(char.name)
+
+        evt = Event(name=tgt.name, target_id=tgt.id, channel_id="1", dkp=10, killed=True, created_at=start)
+        session.add(evt)
+        session.flush()
+        attendees = chars[: args.attendees]
+        for i, char in enumerate(attendees):
+            tracking_id = None
+            if i < args.rte:
+                tracking = Tracking(
+                    target_id=tgt.id,
+                    character_id=char.id,
+                    start_time=start - datetime.timedelta(hours=3),
+                    end_time=start,
+                    role_id=7,
+                    is_rte=True,
+                    close_event_id=evt.id,
+                    adjustment_id=0,  # paid through the raid's RTE attendance
+                )
+                session.add(tracking)
+                session.flush()
+                tracking_id = str(tracking.id)
+            session.add(Attendee(event_id=evt.id, character_id=str(char.id), tracking_id=tracking_id))
+        for char in chars[args.attendees :]:
+            session.add(Fte(event_id=evt.id, character_id=char.id, dkp=5))
+        for i in range(args.loot):
+            loot = Loot(name=f"Loot {i}")
+            session.add(loot)
+            session.flush()
+            buyer = rng.choice(attendees)
+            session.add(EventLoot(event_id=evt.id, loot_id=loot.id, character_id=buyer.id, dkp=rng.randint(1, 60)))
+        for i in range(args.trackings):
+            began = start - datetime.timedelta(days=1, minutes=30 * i)
+            session.add(
+                Tracking(
+                    target_id=tgt.id,
+                    character_id=rng.choice(attendees).id,
+                    start_time=began,
+                    end_time=began + datetime.timedelta(minutes=rng.randint(20, 240)),
+                    role_id=rng.choice(list(RTE_ROLES)),
+                    is_rte=True,
+                )
+            )
+        session.commit()
+
+        enqueue_submit(session, evt)
+        enqueue_rte_submit(session, tgt)
+        session.commit()
+
+
+async def run(args, concurrency: int) -> dict:
+    config.EQDKP_MAX_CONNECTIONS = concurrency
+    eqdkp_client.lookup_cache.clear()
+    server = FakeEqdkp(
+        latency=args.latency_ms / 1000.0,
+        jitter=args.jitter_ms / 1000.0,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        seed=args.seed,
+    )
+    pool = server.install(URL)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = raid_base._engines[GUILD_ID] = create_sqlite_engine(os.path.join(tmp, "raids_bench.db"))
+        RaidBase.metadata.create_all(engine)
+        seed(args, random.Random(args.seed), server)
+
+        worker = OutboxWorker(concurrency=concurrency, retry_delay=args.outbox_retry_sec)
+        started = time.perf_counter()
+        while True:
+            await worker.drain(GUILD_ID)
+            # Rows waiting out a retry backoff are not ready yet; come back when they are.
+            with get_raid_session(GUILD_ID) as session:
+                if not session.query(EqdkpOutbox.id).filter_by(status=OUTBOX_PENDING).first():
+                    break
+            await asyncio.sleep(args.outbox_retry_sec / 2)
+        elapsed = time.perf_counter() - started
+
+        with get_raid_session(GUILD_ID) as session:
+            rows = collections.Counter(status for (status,) in session.query(EqdkpOutbox.status))
+        await eqdkp_client.close_pools()
+        engine.dispose()
+        del raid_base._engines[GUILD_ID]
+    return {
+        "seconds": elapsed,
+        "requests": server.requests,
+        "calls": server.calls,
+        "client_retries": pool.retries,
+        "outbox_retries": worker.retried,
+        "rate_limited": server.rate_limited,
+        "peak": server.peak_in_flight,
+        "rows": rows,
+    }
+
+
+def report(concurrency: int, result: dict) -> None:
+    print(
+        f"  concurrency {concurrency:>3}: {result['seconds'] * 1000:9.1f} ms  {result['requests']:4d} requests  "
+        f"peak {result['peak']:3d} in flight  retries {result['client_retries']} client / "
+        f"{result['outbox_retries']} outbox  {result['rate_limited']} rate-limited"
+    )
+    print(f"{'':18}requests: {', '.join(f'{k} {v}' for k, v in sorted(result['calls'].items()))}")
+    print(f"{'':18}rows:     {', '.join(f'{k} {v}' for k, v in sorted(result['rows'].items()))}")
+
+
+def main() -> None:
+    args = parse_arguments()
+    logging.basicConfig(level=logging.ERROR)
+    config.EQDKP_SETTINGS[GUILD_ID] = {"url": URL, "host": URL.split("://", 1)[1], "api_key": "bench"}
+    print(
+        f"$submit of {args.attendees} attendees ({args.rte} via RTE), {args.ftes} FTE, {args.loot} loot, "
+        f"plus /rte submit of {args.trackings} trackings; {args.known:.0%} already in EQdkp; "
+        f"latency {args.latency_ms:g}+{args.jitter_ms:g} ms, error rate {args.error_rate:g}, "
+        f"rate limit {args.rate_limit:g}/s"
+    )
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        report(concurrency, asyncio.run(run(args, concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Benchmark SQLite lock contention with and without the ``[database]`` engine tuning.
+
+Spawns writer threads (short transactions shaped like last_login updates plus audit inserts) and
+reader threads (account list scans) against a scratch database, once with a default
+``sqlalchemy.create_engine`` and once with ``roboToald.db.base.create_sqlite_engine`` (WAL,
+busy_timeout, synchronous=NORMAL, mmap/cache sizes, sized pool).
+
+Reports committed writes and reads per second, p50/p95/p99 latency, and "database is locked" errors.
+
+Usage:
+    python scripts/bench_sqlite_contention.py [--writers 8] [--readers 8] [--seconds 5] [--accounts 500]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path so we can import roboToald modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy
+import sqlalchemy.exc
+
+from bench_stats import percentile
+from roboToald.db import base
+
+SCHEMA = (
+    "CREATE TABLE account (id INTEGER PRIMARY KEY, guild_id INTEGER, real_user TEXT, last_login DATETIME)",
+    "CREATE TABLE audit (id INTEGER PRIMARY KEY, timestamp DATETIME, ip TEXT, username TEXT, success BOOLEAN)",
+    "CREATE INDEX ix_audit_ip ON audit (ip, success, timestamp)",
+)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark SQLite contention for default vs tuned engines.")
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent writer threads")
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent reader threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration per engine")
+    parser.add_argument("--accounts", type=int, default=500, help="Rows in the account table")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def prepare(engine: sqlalchemy.engine.Engine, n_accounts: int) -> None:
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(
+            "INSERT INTO account (guild_id, real_user, last_login) VALUES (?, ?, ?)",
+            [(1, f"account{i}", datetime.datetime(2000, 1, 1)) for i in range(n_accounts)],
+        )
+
+
+def worker(engine, kind: str, args, stop: threading.Event, results: dict, seed: int) -> None:
+    rng = random.Random(seed)
+    latencies = []
+    locked = 0
+    other = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                if kind == "write":
+                    conn.exec_driver_sql(
+                        "UPDATE account SET last_login = ? WHERE id = ?",
+                        (datetime.datetime.now(), rng.randint(1, args.accounts)),
+                    )
+                    conn.exec_driver_sql(
+                        "INSERT INTO audit (timestamp, ip, username, success) VALUES (?, ?, ?, ?)",
+                        (datetime.datetime.now(), f"10.0.0.{rng.randint(1, 50)}", "bench", rng.random() < 0.9),
+                    )
+                else:
+                    conn.exec_driver_sql("SELECT id, real_user, last_login FROM account WHERE guild_id = 1").fetchall()
+        except sqlalchemy.exc.OperationalError as e:
+            if "locked" in str(e) or "busy" in str(e):
+                locked += 1
+            else:
+                other += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    with results["lock"]:
+        results[kind].extend(latencies)
+        results[f"{kind}_locked"] += locked
+        results["errors"] += other
+
+
+def run(label: str, engine: sqlalchemy.engine.Engine, args) -> None:
+    prepare(engine, args.accounts)
+    results = {
+        "lock": threading.Lock(),
+        "write": [],
+        "read": [],
+        "write_locked": 0,
+        "read_locked": 0,
+        "errors": 0,
+    }
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=worker, args=(engine, "write", args, stop, results, args.seed + i))
+        for i in range(args.writers)
+    ] + [
+        threading.Thread(target=worker, args=(engine, "read", args, stop, results, args.seed + 1000 + i))
+        for i in range(args.readers)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    for kind in ("write", "read"):
+        lat = results[kind]
+        print(
+            f"{label:8} {kind:5} {len(lat) / args.seconds:10.0f}/s  p50 {percentile(lat, 50):7.2f} ms  "
+            f"p95 {percentile(lat, 95):7.2f} ms  p99 {percentile(lat, 99):8.2f} ms  "
+            f"locked {results[f'{kind}_locked']}"
+        )
+    if results["errors"]:
+        print(f"{label:8} other errors: {results['errors']}")
+
+
+def main() -> None:
+    args = parse_arguments()
+    print(
+        f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s per engine, "
+        f"pragmas: {'; '.join(base.sqlite_pragmas())}\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        default = sqlalchemy.create_engine(f"sqlite:///{os.path.join(tmp, 'default.db')}", future=True)
+        run("default", default, args)
+        tuned = base.create_sqlite_engine(os.path.join(tmp, "tuned.db"))
+        run("tuned", tuned, args)
+
+
+if __name__ == "__main__":
+    main()
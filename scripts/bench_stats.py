@@ -0,0 +1,9 @@
+"""Statistics shared by the benchmark and load-test scripts in this directory."""
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank *pct* percentile of *values* (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Benchmark WebSocket full_state / delta fan-out in ``roboToald.api.websocket``.
+
+Builds a synthetic guild (no database or Discord connection needed), connects fake sockets spread
+over a few role sets, then measures pushes for each encoding mode:
+
+    - encoder: stdlib ``json`` vs ``orjson`` (when installed)
+    - field names: full vs compact (``"compact_keys": true`` clients)
+    - permessage-deflate: off vs on (per-connection zlib stream, as negotiated by ``websockets``)
+
+Reports bytes on the wire and process CPU time per push and per full_state.
+
+Usage:
+    python scripts/bench_ws_push.py [--accounts 600] [--connections 200] [--role-sets 5] [--pushes 50]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import time
+import zlib
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import roboToald modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.websockets import WebSocketState
+
+from roboToald.api import websocket as ws_module
+from roboToald.db.models.sso import CharacterClass
+
+ITEM_ATTRS = (
+    "key_seb",
+    "key_vp",
+    "key_st",
+    "item_void",
+    "item_neck",
+    "item_lizard",
+    "item_thurg",
+    "item_reaper",
+    "item_brass_idol",
+    "item_pearl",
+    "item_peridot",
+    "item_mb3",
+    "item_mb4",
+    "item_mb5",
+)
+ZONES = ("East Commonlands", "Skyfire Mountains", "The Wakening Lands", "Western Wastes", "Plane of Hate")
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket delta/full_state fan-out.")
+    parser.add_argument("--accounts", type=int, default=600, help="Accounts in the synthetic guild")
+    parser.add_argument("--characters", type=int, default=4, help="Characters per account")
+    parser.add_argument("--connections", type=int, default=200, help="Connected WebSocket clients")
+    parser.add_argument("--role-sets", type=int, default=5, help="Distinct access role sets among clients")
+    parser.add_argument("--pushes", type=int, default=50, help="Delta pushes per mode")
+    parser.add_argument("--changed", type=int, default=5, help="Accounts changed per push")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def make_character(rng: random.Random, name: str) -> SimpleNamespace:
+    char = SimpleNamespace(
+        name=name,
+        klass=rng.choice(list(CharacterClass)),
+        bind_location=rng.choice(ZONES),
+        park_location=rng.choice(ZONES),
+        level=rng.randint(50, 60),
+    )
+    for attr in ITEM_ATTRS:
+        setattr(char, attr, rng.choice((True, False, None)))
+    return char
+
+
+def make_account(rng: random.Random, account_id: int, n_characters: int, n_role_sets: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=account_id,
+        real_user=f"account{account_id:05d}",
+        aliases=[SimpleNamespace(alias=f"alias{account_id}")],
+        tags=[SimpleNamespace(tag=rng.choice(("vp", "st", "seb", "kael")))],
+        characters=[make_character(rng, f"Char{account_id}x{i}") for i in range(n_characters)],
+        last_login=datetime.datetime.now().astimezone(),
+        last_login_by="Someone",
+        groups=[SimpleNamespace(role_id=100 + account_id % n_role_sets)],
+    )
+
+
+class FakeSocket:
+    """Counts payload bytes and, with deflate, compressed bytes from a per-connection zlib stream."""
+
+    def __init__(self, deflate: bool):
+        self.client_state = WebSocketState.CONNECTED
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        # websockets' default permessage-deflate settings: 12 window bits, memLevel 5, context takeover.
+        self._z = zlib.compressobj(wbits=-12, memLevel=5) if deflate else None
+
+    async def send_text(self, data: str) -> None:
+        payload = data.encode()
+        self.raw_bytes += len(payload)
+        if self._z is not None:
+            # RFC 7692: the trailing 0x00 0x00 0xff 0xff of the sync flush is not sent.
+            self.wire_bytes += len(self._z.compress(payload) + self._z.flush(zlib.Z_SYNC_FLUSH)) - 4
+        else:
+            self.wire_bytes += len(payload)
+
+
+class BenchManager(ws_module.ConnectionManager):
+    def __init__(self, member_roles: dict[int, set[int]]):
+        super().__init__()
+        self._member_roles = member_roles
+
+    def _member_role_ids(self, guild_id: int, discord_user_id: int) -> set[int]:
+        return self._member_roles.get(discord_user_id, set())
+
+
+async def run_mode(args, accounts: dict, encoder: str, compact: bool, deflate: bool) -> dict:
+    ws_module.orjson = _orjson if encoder == "orjson" else None
+    ws_module.sso_model.list_accounts = lambda gid, account_ids=None, **kw: [
+        a for a in accounts.values() if account_ids is None or a.id in account_ids
+    ]
+    ws_module.sso_model.get_active_characters = lambda gid: {}
+
+    member_roles = {uid: {100 + r for r in range(uid % args.role_sets + 1)} for uid in range(args.connections)}
+    mgr = BenchManager(member_roles)
+    rng = random.Random(args.seed)
+
+    # Connect everyone: full_state per client.
+    conns = []
+    cpu = time.process_time()
+    for uid in range(args.connections):
+        sock = FakeSocket(deflate)
+        tree = await mgr.build_full_state(1, uid)
+        conn = ws_module.ClientConnection(
+            websocket=sock,
+            guild_id=1,
+            discord_user_id=uid,
+            sent_fingerprints=mgr.sent_fingerprints(1, tree),
+            snapshot_version=mgr.snapshot_version(1),
+            role_key=mgr.role_key(1, uid),
+            compact_keys=compact,
+        )
+        mgr.register(conn)
+        await sock.send_text(mgr.full_state_frame(1, tree, compact=compact, count=len(tree)))
+        conns.append(conn)
+    full_cpu = time.process_time() - cpu
+    full_raw = sum(c.websocket.raw_bytes for c in conns)
+    full_wire = sum(c.websocket.wire_bytes for c in conns)
+    for c in conns:
+        c.websocket.raw_bytes = c.websocket.wire_bytes = 0
+
+    push_cpu = 0.0
+    for _ in range(args.pushes):
+        changed = rng.sample(sorted(accounts), args.changed)
+        for account_id in changed:
+            account = accounts[account_id]
+            char = rng.choice(account.characters)
+            accounts[account_id] = SimpleNamespace(
+                **{
+                    **vars(account),
+                    "last_login_by": f"User{rng.randint(0, 999)}",
+                    "characters": [
+                        SimpleNamespace(**{**vars(c), "level": rng.randint(50, 60)}) if c is char else c
+                        for c in account.characters
+                    ],
+                }
+            )
+        mgr.mark_accounts_changed(1, set(changed))
+        snapshot = await mgr._refreshed_snapshot(1)
+        cpu = time.process_time()
+        await mgr._push_snapshot(1, snapshot, conns)
+        push_cpu += time.process_time() - cpu
+
+    return {
+        "mode": f"{encoder:6} {'compact' if compact else 'full':7} {'deflate' if deflate else 'plain':7}",
+        "full_state_kb": full_raw / args.connections / 1024,
+        "full_state_wire_kb": full_wire / args.connections / 1024,
+        "full_state_cpu_ms": full_cpu * 1000 / args.connections,
+        "push_wire_kb": sum(c.websocket.wire_bytes for c in conns) / args.pushes / 1024,
+        "push_cpu_ms": push_cpu * 1000 / args.pushes,
+    }
+
+
+async def main() -> None:
+    args = parse_arguments()
+    rng = random.Random(args.seed)
+    template = {i: make_account(rng, i, args.characters, args.role_sets) for i in range(1, args.accounts + 1)}
+
+    encoders = ["json"] + (["orjson"] if _orjson is not None else [])
+    print(
+        f"{args.accounts} accounts x {args.characters} characters, {args.connections} clients over "
+        f"{args.role_sets} role sets, {args.pushes} pushes x {args.changed} changed accounts\n"
+    )
+    print(
+        f"{'mode':24} {'full_state KB':>14} {'on wire KB':>11} {'CPU ms/client':>14} "
+        f"{'push wire KB':>13} {'push CPU ms':>12}"
+    )
+    for encoder in encoders:
+        for compact in (False, True):
+            for deflate in (False, True):
+                r = await run_mode(args, dict(template), encoder, compact, deflate)
+                print(
+                    f"{r['mode']:24} {r['full_state_kb']:14.1f} {r['full_state_wire_kb']:11.1f} "
+                    f"{r['full_state_cpu_ms']:14.3f} {r['push_wire_kb']:13.1f} {r['push_cpu_ms']:12.2f}"
+                )
+
+
+_orjson = ws_module.orjson
+
+if __name__ == "__main__":
+    asyncio.run(main())
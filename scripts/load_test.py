@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+"""
+Offline load test for the SSO API: ``/auth`` bursts plus many ``/ws/accounts`` clients.
+
+Everything runs in one process with no network access or Discord connection:
+
+    - a scratch SQLite database (in a temporary directory) is seeded with N accounts, their
+      characters, R account groups mapped to Discord roles, and one access key per user
+    - a stand-in Discord client (fake guild, members, roles) is injected into the app, exactly as
+      ``run_api_server`` does with the real bot
+    - the real FastAPI app is served by uvicorn on a loopback port in a background thread
+    - M WebSocket clients follow the real protocol (auth -> full_state, then heartbeat /
+      update_location / login_auth), while ``/auth`` bursts are fired over HTTP
+
+Server-side probes (installed in-process) record:
+
+    - event-loop lag on the uvicorn loop (ticker overshoot)
+    - delta fan-out time (``ConnectionManager._notify_guild_async`` duration)
+    - DB write time: write statements and commits, which is where SQLite lock waits show up
+      (``busy_timeout`` blocks inside them), plus "database is locked" errors
+
+Reports count / p50 / p95 / p99 / max for each metric.  ``--json`` writes the same numbers to a file
+so runs can be compared before deploying; ``--max-auth-p99-ms`` / ``--max-loop-lag-p99-ms`` make the
+script exit non-zero when a budget is exceeded.
+
+Usage:
+    python scripts/load_test.py [--accounts 300] [--clients 200] [--duration 20] [--bursts 5] [--burst-size 100]
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+# Add parent directory to path so we can import roboToald modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import sqlalchemy
+import uvicorn
+from websockets.asyncio.client import connect as ws_connect
+
+from bench_stats import percentile
+from roboToald import config
+from roboToald.api import server
+from roboToald.db import base
+from roboToald.db.models import sso as sso_model
+
+GUILD_ID = 4242
+ROLE_BASE = 9000
+USER_BASE = 100000
+CLASSES = list(sso_model.CharacterClass)
+ZONES = ("East Commonlands", "Skyfire Mountains", "The Wakening Lands", "Western Wastes", "Plane of Hate")
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test for /auth and /ws/accounts.")
+    parser.add_argument("--accounts", type=int, default=300, help="Accounts in the scratch guild")
+    parser.add_argument("--characters", type=int, default=2, help="Characters per account")
+    parser.add_argument("--role-sets", type=int, default=4, help="Account groups / Discord roles")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent WebSocket clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of WebSocket traffic")
+    parser.add_argument("--heartbeat-interval", type=float, default=5.0, help="Mean seconds between heartbeats")
+    parser.add_argument("--location-interval", type=float, default=15.0, help="Mean seconds between update_location")
+    parser.add_argument("--login-interval", type=float, default=30.0, help="Mean seconds between login_auth")
+    parser.add_argument("--bursts", type=int, default=5, help="/auth bursts during the run")
+    parser.add_argument("--burst-size", type=int, default=100, help="Concurrent /auth requests per burst")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    parser.add_argument("--max-auth-p99-ms", type=float, help="Exit 1 if /auth p99 exceeds this")
+    parser.add_argument("--max-loop-lag-p99-ms", type=float, help="Exit 1 if event-loop lag p99 exceeds this")
+    return parser.parse_args()
+
+
+# -- Stand-in Discord client ---------------------------------------------------
+
+
+class FakeDiscord:
+    """The parts of ``disnake.Client`` the API reads: guilds, members, roles, readiness."""
+
+    def __init__(self, members: dict[int, list[int]]):
+        self.loop = None
+        members_by_id = {
+            uid: SimpleNamespace(
+                id=uid,
+                display_name=f"Tester{uid}",
+                roles=[SimpleNamespace(id=role_id) for role_id in role_ids],
+            )
+            for uid, role_ids in members.items()
+        }
+        self._guild = SimpleNamespace(id=GUILD_ID, name="Load Test Guild", get_member=members_by_id.get)
+
+    def get_guild(self, guild_id):
+        return self._guild if guild_id == GUILD_ID else None
+
+    def is_ready(self):
+        return True
+
+
+# -- Seeding ---------------------------------------------------------------------
+
+
+def seed(args, rng: random.Random):
+    """Create the scratch guild; return (users, fake discord)."""
+    base.Base.metadata.create_all(base.get_engine())
+    for r in range(args.role_sets):
+        sso_model.create_account_group(GUILD_ID, f"group{r}", ROLE_BASE + r)
+
+    characters_by_group = collections.defaultdict(list)
+    for i in range(args.accounts):
+        group = i % args.role_sets
+        sso_model.create_account(GUILD_ID, f"loadacct{i}", f"pass{i}", group=f"group{group}")
+        for c in range(args.characters):
+            name = f"Load{i}x{c}"
+            sso_model.add_account_character(GUILD_ID, f"loadacct{i}", name, rng.choice(CLASSES))
+            characters_by_group[group].append(name)
+
+    users = []
+    members = {}
+    for u in range(args.clients):
+        uid = USER_BASE + u
+        groups = {u % args.role_sets, (u + 1) % args.role_sets}
+        members[uid] = [ROLE_BASE + g for g in groups]
+        key = sso_model.get_access_key_by_user(GUILD_ID, uid).access_key
+        characters = [name for g in groups for name in characters_by_group[g]]
+        users.append(SimpleNamespace(discord_user_id=uid, access_key=key, characters=characters))
+    return users, FakeDiscord(members)
+
+
+# -- Server and probes -------------------------------------------------------------
+
+
+class Samples:
+    """Thread-safe latency samples (milliseconds) keyed by metric name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values: dict[str, list[float]] = collections.defaultdict(list)
+        self.counters: collections.Counter = collections.Counter()
+
+    def add(self, metric: str, ms: float) -> None:
+        with self._lock:
+            self.values[metric].append(ms)
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += n
+
+
+def install_db_probes(engine: sqlalchemy.engine.Engine, samples: Samples) -> None:
+    """Time write statements and commits; count lock errors."""
+
+    @sqlalchemy.event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["load_test_started"] = time.perf_counter()
+
+    @sqlalchemy.event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("load_test_started", None)
+        if started is not None and not statement.lstrip().upper().startswith(("SELECT", "PRAGMA")):
+            samples.add("db_write_stmt", (time.perf_counter() - started) * 1000.0)
+
+    @sqlalchemy.event.listens_for(engine, "handle_error")
+    def on_error(context):
+        if "locked" in str(context.original_exception) or "busy" in str(context.original_exception):
+            samples.count("db_locked_errors")
+
+    do_commit = engine.dialect.do_commit
+
+    def timed_commit(dbapi_connection):
+        started = time.perf_counter()
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            samples.add("db_commit", (time.perf_counter() - started) * 1000.0)
+
+    engine.dialect.do_commit = timed_commit
+
+
+def install_fanout_probe(samples: Samples) -> None:
+    manager = server.ws_manager
+    notify = manager._notify_guild_async
+
+    async def timed_notify(guild_id: int):
+        started = time.perf_counter()
+        try:
+            await notify(guild_id)
+        finally:
+            samples.add("delta_fanout", (time.perf_counter() - started) * 1000.0)
+
+    manager._notify_guild_async = timed_notify
+
+
+async def loop_lag_ticker(samples: Samples, stop: asyncio.Event, tick: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        samples.add("loop_lag", (time.perf_counter() - started - tick) * 1000.0)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> tuple[uvicorn.Server, threading.Thread]:
+    uv_config = uvicorn.Config(
+        server.app,
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        ws_per_message_deflate=config.WS_PER_MESSAGE_DEFLATE,
+        ws_max_size=64 * 1024 * 1024,
+    )
+    uv_server = uvicorn.Server(uv_config)
+    thread = threading.Thread(target=uv_server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 15
+    while not uv_server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return uv_server, thread
+
+
+# -- Clients -------------------------------------------------------------------------
+
+
+async def ws_client(url: str, user, args, samples: Samples, stop: asyncio.Event, rng: random.Random) -> None:
+    pending: dict[str, float] = {}
+    started = time.perf_counter()
+    try:
+        async with ws_connect(url, max_size=None, open_timeout=30) as ws:
+            await ws.send(json.dumps({"type": "auth", "access_key": user.access_key, "client_version": "9.9.9"}))
+            first = json.loads(await ws.recv())
+            if first.get("type") != "full_state":
+                samples.count("ws_auth_failed")
+                return
+            samples.add("ws_connect_full_state", (time.perf_counter() - started) * 1000.0)
+
+            async def reader():
+                async for raw in ws:
+                    msg = json.loads(raw)
+                    kind = msg.get("type")
+                    samples.count(f"ws_rx_{kind}")
+                    if kind == "login_auth_response":
+                        sent = pending.pop(msg.get("request_id"), None)
+                        if sent is not None:
+                            samples.add("ws_login_auth", (time.perf_counter() - sent) * 1000.0)
+                            if msg.get("error"):
+                                samples.count("ws_login_auth_failed")
+
+            reader_task = asyncio.create_task(reader())
+            now = time.monotonic()
+            next_heartbeat = now + rng.uniform(0, args.heartbeat_interval)
+            next_location = now + rng.uniform(0, args.location_interval)
+            next_login = now + rng.uniform(0, args.login_interval)
+            try:
+                while not stop.is_set():
+                    now = time.monotonic()
+                    character = rng.choice(user.characters)
+                    if now >= next_heartbeat:
+                        await ws.send(json.dumps({"type": "heartbeat", "character_name": character}))
+                        samples.count("ws_tx_heartbeat")
+                        next_heartbeat = now + rng.expovariate(1 / args.heartbeat_interval)
+                    if now >= next_location:
+                        zone = rng.choice(ZONES)
+                        msg = {
+                            "type": "update_location",
+                            "character_name": character,
+                            "bind_location": zone,
+                            "park_location": zone,
+                            "level": rng.randint(50, 60),
+                        }
+                        await ws.send(json.dumps(msg))
+                        samples.count("ws_tx_update_location")
+                        next_location = now + rng.expovariate(1 / args.location_interval)
+                    if now >= next_login:
+                        request_id = uuid.uuid4().hex
+                        pending[request_id] = time.perf_counter()
+                        await ws.send(
+                            json.dumps({"type": "login_auth", "request_id": request_id, "username": character})
+                        )
+                        samples.count("ws_tx_login_auth")
+                        next_login = now + rng.expovariate(1 / args.login_interval)
+                    wake = min(next_heartbeat, next_location, next_login) - time.monotonic()
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=max(0.0, wake))
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                reader_task.cancel()
+    except Exception as e:
+        samples.count("ws_errors")
+        samples.count(f"ws_error_{type(e).__name__}")
+
+
+async def auth_bursts(base_url: str, users, args, samples: Samples, rng: random.Random) -> None:
+    if args.bursts <= 0:
+        return
+    gap = args.duration / (args.bursts + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=None)) as client:
+
+        async def one():
+            user = rng.choice(users)
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/auth", json={"username": rng.choice(user.characters), "password": user.access_key}
+                )
+            except httpx.HTTPError:
+                samples.count("auth_errors")
+                return
+            samples.add("auth", (time.perf_counter() - started) * 1000.0)
+            samples.count(f"auth_{response.status_code}")
+
+        for _ in range(args.bursts):
+            await asyncio.sleep(gap)
+            await asyncio.gather(*(one() for _ in range(args.burst_size)))
+
+
+async def drive(port: int, users, args, samples: Samples) -> None:
+    rng = random.Random(args.seed)
+    stop = asyncio.Event()
+    url = f"ws://127.0.0.1:{port}/ws/accounts"
+    clients = [
+        asyncio.create_task(ws_client(url, users[i], args, samples, stop, random.Random(args.seed + i)))
+        for i in range(args.clients)
+    ]
+    bursts = asyncio.create_task(auth_bursts(f"http://127.0.0.1:{port}", users, args, samples, rng))
+    await asyncio.sleep(args.duration)
+    await bursts
+    stop.set()
+    await asyncio.gather(*clients)
+
+
+# -- Reporting -------------------------------------------------------------------------
+
+
+def summarize(samples: Samples) -> dict:
+    metrics = {}
+    for name, values in sorted(samples.values.items()):
+        metrics[name] = {
+            "count": len(values),
+            "p50": round(percentile(values, 50), 2),
+            "p95": round(percentile(values, 95), 2),
+            "p99": round(percentile(values, 99), 2),
+            "max": round(max(values), 2),
+        }
+    return {"metrics": metrics, "counters": dict(sorted(samples.counters.items()))}
+
+
+def print_report(results: dict) -> None:
+    print(f"{'metric (ms)':24} {'count':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, m in results["metrics"].items():
+        print(f"{name:24} {m['count']:8d} {m['p50']:9.2f} {m['p95']:9.2f} {m['p99']:9.2f} {m['max']:9.2f}")
+    print()
+    for name, value in results["counters"].items():
+        print(f"{name:32} {value}")
+
+
+def main() -> int:
+    args = parse_arguments()
+    if args.json_path:
+        args.json_path = os.path.abspath(args.json_path)
+    rng = random.Random(args.seed)
+    # Every burst comes from 127.0.0.1; keep the rate limiter out of the measurement.
+    config.RATE_LIMIT_MAX_ATTEMPTS = 1_000_000
+    samples = Samples()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.mkdir("data")
+        print(f"Seeding {args.accounts} accounts x {args.characters} characters, {args.clients} users...")
+        users, discord = seed(args, rng)
+        server.app.state.discord_client = discord
+        server.ws_manager.set_discord_client(discord)
+        install_db_probes(base.get_engine(), samples)
+        install_fanout_probe(samples)
+
+        port = free_port()
+        uv_server, thread = start_server(port)
+        lag_stop = asyncio.Event()
+        server_loop = server.ws_manager._loop
+        ticker = asyncio.run_coroutine_threadsafe(loop_lag_ticker(samples, lag_stop), server_loop)
+        print(
+            f"Server on 127.0.0.1:{port}; {args.clients} WebSocket clients for {args.duration:.0f}s, "
+            f"{args.bursts} /auth bursts of {args.burst_size}\n"
+        )
+        try:
+            asyncio.run(drive(port, users, args, samples))
+        finally:
+            server_loop.call_soon_threadsafe(lag_stop.set)
+            ticker.result(timeout=5)
+            uv_server.should_exit = True
+            thread.join(30)
+            base.get_engine().dispose()
+
+    results = summarize(samples)
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    auth_p99 = results["metrics"].get("auth", {}).get("p99", 0.0)
+    lag_p99 = results["metrics"].get("loop_lag", {}).get("p99", 0.0)
+    if args.max_auth_p99_ms is not None and auth_p99 > args.max_auth_p99_ms:
+        print(f"\nFAIL: /auth p99 {auth_p99:.1f} ms > {args.max_auth_p99_ms:.1f} ms")
+        failed = True
+    if args.max_loop_lag_p99_ms is not None and lag_p99 > args.max_loop_lag_p99_ms:
+        print(f"\nFAIL: loop lag p99 {lag_p99:.1f} ms > {args.max_loop_lag_p99_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -105,11 +105,19 @@ def sso_session(monkeypatch):
 
     sso_module.invalidate_access_key_cache()
     sso_module.invalidate_revocation_cache()
+    sso_module.invalidate_failed_attempts_cache()
+    sso_module.invalidate_name_index()
+    sso_module.invalidate_dynamic_tag_index()
+    sso_module.invalidate_access_index()
 
     yield session
 
     sso_module.invalidate_access_key_cache()
     sso_module.invalidate_revocation_cache()
+    sso_module.invalidate_failed_attempts_cache()
+    sso_module.invalidate_name_index()
+    sso_module.invalidate_dynamic_tag_index()
+    sso_module.invalidate_access_index()
     session.close()
     engine.dispose()
 
@@ -0,0 +1,76 @@
+"""Tests for the per-channel alert index (``roboToald.db.models.alert``) and ``find_match``."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from roboToald.db import base
+from roboToald.db.models import alert as alert_model
+from roboToald.discord_client import base as discord_base
+
+CHANNEL = 555
+
+
+@pytest.fixture()
+def alerts(sso_session):
+    alert_model.invalidate_alert_index()
+    yield sso_session
+    alert_model.invalidate_alert_index()
+
+
+def _add(session, **kw):
+    fields = dict(channel_id=CHANNEL, user_id=1, alert_regex=None, alert_url="https://x/1", guild_id=9, alert_role=None)
+    fields.update(kw)
+    alert = alert_model.Alert(**fields)
+    session.add(alert)
+    session.commit()
+    return alert.id
+
+
+def test_index_is_loaded_once_until_invalidated(alerts, monkeypatch):
+    _add(alerts, alert_regex=".*dragon.*")
+    calls = []
+    real_get_session = base.get_session
+    monkeypatch.setattr(base, "get_session", lambda: calls.append(1) or real_get_session())
+
+    rules = alert_model.get_alert_rules_for_channel(CHANNEL)
+    assert [r.pattern.match("A DRAGON spawned") is not None for r in rules] == [True]
+    assert alert_model.get_alert_rules_for_channel(12345) == []
+    assert alert_model.get_registered_channels() == {CHANNEL}
+    assert len(calls) == 1
+
+    _add(alerts, channel_id=777, alert_url="https://x/2")
+    assert alert_model.get_registered_channels() == {CHANNEL}
+    alert_model.invalidate_alert_index()
+    assert alert_model.get_registered_channels() == {CHANNEL, 777}
+
+
+def test_invalid_regex_is_skipped(alerts):
+    _add(alerts, alert_regex="([unclosed")
+    _add(alerts, alert_regex="ok", alert_url="https://x/2")
+    assert [r.alert_url for r in alert_model.get_alert_rules_for_channel(CHANNEL)] == ["https://x/2"]
+
+
+def test_find_match_sends_matching_alerts_once_per_url(alerts, monkeypatch):
+    role_alert = _add(alerts, alert_role=42, alert_url="https://x/role")
+    regex_alert = _add(alerts, alert_regex="^vox", alert_url="https://x/shared")
+    _add(alerts, alert_regex="vox", user_id=2, alert_url="https://x/shared")
+    _add(alerts, alert_regex="^naggy", alert_url="https://x/other")
+    sent = []
+    monkeypatch.setattr(discord_base.utils, "send_alert", lambda alert, *a, **kw: sent.append(alert.id))
+    monkeypatch.setattr(discord_base, "is_user_authorized", lambda *a: True)
+    monkeypatch.setattr(discord_base, "resolve_alert_owner_display_name", lambda *a: None)
+    monkeypatch.setattr(discord_base, "resolve_guild_display_name", lambda *a: None)
+    monkeypatch.setattr(discord_base.config, "get_member_role", lambda gid: 0)
+
+    message = SimpleNamespace(
+        clean_content="Vox is up",
+        role_mentions=[SimpleNamespace(id=42)],
+        mention_everyone=False,
+        guild=MagicMock(),
+    )
+    discord_base.find_match(CHANNEL, message)
+    assert sent == [role_alert, regex_alert]
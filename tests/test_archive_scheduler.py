@@ -0,0 +1,144 @@
+"""Tests for streaming audit/session archival (``sso.archive_old_records``, ``api.archive_scheduler``)."""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import datetime
+import gzip
+import threading
+
+import pytest
+import sqlalchemy
+
+from roboToald import config
+from roboToald.api.archive_scheduler import ArchiveScheduler
+from roboToald.db import base
+from roboToald.db.models import sso
+
+
+@pytest.fixture()
+def old_rows(sso_session):
+    now = datetime.datetime.now()
+    old = now - datetime.timedelta(days=200)
+    sso_session.execute(
+        sqlalchemy.insert(sso.SSOAuditLog),
+        [{"timestamp": old if i % 4 else now, "username": f"u{i}", "success": i % 2 == 0} for i in range(10)],
+    )
+    sso_session.execute(
+        sqlalchemy.insert(sso.SSOCharacterSession),
+        [
+            {
+                "guild_id": 1,
+                "account_id": 1,
+                "character_name": f"Char{i}",
+                "discord_user_id": 5,
+                "first_seen": old,
+                "last_seen": now if i == 0 else old,
+            }
+            for i in range(3)
+        ],
+    )
+    sso_session.commit()
+    return sso_session
+
+
+def _read(path) -> list[dict]:
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_archive_streams_chunks_to_gzip_and_deletes(old_rows, tmp_path):
+    audit_count, session_count = sso.archive_old_records(retention_days=90, archive_dir=str(tmp_path), chunk_size=3)
+    assert (audit_count, session_count) == (7, 2)
+
+    [audit_path] = tmp_path.glob("audit_log_*.csv.gz")
+    archived = _read(audit_path)
+    assert [r["username"] for r in archived] == ["u1", "u2", "u3", "u5", "u6", "u7", "u9"]
+    assert "client_version" in archived[0]
+    [session_path] = tmp_path.glob("character_session_*.csv.gz")
+    assert [r["character_name"] for r in _read(session_path)] == ["Char1", "Char2"]
+
+    remaining = old_rows.query(sso.SSOAuditLog.username).order_by(sso.SSOAuditLog.id).all()
+    assert [r.username for r in remaining] == ["u0", "u4", "u8"]
+    assert [s.character_name for s in old_rows.query(sso.SSOCharacterSession).all()] == ["Char0"]
+
+
+def test_archive_without_expired_rows_writes_no_files(sso_session, tmp_path):
+    assert sso.archive_old_records(retention_days=90, archive_dir=str(tmp_path)) == (0, 0)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stop_event_ends_run_between_chunks(old_rows, tmp_path, monkeypatch):
+    stop = threading.Event()
+    get_session = base.get_session
+
+    @contextlib.contextmanager
+    def stop_after_first_chunk(*args, **kwargs):
+        with get_session(*args, **kwargs) as session:
+            yield session
+        stop.set()
+
+    monkeypatch.setattr(base, "get_session", stop_after_first_chunk)
+    assert sso.archive_old_records(retention_days=90, archive_dir=str(tmp_path), chunk_size=3, stop=stop) == (3, 0)
+    [audit_path] = tmp_path.glob("audit_log_*.csv.gz")
+    assert [r["username"] for r in _read(audit_path)] == ["u1", "u2", "u3"]
+    assert old_rows.query(sso.SSOAuditLog).count() == 7
+
+
+def test_scheduler_run_once_records_throughput(old_rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "AUDIT_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "AUDIT_RETENTION_DAYS", 90)
+    scheduler = ArchiveScheduler(interval_hours=0, chunk_size=4)
+    assert scheduler.run_once() == (7, 2)
+    stats = scheduler.stats()
+    assert stats["runs"] == 1
+    assert (stats["audit_archived"], stats["sessions_archived"], stats["last_rows"]) == (7, 2, 9)
+    assert stats["last_run"] is not None
+
+    assert scheduler.run_once() == (0, 0)
+    assert scheduler.stats()["audit_archived"] == 7
+
+
+async def test_scheduler_runs_on_default_executor_and_stops(monkeypatch):
+    calls = []
+
+    def fake_archive(**kwargs):
+        calls.append((threading.current_thread(), kwargs))
+        return 3, 1
+
+    monkeypatch.setattr(sso, "archive_old_records", fake_archive)
+    scheduler = ArchiveScheduler(interval_hours=0, chunk_size=50, startup_delay=0)
+    scheduler.start()
+    await scheduler._task
+    [(thread, kwargs)] = calls
+    assert thread is not threading.main_thread()
+    assert kwargs["chunk_size"] == 50
+    assert scheduler.stats()["sessions_archived"] == 1
+
+    await scheduler.stop()
+    assert kwargs["stop"].is_set()
+
+
+def test_halt_waits_for_running_pass_from_another_thread(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_archive(**kwargs):
+        started.set()
+        release.wait(5)
+        return 1, 0
+
+    monkeypatch.setattr(sso, "archive_old_records", slow_archive)
+    scheduler = ArchiveScheduler(interval_hours=0)
+    running = threading.Thread(target=scheduler.run_once)
+    running.start()
+    started.wait(5)
+
+    assert scheduler.halt(timeout=0.01) is False
+    release.set()
+    assert scheduler.halt(timeout=5) is True
+    running.join()
+    assert scheduler.stats()["audit_archived"] == 1
+    # Later passes (e.g. from a scheduling task outliving the exit path) don't start.
+    assert scheduler.run_once() == (0, 0)
+    assert scheduler.stats()["runs"] == 1
@@ -0,0 +1,170 @@
+"""Tests for the batched SSO audit log writer (``roboToald.api.audit_writer``)."""
+
+from __future__ import annotations
+
+import pytest
+
+from roboToald.api.audit_writer import MAX_FLUSH_ATTEMPTS, AuditLogWriter
+from roboToald.db.models import sso
+
+IP = "203.0.113.50"
+
+
+@pytest.fixture()
+def audit_writer(sso_session):
+    writer = AuditLogWriter(max_queue=3, flush_interval_ms=60_000)
+    sso.set_audit_sink(writer.submit)
+    yield writer
+    sso.set_audit_sink(None)
+
+
+def _rows(session) -> list[sso.SSOAuditLog]:
+    return session.query(sso.SSOAuditLog).order_by(sso.SSOAuditLog.id).all()
+
+
+def test_create_audit_log_queues_until_flush(audit_writer, sso_session):
+    entry = sso.create_audit_log("u1", ip_address=IP, success=False, details="Invalid access key")
+    sso.create_audit_log("u2", ip_address=IP, success=True, guild_id=7, client_version="1.2.3")
+    assert entry.id is None
+    assert _rows(sso_session) == []
+    assert audit_writer.queue_depth() == 2
+
+    assert audit_writer.flush() == 2
+    rows = _rows(sso_session)
+    assert [(r.username, r.success, r.details) for r in rows] == [
+        ("u1", False, "Invalid access key"),
+        ("u2", True, None),
+    ]
+    assert rows[1].client_version == "1.2.3"
+    assert rows[0].timestamp == entry.timestamp
+    assert audit_writer.stats()["written"] == 2
+
+
+def test_failed_attempts_count_before_flush(audit_writer, sso_session):
+    for _ in range(3):
+        sso.create_audit_log("u", ip_address=IP, success=False)
+    assert _rows(sso_session) == []
+    assert sso.is_ip_rate_limited(IP, max_attempts=3, minutes=30) is True
+
+    audit_writer.flush()
+    # Reseeding from the audit log agrees with the in-memory window.
+    sso.invalidate_failed_attempts_cache()
+    assert sso.count_failed_attempts(IP, minutes=30) == 3
+
+
+def test_clear_rate_limit_covers_queued_attempts(audit_writer, sso_session):
+    for _ in range(3):
+        sso.create_audit_log("u", ip_address=IP, success=False)
+    assert sso.clear_rate_limit(IP) == 0  # nothing persisted yet
+    sso.create_audit_log("later", ip_address=IP, success=False)  # queue full: written inline
+
+    audit_writer.flush()
+    assert sorted((r.username, r.rate_limit) for r in _rows(sso_session)) == [
+        ("later", True),
+        ("u", False),
+        ("u", False),
+        ("u", False),
+    ]
+    # A restart reseeds the window from the audit log: only the attempt after the clear counts.
+    sso.invalidate_failed_attempts_cache()
+    assert sso.count_failed_attempts(IP, minutes=30) == 1
+
+
+def test_full_queue_writes_inline(audit_writer, sso_session):
+    for i in range(4):
+        sso.create_audit_log(f"u{i}", ip_address=IP, success=False)
+    # The fourth row didn't fit and was written by the caller.
+    assert [r.username for r in _rows(sso_session)] == ["u3"]
+    assert audit_writer.stats()["overflowed"] == 1
+    assert sso.count_failed_attempts(IP, minutes=30) == 4
+
+    audit_writer.flush()
+    assert sorted(r.username for r in _rows(sso_session)) == ["u0", "u1", "u2", "u3"]
+
+
+def test_failed_flush_is_retried(audit_writer, sso_session, monkeypatch):
+    sso.create_audit_log("u1", ip_address=IP)
+    sso.create_audit_log("u2", ip_address=IP)
+    insert = sso.insert_audit_logs
+    calls = []
+
+    def locked_once(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return insert(rows)
+
+    monkeypatch.setattr("roboToald.api.audit_writer.sso_model.insert_audit_logs", locked_once)
+    assert audit_writer.flush() == 0
+    stats = audit_writer.stats()
+    assert (stats["errors"], stats["dropped"], stats["retrying"], stats["queue_depth"]) == (1, 0, 2, 0)
+
+    sso.create_audit_log("u3", ip_address=IP)
+    assert audit_writer.flush() == 3
+    assert calls == [2, 2, 1]
+    assert [r.username for r in _rows(sso_session)] == ["u1", "u2", "u3"]
+    assert audit_writer.stats()["retrying"] == 0
+
+
+def test_batch_failing_every_attempt_is_written_row_by_row(audit_writer, sso_session, monkeypatch):
+    for name in ("good", "bad", "fine"):
+        sso.create_audit_log(name, ip_address=IP)
+    insert = sso.insert_audit_logs
+
+    def reject_batches_and_bad_row(rows):
+        if len(rows) > 1 or rows[0]["username"] == "bad":
+            raise RuntimeError("constraint failed")
+        return insert(rows)
+
+    monkeypatch.setattr("roboToald.api.audit_writer.sso_model.insert_audit_logs", reject_batches_and_bad_row)
+    for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+        assert audit_writer.flush() == 0
+    assert audit_writer.pending() == 3
+
+    assert audit_writer.flush() == 2
+    assert [r.username for r in _rows(sso_session)] == ["good", "fine"]
+    stats = audit_writer.stats()
+    assert (stats["errors"], stats["dropped"], stats["retrying"]) == (MAX_FLUSH_ATTEMPTS, 1, 0)
+
+
+def test_stop_writes_held_batch(audit_writer, sso_session, monkeypatch):
+    sso.create_audit_log("u1", ip_address=IP)
+    insert = sso.insert_audit_logs
+    calls = []
+
+    def locked_once(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return insert(rows)
+
+    monkeypatch.setattr("roboToald.api.audit_writer.sso_model.insert_audit_logs", locked_once)
+    assert audit_writer.flush() == 0
+    audit_writer.stop()
+    assert [r.username for r in _rows(sso_session)] == ["u1"]
+    assert audit_writer.pending() == 0
+
+
+def test_stop_gives_up_on_a_batch_that_never_writes(audit_writer, monkeypatch):
+    sso.create_audit_log("u1", ip_address=IP)
+
+    def boom(rows):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr("roboToald.api.audit_writer.sso_model.insert_audit_logs", boom)
+    audit_writer.stop()
+    stats = audit_writer.stats()
+    assert (stats["dropped"], stats["retrying"], stats["queue_depth"]) == (1, 0, 0)
+
+
+def test_start_stop_installs_sink_and_drains(sso_session):
+    writer = AuditLogWriter(flush_interval_ms=60_000)
+    writer.start()
+    assert sso._audit_sink == writer.submit
+    writer.stop()
+    assert sso._audit_sink is None
+
+    # Rows still queued when the sink is removed are written by stop().
+    writer.submit(sso._audit_log_row(sso.SSOAuditLog("late", ip_address=IP, success=True)))
+    writer.stop()
+    assert [r.username for r in _rows(sso_session)] == ["late"]
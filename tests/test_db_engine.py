@@ -0,0 +1,78 @@
+"""Tests for the SQLite engine factory in ``roboToald.db.base``."""
+
+from __future__ import annotations
+
+import threading
+
+import sqlalchemy
+
+from roboToald import config
+from roboToald.db import base, raid_base
+
+
+def _pragma(conn, name):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_create_sqlite_engine_applies_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_BUSY_TIMEOUT_MS", 1234)
+    monkeypatch.setattr(config, "DB_CACHE_SIZE", -4000)
+    engine = base.create_sqlite_engine(str(tmp_path / "tuned.db"))
+    try:
+        with engine.connect() as conn:
+            assert _pragma(conn, "journal_mode") == "wal"
+            assert _pragma(conn, "busy_timeout") == 1234
+            assert _pragma(conn, "synchronous") == 1  # NORMAL
+            assert _pragma(conn, "cache_size") == -4000
+        assert isinstance(engine.pool, sqlalchemy.pool.QueuePool)
+        assert engine.pool.size() == config.DB_POOL_SIZE
+    finally:
+        engine.dispose()
+
+
+def test_create_tables_enables_incremental_vacuum_on_new_database(tmp_path):
+    metadata = sqlalchemy.MetaData()
+    sqlalchemy.Table("t", metadata, sqlalchemy.Column("x", sqlalchemy.Integer))
+    engine = base.create_sqlite_engine(str(tmp_path / "new.db"))
+    try:
+        base.create_tables(metadata, engine)
+        with engine.connect() as conn:
+            assert _pragma(conn, "auto_vacuum") == 2  # INCREMENTAL
+            assert _pragma(conn, "journal_mode") == "wal"
+    finally:
+        engine.dispose()
+
+
+def test_raid_engine_uses_tuned_factory(tmp_path, monkeypatch):
+    monkeypatch.setattr(raid_base, "_db_path", lambda gid: str(tmp_path / f"raids_{gid}.db"))
+    monkeypatch.setattr(raid_base, "_engines", {})
+    engine = raid_base.get_raid_engine(99)
+    try:
+        with engine.connect() as conn:
+            assert _pragma(conn, "journal_mode") == "wal"
+    finally:
+        engine.dispose()
+
+
+def test_wal_reader_not_blocked_by_open_write(tmp_path):
+    engine = base.create_sqlite_engine(str(tmp_path / "wal.db"))
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+            conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+        result = []
+        with engine.connect() as writer:
+            writer.exec_driver_sql("BEGIN IMMEDIATE")
+            writer.exec_driver_sql("INSERT INTO t VALUES (2)")
+
+            def read():
+                with engine.connect() as reader:
+                    result.append(reader.exec_driver_sql("SELECT count(*) FROM t").scalar())
+
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join(5)
+            writer.rollback()
+        assert result == [1]
+    finally:
+        engine.dispose()
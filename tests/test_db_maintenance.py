@@ -0,0 +1,98 @@
+"""Tests for background SQLite maintenance (``roboToald.db.maintenance``)."""
+
+from __future__ import annotations
+
+import datetime
+import zoneinfo
+
+import pytest
+import sqlalchemy
+
+from roboToald.db import base, maintenance
+
+ET = zoneinfo.ZoneInfo("America/New_York")
+
+_metadata = sqlalchemy.MetaData()
+sqlalchemy.Table(
+    "t",
+    _metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("body", sqlalchemy.LargeBinary),
+)
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    eng = base.create_sqlite_engine(str(tmp_path / "m.db"))
+    base.create_tables(_metadata, eng)
+    with eng.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO t (body) VALUES (zeroblob(2000))")
+        for _ in range(8):
+            conn.exec_driver_sql("INSERT INTO t (body) SELECT body FROM t")
+        conn.exec_driver_sql("DELETE FROM t")
+    yield eng
+    eng.dispose()
+
+
+def test_parse_windows_and_wraparound():
+    windows = maintenance.parse_windows("05:00-11:00, 23:30-01:00")
+    assert windows == [
+        (datetime.time(5, 0), datetime.time(11, 0)),
+        (datetime.time(23, 30), datetime.time(1, 0)),
+    ]
+    assert maintenance.in_window(datetime.time(5, 0), windows)
+    assert not maintenance.in_window(datetime.time(11, 0), windows)
+    assert not maintenance.in_window(datetime.time(20, 0), windows)
+    assert maintenance.in_window(datetime.time(0, 15), windows)
+    with pytest.raises(ValueError, match="HH:MM-HH:MM"):
+        maintenance.parse_windows("5am-11am")
+
+
+def test_maintain_engine_analyzes_vacuums_and_checkpoints(engine, tmp_path):
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == maintenance.AUTO_VACUUM_INCREMENTAL
+        free_before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    assert free_before > 100
+
+    first = maintenance.maintain_engine(engine)
+    assert first.database == "m.db"
+    assert first.analyzed is True
+    # ANALYZE reuses a free page for sqlite_stat1; the vacuum releases the rest.
+    assert (first.pages_reclaimed, first.free_pages) == (free_before - 1, 0)
+    assert not first.checkpoint_busy
+    assert (tmp_path / "m.db-wal").stat().st_size == 0
+
+    second = maintenance.maintain_engine(engine)
+    assert second.analyzed is False
+    assert second.pages_reclaimed == 0
+
+
+def test_vacuum_pages_caps_pages_per_pass(engine):
+    result = maintenance.maintain_engine(engine, vacuum_pages=10)
+    assert result.pages_reclaimed == 10
+    assert result.free_pages > 0
+
+
+def test_scheduler_only_due_inside_window_once_per_interval(monkeypatch, engine):
+    monkeypatch.setattr(maintenance, "engines", lambda: [engine])
+    scheduler = maintenance.MaintenanceScheduler(windows="05:00-11:00", interval_hours=24, vacuum_pages=0, zone=ET)
+    prime_time = datetime.datetime(2026, 10, 17, 20, 30, tzinfo=ET)
+    morning = datetime.datetime(2026, 10, 17, 6, 0, tzinfo=ET)
+    assert not scheduler.due(prime_time)
+    assert scheduler.due(morning)
+
+    [result] = scheduler.run_once()
+    assert not scheduler.due(morning)
+    stats = scheduler.stats()
+    assert stats["runs"] == 1
+    assert stats["pages_reclaimed"] == {"m.db": result.pages_reclaimed}
+    assert stats["last_pages_reclaimed"] == result.pages_reclaimed > 0
+
+
+def test_scheduler_skips_failing_database(monkeypatch, engine, tmp_path):
+    broken = base.create_sqlite_engine(str(tmp_path / "missing" / "x.db"))
+    monkeypatch.setattr(maintenance, "engines", lambda: [broken, engine])
+    scheduler = maintenance.MaintenanceScheduler(windows="00:00-23:59", interval_hours=24, vacuum_pages=0, zone=ET)
+    results = scheduler.run_once()
+    assert [r.database for r in results] == ["m.db"]
+    assert scheduler.stats()["errors"] == 1
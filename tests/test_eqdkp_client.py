@@ -2,12 +2,23 @@
 
 from __future__ import annotations
 
+import asyncio
+
+import httpx
 import pytest
 
 from roboToald import config
+from roboToald.eqdkp import client as eqdkp_client
 from roboToald.eqdkp.client import EqdkpApiError, EqdkpClient, _raise_if_eqdkp_error, _values_with_prefix
 
 
+@pytest.fixture(autouse=True)
+def _empty_lookup_cache():
+    eqdkp_client.lookup_cache.clear()
+    yield
+    eqdkp_client.lookup_cache.clear()
+
+
 def test_raise_if_eqdkp_error():
     with pytest.raises(EqdkpApiError, match="unknown EQdkp error"):
         _raise_if_eqdkp_error({"status": 0})
@@ -147,3 +158,241 @@ async def test_create_event_returns_id(monkeypatch):
 
     monkeypatch.setattr(client, "_post", fake_post)
     assert await client.create_event("Raid Night", 10) == 999
+
+
+URL = "http://pool.test"
+
+
+@pytest.fixture()
+def pooled(monkeypatch):
+    """EqdkpClient whose pool sends requests to *handler* via ``httpx.MockTransport``."""
+    monkeypatch.setitem(config.EQDKP_SETTINGS, 1, {"url": URL, "host": "pool.test", "api_key": "token"})
+    monkeypatch.setattr(config, "EQDKP_RETRY_BACKOFF_MS", 0)
+    monkeypatch.setattr(config, "EQDKP_MAX_CONNECTIONS", 2)
+
+    def install(handler):
+        pool = eqdkp_client._Pool(transport=httpx.MockTransport(handler))
+        eqdkp_client._pools[(URL, asyncio.get_running_loop())] = pool
+        return EqdkpClient(1), pool
+
+    yield install
+    eqdkp_client._pools.clear()
+
+
+async def test_clients_share_one_pool_per_base_url(pooled):
+    client, pool = pooled(lambda request: httpx.Response(200, json={"direct": {}}))
+    await client.find_character("A")
+    await EqdkpClient(1).find_character("B")
+    assert eqdkp_client._pool(URL) is pool
+    assert pool.requests == 2
+
+    await eqdkp_client.close_pools()
+    assert pool.client.is_closed
+    assert eqdkp_client._pools == {}
+
+
+async def test_get_retries_5xx_and_timeouts(pooled):
+    responses = iter([httpx.Response(503), httpx.ReadTimeout("slow"), httpx.Response(200, json={"direct": {}})])
+
+    def handler(request):
+        result = next(responses)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    client, pool = pooled(handler)
+    assert await client.find_character("A") is None
+    assert (pool.requests, pool.retries) == (3, 2)
+
+
+async def test_get_gives_up_after_max_retries(pooled, monkeypatch):
+    monkeypatch.setattr(config, "EQDKP_MAX_RETRIES", 1)
+    client, pool = pooled(lambda request: httpx.Response(500))
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.find_character("A")
+    assert pool.requests == 2
+
+
+async def test_post_only_retries_when_not_applied(pooled):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["function"])
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")
+        if len(calls) == 2:
+            return httpx.Response(503)
+        if len(calls) == 3:
+            return httpx.Response(200, json={"event_id": 7})
+        return httpx.Response(500 if len(calls) == 4 else 502)
+
+    client, pool = pooled(handler)
+    assert await client.create_event("Raid", 1) == 7
+    # A 500 or 502 may have created the event already, so neither is retried.
+    for status in (500, 502):
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await client.create_event("Raid", 1)
+        assert exc_info.value.response.status_code == status
+    assert calls == ["add_event"] * 5
+
+
+async def test_in_flight_requests_are_bounded(pooled):
+    in_flight = peak = 0
+
+    class SlowTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={"direct": {}})
+
+    pool = eqdkp_client._Pool(transport=SlowTransport())
+    eqdkp_client._pools[(URL, asyncio.get_running_loop())] = pool
+    client = EqdkpClient(1)
+    await asyncio.gather(*(client.find_character(f"C{i}") for i in range(6)))
+    assert peak == 2
+    assert pool.requests == 6
+
+
+def _search_handler(calls, members):
+    def handler(request):
+        params = request.url.params
+        calls.append((params["function"], params.get("for")))
+        if params["function"] == "character":
+            members[request.read().decode()] = True
+            return httpx.Response(200, json={"status": 1})
+        name = params.get("for")
+        direct = {"member:1": {"id": 1, "user_id": "3", "name": name}} if any(name in m for m in members) else {}
+        return httpx.Response(200, json={"direct": direct})
+
+    return handler
+
+
+async def test_lookups_are_cached_with_negative_entries(pooled, monkeypatch):
+    calls = []
+    client, pool = pooled(_search_handler(calls, {}))
+    assert await client.find_character("Ghost") is None
+    assert await client.find_character("Ghost") is None
+    assert calls == [("search", "Ghost")]
+    stats = eqdkp_client.lookup_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    monkeypatch.setattr(config, "EQDKP_CACHE_MISS_TTL_SEC", 0)
+    eqdkp_client.lookup_cache.clear()
+    await client.find_character("Ghost")
+    await client.find_character("Ghost")
+    assert len(calls) == 3
+
+
+async def test_concurrent_identical_lookups_share_one_request(pooled):
+    calls = []
+    handler = _search_handler(calls, {"Bob": True})
+
+    async def slow_handler(request):
+        await asyncio.sleep(0.01)
+        return handler(request)
+
+    client, pool = pooled(slow_handler)
+    results = await asyncio.gather(*(client.find_character("Bob") for _ in range(5)))
+    assert all(r["name"] == "Bob" for r in results)
+    assert calls == [("search", "Bob")]
+    assert eqdkp_client.lookup_cache.stats()["coalesced"] == 4
+
+
+async def test_cancelled_lookup_does_not_cancel_coalesced_waiters(pooled):
+    calls = []
+    handler = _search_handler(calls, {"Bob": True})
+    started = asyncio.Event()
+
+    async def slow_handler(request):
+        started.set()
+        await asyncio.sleep(0.01)
+        return handler(request)
+
+    client, pool = pooled(slow_handler)
+    leader = asyncio.create_task(client.find_character("Bob"))
+    await started.wait()
+    waiter = asyncio.create_task(client.find_character("Bob"))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert (await waiter)["name"] == "Bob"
+    assert leader.cancelled()
+    assert eqdkp_client.lookup_cache.stats()["coalesced"] == 1
+
+
+async def test_create_member_invalidates_negative_entry(pooled, monkeypatch):
+    calls = []
+    client, pool = pooled(_search_handler(calls, {}))
+    assert await client.find_character("Newbie") is None
+    await client.create_character("Newbie")
+    assert (await client.find_character("Newbie"))["name"] == "Newbie"
+    assert calls == [("search", "Newbie"), ("character", None), ("search", "Newbie")]
+
+
+async def test_invalidate_during_lookup_keeps_stale_result_out_of_cache(pooled):
+    calls = []
+    handler = _search_handler(calls, {})
+    started = asyncio.Event()
+
+    async def slow_handler(request):
+        started.set()
+        await asyncio.sleep(0.01)
+        return handler(request)
+
+    client, pool = pooled(slow_handler)
+    lookup = asyncio.create_task(client.find_character("Newbie"))
+    await started.wait()
+    client.invalidate_cache("character", "Newbie")
+    fresh = asyncio.create_task(client.find_character("Newbie"))
+    assert await lookup is None
+    assert await fresh is None
+    assert calls == [("search", "Newbie"), ("search", "Newbie")]
+    assert eqdkp_client.lookup_cache.stats()["coalesced"] == 0
+    # Only the load that started after the invalidation was cached.
+    assert await client.find_character("Newbie") is None
+    assert len(calls) == 2
+
+    started.clear()
+    lookup = asyncio.create_task(client.find_character("Other"))
+    await started.wait()
+    eqdkp_client.lookup_cache.clear()
+    await lookup
+    assert eqdkp_client.lookup_cache.stats()["entries"] == 0
+
+
+async def test_adjustment_invalidates_cached_points(pooled):
+    balance = iter(["10", "15"])
+
+    def handler(request):
+        function = request.url.params["function"]
+        if function == "add_adjustment":
+            return httpx.Response(200, json={"status": 1, "adjustment_id": [4]})
+        points = {"multidkp_points:1": {"points_current_with_twink": next(balance)}}
+        return httpx.Response(200, json={"players": {"player:3": {"points": points}}})
+
+    client, pool = pooled(handler)
+    assert await client.find_points(3) == "10"
+    assert await client.find_points(3) == "10"
+    await client.add_adjustment(member_id=1, value=5, reason="Bonus")
+    assert await client.find_points(3) == "15"
+
+
+async def test_prefetch_warms_cache_and_errors_are_not_cached(pooled):
+    calls = []
+    handler = _search_handler(calls, {"Aa": True, "Bb": True})
+
+    def flaky(request):
+        if request.url.params.get("for") == "Cc" and calls.count(("search", "Cc")) == 0:
+            calls.append(("search", "Cc"))
+            return httpx.Response(400)
+        return handler(request)
+
+    client, pool = pooled(flaky)
+    await client.prefetch_characters(["Aa", "Bb", "Aa", "Cc"])
+    assert sorted(calls) == [("search", "Aa"), ("search", "Bb"), ("search", "Cc")]
+    assert (await client.find_character("Aa"))["name"] == "Aa"
+    assert await client.find_character("Cc") is None  # the failed lookup is retried, not cached
+    assert calls.count(("search", "Cc")) == 2
@@ -0,0 +1,91 @@
+"""``EqdkpClient`` against the in-process fake EQdkp server (``roboToald.eqdkp.fake_server``)."""
+
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from roboToald import config
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.eqdkp.client import EqdkpApiError, EqdkpClient
+from roboToald.eqdkp.fake_server import CONNECT_ERROR, FakeEqdkp
+
+URL = "http://fake.test"
+GUILD_ID = 1
+
+
+@pytest.fixture()
+def eqdkp(monkeypatch):
+    monkeypatch.setitem(config.EQDKP_SETTINGS, GUILD_ID, {"url": URL, "host": "fake.test", "api_key": "token"})
+    monkeypatch.setattr(config, "EQDKP_MAX_RETRIES", 2)
+    monkeypatch.setattr(config, "EQDKP_RETRY_BACKOFF_MS", 0)
+    eqdkp_client.lookup_cache.clear()
+    yield EqdkpClient(GUILD_ID)
+    eqdkp_client._pools.clear()
+    eqdkp_client.lookup_cache.clear()
+
+
+async def test_members_lookups_and_points(eqdkp):
+    server = FakeEqdkp()
+    server.install(URL)
+    main = server.add_member("Main", discord_id=555)
+    server.add_member("Alt", user_id=main.user_id, discord_id=555)
+
+    assert (await eqdkp.find_character("main"))["id"] == main.id
+    assert [m["name"] for m in await eqdkp.find_characters_by_discord_id(555)] == ["Alt", "Main"]
+    created = await eqdkp.resolve_member("Newbie")
+    assert created["name"] == "Newbie" and created["user_id"] != str(main.user_id)
+
+    event_id = await eqdkp.create_event("Vulak", 10)
+    raid_id = await eqdkp.create_raid(event_id, 10, "note", [main.id])
+    await eqdkp.add_item("Sword", 4, main.id, raid_id)
+    await eqdkp.add_adjustment(server.members["alt"].id, 3, "RTE Vulak", raid_id=raid_id)
+
+    assert await eqdkp.find_points(main.user_id) == "9"
+    assert server.calls["search"] == 4  # Newbie: find, create, find again
+    assert server.statuses == {200: server.requests}
+
+
+async def test_writes_against_unknown_records_fail_like_eqdkp(eqdkp):
+    FakeEqdkp().install(URL)
+    with pytest.raises(EqdkpApiError, match="required data missing"):
+        await eqdkp.create_raid(12345, 10, "note", [1])
+
+
+async def test_rate_limited_requests_are_retried(eqdkp):
+    server = FakeEqdkp(rate_limit=0.001, burst=2)
+    pool = server.install(URL)
+    server.add_member("Main")
+
+    assert await eqdkp.find_character("Main")
+    assert await eqdkp.find_character("Other") is None
+    with pytest.raises(httpx.HTTPStatusError) as exc_info:
+        await eqdkp.find_character("Third")
+    assert exc_info.value.response.status_code == 503
+    assert server.rate_limited == pool.retries + 1 == 3
+
+
+async def test_injected_failures(eqdkp):
+    server = FakeEqdkp()
+    pool = server.install(URL)
+
+    server.inject("add_event", 503, CONNECT_ERROR)
+    assert await eqdkp.create_event("Vulak", 10)
+    assert (pool.retries, len(server.events)) == (2, 1)
+
+    server.inject("add_event", 500)
+    with pytest.raises(httpx.HTTPStatusError):
+        await eqdkp.create_event("Vulak", 10)
+    server.inject("add_event", 0)
+    with pytest.raises(EqdkpApiError, match="injected"):
+        await eqdkp.create_event("Vulak", 10)
+    assert pool.retries == 2 and len(server.events) == 1
+
+
+async def test_error_rate_and_latency(eqdkp):
+    server = FakeEqdkp(latency=0.001, error_rate=1.0, error_status=502, seed=1)
+    server.install(URL)
+    with pytest.raises(httpx.HTTPStatusError):
+        await eqdkp.find_character("Main")
+    assert server.statuses == {502: 3}
+    assert server.peak_in_flight == 1
@@ -0,0 +1,260 @@
+"""Tests for the EQdkp outbox worker (``roboToald.raid.eqdkp_outbox``)."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+
+from roboToald import config
+from roboToald.db import raid_base
+from roboToald.db.base import create_sqlite_engine
+from roboToald.db.raid_base import RaidBase, get_raid_session
+from roboToald.db.raid_models.character import Character
+from roboToald.db.raid_models.outbox import (
+    OUTBOX_DONE,
+    OUTBOX_FAILED,
+    OUTBOX_PENDING,
+    OUTBOX_SENDING,
+    OUTBOX_SKIPPED,
+    EqdkpOutbox,
+)
+from roboToald.db.raid_models.raid import EqdkpEvent, Event
+from roboToald.db.raid_models.tracking import Tracking
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.raid import eqdkp_outbox as outbox
+
+URL = "http://outbox.test"
+GUILD_ID = 1
+
+
+@pytest.fixture()
+def eqdkp(tmp_path, monkeypatch):
+    """A file-backed raid DB with one character already linked to EQdkp; returns a function installing a handler."""
+    engine = create_sqlite_engine(str(tmp_path / "raids_1.db"))
+    RaidBase.metadata.create_all(engine)
+    monkeypatch.setattr(raid_base, "_engines", {GUILD_ID: engine})
+    monkeypatch.setitem(config.EQDKP_SETTINGS, GUILD_ID, {"url": URL, "host": "outbox.test", "api_key": "token"})
+    monkeypatch.setattr(config, "EQDKP_MAX_RETRIES", 0)
+    with get_raid_session(GUILD_ID) as session:
+        session.add(Character(id=1, name="Tracker", eqdkp_member_id=11, eqdkp_user_id=21))
+        session.commit()
+
+    def install(handler):
+        pool = eqdkp_client._Pool(transport=httpx.MockTransport(handler))
+        eqdkp_client._pools[(URL, asyncio.get_running_loop())] = pool
+
+    yield install
+    eqdkp_client._pools.clear()
+    engine.dispose()
+
+
+def _adjustment(tracking_ids=(1,)) -> list[outbox.Op]:
+    payload = {"character_id": 1, "value": 7, "reason": "RTE Vulak", "tracking_ids": list(tracking_ids)}
+    return [outbox.Op("adjustment", 1, "adjustment", "RTE Tracker", payload)]
+
+
+def _rows() -> list[EqdkpOutbox]:
+    with get_raid_session(GUILD_ID) as session:
+        rows = session.query(EqdkpOutbox).order_by(EqdkpOutbox.id).all()
+        session.expunge_all()
+        return rows
+
+
+def test_enqueue_ignores_known_idempotency_keys(eqdkp):
+    with get_raid_session(GUILD_ID) as session:
+        assert outbox.enqueue(session, "rte:1:1", _adjustment()) == 1
+        assert outbox.enqueue(session, "rte:1:1", _adjustment()) == 0
+        assert outbox.enqueue(session, "rte:1:2", _adjustment()) == 1
+        session.commit()
+        assert outbox.queued_tracking_ids(session) == {1}
+    assert [r.idempotency_key for r in _rows()] == ["rte:1:1:adjustment", "rte:1:2:adjustment"]
+
+
+async def test_adjustment_marks_its_trackings(eqdkp):
+    async def handler(request):
+        return httpx.Response(200, json={"status": 1, "adjustment_id": [55]})
+
+    eqdkp(handler)
+    with get_raid_session(GUILD_ID) as session:
+        session.add_all([Tracking(id=1, character_id=1), Tracking(id=2, character_id=1)])
+        outbox.enqueue(session, "rte:1:1", _adjustment(tracking_ids=(1, 2)))
+        session.commit()
+
+    await outbox.OutboxWorker().drain(GUILD_ID)
+
+    [row] = _rows()
+    assert (row.status, row.result_id, row.attempts) == (OUTBOX_DONE, 55, 1)
+    with get_raid_session(GUILD_ID) as session:
+        assert {t.adjustment_id for t in session.query(Tracking)} == {55}
+        assert outbox.queued_tracking_ids(session) == set()
+
+
+@pytest.mark.parametrize(
+    ("status", "expected"),
+    [(503, OUTBOX_PENDING), (500, OUTBOX_FAILED), (502, OUTBOX_FAILED)],
+)
+async def test_only_posts_eqdkp_cannot_have_applied_are_retried(eqdkp, status, expected):
+    eqdkp(lambda request: httpx.Response(status))
+    with get_raid_session(GUILD_ID) as session:
+        outbox.enqueue(session, "rte:1:1", _adjustment())
+        session.commit()
+    worker = outbox.OutboxWorker(retry_delay=60)
+
+    assert await worker.drain(GUILD_ID) == 1  # a retry is not due yet
+
+    [row] = _rows()
+    assert (row.status, row.attempts) == (expected, 1)
+    assert str(status) in row.last_error
+    assert (row.next_attempt_at is not None) == (expected == OUTBOX_PENDING)
+    assert worker.stats()["retried" if expected == OUTBOX_PENDING else "failed"] == 1
+
+
+async def test_rows_fail_after_max_attempts_and_retry_on_request(eqdkp):
+    eqdkp(lambda request: httpx.Response(503))
+    with get_raid_session(GUILD_ID) as session:
+        outbox.enqueue(session, "rte:1:1", _adjustment())
+        session.commit()
+
+    await outbox.OutboxWorker(max_attempts=3, retry_delay=0).drain(GUILD_ID)
+    [row] = _rows()
+    assert (row.status, row.attempts) == (OUTBOX_FAILED, 3)
+
+    with get_raid_session(GUILD_ID) as session:
+        assert outbox.retry_failed(session, "rte:1:1") == 1
+        session.commit()
+    [row] = _rows()
+    assert (row.status, row.attempts, row.last_error) == (OUTBOX_PENDING, 0, None)
+
+
+async def test_event_created_by_another_submit_is_reused(eqdkp):
+    requests = []
+    eqdkp(lambda request: requests.append(request) or httpx.Response(500))
+    with get_raid_session(GUILD_ID) as session:
+        session.add_all([Event(id=5, name="Vulak"), EqdkpEvent(name="Vulak", eqdkp_event_id="77")])
+        payload = {"event_id": 5, "name": "vulak", "value": 3}
+        outbox.enqueue(session, "submit:5", [outbox.Op("event", 0, "event", "Vulak", payload)])
+        session.commit()
+
+    await outbox.OutboxWorker().drain(GUILD_ID)
+
+    [row] = _rows()
+    assert (row.status, row.result_id) == (OUTBOX_DONE, 77)
+    assert requests == []
+    with get_raid_session(GUILD_ID) as session:
+        assert session.get(Event, 5).eqdkp_event_id == 77
+
+
+def test_later_stages_wait_for_earlier_ones(eqdkp):
+    member = outbox.Op("member:1", 0, "member", "Tracker", {"character_id": 1})
+    with get_raid_session(GUILD_ID) as session:
+        outbox.enqueue(session, "rte:1:1", [member, *_adjustment()])
+        session.commit()
+        now = datetime(2030, 1, 1)
+        assert [r.kind for r in outbox.ready_rows(session, now)] == ["member"]
+        session.query(EqdkpOutbox).filter_by(kind="member").update({"status": OUTBOX_FAILED})
+        assert outbox.ready_rows(session, now) == []
+        session.query(EqdkpOutbox).filter_by(kind="member").update({"status": OUTBOX_DONE})
+        assert [r.kind for r in outbox.ready_rows(session, now)] == ["adjustment"]
+
+
+async def test_member_lookup_that_keeps_failing_skips_only_its_character(eqdkp):
+    def handler(request):
+        if request.url.params["function"] == "search":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"status": 1, "adjustment_id": [55]})
+
+    eqdkp(handler)
+    with get_raid_session(GUILD_ID) as session:
+        session.add(Character(id=2, name="Newbie"))
+        newbie = {"character_id": 2, "value": 7, "reason": "RTE Vulak"}
+        ops = [
+            outbox.Op("member:2", 0, "member", "Newbie", {"character_id": 2}),
+            *_adjustment(tracking_ids=()),
+            outbox.Op("adjustment:2", 1, "adjustment", "RTE Newbie", newbie),
+        ]
+        outbox.enqueue(session, "rte:1:1", ops)
+        session.commit()
+
+    worker = outbox.OutboxWorker(max_attempts=2, retry_delay=0)
+    await worker.drain(GUILD_ID)
+
+    member, tracker, skipped = _rows()
+    assert (member.status, member.attempts) == (OUTBOX_SKIPPED, 2)
+    assert member.last_error.startswith("lookup failed 2 time(s)")
+    assert (tracker.status, tracker.result_id) == (OUTBOX_DONE, 55)
+    assert (skipped.status, skipped.last_error) == (OUTBOX_SKIPPED, "no EQdkp member")
+    assert worker.stats()["failed"] == 0
+
+
+def _enqueue_two_adjustments() -> None:
+    with get_raid_session(GUILD_ID) as session:
+        outbox.enqueue(session, "rte:1:1", _adjustment())
+        outbox.enqueue(session, "rte:1:2", _adjustment())
+        session.commit()
+
+
+async def test_stop_finishes_in_flight_requests_and_takes_no_new_rows(eqdkp, monkeypatch):
+    arrived, release = asyncio.Event(), asyncio.Event()
+
+    async def handler(request):
+        arrived.set()
+        await release.wait()
+        return httpx.Response(200, json={"status": 1, "adjustment_id": [55]})
+
+    eqdkp(handler)
+    monkeypatch.setattr(config, "raid_guild_ids", lambda: [GUILD_ID])
+    _enqueue_two_adjustments()
+    worker = outbox.OutboxWorker(concurrency=1)
+    worker.start()
+    await arrived.wait()
+
+    stopping = asyncio.create_task(worker.stop())
+    await asyncio.sleep(0.01)
+    assert not stopping.done()
+    release.set()
+    await stopping
+
+    assert [(r.status, r.attempts) for r in _rows()] == [(OUTBOX_DONE, 1), (OUTBOX_PENDING, 0)]
+
+
+async def test_stop_cancels_requests_that_outlive_the_timeout(eqdkp, monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(60)
+
+    eqdkp(handler)
+    monkeypatch.setattr(config, "raid_guild_ids", lambda: [GUILD_ID])
+    _enqueue_two_adjustments()
+    worker = outbox.OutboxWorker(concurrency=1)
+    worker.start()
+    while _rows()[0].status != OUTBOX_SENDING:
+        await asyncio.sleep(0.001)
+
+    await worker.stop(timeout=0.01)
+
+    assert [r.status for r in _rows()] == [OUTBOX_SENDING, OUTBOX_PENDING]
+    assert worker.recover(GUILD_ID) == 1
+    assert _rows()[0].last_error == outbox.INTERRUPTED
+
+
+async def test_failed_recovery_does_not_stop_the_worker(eqdkp, monkeypatch, caplog):
+    async def handler(request):
+        return httpx.Response(200, json={"status": 1, "adjustment_id": [55]})
+
+    eqdkp(handler)
+    monkeypatch.setattr(config, "raid_guild_ids", lambda: [GUILD_ID])
+    _enqueue_two_adjustments()
+    worker = outbox.OutboxWorker()
+
+    def broken_recover(guild_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(worker, "recover", broken_recover)
+    worker.start()
+    while any(r.status != OUTBOX_DONE for r in _rows()):
+        await asyncio.sleep(0.001)
+    await worker.stop()
+
+    assert "EQdkp outbox recovery failed for guild 1" in caplog.text
@@ -0,0 +1,386 @@
+"""Tests for ``$submit`` through the EQdkp outbox (``raid.eqdkp_submit`` and ``raid.eqdkp_outbox``)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from roboToald import config
+from roboToald.db import raid_base
+from roboToald.db.base import create_sqlite_engine
+from roboToald.db.raid_base import RaidBase, get_raid_session
+from roboToald.db.raid_models.character import Character
+from roboToald.db.raid_models.loot import EventLoot, Loot
+from roboToald.db.raid_models.outbox import OUTBOX_FAILED, OUTBOX_SENDING, EqdkpOutbox
+from roboToald.db.raid_models.raid import Attendee, Event, Fte
+from roboToald.db.raid_models.target import Target
+from roboToald.db.raid_models.tracking import Tracking
+from roboToald.eqdkp import client as eqdkp_client
+from roboToald.raid.eqdkp_outbox import INTERRUPTED, OutboxWorker, retry_failed
+from roboToald.raid.eqdkp_submit import (
+    FAILED,
+    OK,
+    SKIPPED,
+    SubmitError,
+    SubmitProgress,
+    batch_progress,
+    build_submit_embed,
+    enqueue_rte_submit,
+    enqueue_submit,
+    watch_batch,
+)
+
+URL = "http://submit.test"
+GUILD_ID = 1
+
+
+class FakeEqdkp:
+    """Just enough of ``/api.php`` for a submit, recording each call and the peak concurrency."""
+
+    def __init__(self, members: dict[str, int], fail: set[str] = frozenset(), unfindable: set[str] = frozenset()):
+        self.members = dict(members)  # name -> user id
+        self.fail = set(fail)  # function names or character names answered with HTTP 500
+        self.unfindable = unfindable  # characters whose creation "succeeds" but never shows up in searches
+        self.calls: list[tuple[str, object]] = []
+        self.in_flight = self.peak = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.005)
+            return self._handle(request)
+        finally:
+            self.in_flight -= 1
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        function = request.url.params["function"]
+        body = json.loads(request.content) if request.content else None
+        if function == "search":
+            name = request.url.params["for"]
+            self.calls.append((function, name))
+            if name in self.fail:
+                return httpx.Response(500)
+            if name not in self.members or name in self.unfindable:
+                return httpx.Response(200, json={"direct": {}})
+            member_id = list(self.members).index(name) + 1
+            member = {"id": member_id, "user_id": str(self.members[name]), "main_id": member_id, "name": name}
+            return httpx.Response(200, json={"direct": {"member:1": member}})
+        self.calls.append((function, body))
+        if function in self.fail:
+            return httpx.Response(500)
+        if function == "character":
+            self.members[body["name"]] = 100 + len(self.members)
+            return httpx.Response(200, json={"status": 1})
+        n = len(self.calls)
+        return httpx.Response(
+            200,
+            json={"status": 1, "event_id": 5, "raid_id": 70, "item_id": 900 + n, "adjustment_id": [800 + n]},
+        )
+
+    def posted(self, function: str) -> list[dict]:
+        return [body for f, body in self.calls if f == function]
+
+
+@pytest.fixture()
+def raid_db(tmp_path, monkeypatch):
+    """A file-backed raid database for guild 1, so the worker can open sessions of its own."""
+    engine = create_sqlite_engine(str(tmp_path / "raids_1.db"))
+    RaidBase.metadata.create_all(engine)
+    monkeypatch.setattr(raid_base, "_engines", {GUILD_ID: engine})
+    yield
+    engine.dispose()
+
+
+@pytest.fixture()
+def fake_eqdkp(monkeypatch, raid_db):
+    monkeypatch.setitem(config.EQDKP_SETTINGS, GUILD_ID, {"url": URL, "host": "submit.test", "api_key": "token"})
+    monkeypatch.setattr(config, "EQDKP_RETRY_BACKOFF_MS", 0)
+    monkeypatch.setattr(config, "EQDKP_MAX_RETRIES", 0)
+    eqdkp_client.lookup_cache.clear()
+
+    def install(server: FakeEqdkp) -> FakeEqdkp:
+        pool = eqdkp_client._Pool(transport=httpx.MockTransport(server))
+        eqdkp_client._pools[(URL, asyncio.get_running_loop())] = pool
+        return server
+
+    yield install
+    eqdkp_client._pools.clear()
+    eqdkp_client.lookup_cache.clear()
+
+
+@pytest.fixture()
+def event_id(raid_db) -> int:
+    """A killed 10 DKP event: six attendees, an RTE tracker, an FTE and two looted items."""
+    with get_raid_session(GUILD_ID) as session:
+        names = ["Aa", "Bb", "Cc", "Dd", "Ee", "Ff", "Tracker", "Fter", "Alt"]
+        chars = [Character(name=n) for n in names]
+        session.add_all(chars)
+        evt = Event(name="Vulak", channel_id="200", dkp=10, killed=True, created_at=datetime(2026, 10, 1, 20, 0))
+        session.add(evt)
+        session.flush()
+        for c in chars[:6]:
+            session.add(Attendee(event_id=evt.id, character_id=str(c.id)))
+        session.add(Attendee(event_id=evt.id, character_id=str(chars[6].id), tracking_id="1"))
+        session.add(Fte(event_id=evt.id, character_id=chars[7].id, dkp=5))
+        sword, shield = Loot(name="Sword"), Loot(name="Shield")
+        session.add_all([sword, shield])
+        session.flush()
+        session.add(EventLoot(event_id=evt.id, loot_id=sword.id, character_id=chars[0].id, dkp=30))
+        session.add(EventLoot(event_id=evt.id, loot_id=shield.id, character_id=chars[1].id, dkp=20))
+        session.commit()
+        return evt.id
+
+
+def _members():
+    return {n: i + 1 for i, n in enumerate(["Aa", "Bb", "Cc", "Dd", "Ee", "Ff", "Tracker", "Fter"])}
+
+
+def _enqueue(event_id: int) -> str:
+    with get_raid_session(GUILD_ID) as session:
+        batch = enqueue_submit(session, session.get(Event, event_id))
+        session.commit()
+    return batch
+
+
+def _progress(batch: str) -> SubmitProgress:
+    with get_raid_session(GUILD_ID) as session:
+        return batch_progress(session, batch)
+
+
+def _retry(batch: str) -> int:
+    with get_raid_session(GUILD_ID) as session:
+        n = retry_failed(session, batch)
+        session.commit()
+    return n
+
+
+async def test_submit_is_queued_then_sent_stage_by_stage(fake_eqdkp, event_id):
+    server = fake_eqdkp(FakeEqdkp(_members()))
+
+    batch = _enqueue(event_id)
+    assert server.calls == []
+    queued = _progress(batch)
+    assert (queued.phase, queued.done) == ("event", False)
+    assert queued.count("member") == 8  # "Alt" is not referenced by the event
+
+    await OutboxWorker(concurrency=3).drain(GUILD_ID)
+
+    assert server.peak == 3
+    functions = [f for f, _ in server.calls]
+    assert functions.index("add_event") < functions.index("search") < functions.index("add_raid")
+    assert functions.index("add_raid") < min(functions.index("add_item"), functions.index("add_adjustment"))
+    [raid] = server.posted("add_raid")
+    assert raid["raid_value"] == 10
+    assert sorted(raid["raid_attendees"]["member"]) == [1, 2, 3, 4, 5, 6]
+    assert sorted(b["item_name"] for b in server.posted("add_item")) == ["Shield", "Sword"]
+    assert sorted(b["adjustment_reason"] for b in server.posted("add_adjustment")) == ["FTE Vulak", "RTE Vulak"]
+
+    progress = _progress(batch)
+    assert progress.done and progress.raid_id == 70
+    assert all(i.status == OK for i in progress.items)
+    with get_raid_session(GUILD_ID) as session:
+        evt = session.get(Event, event_id)
+        assert (evt.eqdkp_event_id, evt.eqdkp_raid_id) == (5, 70)
+        assert all(el.eqdkp_item_id for el in session.query(EventLoot).all())
+
+
+async def test_enqueue_is_idempotent(fake_eqdkp, event_id):
+    batch = _enqueue(event_id)
+    with pytest.raises(SubmitError, match="already queued"):
+        _enqueue(event_id)
+    with get_raid_session(GUILD_ID) as session:
+        keys = [k for (k,) in session.query(EqdkpOutbox.idempotency_key)]
+    # event, 8 members, raid, RTE, FTE and two items
+    assert len(keys) == len(set(keys)) == 14
+    assert f"{batch}:raid" in keys
+
+
+async def test_failed_items_are_reported_and_the_rest_still_land(fake_eqdkp, event_id):
+    server = fake_eqdkp(FakeEqdkp(_members(), fail={"add_adjustment"}))
+    batch = _enqueue(event_id)
+
+    await OutboxWorker().drain(GUILD_ID)
+
+    progress = _progress(batch)
+    assert progress.done and progress.error is None
+    assert sorted(i.label for i in progress.failed) == ["FTE Fter", "RTE Tracker"]
+    assert progress.count("item", OK) == 2
+    embed = build_submit_embed(progress)
+    assert embed.description == "Submitted as raid 70 with 2 failure(s)."
+    assert "RTE Tracker" in next(f for f in embed.fields if f.name == "Failures").value
+
+    server.fail.clear()
+    assert _retry(batch) == 2
+    await OutboxWorker().drain(GUILD_ID)
+    assert not _progress(batch).failed
+    assert len(server.posted("add_raid")) == 1
+    assert len(server.posted("add_item")) == 2
+
+
+async def test_member_lookup_that_keeps_failing_skips_only_that_character(fake_eqdkp, event_id):
+    server = fake_eqdkp(FakeEqdkp(_members(), fail={"Aa"}))
+    batch = _enqueue(event_id)
+
+    await OutboxWorker(max_attempts=2, retry_delay=0).drain(GUILD_ID)
+
+    assert server.calls.count(("search", "Aa")) == 2
+    [raid] = server.posted("add_raid")
+    assert len(raid["raid_attendees"]["member"]) == 5
+    assert [b["item_name"] for b in server.posted("add_item")] == ["Shield"]
+    progress = _progress(batch)
+    assert progress.done and progress.raid_id == 70
+    member, item = [i for i in progress.items if i.status == SKIPPED]
+    assert (member.kind, member.label) == ("member", "Aa")
+    assert member.error.startswith("lookup failed 2 time(s): Server error '500")
+    assert (item.kind, item.label, item.error) == ("item", "Sword (Aa)", "no EQdkp member")
+    assert not progress.failed
+
+
+async def test_missing_members_are_created_and_unfindable_ones_skipped(fake_eqdkp, event_id):
+    members = _members()
+    del members["Ff"], members["Fter"]
+    server = fake_eqdkp(FakeEqdkp(members, unfindable={"Fter"}))
+    batch = _enqueue(event_id)
+
+    await OutboxWorker().drain(GUILD_ID)
+
+    assert sorted(b["name"] for b in server.posted("character")) == ["Ff", "Fter"]
+    [raid] = server.posted("add_raid")
+    assert len(raid["raid_attendees"]["member"]) == 6
+    progress = _progress(batch)
+    skipped = [(i.kind, i.label) for i in progress.items if i.status == SKIPPED]
+    assert sorted(skipped) == [("adjustment", "FTE Fter"), ("member", "Fter")]
+    assert [b["adjustment_reason"] for b in server.posted("add_adjustment")] == ["RTE Vulak"]
+    assert not progress.failed
+
+
+async def test_rte_is_skipped_when_the_user_attended(fake_eqdkp, event_id):
+    members = _members()
+    members["Tracker"] = members["Aa"]  # another character of an attendee's EQdkp user
+    server = fake_eqdkp(FakeEqdkp(members))
+    batch = _enqueue(event_id)
+
+    await OutboxWorker().drain(GUILD_ID)
+
+    assert [b["adjustment_reason"] for b in server.posted("add_adjustment")] == ["FTE Vulak"]
+    [rte] = [i for i in _progress(batch).items if i.label == "RTE Tracker"]
+    assert (rte.status, rte.error) == (SKIPPED, "attended the raid")
+
+
+async def test_empty_roster_fails_the_raid(fake_eqdkp, raid_db):
+    server = fake_eqdkp(FakeEqdkp({}))
+    with get_raid_session(GUILD_ID) as session:
+        evt = Event(name="Empty", channel_id="201", dkp=10, killed=True)
+        session.add(evt)
+        session.commit()
+        event_id = evt.id
+    batch = _enqueue(event_id)
+
+    await OutboxWorker().drain(GUILD_ID)
+
+    assert server.posted("add_raid") == []
+    progress = _progress(batch)
+    assert progress.done
+    [raid] = progress.failed
+    assert "at least one raid member" in raid.error
+
+
+async def test_restart_resumes_lookups_but_not_interrupted_posts(fake_eqdkp, event_id):
+    server = fake_eqdkp(FakeEqdkp(_members()))
+    batch = _enqueue(event_id)
+    await OutboxWorker().drain(GUILD_ID)
+    # As if the bot had died with a member lookup and both item POSTs in flight.
+    with get_raid_session(GUILD_ID) as session:
+        session.query(EqdkpOutbox).filter_by(batch=batch, kind="item").update({"status": OUTBOX_SENDING})
+        session.query(EqdkpOutbox).filter_by(batch=batch, label="Aa").update({"status": OUTBOX_SENDING})
+        session.commit()
+
+    worker = OutboxWorker()
+    assert worker.recover(GUILD_ID) == 3
+    await worker.drain(GUILD_ID)
+
+    assert worker.stats()["sent"] == 1
+    with get_raid_session(GUILD_ID) as session:
+        items = session.query(EqdkpOutbox).filter_by(batch=batch, kind="item").all()
+        assert {(r.status, r.last_error) for r in items} == {(OUTBOX_FAILED, INTERRUPTED)}
+    assert len(server.posted("add_item")) == 2
+
+
+async def test_worker_wakes_on_notify(fake_eqdkp, event_id, monkeypatch):
+    monkeypatch.setattr(config, "raid_guild_ids", lambda: [GUILD_ID])
+    server = fake_eqdkp(FakeEqdkp(_members()))
+    worker = OutboxWorker(poll_interval=60)
+    worker.start()
+    await asyncio.sleep(0.01)
+    assert server.calls == []
+
+    batch = _enqueue(event_id)
+    worker.notify()
+    phases = []
+
+    async def on_progress(progress):
+        phases.append(progress.phase)
+
+    try:
+        progress = await asyncio.wait_for(watch_batch(GUILD_ID, batch, on_progress, interval=0.01), 5)
+    finally:
+        await worker.stop()
+    assert progress.raid_id == 70
+    assert phases[-1] == "items"
+    assert worker.stats()["sent"] == 14
+
+
+def test_rte_submit_queues_one_adjustment_per_character_and_rate(raid_session):
+    tgt = Target(name="Vulak", rate_per_hour=4)
+    chars = [Character(name="Tracker"), Character(name="Puller")]
+    raid_session.add_all([tgt, *chars])
+    raid_session.flush()
+    start = datetime(2026, 10, 1, 20, 0)
+    for char, hours in ((chars[0], 1), (chars[0], 2), (chars[1], 1)):
+        raid_session.add(
+            Tracking(
+                target_id=tgt.id,
+                character_id=char.id,
+                role_id=7,
+                start_time=start,
+                end_time=start + timedelta(hours=hours),
+            )
+        )
+    raid_session.add(Tracking(target_id=tgt.id, character_id=chars[1].id, start_time=start))  # still open
+    raid_session.commit()
+
+    assert enqueue_rte_submit(raid_session, tgt) == (2, 0)
+    rows = raid_session.query(EqdkpOutbox).filter_by(kind="adjustment").order_by(EqdkpOutbox.id).all()
+    assert [(r.label, r.data["value"], r.data["tracking_ids"]) for r in rows] == [
+        ("RTE Tracker", 12, [1, 2]),
+        ("RTE Puller", 4, [3]),
+    ]
+    assert rows[0].data["reason"].startswith("RTE Vulak as Tracker for 3h 0m")
+
+    # Queued trackings are not queued twice; a failed adjustment is requeued instead.
+    rows[1].status = OUTBOX_FAILED
+    raid_session.commit()
+    assert enqueue_rte_submit(raid_session, tgt) == (0, 1)
+
+
+def test_embed_in_progress_and_failed_states():
+    progress = SubmitProgress(phase="members")
+    progress.add("member", "Aa", OK)
+    progress.add("member", "Bb")
+    progress.add("member", "Cc", error="HTTP 500")
+    embed = build_submit_embed(progress)
+    assert embed.description == "Resolving raid members..."
+    assert embed.fields[0].value == "1/3 done, 1 retrying"
+
+    for n in range(100):
+        progress.add("item", f"Item number {n} (Somebody)", FAILED, "HTTP 500 Internal Server Error")
+    progress.done, progress.raid_id = True, 70
+    embed = build_submit_embed(progress)
+    failures = next(f for f in embed.fields if f.name == "Failures")
+    assert len(failures.value) <= 1024
+    assert "more" in failures.value
@@ -0,0 +1,55 @@
+"""Tests for the cache invalidation bus (``roboToald.db.invalidation``)."""
+
+from __future__ import annotations
+
+import logging
+
+from roboToald.db import invalidation
+
+
+def test_publish_dispatches_by_type_and_isolates_failures(caplog):
+    bus = invalidation.InvalidationBus()
+    seen = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    bus.subscribe(invalidation.GroupsChanged, broken)
+    bus.subscribe(invalidation.GroupsChanged, seen.append)
+    bus.subscribe(invalidation.GroupsChanged, seen.append)  # duplicate subscriptions are ignored
+    bus.subscribe(invalidation.NamesChanged, lambda e: seen.append(("names", e.guild_id)))
+
+    with caplog.at_level(logging.ERROR, logger=invalidation.__name__):
+        bus.publish(invalidation.GroupsChanged(7))
+    assert seen == [invalidation.GroupsChanged(7)]
+    assert "boom" in caplog.text
+
+    bus.unsubscribe(invalidation.GroupsChanged, seen.append)
+    bus.publish(invalidation.GroupsChanged(8))
+    bus.publish(invalidation.NamesChanged(9))
+    assert seen == [invalidation.GroupsChanged(7), ("names", 9)]
+
+
+def test_sso_mutators_publish_events(sso_session):
+    from roboToald.db.models import sso
+
+    events = []
+    for event_type in (invalidation.NamesChanged, invalidation.GroupsChanged, invalidation.AccountsChanged):
+        invalidation.subscribe(event_type, events.append)
+    try:
+        sso.create_account_group(1, "raiders", 100)
+        sso.create_account(1, "acct", "pw", group="raiders")
+        sso.add_account_character(1, "acct", "Bob", sso.CharacterClass.Cleric)
+    finally:
+        for event_type in (invalidation.NamesChanged, invalidation.GroupsChanged, invalidation.AccountsChanged):
+            invalidation.unsubscribe(event_type, events.append)
+
+    account_id = sso.get_account(1, "acct").id
+    assert events == [
+        invalidation.GroupsChanged(1),
+        invalidation.NamesChanged(1),
+        invalidation.GroupsChanged(1),
+        invalidation.AccountsChanged(1, frozenset({account_id})),
+        invalidation.NamesChanged(1, characters=True),
+        invalidation.AccountsChanged(1, frozenset({account_id})),
+    ]
@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
-from roboToald.api.server import LoginAuthResult, _perform_login_auth
+from roboToald.api.server import TAG_PICK_ATTEMPTS, LoginAuthResult, _perform_login_auth
 from roboToald.db.models import sso as sso_model
 
 
@@ -23,7 +26,7 @@ def _account(
 ):
     chars = [SimpleNamespace(name=n) for n in (characters or ())]
     als = [SimpleNamespace(alias=a) for a in (aliases or ())]
-    return SimpleNamespace(id=aid, real_user=real_user, characters=chars, aliases=als)
+    return SimpleNamespace(id=aid, real_user=real_user, characters=chars, aliases=als, last_login=datetime.datetime.min)
 
 
 def test_perform_login_auth_account_not_found(monkeypatch):
@@ -164,3 +167,76 @@ def test_perform_login_auth_success_via_tag(monkeypatch):
     )
     assert r.success is True
     assert "tag" in log_calls[0]["details"]
+
+
+def test_concurrent_tag_logins_get_different_accounts(monkeypatch):
+    # Two inactive accounts behind one tag; an account only becomes busy once last_login is stamped.
+    accounts = {1: _account(aid=1, real_user="first"), 2: _account(aid=2, real_user="second")}
+    for acc in accounts.values():
+        acc.real_pass = "pw"
+    db_lock = threading.Lock()
+    picked = threading.Barrier(2, timeout=5)
+    finds = []
+
+    def find_least_recent(*a, **k):
+        with db_lock:
+            acc = min(accounts.values(), key=lambda a: (a.last_login, a.id))
+            found = SimpleNamespace(**vars(acc))
+            finds.append(found.id)
+            first_round = len(finds) <= 2
+        if first_round:
+            picked.wait()  # both logins pick the same account before either stamps it
+        return found
+
+    stamps = []
+
+    def stamp(**kw):
+        with db_lock:
+            acc = accounts[kw["account_id"]]
+            if kw["expected_last_login"] != acc.last_login:
+                raise sso_model.SSOAccountClaimedError()
+            acc.last_login = datetime.datetime.now()
+            stamps.append(kw["account_id"])
+
+    monkeypatch.setattr("roboToald.api.server.sso_model.find_account_by_username", find_least_recent)
+    monkeypatch.setattr("roboToald.api.server.user_has_access_to_accounts", lambda *a, **k: True)
+    monkeypatch.setattr("roboToald.api.server.sso_model.update_last_login_and_log", stamp)
+    monkeypatch.setattr("roboToald.api.server.ws_manager.notify_guild", lambda *a, **k: None)
+
+    def login(_):
+        return _perform_login_auth("vpclr", GUILD_ID, DISCORD_UID, CLIENT_IP, None, None, auth_source="http")
+
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(login, range(2)))
+    assert all(r.success for r in results)
+    assert sorted(r.real_user for r in results) == ["first", "second"]
+    assert sorted(stamps) == [1, 2]
+    assert finds == [1, 1, 2]  # the login that lost the race picked again
+
+
+def test_tag_login_gives_up_when_every_pick_is_claimed(monkeypatch):
+    acc = _account(real_user="owner")
+    monkeypatch.setattr("roboToald.api.server.sso_model.find_account_by_username", lambda *a, **k: acc)
+    monkeypatch.setattr("roboToald.api.server.user_has_access_to_accounts", lambda *a, **k: True)
+    calls = []
+
+    def always_claimed(**kw):
+        calls.append(kw["expected_last_login"])
+        raise sso_model.SSOAccountClaimedError()
+
+    monkeypatch.setattr("roboToald.api.server.sso_model.update_last_login_and_log", always_claimed)
+    r = _perform_login_auth("sharedtag", GUILD_ID, DISCORD_UID, CLIENT_IP, None, None, auth_source="http")
+    assert (r.success, r.error_status) == (False, 410)
+    assert calls == [datetime.datetime.min] * TAG_PICK_ATTEMPTS
+
+
+def test_non_tag_login_stamps_unconditionally(monkeypatch):
+    acc = _account(real_user="owner")
+    acc.real_pass = "pw"
+    monkeypatch.setattr("roboToald.api.server.sso_model.find_account_by_username", lambda *a, **k: acc)
+    monkeypatch.setattr("roboToald.api.server.user_has_access_to_accounts", lambda *a, **k: True)
+    log_calls: list[dict] = []
+    monkeypatch.setattr("roboToald.api.server.sso_model.update_last_login_and_log", lambda **kw: log_calls.append(kw))
+    monkeypatch.setattr("roboToald.api.server.ws_manager.notify_guild", lambda *a, **k: None)
+    assert _perform_login_auth("owner", GUILD_ID, DISCORD_UID, CLIENT_IP, None, None, auth_source="http").success
+    assert log_calls[0]["expected_last_login"] is None
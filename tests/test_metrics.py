@@ -0,0 +1,88 @@
+"""Tests for the Prometheus metrics registry (``roboToald.metrics``) and the ``/metrics`` endpoint."""
+
+from __future__ import annotations
+
+import pytest
+from starlette.testclient import TestClient
+
+from roboToald import config, metrics
+from roboToald.api.server import app
+from roboToald.db import base
+
+
+def test_counter_and_histogram_render():
+    registry = metrics.Registry()
+    requests = registry.counter("t_requests_total", "Requests.", ["code"])
+    latency = registry.histogram("t_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.labels(200).inc()
+    requests.labels(200).inc(2)
+    requests.labels('a"b').inc()
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE t_requests_total counter" in lines
+    assert 't_requests_total{code="200"} 3' in lines
+    assert 't_requests_total{code="a\\"b"} 1' in lines
+    assert 't_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 't_latency_seconds_bucket{le="1"} 2' in lines
+    assert 't_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "t_latency_seconds_sum 5.55" in lines
+    assert "t_latency_seconds_count 3" in lines
+
+
+def test_callback_metric_and_label_validation():
+    registry = metrics.Registry()
+    conns = registry.callback("t_conns", "Connections.", lambda: {(7,): 2, (3,): 1}, ["guild_id"])
+    assert 't_conns{guild_id="3"} 1\nt_conns{guild_id="7"} 2' in registry.render()
+    with pytest.raises(TypeError):
+        conns.labels(7)
+    with pytest.raises(TypeError):
+        metrics._Metric("t_abstract", "No series type.")
+    with pytest.raises(ValueError):
+        registry.counter("t_conns", "Duplicate.")
+    with pytest.raises(ValueError):
+        registry.counter("t_other", "Needs a label.", ["x"]).inc()
+
+
+def _query_count(module: str) -> int:
+    child = metrics.DB_QUERY_SECONDS._children.get((module,))
+    return sum(child.snapshot()[0]) if child else 0
+
+
+def test_instrumented_engine_counts_queries(tmp_path):
+    engine = base.create_sqlite_engine(str(tmp_path / "m.db"))
+    try:
+        # Test modules are not under ``roboToald``, so their queries are labelled "other".
+        before = _query_count("other")
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1").scalar()
+        assert _query_count("other") == before + 1
+    finally:
+        engine.dispose()
+
+
+def test_model_queries_labelled_by_model_module(sso_session):
+    from roboToald.db.models import sso
+
+    metrics.instrument_engine(sso_session.get_bind())
+    before = _query_count("roboToald.db.models.sso")
+    sso.list_accounts(1)
+    assert _query_count("roboToald.db.models.sso") > before
+
+
+def test_metrics_endpoint(monkeypatch):
+    with TestClient(app) as client:
+        assert client.get("/metrics").status_code == 404
+
+        monkeypatch.setattr(config, "METRICS_ALLOW_IPS", {"*"})
+        client.get("/")
+        r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert 'robotoald_http_request_seconds_count{route="/",status="200"}' in body
+    assert "# TYPE robotoald_ws_notify_guild_seconds histogram" in body
+    assert "robotoald_ws_pending_notifications 0" in body
+    assert 'robotoald_audit_log_rows_total{outcome="batched"}' in body
@@ -0,0 +1,109 @@
+"""Tests for the opt-in query profiler (``roboToald.db.query_profiler``)."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+import sqlalchemy
+from starlette.testclient import TestClient
+
+from roboToald import config
+from roboToald.api import dashboard
+from roboToald.api.server import app
+from roboToald.db import query_profiler, raid_base
+
+
+@pytest.fixture()
+def profiler(monkeypatch):
+    prof = query_profiler.QueryProfiler(slow_ms=10_000, session_threshold=20, repeat_threshold=3)
+    monkeypatch.setattr(query_profiler, "profiler", prof)
+    monkeypatch.setattr(config, "DB_QUERY_PROFILING", True)
+    return prof
+
+
+@pytest.fixture()
+def engine(tmp_path, profiler):
+    eng = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'p.db'}")
+    query_profiler.instrument_engine(eng, str(tmp_path / "p.db"))
+    with eng.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+    yield eng
+    eng.dispose()
+
+
+def test_fingerprint_collapses_literals_and_in_lists():
+    assert query_profiler.fingerprint("SELECT *\n  FROM t WHERE id IN (?, ?, ?) AND name = 'x''y' LIMIT 10") == (
+        "SELECT * FROM t WHERE id IN (?+) AND name = ? LIMIT ?"
+    )
+    assert query_profiler.fingerprint("SELECT anon_1.id FROM t AS anon_1") == "SELECT anon_1.id FROM t AS anon_1"
+
+
+def _n_plus_one(engine, n):
+    with query_profiler.profile_session(), engine.connect() as conn:
+        for i in range(n):
+            conn.exec_driver_sql("SELECT name FROM t WHERE id = ?", (i,)).all()
+
+
+def test_repeated_statement_flags_session(engine, profiler, caplog):
+    _n_plus_one(engine, 2)
+    assert profiler.report()["flagged_callers"] == []
+
+    with caplog.at_level("WARNING", logger=query_profiler.__name__):
+        _n_plus_one(engine, 5)
+        _n_plus_one(engine, 5)
+    report = profiler.report()
+    [flagged] = report["flagged_callers"]
+    assert flagged["caller"].startswith(f"{__name__}._n_plus_one:")
+    assert flagged["times"] == 2
+    assert flagged["max_repeats"] == 5
+    assert flagged["fingerprint"] == "SELECT name FROM t WHERE id = ?"
+    assert report["recent_flagged"][0]["reason"] == "repeated statement"
+    # The second flag from the same caller inside LOG_INTERVAL_SEC is not logged again.
+    assert sum("Query-heavy session" in r.message for r in caplog.records) == 1
+
+    counts = {s["fingerprint"]: s["count"] for s in report["top_statements"]}
+    assert counts["SELECT name FROM t WHERE id = ?"] == 12
+    assert report["sessions"] == 3
+
+
+def test_slow_statement_logged_with_caller(engine, profiler, caplog):
+    profiler.slow = 0.0
+    with caplog.at_level("WARNING", logger=query_profiler.__name__):
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT count(*) FROM t").scalar()
+    [slow] = profiler.report()["recent_slow"]
+    assert slow["caller"].startswith(f"{__name__}.test_slow_statement_logged_with_caller:")
+    assert slow["database"] == "p.db"
+    assert any("Slow query" in r.message for r in caplog.records)
+
+
+def test_profile_session_noop_when_disabled(monkeypatch):
+    monkeypatch.setattr(config, "DB_QUERY_PROFILING", False)
+    with query_profiler.profile_session() as profile:
+        assert profile is None
+
+
+def test_raid_sessions_are_profiled(tmp_path, monkeypatch, profiler):
+    monkeypatch.setattr(raid_base, "_db_path", lambda gid: str(tmp_path / f"raids_{gid}.db"))
+    monkeypatch.setattr(raid_base, "_engines", {})
+    try:
+        with raid_base.get_raid_session(5) as session:
+            for _ in range(3):
+                session.execute(sqlalchemy.text("SELECT 1")).all()
+    finally:
+        raid_base.get_raid_engine(5).dispose()
+    [flagged] = profiler.report()["recent_flagged"]
+    assert flagged["databases"] == "raids_5.db"
+    assert flagged["caller"].startswith(f"{__name__}.test_raid_sessions_are_profiled:")
+
+
+def test_dashboard_partial_for_super_admin(engine, profiler):
+    _n_plus_one(engine, 4)
+    cookie = dashboard._make_session_cookie({"iat": time.time(), "super": True, "guilds": []})
+    with TestClient(app) as client:
+        client.cookies.set(dashboard.COOKIE_NAME, cookie)
+        r = client.get("/admin/partials/query_profile")
+    assert r.status_code == 200
+    assert "_n_plus_one" in r.text
+    assert "SELECT name FROM t WHERE id = ?" in r.text
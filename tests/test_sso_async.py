@@ -0,0 +1,105 @@
+"""Tests for the executor-backed SSO facade (``roboToald.api.sso_async``) and its use by ``/auth``."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from starlette.testclient import TestClient
+
+from roboToald.api import sso_async
+from roboToald.api.server import LoginAuthResult, app
+from roboToald.db.models import sso as sso_model
+
+
+async def test_run_uses_pool_thread_and_counts():
+    executor = sso_async.SSOExecutor(max_workers=2)
+    try:
+        name = await executor.run(lambda: threading.current_thread().name)
+        assert name.startswith("sso-db")
+        with pytest.raises(ValueError):
+            await executor.run(int, "not a number")
+        stats = executor.stats()
+        assert stats["calls"] == 2
+        assert stats["errors"] == 1
+        assert stats["in_flight"] == 0
+    finally:
+        executor.shutdown()
+
+
+async def test_blocking_call_does_not_stall_loop():
+    executor = sso_async.SSOExecutor(max_workers=1)
+    release = threading.Event()
+    try:
+        pending = asyncio.ensure_future(executor.run(release.wait, 5))
+        # The loop keeps running other tasks while the pool thread blocks.
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert not pending.done()
+        assert executor.stats()["in_flight"] == 1
+        release.set()
+        assert await pending is True
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_auth_runs_model_calls_off_the_loop(monkeypatch):
+    threads = {}
+
+    def record(name, result):
+        def fn(*args, **kwargs):
+            threads[name] = threading.current_thread().name
+            return result
+
+        return fn
+
+    key = MagicMock()
+    key.guild_id = 1
+    key.discord_user_id = 99
+    monkeypatch.setattr("roboToald.api.server.sso_model.is_ip_rate_limited", record("rate_limit", False))
+    monkeypatch.setattr("roboToald.api.server.sso_model.get_access_key_by_key", record("access_key", key))
+    monkeypatch.setattr("roboToald.api.server.sso_model.is_user_access_revoked", record("revoked", False))
+    monkeypatch.setattr(
+        "roboToald.api.server._perform_login_auth",
+        record("login", LoginAuthResult(success=True, real_user="realuser", real_pass="realpass")),
+    )
+    with TestClient(app) as client:
+        r = client.post("/auth", json={"username": "tagname", "password": "goodkey"})
+    assert r.status_code == 200
+    assert set(threads) == {"rate_limit", "access_key", "revoked", "login"}
+    assert all(name.startswith("sso-db") for name in threads.values())
+
+
+def test_websocket_auth_runs_model_calls_off_the_loop(monkeypatch):
+    threads = {}
+    key = MagicMock()
+    key.guild_id = 1
+    key.discord_user_id = 99
+    real_get_dynamic_tags = sso_model.get_dynamic_tags
+
+    def record(name, fn):
+        def wrapper(*args, **kwargs):
+            threads[name] = threading.current_thread().name
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    async def empty_tree(guild_id, discord_user_id):
+        return {}
+
+    monkeypatch.setattr("roboToald.api.server.sso_model.is_ip_rate_limited", record("rate_limit", lambda *a: False))
+    monkeypatch.setattr("roboToald.api.server.sso_model.get_access_key_by_key", record("access_key", lambda k: key))
+    monkeypatch.setattr("roboToald.api.server.sso_model.is_user_access_revoked", record("revoked", lambda *a: False))
+    monkeypatch.setattr(
+        "roboToald.api.server.sso_model.get_dynamic_tags", record("dynamic_tags", real_get_dynamic_tags)
+    )
+    monkeypatch.setattr("roboToald.api.server.ws_manager.build_full_state", empty_tree)
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/accounts") as ws:
+            ws.send_json({"type": "auth", "access_key": "good", "client_version": "2.0.0"})
+            assert ws.receive_json()["type"] == "full_state"
+    assert set(threads) == {"rate_limit", "access_key", "revoked", "dynamic_tags"}
+    assert all(name.startswith("sso-db") for name in threads.values())
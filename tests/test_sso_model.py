@@ -3,11 +3,15 @@
 from __future__ import annotations
 
 import datetime
+import random
+from types import SimpleNamespace
 
 import pytest
+import sqlalchemy
 from freezegun import freeze_time
 
 from roboToald import config
+from roboToald.db import base
 from roboToald.db.models import sso as sso
 
 
@@ -144,6 +148,21 @@ def test_find_account_by_static_tag_cold_beats_warm(sso_session, monkeypatch):
     assert found.real_user == "cold"
 
 
+def test_conditional_last_login_stamp_claims_account_once(sso_session):
+    sso.create_account(GUILD_ID, "shared", "pw")
+    picked = sso.get_account(GUILD_ID, "shared")
+    log = dict(username="shared", ip_address="203.0.113.9", discord_user_id=1, guild_id=GUILD_ID, details="tag")
+
+    sso.update_last_login_and_log(picked.id, "First", expected_last_login=picked.last_login, **log)
+    with pytest.raises(sso.SSOAccountClaimedError):
+        sso.update_last_login_and_log(picked.id, "Second", expected_last_login=picked.last_login, **log)
+
+    account = sso.get_account(GUILD_ID, "shared")
+    assert account.last_login > picked.last_login
+    assert account.last_login_by == "First"
+    assert sso_session.query(sso.SSOAuditLog).filter_by(account_id=picked.id).count() == 1
+
+
 def test_find_account_dynamic_tag_vpclr(sso_session, monkeypatch):
     monkeypatch.setattr(config, "SSO_INACTIVITY_SECONDS", 62)
     monkeypatch.setattr(config, "REQUIRE_KEYS_FOR_DYNAMIC_TAGS", False)
@@ -162,6 +181,155 @@ def test_find_account_dynamic_tag_vpclr(sso_session, monkeypatch):
     assert found.real_user == "dynacc"
 
 
+def test_dynamic_tag_pool_follows_mutators_without_rebuild(sso_session, monkeypatch):
+    monkeypatch.setattr(config, "SSO_INACTIVITY_SECONDS", 62)
+    monkeypatch.setattr(config, "REQUIRE_KEYS_FOR_DYNAMIC_TAGS", True)
+    for name, char in (("low", "Lowclr"), ("high", "Highclr")):
+        sso.create_account(GUILD_ID, name, "pw")
+        sso.add_account_character(GUILD_ID, name, char, sso.CharacterClass.Cleric)
+    sso_session.query(sso.SSOAccount).update({"last_login": datetime.datetime(1999, 1, 1)})
+    sso_session.commit()
+
+    with pytest.raises(sso.SSOTagTemporarilyEmptyError):
+        sso.find_account_by_username("vpclr", guild_id=GUILD_ID)
+
+    loads = []
+    real_load = sso._load_dynamic_tag_index
+    monkeypatch.setattr(sso, "_load_dynamic_tag_index", lambda gid: loads.append(gid) or real_load(gid))
+
+    sso.update_account_character(GUILD_ID, "Lowclr", park_location="veeshan", level=50)
+    sso.update_account_character(GUILD_ID, "Highclr", park_location="veeshan", level=60)
+    # Parked in VP but keyless: still not eligible while keys are required.
+    with pytest.raises(sso.SSOTagTemporarilyEmptyError):
+        sso.find_account_by_username("vpclr", guild_id=GUILD_ID)
+
+    sso.mark_key_from_park_zone(GUILD_ID, "Lowclr", "veeshan")
+    assert sso.find_account_by_username("vpclr", guild_id=GUILD_ID).real_user == "low"
+    sso.mark_key_from_park_zone(GUILD_ID, "Highclr", "veeshan")
+    # Both cold: the higher level wins.
+    assert sso.find_account_by_username("vpclr", guild_id=GUILD_ID).real_user == "high"
+
+    sso.update_last_login(sso.get_account(GUILD_ID, "high").id, login_by="someone")
+    assert sso.find_account_by_username("vpclr", guild_id=GUILD_ID).real_user == "low"
+    sso.update_account_character(GUILD_ID, "Lowclr", park_location="skyshrine")
+    with pytest.raises(sso.SSOTagTemporarilyEmptyError):
+        sso.find_account_by_username("vpclr", guild_id=GUILD_ID)
+    assert loads == []
+
+
+def test_dynamic_tag_pool_pick_matches_login_sort_key():
+    rng = random.Random(7)
+    now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    inactive_before = now - datetime.timedelta(seconds=62)
+    for _ in range(200):
+        pool = sso._DynamicTagPool()
+        accounts = {}
+        for account_id in range(rng.randint(1, 12)):
+            last_login = now - datetime.timedelta(seconds=rng.choice((0, 30, 45, 90, 95, 600, 1199, 1200, 5000)))
+            level = rng.randint(1, 60)
+            pool.set_character(account_id, account_id, level, last_login)
+            accounts[account_id] = SimpleNamespace(id=account_id, last_login=last_login, level=level)
+        eligible = [a for a in accounts.values() if a.last_login < inactive_before]
+        picked = pool.pick(now, inactive_before)
+        if not eligible:
+            assert picked is None
+            continue
+        best = min(_login_sort_key_for(a, now) for a in eligible)
+        assert _login_sort_key_for(accounts[picked], now) == best
+
+
+def _login_sort_key_for(account, now):
+    return sso._login_sort_key(account, now, lambda a: a.level)
+
+
+def test_resolve_name_priority_and_case(sso_session):
+    sso.create_account(GUILD_ID, "clash", "pw")
+    sso.create_account(GUILD_ID, "other", "pw")
+    sso.add_account_character(GUILD_ID, "other", "Clash", sso.CharacterClass.Cleric)
+    sso.add_account_character(GUILD_ID, "other", "Healer", sso.CharacterClass.Cleric)
+    sso.create_account_alias(GUILD_ID, "clash", "healer")
+    sso.tag_account(GUILD_ID, "clash", "pool")
+    sso.tag_account(GUILD_ID, "other", "pool")
+    clash = sso.get_account(GUILD_ID, "clash")
+    other = sso.get_account(GUILD_ID, "other")
+
+    assert sso.resolve_name(GUILD_ID, "CLASH") == ("account", (clash.id,))
+    assert sso.resolve_name(GUILD_ID, "healer") == ("character", (other.id,))
+    assert sso.resolve_name(GUILD_ID, "pool") == ("tag", (clash.id, other.id))
+    assert sso.resolve_name(GUILD_ID, "nobody") is None
+    assert sso.resolve_name(GUILD_ID + 1, "clash") is None
+
+
+def test_name_index_follows_mutations(sso_session):
+    sso.create_account(GUILD_ID, "acc", "pw")
+    assert sso.find_account_by_username("bob", guild_id=GUILD_ID) is None
+
+    sso.create_account_alias(GUILD_ID, "acc", "bob")
+    sso.add_account_character(GUILD_ID, "acc", "Raidmain", sso.CharacterClass.Warrior)
+    assert sso.find_account_by_username("bob", guild_id=GUILD_ID).real_user == "acc"
+    assert sso.find_account_by_username("raidmain", guild_id=GUILD_ID).real_user == "acc"
+
+    sso.delete_account_alias(GUILD_ID, "bob")
+    sso.remove_account_character(GUILD_ID, "Raidmain")
+    assert sso.find_account_by_username("bob", guild_id=GUILD_ID) is None
+    assert sso.find_account_by_username("raidmain", guild_id=GUILD_ID) is None
+
+    sso.tag_account(GUILD_ID, "acc", "old")
+    sso.update_tag(GUILD_ID, "old", new_name="new")
+    assert sso.resolve_name(GUILD_ID, "old") is None
+    assert sso.resolve_name(GUILD_ID, "new")[0] == "tag"
+
+    sso.delete_account(GUILD_ID, "acc")
+    assert sso.find_account_by_username("acc", guild_id=GUILD_ID) is None
+
+
+def test_access_index_follows_group_mutations(sso_session):
+    sso.create_account_group(GUILD_ID, "raiders", 100)
+    sso.create_account_group(GUILD_ID, "officers", 200)
+    sso.create_account(GUILD_ID, "a", "pw", group="raiders")
+    sso.create_account(GUILD_ID, "b", "pw")
+    a, b = sso.get_account(GUILD_ID, "a").id, sso.get_account(GUILD_ID, "b").id
+
+    assert sso.accessible_account_ids(GUILD_ID, {100}, [a, b]) == [a]
+    assert sso.accessible_account_ids(GUILD_ID, {200, 999}, [a, b]) == []
+    assert sso.accessible_account_ids(GUILD_ID + 1, {100}, [a, b]) == []
+
+    sso.add_account_to_group(GUILD_ID, "officers", "b")
+    assert sso.accessible_account_ids(GUILD_ID, {100, 200}, [b, a]) == [b, a]
+    sso.remove_account_from_group(GUILD_ID, "raiders", "a")
+    assert sso.accessible_account_ids(GUILD_ID, {100}, [a, b]) == []
+    sso.delete_account_group(GUILD_ID, "officers")
+    assert sso.accessible_account_ids(GUILD_ID, {200}, [b]) == []
+
+
+def test_access_index_answers_from_cache(sso_session):
+    sso.create_account_group(GUILD_ID, "raiders", 100)
+    sso.create_account(GUILD_ID, "a", "pw", group="raiders")
+    account_id = sso.get_account(GUILD_ID, "a").id
+    sso.get_access_index(GUILD_ID)
+
+    statements = []
+    engine = sso_session.get_bind()
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    sqlalchemy.event.listen(engine, "before_cursor_execute", listener)
+    try:
+        for _ in range(5):
+            assert sso.accessible_account_ids(GUILD_ID, {100}, [account_id]) == [account_id]
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+
+def test_find_account_by_username_stale_index_rebuilds(sso_session):
+    sso.create_account(GUILD_ID, "gone", "pw")
+    assert sso.resolve_name(GUILD_ID, "gone") is not None
+    # Removed behind the helpers' back: the primary-key fetch misses and the index is rebuilt.
+    sso_session.query(sso.SSOAccount).delete()
+    sso_session.commit()
+    assert sso.find_account_by_username("gone", guild_id=GUILD_ID) is None
+    assert sso.resolve_name(GUILD_ID, "gone") is None
+
+
 def test_tag_temporarily_empty_raises(sso_session, monkeypatch):
     monkeypatch.setattr(config, "SSO_INACTIVITY_SECONDS", 62)
     sso.create_account(GUILD_ID, "only", "pw")
@@ -226,6 +394,39 @@ def test_access_key_cache_invalidation(sso_session, monkeypatch):
     assert sso.get_access_key_by_key(key2.access_key) is not None
 
 
+def test_access_key_cache_updated_in_place(sso_session, monkeypatch):
+    keys = iter(["KeyAlpha", "KeyBravo", "KeyCharlie"])
+    monkeypatch.setattr(sso, "generate_access_key", lambda: next(keys))
+    sso.get_access_key_by_user(GUILD_ID, 1)
+    assert sso.get_access_key_by_key("KeyAlpha").discord_user_id == 1
+
+    def no_reload():
+        raise AssertionError("access key cache reloaded")
+
+    monkeypatch.setattr(sso, "_load_access_key_cache", no_reload)
+    sso.get_access_key_by_user(GUILD_ID, 2)
+    sso.reset_access_key(GUILD_ID, 1)
+    assert sso.get_access_key_by_key("KeyAlpha") is None
+    assert sso.get_access_key_by_key("KeyCharlie").discord_user_id == 1
+    assert sso.get_access_key_by_key("KeyBravo").discord_user_id == 2
+    sso.delete_access_key(GUILD_ID, 2)
+    assert sso.get_access_key_by_key("KeyBravo") is None
+
+
+def test_revocation_cache_updated_in_place(sso_session, monkeypatch):
+    assert sso.is_user_access_revoked(GUILD_ID, 5) is False
+
+    def no_reload():
+        raise AssertionError("revocation cache reloaded")
+
+    monkeypatch.setattr(sso, "_load_revocation_cache", no_reload)
+    sso.revoke_user_access(GUILD_ID, 5, expiry_days=3)
+    assert sso.is_user_access_revoked(GUILD_ID, 5) is True
+    assert sso.is_user_access_revoked(GUILD_ID, 6) is False
+    sso.remove_access_revocation(GUILD_ID, 5)
+    assert sso.is_user_access_revoked(GUILD_ID, 5) is False
+
+
 def test_get_audit_logs_excludes_noise_usernames(sso_session):
     sso.create_audit_log("keeper", ip_address="1.1.1.1", success=True, guild_id=GUILD_ID, account_id=None)
     sso.create_audit_log("list_accounts", ip_address="1.1.1.1", success=False, guild_id=GUILD_ID)
@@ -306,3 +507,101 @@ def test_mark_key_from_park_zone_sets_key_updated_at(sso_session):
     ch = sso_session.query(sso.SSOAccountCharacter).filter_by(name="Wiz", guild_id=GUILD_ID).one()
     assert ch.key_seb is True
     assert ch.key_seb_updated_at == t1
+
+
+def test_apply_presence_updates_single_transaction(sso_session):
+    from types import SimpleNamespace
+
+    sso.create_account(GUILD_ID, "presence1", "pw")
+    sso.create_account(GUILD_ID, "presence2", "pw")
+    a1 = sso.get_account(GUILD_ID, "presence1")
+    a2 = sso.get_account(GUILD_ID, "presence2")
+    sso.add_account_character(GUILD_ID, "presence1", "Walker", sso.CharacterClass.Monk)
+    sso.add_account_character(GUILD_ID, "presence2", "Sitter", sso.CharacterClass.Bard)
+
+    now = datetime.datetime.now()
+
+    def update(account, name, **kw):
+        fields = {
+            "guild_id": GUILD_ID,
+            "account_id": account.id,
+            "character_name": name,
+            "discord_user_id": 4242,
+            "login_by": "Player",
+            "seen_at": now,
+            "character_fields": {},
+            "park_zone_keys": [],
+        }
+        fields.update(kw)
+        return SimpleNamespace(**fields)
+
+    changed = sso.apply_presence_updates(
+        [
+            update(a2, "Sitter"),
+            update(
+                a1, "Walker", character_fields={"park_location": "sebilis", "item_pearl": 3}, park_zone_keys=["sebilis"]
+            ),
+        ]
+    )
+    assert changed == {GUILD_ID}
+
+    walker = sso_session.query(sso.SSOAccountCharacter).filter_by(name="Walker", guild_id=GUILD_ID).one()
+    assert walker.park_location == "sebilis"
+    assert walker.item_pearl == 3
+    assert walker.key_seb is True
+    assert sso.get_account(GUILD_ID, "presence1").last_login_by == "Player"
+    # The later entry for the same user expires the earlier character's session.
+    assert sso.get_active_characters(GUILD_ID) == {a1.id: "Walker"}
+
+    assert sso.apply_presence_updates([update(a1, "Walker")]) == set()
+    assert sso.apply_presence_updates([]) == set()
+
+
+def test_failed_attempts_seeded_from_audit_log(sso_session, monkeypatch):
+    ip = "198.51.100.20"
+    now = datetime.datetime.now()
+    sso_session.add_all(
+        [
+            sso.SSOAuditLog("u", ip_address=ip, success=False, timestamp=now - datetime.timedelta(minutes=5)),
+            sso.SSOAuditLog("u", ip_address=ip, success=False, timestamp=now - datetime.timedelta(minutes=45)),
+            sso.SSOAuditLog("u", ip_address=ip, success=False, timestamp=now - datetime.timedelta(days=1)),
+            sso.SSOAuditLog("u", ip_address=ip, success=True, timestamp=now),
+            sso.SSOAuditLog("u", ip_address=ip, success=False, rate_limit=False, timestamp=now),
+        ]
+    )
+    sso_session.commit()
+    sso.load_failed_attempts()
+
+    # Served from memory: no session needed any more.
+    def no_session(*a, **k):
+        raise AssertionError("rate limit check hit the database")
+
+    monkeypatch.setattr(base, "get_session", no_session)
+    assert sso.count_failed_attempts(ip, minutes=30) == 1
+    assert sso.count_failed_attempts(ip, minutes=60) == 2
+    assert sso.is_ip_rate_limited(ip, max_attempts=2, minutes=30) is False
+    assert sso.is_ip_rate_limited(ip, max_attempts=2, minutes=60) is True
+
+
+def test_failed_attempts_window_slides(sso_session):
+    ip = "198.51.100.21"
+    with freeze_time("2026-01-01 12:00:00") as frozen:
+        for _ in range(3):
+            sso.create_audit_log("u", ip_address=ip, success=False)
+        assert sso.is_ip_rate_limited(ip, max_attempts=3, minutes=30) is True
+        frozen.tick(datetime.timedelta(minutes=31))
+        assert sso.is_ip_rate_limited(ip, max_attempts=3, minutes=30) is False
+        assert sso.count_failed_attempts(ip, minutes=60) == 3
+        # Longer than the in-memory horizon: counted in the audit log.
+        assert sso.count_failed_attempts(ip, minutes=24 * 60) == 3
+
+
+def test_clear_rate_limit_resets_in_memory_window(sso_session):
+    ip = "198.51.100.22"
+    for _ in range(3):
+        sso.create_audit_log("u", ip_address=ip, success=False)
+    assert sso.is_ip_rate_limited(ip, max_attempts=3, minutes=30) is True
+    sso.clear_rate_limit(ip)
+    assert sso.is_ip_rate_limited(ip, max_attempts=3, minutes=30) is False
+    sso.invalidate_failed_attempts_cache()
+    assert sso.count_failed_attempts(ip) == 0
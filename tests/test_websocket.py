@@ -7,7 +7,7 @@ from types import SimpleNamespace
 
 from roboToald.db.models import sso as sso_model
 from roboToald.db.models.sso import CharacterClass
-from roboToald.api.websocket import build_account_tree, compute_diff
+from roboToald.api.websocket import WS_PROTOCOL_CHARACTER_PATCHES, build_account_tree, compute_diff
 
 
 def _char(name, klass=None, **kwargs):
@@ -239,3 +239,21 @@ def test_compute_diff_scalar_fields():
     assert ch["last_login"] == "b"
     assert ch["last_login_by"] == "bob"
     assert ch["active_character"] == "Z"
+
+
+def test_compute_diff_character_patch_protocol():
+    items = {"seb": None, "vp": None, "st": None, "void": 1, "neck": None}
+    char_blob = {"class": "Cleric", "bind": "ecommons", "park": None, "level": 60, "items": items, "keys": {}}
+    acct = {"aliases": [], "tags": [], "last_login": None, "last_login_by": None, "active_character": None}
+    old_t = {"u": {**acct, "characters": {"A": char_blob, "C": char_blob}}}
+    new_a = {**char_blob, "park": "Western Wastes", "items": {**items, "vp": True}, "keys": {"vp": True}}
+    new_t = {"u": {**acct, "characters": {"A": new_a, "B": char_blob}}}
+
+    fields = compute_diff(old_t, new_t, protocol=WS_PROTOCOL_CHARACTER_PATCHES)[0]["fields"]["characters"]
+    assert fields == {
+        "add": {"B": char_blob},
+        "remove": ["C"],
+        "patch": {"A": {"park": "Western Wastes", "items": {"vp": True}}},
+    }
+    # Protocol 1 clients still get the full entry.
+    assert compute_diff(old_t, new_t)[0]["fields"]["characters"]["update"] == {"A": new_a}
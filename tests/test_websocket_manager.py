@@ -3,45 +3,116 @@
 from __future__ import annotations
 
 import asyncio
+import json
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from starlette.websockets import WebSocket, WebSocketState
 
-from roboToald.api.websocket import ClientConnection, ConnectionManager, _brief_exc_info
+from roboToald.api.websocket import (
+    ClientConnection,
+    ConnectionManager,
+    GuildSnapshot,
+    TreeEntry,
+    _brief_exc_info,
+    tree_fingerprints,
+)
+from roboToald.db.models.sso import AccessIndex
 
 
-def test_filter_accessible_no_discord_client():
-    mgr = ConnectionManager()
-    acc = SimpleNamespace(groups=[SimpleNamespace(role_id=1)])
-    assert mgr._filter_accessible(1, 10, [acc]) == []
+ROLE = SimpleNamespace(role_id=100)
+
+# Role grants of every fake account, by account id; the latest ``_account`` call for an id wins.
+_grants: dict[int, frozenset[int]] = {}
+_indexes: dict[frozenset, AccessIndex] = {}
+
+
+@pytest.fixture(autouse=True)
+def access_index(monkeypatch):
+    """Serve ``get_access_index`` from the ``groups`` of the fake accounts (one group per role)."""
+
+    def get_access_index(guild_id):
+        grants = frozenset((account_id, role_id) for account_id, roles in _grants.items() for role_id in roles)
+        index = _indexes.get(grants)
+        if index is None:
+            roles = {role_id for _, role_id in grants}
+            index = _indexes[grants] = AccessIndex(
+                role_groups={role_id: frozenset({role_id}) for role_id in roles},
+                group_accounts={role_id: frozenset(a for a, r in grants if r == role_id) for role_id in roles},
+            )
+        return index
+
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.get_access_index", get_access_index)
+    yield
+    _grants.clear()
+    _indexes.clear()
+
+
+def _account(account_id, real_user, **kw):
+    base = dict(aliases=[], tags=[], characters=[], last_login=None, last_login_by=None, groups=[ROLE])
+    base.update(kw)
+    _grants[account_id] = frozenset(g.role_id for g in base["groups"])
+    return SimpleNamespace(id=account_id, real_user=real_user, **base)
+
+
+def _mock_ws():
+    ws = MagicMock(spec=WebSocket)
+    ws.client_state = WebSocketState.CONNECTED
+    ws.send_json = AsyncMock()
+    ws.send_text = AsyncMock()
+    return ws
+
+
+def _sent(ws) -> dict:
+    ws.send_text.assert_awaited()
+    return json.loads(ws.send_text.await_args[0][0])
 
 
-def test_filter_accessible_no_member():
+def _loaded_snapshot(monkeypatch, accounts, guild_id=1, active=None) -> GuildSnapshot:
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid, **kw: list(accounts))
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.get_active_characters", lambda gid: dict(active or {}))
+    snapshot = GuildSnapshot(guild_id)
+    snapshot.refresh()
+    return snapshot
+
+
+def test_tree_for_roles_uses_access_index(monkeypatch):
+    snapshot = _loaded_snapshot(
+        monkeypatch, [_account(10, "alpha"), _account(20, "beta", groups=[SimpleNamespace(role_id=200)])]
+    )
+    assert snapshot.role_key({100, 999}) == {100}
+    assert list(snapshot.tree_for_roles(frozenset({100}))) == ["alpha"]
+    assert list(snapshot.tree_for_roles(frozenset({100, 200}))) == ["alpha", "beta"]
+    assert snapshot.tree_for_roles(frozenset()) == {}
+
+
+def test_tree_for_roles_follows_access_index_changes(monkeypatch):
+    snapshot = _loaded_snapshot(monkeypatch, [_account(10, "alpha"), _account(20, "beta")])
+    version = snapshot.version
+    assert list(snapshot.tree_for_roles(frozenset({100}))) == ["alpha", "beta"]
+
+    # beta moved to another group: no account field changed, but the index did.
+    _account(20, "beta", groups=[SimpleNamespace(role_id=200)])
+    assert snapshot.refresh() is True
+    assert snapshot.version == version + 1
+    assert snapshot.changed_since(version) == {"alpha", "beta"}
+    assert list(snapshot.tree_for_roles(frozenset({100}))) == ["alpha"]
+    assert snapshot.role_key({200}) == {200}
+
+
+def test_role_key_no_discord_client(monkeypatch):
     mgr = ConnectionManager()
-    dc = MagicMock()
-    dc.get_guild.return_value.get_member.return_value = None
-    mgr.set_discord_client(dc)
-    acc = SimpleNamespace(groups=[SimpleNamespace(role_id=1)])
-    assert mgr._filter_accessible(1, 10, [acc]) == []
+    _loaded_snapshot(monkeypatch, [_account(10, "alpha")], guild_id=10)
+    assert mgr.role_key(10, 1) == frozenset()
 
 
-def test_filter_accessible_matches_role():
+def test_role_key_no_member(monkeypatch):
     mgr = ConnectionManager()
-    role = SimpleNamespace(id=100)
-    member = MagicMock()
-    member.roles = [role]
-    guild = MagicMock()
-    guild.get_member.return_value = member
     dc = MagicMock()
-    dc.get_guild.return_value = guild
+    dc.get_guild.return_value.get_member.return_value = None
     mgr.set_discord_client(dc)
-
-    acc_ok = SimpleNamespace(groups=[SimpleNamespace(role_id=100)])
-    acc_no = SimpleNamespace(groups=[SimpleNamespace(role_id=200)])
-    out = mgr._filter_accessible(42, 7, [acc_ok, acc_no])
-    assert out == [acc_ok]
+    assert mgr.role_key(10, 1) == frozenset()
 
 
 def test_brief_exc_info_inside_except():
@@ -114,67 +185,40 @@ async def test_disconnect_user_async_sends_error_and_unregisters(monkeypatch):
 @pytest.mark.asyncio
 async def test_build_full_state(monkeypatch):
     mgr = ConnectionManager()
-    acc = SimpleNamespace(
-        id=1,
-        real_user="alpha",
-        aliases=[],
-        tags=[],
-        characters=[],
-        last_login=None,
-        last_login_by=None,
-    )
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid: [acc])
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.get_active_characters", lambda gid: {})
-    monkeypatch.setattr(mgr, "_filter_accessible", lambda uid, gid, accounts: accounts)
+    _loaded_snapshot(monkeypatch, [_account(1, "alpha")])
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
     tree = await mgr.build_full_state(1, 99)
     assert tree["alpha"]["aliases"] == []
+    assert mgr.role_key(1, 99) == {100}
 
 
 @pytest.mark.asyncio
 async def test_push_delta_sends_when_tree_changes(monkeypatch):
     mgr = ConnectionManager()
-    ws = MagicMock(spec=WebSocket)
-    ws.client_state = WebSocketState.CONNECTED
-    ws.send_json = AsyncMock()
-    acc = SimpleNamespace(
-        id=1,
-        real_user="alpha",
-        aliases=[],
-        tags=[],
-        characters=[],
-        last_login=None,
-        last_login_by=None,
-    )
+    ws = _mock_ws()
     conn = ClientConnection(
         websocket=ws,
         guild_id=1,
         discord_user_id=9,
-        last_sent_state={
-            "alpha": {
-                "aliases": [],
-                "tags": [],
-                "characters": {},
-                "last_login": None,
-                "last_login_by": None,
-                "active_character": None,
+        sent_fingerprints=tree_fingerprints(
+            {
+                "alpha": TreeEntry(
+                    {
+                        "aliases": [],
+                        "tags": [],
+                        "characters": {},
+                        "last_login": None,
+                        "last_login_by": None,
+                        "active_character": None,
+                    }
+                )
             }
-        },
-    )
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid: [acc])
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.get_active_characters", lambda gid: {})
-    monkeypatch.setattr(mgr, "_filter_accessible", lambda uid, gid, accounts: accounts)
-    acc2 = SimpleNamespace(
-        id=1,
-        real_user="alpha",
-        aliases=[SimpleNamespace(alias="newalias")],
-        tags=[],
-        characters=[],
-        last_login=None,
-        last_login_by=None,
+        ),
     )
-    await mgr._push_delta(conn, 1, [acc2], {})
-    ws.send_json.assert_awaited()
-    call = ws.send_json.await_args[0][0]
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+    acc2 = _account(1, "alpha", aliases=[SimpleNamespace(alias="newalias")])
+    await mgr._push_delta(conn, _loaded_snapshot(monkeypatch, [acc2]))
+    call = _sent(ws)
     assert call["type"] == "delta"
     assert call["changes"]
 
@@ -182,9 +226,7 @@ async def test_push_delta_sends_when_tree_changes(monkeypatch):
 @pytest.mark.asyncio
 async def test_push_delta_skips_when_no_changes(monkeypatch):
     mgr = ConnectionManager()
-    ws = MagicMock(spec=WebSocket)
-    ws.client_state = WebSocketState.CONNECTED
-    ws.send_json = AsyncMock()
+    ws = _mock_ws()
     blob = {
         "aliases": [],
         "tags": [],
@@ -193,21 +235,12 @@ async def test_push_delta_skips_when_no_changes(monkeypatch):
         "last_login_by": None,
         "active_character": None,
     }
-    acc = SimpleNamespace(
-        id=1,
-        real_user="alpha",
-        aliases=[],
-        tags=[],
-        characters=[],
-        last_login=None,
-        last_login_by=None,
+    conn = ClientConnection(
+        websocket=ws, guild_id=1, discord_user_id=9, sent_fingerprints={"alpha": TreeEntry(blob).fingerprint}
     )
-    conn = ClientConnection(websocket=ws, guild_id=1, discord_user_id=9, last_sent_state={"alpha": dict(blob)})
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid: [acc])
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.get_active_characters", lambda gid: {})
-    monkeypatch.setattr(mgr, "_filter_accessible", lambda uid, gid, accounts: accounts)
-    await mgr._push_delta(conn, 1, [acc], {})
-    ws.send_json.assert_not_called()
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+    await mgr._push_delta(conn, _loaded_snapshot(monkeypatch, [_account(1, "alpha")]))
+    ws.send_text.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -232,23 +265,399 @@ async def test_notify_guild_entry_immediate_pushes_delta(monkeypatch):
     mgr = ConnectionManager()
     loop = asyncio.get_running_loop()
     mgr.set_event_loop(loop)
-    ws = MagicMock(spec=WebSocket)
-    ws.client_state = WebSocketState.CONNECTED
-    ws.send_json = AsyncMock()
-    acc = SimpleNamespace(
-        id=1,
-        real_user="a",
-        aliases=[],
-        tags=[],
-        characters=[],
-        last_login=None,
-        last_login_by=None,
-    )
-    conn = ClientConnection(websocket=ws, guild_id=7, discord_user_id=8, last_sent_state={})
+    ws = _mock_ws()
+    conn = ClientConnection(websocket=ws, guild_id=7, discord_user_id=8)
     mgr.register(conn)
-    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid: [acc])
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid: [_account(1, "a")])
     monkeypatch.setattr("roboToald.api.websocket.sso_model.get_active_characters", lambda gid: {})
-    monkeypatch.setattr(mgr, "_filter_accessible", lambda uid, gid, accounts: accounts)
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
     await mgr._notify_guild_entry(7, immediate=True)
-    ws.send_json.assert_awaited()
-    assert ws.send_json.await_args[0][0]["type"] == "delta"
+    assert _sent(ws)["type"] == "delta"
+
+
+def test_snapshot_refresh_reloads_only_dirty_accounts(monkeypatch):
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha"), _account(2, "beta")])
+    assert snapshot.version == 1
+    beta_entry = snapshot.entries[2]
+
+    calls = []
+
+    def fake_list(gid, account_ids=None):
+        calls.append(account_ids)
+        return [_account(1, "alpha", aliases=[SimpleNamespace(alias="a1")])]
+
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", fake_list)
+    snapshot.mark_changed({1})
+    assert snapshot.refresh() is True
+    assert calls == [{1}]
+    assert snapshot.version == 2
+    assert snapshot.entries[1]["aliases"] == ["a1"]
+    assert snapshot.entries[2] is beta_entry
+    assert snapshot.changed_since(1) == {"alpha"}
+    assert snapshot.changed_since(2) == frozenset()
+    assert snapshot.changed_since(-1) is None
+
+    # Nothing dirty and no active-character change: no reload, no version bump.
+    assert snapshot.refresh() is False
+    assert calls == [{1}]
+
+
+def test_snapshot_refresh_tracks_active_characters_and_deletes(monkeypatch):
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha"), _account(2, "beta")])
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.get_active_characters", lambda gid: {2: "Bob"})
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", lambda gid, account_ids=None: [])
+    snapshot.mark_changed({1})
+    assert snapshot.refresh() is True
+    assert 1 not in snapshot.entries
+    assert snapshot.entries[2]["active_character"] == "Bob"
+    assert snapshot.changed_since(1) == {"alpha", "beta"}
+
+
+def test_snapshot_refresh_failure_keeps_dirty_accounts(monkeypatch):
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha")])
+
+    def boom(gid, account_ids=None):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr("roboToald.api.websocket.sso_model.list_accounts", boom)
+    snapshot.mark_changed({1})
+    with pytest.raises(RuntimeError):
+        snapshot.refresh()
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [_account(1, "alpha", last_login_by="Someone")],
+    )
+    assert snapshot.refresh() is True
+    assert snapshot.entries[1]["last_login_by"] == "Someone"
+
+
+@pytest.mark.asyncio
+async def test_push_delta_partial_diff_only_sends_changed_and_visibility(monkeypatch):
+    mgr = ConnectionManager()
+    ws = _mock_ws()
+    roles = {100}
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: roles)
+
+    gamma_group = SimpleNamespace(role_id=200)
+    snapshot = _loaded_snapshot(
+        monkeypatch, [_account(1, "alpha"), _account(2, "beta"), _account(3, "gamma", groups=[gamma_group])]
+    )
+    conn = ClientConnection(
+        websocket=ws,
+        guild_id=1,
+        discord_user_id=9,
+        sent_fingerprints=dict(snapshot.fingerprints_for_roles(frozenset({100}))),
+        snapshot_version=snapshot.version,
+        role_key=frozenset({100}),
+    )
+    # Stale fingerprint the partial diff must not look at: only changed / visibility-changed names are compared.
+    conn.sent_fingerprints["beta"] = 12345
+
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [_account(1, "alpha", tags=[SimpleNamespace(tag="vp")])],
+    )
+    snapshot.mark_changed({1})
+    snapshot.refresh()
+    roles.add(200)
+    await mgr._push_delta(conn, snapshot)
+
+    changes = _sent(ws)["changes"]
+    assert {(c["action"], c["account"]) for c in changes} == {("update", "alpha"), ("add", "gamma")}
+    assert conn.snapshot_version == snapshot.version
+    assert conn.role_key == {100, 200}
+    assert conn.sent_fingerprints["gamma"] == snapshot.entries[3].fingerprint
+    assert conn.sent_fingerprints["alpha"] == snapshot.entries[1].fingerprint
+    assert conn.sent_fingerprints["beta"] == 12345
+
+
+def test_accounts_changed_subscriber_registered():
+    from roboToald.api import websocket
+    from roboToald.db import invalidation
+
+    assert websocket.manager.on_accounts_changed in invalidation.bus.subscribers(invalidation.AccountsChanged)
+
+
+@pytest.mark.asyncio
+async def test_push_snapshot_shares_diff_and_frame_per_role_set(monkeypatch):
+    mgr = ConnectionManager()
+    officer = SimpleNamespace(role_id=300)
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha"), _account(2, "beta", groups=[officer])])
+    member_roles = {10: {100, 999}, 11: {100}, 12: {100, 300}}
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: member_roles[uid])
+
+    conns = {}
+    for uid in member_roles:
+        key = snapshot.role_key(member_roles[uid])
+        conns[uid] = ClientConnection(
+            websocket=_mock_ws(),
+            guild_id=1,
+            discord_user_id=uid,
+            sent_fingerprints=snapshot.fingerprints_for_roles(key),
+            snapshot_version=snapshot.version,
+            role_key=key,
+        )
+
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [
+            _account(1, "alpha", last_login_by="x"),
+            _account(2, "beta", groups=[officer], last_login_by="y"),
+        ],
+    )
+    snapshot.mark_changed({1, 2})
+    snapshot.refresh()
+
+    diffs = []
+    real_diff = ConnectionManager._diff_for
+    monkeypatch.setattr(mgr, "_diff_for", lambda *a: diffs.append(a) or real_diff(*a))
+    await mgr._push_snapshot(1, snapshot, list(conns.values()))
+
+    # Users 10 and 11 reduce to the same role key {100}; user 12 also sees the officer account.
+    assert len(diffs) == 2
+    frame_10 = conns[10].websocket.send_text.await_args[0][0]
+    assert frame_10 is conns[11].websocket.send_text.await_args[0][0]
+    assert conns[10].sent_fingerprints is conns[11].sent_fingerprints
+    assert {c["account"] for c in json.loads(frame_10)["changes"]} == {"alpha"}
+    frame_12 = json.loads(conns[12].websocket.send_text.await_args[0][0])
+    assert {c["account"] for c in frame_12["changes"]} == {"alpha", "beta"}
+
+
+def test_encode_message_matches_stdlib_without_orjson(monkeypatch):
+    from roboToald.api import websocket
+
+    msg = {"type": "delta", "changes": [{"account": "ünïcode", "fields": {"level": 60, "bind": None}}]}
+    encoded = websocket._encode_message(msg)
+    monkeypatch.setattr(websocket, "orjson", None)
+    assert websocket._encode_message(msg) == encoded
+    assert json.loads(encoded) == msg
+
+
+def test_compact_tree_and_changes():
+    from roboToald.api.websocket import compact_changes, compact_tree
+
+    char = {"class": "Cleric", "bind": "ecommons", "park": None, "level": 60, "items": {"seb": True}, "keys": {}}
+    tree = {"alpha": {"aliases": ["a1"], "tags": [], "characters": {"Bob": char}, "last_login": None}}
+    assert compact_tree(tree) == {
+        "alpha": {
+            "a": ["a1"],
+            "t": [],
+            "c": {"Bob": {"k": "Cleric", "b": "ecommons", "p": None, "l": 60, "i": {"seb": True}}},
+            "ll": None,
+        }
+    }
+    changes = [
+        {"action": "add", "entity": "account", "account": "alpha", "data": tree["alpha"]},
+        {
+            "action": "update",
+            "entity": "account",
+            "account": "beta",
+            "fields": {
+                "tags": {"add": ["vp"], "remove": []},
+                "characters": {"update": {"Bob": char}, "remove": ["Al"]},
+            },
+        },
+    ]
+    out = compact_changes(changes)
+    assert out[0]["data"]["c"]["Bob"]["k"] == "Cleric"
+    assert out[1]["fields"]["t"] == {"add": ["vp"], "remove": []}
+    assert out[1]["fields"]["c"] == {"update": {"Bob": compact_tree(tree)["alpha"]["c"]["Bob"]}, "remove": ["Al"]}
+    assert changes[1]["fields"]["characters"]["update"]["Bob"] is char
+
+
+@pytest.mark.asyncio
+async def test_full_state_frame_reuses_encoded_tree(monkeypatch):
+    mgr = ConnectionManager()
+    _loaded_snapshot(monkeypatch, [_account(1, "alpha")])
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+    tree = await mgr.build_full_state(1, 99)
+
+    frame = mgr.full_state_frame(1, tree, count=1, dynamic_tag_zones=["vp"])
+    assert json.loads(frame) == {"type": "full_state", "account_tree": tree, "count": 1, "dynamic_tag_zones": ["vp"]}
+    assert mgr._snapshots[1]._encoded_trees[(frozenset({100}), False)] in frame
+    compact = json.loads(mgr.full_state_frame(1, tree, compact=True))
+    assert compact == {
+        "type": "full_state",
+        "account_tree": {"alpha": {"a": [], "t": [], "c": {}, "ll": None, "lb": None, "ac": None}},
+    }
+
+
+@pytest.mark.asyncio
+async def test_push_group_encodes_once_per_mode(monkeypatch):
+    mgr = ConnectionManager()
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha")])
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+    key = frozenset({100})
+    conns = [
+        ClientConnection(
+            websocket=_mock_ws(),
+            guild_id=1,
+            discord_user_id=uid,
+            sent_fingerprints=snapshot.fingerprints_for_roles(key),
+            snapshot_version=snapshot.version,
+            role_key=key,
+            compact_keys=uid == 3,
+        )
+        for uid in (1, 2, 3)
+    ]
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [_account(1, "alpha", last_login_by="x")],
+    )
+    snapshot.mark_changed({1})
+    snapshot.refresh()
+
+    from roboToald.api import websocket
+
+    encoded = []
+    real_encode = websocket._encode_message
+    monkeypatch.setattr(websocket, "_encode_message", lambda m: encoded.append(m) or real_encode(m))
+    await mgr._push_snapshot(1, snapshot, conns)
+
+    assert len(encoded) == 2
+    assert _sent(conns[0].websocket)["changes"][0]["fields"] == {"last_login_by": "x"}
+    assert _sent(conns[2].websocket)["changes"][0]["fields"] == {"lb": "x"}
+
+
+def test_snapshot_entries_fingerprint_content(monkeypatch):
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha"), _account(2, "beta")])
+    alpha, beta = snapshot.entries[1], snapshot.entries[2]
+    assert alpha.fingerprint == beta.fingerprint
+    assert alpha.fingerprint == TreeEntry(dict(alpha)).fingerprint
+    assert json.loads(json.dumps(alpha)) == alpha
+
+    # A full reload with identical content keeps the entry (and its fingerprint); a change replaces it.
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [_account(1, "alpha"), _account(2, "beta", tags=[SimpleNamespace(tag="vp")])],
+    )
+    snapshot.mark_changed(None)
+    assert snapshot.refresh() is True
+    assert snapshot.entries[1] is alpha
+    assert snapshot.entries[2].fingerprint != beta.fingerprint
+    assert snapshot.entry_for(beta.fingerprint) is not None
+    assert snapshot.changed_since(1) == {"beta"}
+
+
+@pytest.mark.asyncio
+async def test_diff_for_skips_unchanged_fingerprints(monkeypatch):
+    mgr = ConnectionManager()
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+    snapshot = _loaded_snapshot(monkeypatch, [_account(i, f"user{i}") for i in range(1, 51)])
+    key = frozenset({100})
+    conn = ClientConnection(websocket=_mock_ws(), guild_id=1, discord_user_id=9)
+    conn.sent_fingerprints = dict(snapshot.fingerprints_for_roles(key))
+
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [_account(7, "user7", last_login_by="x")],
+    )
+    snapshot.mark_changed({7})
+    snapshot.refresh()
+
+    from roboToald.api import websocket
+
+    compared = []
+    real_update = websocket._update_change
+    monkeypatch.setattr(websocket, "_update_change", lambda *a: compared.append(a[0]) or real_update(*a))
+    # role_key None forces the full path: every name is considered, only the moved fingerprint is diffed.
+    await mgr._push_delta(conn, snapshot)
+    assert compared == ["user7"]
+    assert _sent(conn.websocket)["changes"] == [
+        {"action": "update", "entity": "account", "account": "user7", "fields": {"last_login_by": "x"}}
+    ]
+    assert conn.sent_fingerprints is snapshot.fingerprints_for_roles(key)
+
+
+@pytest.mark.asyncio
+async def test_diff_for_lagging_connection_uses_retained_entries(monkeypatch):
+    from roboToald.api import websocket
+
+    monkeypatch.setattr(websocket, "WS_SNAPSHOT_HISTORY", 4)
+    mgr = ConnectionManager()
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha"), _account(2, "beta", last_login_by="b")])
+    key = frozenset({100})
+    behind = ClientConnection(
+        websocket=_mock_ws(),
+        guild_id=1,
+        discord_user_id=9,
+        sent_fingerprints=snapshot.fingerprints_for_roles(key),
+        snapshot_version=snapshot.version,
+        role_key=key,
+    )
+    original_alpha = snapshot.entries[1].fingerprint
+
+    for n in range(3):
+        monkeypatch.setattr(
+            "roboToald.api.websocket.sso_model.list_accounts",
+            lambda gid, account_ids=None, n=n: [_account(1, "alpha", aliases=[SimpleNamespace(alias=f"a{n}")])],
+        )
+        snapshot.mark_changed({1})
+        snapshot.refresh()
+
+    await mgr._push_delta(behind, snapshot)
+    [change] = _sent(behind.websocket)["changes"]
+    assert change["fields"] == {"aliases": {"add": ["a2"], "remove": []}}
+
+    # Once the held entry ages out of the history window the account is replaced wholesale.
+    behind.sent_fingerprints = {"alpha": original_alpha, "beta": snapshot.entries[2].fingerprint}
+    for n in range(3, 9):
+        monkeypatch.setattr(
+            "roboToald.api.websocket.sso_model.list_accounts",
+            lambda gid, account_ids=None, n=n: [_account(1, "alpha", aliases=[SimpleNamespace(alias=f"a{n}")])],
+        )
+        snapshot.mark_changed({1})
+        snapshot.refresh()
+    assert snapshot.entry_for(original_alpha) is None
+    behind.role_key = None
+    await mgr._push_delta(behind, snapshot)
+    assert [(c["action"], c["account"]) for c in _sent(behind.websocket)["changes"]] == [
+        ("remove", "alpha"),
+        ("add", "alpha"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_push_snapshot_patches_characters_for_protocol_2(monkeypatch):
+    from roboToald.api.websocket import WS_PROTOCOL_CHARACTER_PATCHES
+
+    mgr = ConnectionManager()
+    monkeypatch.setattr(mgr, "_member_role_ids", lambda gid, uid: {100})
+
+    def _char(**kw):
+        attrs = dict(name="Bob", klass=None, bind_location=None, park_location=None, level=60)
+        attrs.update({a: None for a in ("key_seb", "key_vp", "key_st", "item_void", "item_neck", "item_lizard")})
+        attrs.update({a: None for a in ("item_thurg", "item_reaper", "item_brass_idol", "item_pearl", "item_peridot")})
+        attrs.update({a: None for a in ("item_mb3", "item_mb4", "item_mb5")})
+        attrs.update(kw)
+        return SimpleNamespace(**attrs)
+
+    snapshot = _loaded_snapshot(monkeypatch, [_account(1, "alpha", characters=[_char()])])
+    key = frozenset({100})
+    conns = [
+        ClientConnection(
+            websocket=_mock_ws(),
+            guild_id=1,
+            discord_user_id=uid,
+            sent_fingerprints=snapshot.fingerprints_for_roles(key),
+            snapshot_version=snapshot.version,
+            role_key=key,
+            protocol=protocol,
+        )
+        for uid, protocol in ((1, 1), (2, WS_PROTOCOL_CHARACTER_PATCHES))
+    ]
+    monkeypatch.setattr(
+        "roboToald.api.websocket.sso_model.list_accounts",
+        lambda gid, account_ids=None: [_account(1, "alpha", characters=[_char(park_location="Skyfire", key_vp=True)])],
+    )
+    snapshot.mark_changed({1})
+    snapshot.refresh()
+    await mgr._push_snapshot(1, snapshot, conns)
+
+    full = _sent(conns[0].websocket)["changes"][0]["fields"]["characters"]
+    assert full["update"]["Bob"]["park"] == "Skyfire"
+    assert full["update"]["Bob"]["keys"]["vp"] is True
+    patch = _sent(conns[1].websocket)["changes"][0]["fields"]["characters"]
+    assert patch == {"patch": {"Bob": {"park": "Skyfire", "items": {"vp": True}}}}
+    assert conns[0].sent_fingerprints == conns[1].sent_fingerprints
@@ -0,0 +1,142 @@
+"""Tests for the WebSocket presence write-behind pipeline (``roboToald.api.write_behind``)."""
+
+from __future__ import annotations
+
+import datetime
+import logging
+
+from roboToald.api.write_behind import MAX_FLUSH_ATTEMPTS, PendingPresence, PresenceWriteBehind, _merge_character_fields
+from roboToald.db.models import sso
+
+GUILD_ID = 515151
+
+
+def _entry(name="Hero", **kw) -> PendingPresence:
+    base = {"guild_id": GUILD_ID, "character_name": name, "account_id": 1, "discord_user_id": 99}
+    base.update(kw)
+    return PendingPresence(**base)
+
+
+def test_merge_character_fields_skips_unreported_values():
+    old = {"bind_location": "PoK", "level": 50, "key_seb": True}
+    new = {"bind_location": "", "park_location": None, "level": 51, "key_seb": None, "item_void": False}
+    assert _merge_character_fields(old, new) == {
+        "bind_location": "PoK",
+        "level": 51,
+        "key_seb": True,
+        "item_void": False,
+    }
+
+
+def test_submit_coalesces_per_character():
+    writer = PresenceWriteBehind(flush_interval_ms=1000)
+    writer.submit(_entry(character_fields={"level": 10}, park_zone_keys=["sebilis"]))
+    writer.submit(_entry(character_fields={"level": 11}, park_zone_keys=["veeshan"], notify=True))
+    writer.submit(_entry(name="Other"))
+    assert writer.queue_depth() == 2
+    stats = writer.stats()
+    assert stats["submitted"] == 3
+    assert stats["coalesced"] == 1
+
+    pending = writer._pending[(GUILD_ID, "Hero")]
+    assert pending.character_fields == {"level": 11}
+    assert pending.park_zone_keys == ["sebilis", "veeshan"]
+    assert pending.notify is True
+
+
+def test_flush_writes_one_batch_and_notifies(monkeypatch):
+    batches: list[list] = []
+
+    def fake_apply(updates):
+        batches.append(list(updates))
+        return {GUILD_ID + 1}
+
+    monkeypatch.setattr("roboToald.api.write_behind.sso_model.apply_presence_updates", fake_apply)
+    writer = PresenceWriteBehind(flush_interval_ms=1000)
+    notified: list[set[int]] = []
+    writer.set_on_flushed(notified.append)
+
+    writer.submit(_entry(notify=True))
+    writer.submit(_entry(name="Quiet"))
+    assert writer.flush() == 2
+    assert len(batches) == 1
+    assert notified == [{GUILD_ID, GUILD_ID + 1}]
+    assert writer.queue_depth() == 0
+    assert writer.stats()["flushes"] == 1
+    assert writer.flush() == 0
+
+
+def test_failed_flush_is_retried_with_newer_entries_merged(monkeypatch):
+    batches = []
+
+    def apply_once_locked(updates):
+        batches.append([(e.character_name, dict(e.character_fields)) for e in updates])
+        if len(batches) == 1:
+            raise RuntimeError("database is locked")
+        return set()
+
+    monkeypatch.setattr("roboToald.api.write_behind.sso_model.apply_presence_updates", apply_once_locked)
+    writer = PresenceWriteBehind(flush_interval_ms=1000)
+    writer.submit(_entry("Hero", character_fields={"level": 59, "bind_location": "Oasis"}))
+    writer.submit(_entry("Sidekick", character_fields={"level": 10}))
+    assert writer.flush() == 0
+    assert writer.stats()["errors"] == 1
+    assert writer.queue_depth() == 2
+
+    writer.submit(_entry("Hero", character_fields={"level": 60}))
+    assert writer.flush() == 2
+    assert batches[1] == [("Sidekick", {"level": 10}), ("Hero", {"level": 60, "bind_location": "Oasis"})]
+    assert writer.stats()["dropped"] == 0
+
+
+def test_entries_are_dropped_after_max_attempts(monkeypatch):
+    def boom(updates):
+        raise RuntimeError("locked")
+
+    monkeypatch.setattr("roboToald.api.write_behind.sso_model.apply_presence_updates", boom)
+    writer = PresenceWriteBehind(flush_interval_ms=1000)
+    writer.submit(_entry())
+    for _ in range(MAX_FLUSH_ATTEMPTS):
+        assert writer.flush() == 0
+    assert writer.queue_depth() == 0
+    assert writer.stats()["errors"] == MAX_FLUSH_ATTEMPTS
+    assert writer.stats()["dropped"] == 1
+
+
+def test_stop_drains_queue(sso_session):
+    sso.create_account(GUILD_ID, "acct", "pw")
+    acc = sso.get_account(GUILD_ID, "acct")
+    sso.add_account_character(GUILD_ID, "acct", "Hero", sso.CharacterClass.Warrior)
+
+    writer = PresenceWriteBehind(flush_interval_ms=60_000)
+    writer.start()
+    seen = datetime.datetime.now()
+    writer.submit(_entry(account_id=acc.id, login_by="Someone", seen_at=seen, character_fields={"level": 60}))
+    writer.stop()
+
+    row = sso_session.query(sso.SSOAccountCharacter).filter_by(name="Hero", guild_id=GUILD_ID).one()
+    assert row.level == 60
+    assert sso.get_account(GUILD_ID, "acct").last_login_by == "Someone"
+    assert sso.get_active_characters(GUILD_ID) == {acc.id: "Hero"}
+
+
+def test_bot_exit_stops_background_work(monkeypatch):
+    import batphone
+
+    calls = []
+    monkeypatch.setattr(logging.root, "handlers", [])
+    monkeypatch.setattr(logging.root, "level", logging.root.level)
+    monkeypatch.setattr(batphone.base, "initialize_database", lambda: None)
+    monkeypatch.setattr(batphone.config, "raid_guild_ids", lambda: [])
+    monkeypatch.setattr(sso, "load_failed_attempts", lambda: None)
+    monkeypatch.setattr(batphone.server, "run_api_server", lambda *a, **k: None)
+    monkeypatch.setattr(batphone.discord_client.DISCORD_CLIENT, "run", lambda token: calls.append("bot"))
+    monkeypatch.setattr(batphone.server.archive_scheduler, "halt", lambda timeout: calls.append("archive") or True)
+    monkeypatch.setattr(batphone.server.maintenance.scheduler, "stop", lambda: calls.append("maintenance"))
+    monkeypatch.setattr(batphone.server.sso_async.executor, "shutdown", lambda: calls.append("sso"))
+    monkeypatch.setattr(batphone.server.presence_writer, "stop", lambda: calls.append("presence"))
+    monkeypatch.setattr(batphone.server.audit_writer, "stop", lambda: calls.append("audit"))
+
+    batphone.main()
+
+    assert calls == ["bot", "archive", "maintenance", "sso", "presence", "audit"]
@@ -69,6 +69,16 @@ def test_ws_auth_happy_path_full_state(client, monkeypatch):
         assert "dynamic_tag_classes" in msg
 
 
+def test_ws_auth_compact_keys_full_state(client, monkeypatch):
+    _patch_ws_auth_ok(monkeypatch)
+    with client.websocket_connect("/ws/accounts") as ws:
+        ws.send_json({"type": "auth", "access_key": "good", "client_version": "2.0.0", "compact_keys": True})
+        msg = ws.receive_json()
+        assert msg["type"] == "full_state"
+        assert msg["account_tree"] == {"acct": {"a": [], "t": [], "c": {}, "ll": None, "lb": None, "ac": None}}
+        assert msg["count"] == 1
+
+
 def test_ws_auth_invalid_access_key(client, monkeypatch):
     monkeypatch.setattr("roboToald.api.server.sso_model.is_ip_rate_limited", lambda *a, **k: False)
     monkeypatch.setattr("roboToald.api.server.sso_model.get_access_key_by_key", lambda k: None)
@@ -249,11 +259,30 @@ def test_ws_login_auth_tag_empty(client, monkeypatch):
         assert resp["status"] == 410
 
 
+def _capture_presence_flushes(monkeypatch, changed_guilds=frozenset()):
+    """Record batches handed to ``apply_presence_updates`` by the write-behind flush."""
+    batches: list[list] = []
+
+    def fake_apply(updates):
+        batches.append(list(updates))
+        return set(changed_guilds)
+
+    monkeypatch.setattr("roboToald.api.write_behind.sso_model.apply_presence_updates", fake_apply)
+    return batches
+
+
+def _flushed(batches: list[list]) -> list:
+    from roboToald.api.server import presence_writer
+
+    presence_writer.flush()
+    return [entry for batch in batches for entry in batch]
+
+
 def test_ws_heartbeat_updates_session(client, monkeypatch):
     from types import SimpleNamespace
 
     _patch_ws_auth_ok(monkeypatch)
-    calls: dict[str, list] = {"update_last_login": [], "record": [], "expire": [], "notify": []}
+    notified: list[int] = []
 
     acc = SimpleNamespace(id=7, real_user="u")
 
@@ -264,26 +293,10 @@ def test_ws_heartbeat_updates_session(client, monkeypatch):
 
     monkeypatch.setattr("roboToald.api.server.sso_model.find_account_by_character", fake_find_char)
     monkeypatch.setattr("roboToald.api.server.user_has_access_to_accounts", lambda *a, **k: [acc])
-
-    def ul(aid, login_by=None):
-        calls["update_last_login"].append((aid, login_by))
-
-    monkeypatch.setattr("roboToald.api.server.sso_model.update_last_login", ul)
-
-    def rec(gid, aid, cname, duid):
-        calls["record"].append((gid, aid, cname, duid))
-
-    monkeypatch.setattr("roboToald.api.server.sso_model.record_heartbeat_session", rec)
-
-    def exp(gid, duid, keep):
-        calls["expire"].append((gid, duid, keep))
-
-    monkeypatch.setattr("roboToald.api.server.sso_model.expire_other_sessions", exp)
-
-    async def notify(gid, immediate=False):
-        calls["notify"].append((gid, immediate))
-
-    monkeypatch.setattr("roboToald.api.server.ws_manager.notify_guild_async", notify)
+    monkeypatch.setattr(
+        "roboToald.api.server.ws_manager.notify_guild", lambda gid, immediate=False: notified.append(gid)
+    )
+    batches = _capture_presence_flushes(monkeypatch)
 
     with client.websocket_connect("/ws/accounts") as ws:
         ws.send_json({"type": "auth", "access_key": "good", "client_version": "2.0.0"})
@@ -293,10 +306,13 @@ def test_ws_heartbeat_updates_session(client, monkeypatch):
         import time
 
         time.sleep(0.05)
-    assert calls["update_last_login"] == [(7, None)]
-    assert calls["record"] == [(1, 7, "Hero", 99)]
-    assert calls["expire"] == [(1, 99, 7)]
-    assert calls["notify"] == [(1, False)]
+        entries = _flushed(batches)
+    assert len(entries) == 1
+    entry = entries[0]
+    assert (entry.guild_id, entry.account_id, entry.character_name, entry.discord_user_id) == (1, 7, "Hero", 99)
+    assert entry.login_by is None
+    assert entry.character_fields == {}
+    assert notified == [1]
 
 
 def test_ws_update_location_updates_character(client, monkeypatch):
@@ -308,23 +324,11 @@ def test_ws_update_location_updates_character(client, monkeypatch):
         "roboToald.api.server.sso_model.find_account_by_character", lambda g, n: acc if n == "Zed" else None
     )
     monkeypatch.setattr("roboToald.api.server.user_has_access_to_accounts", lambda *a, **k: [acc])
-    monkeypatch.setattr("roboToald.api.server.sso_model.update_last_login", lambda *a, **k: None)
-    monkeypatch.setattr("roboToald.api.server.sso_model.record_heartbeat_session", lambda *a, **k: None)
-    monkeypatch.setattr("roboToald.api.server.sso_model.expire_other_sessions", lambda *a, **k: None)
-
-    uac_calls: list[dict] = []
-
-    def fake_uac(**kw):
-        uac_calls.append(kw)
-        return True
-
-    monkeypatch.setattr("roboToald.api.server.sso_model.update_account_character", fake_uac)
-    monkeypatch.setattr("roboToald.api.server.sso_model.mark_key_from_park_zone", lambda *a, **k: False)
-
-    async def notify(gid, immediate=False):
-        pass
-
-    monkeypatch.setattr("roboToald.api.server.ws_manager.notify_guild_async", notify)
+    notified: list[int] = []
+    monkeypatch.setattr(
+        "roboToald.api.server.ws_manager.notify_guild", lambda gid, immediate=False: notified.append(gid)
+    )
+    batches = _capture_presence_flushes(monkeypatch, changed_guilds={1})
 
     with client.websocket_connect("/ws/accounts") as ws:
         ws.send_json({"type": "auth", "access_key": "good", "client_version": "2.0.0"})
@@ -342,15 +346,19 @@ def test_ws_update_location_updates_character(client, monkeypatch):
         import time
 
         time.sleep(0.05)
-    assert len(uac_calls) == 1
-    assert uac_calls[0]["guild_id"] == 1
-    assert uac_calls[0]["name"] == "Zed"
-    assert uac_calls[0]["bind_location"] == "PoK"
-    assert uac_calls[0]["park_location"] == "veeshan"
-    assert uac_calls[0]["level"] == 60
-    assert uac_calls[0]["key_seb"] is True
-    assert uac_calls[0]["key_vp"] is None
-    assert uac_calls[0]["key_st"] is False
+        entries = _flushed(batches)
+    assert len(entries) == 1
+    fields = entries[0].character_fields
+    assert entries[0].guild_id == 1
+    assert entries[0].character_name == "Zed"
+    assert fields["bind_location"] == "PoK"
+    assert fields["park_location"] == "veeshan"
+    assert fields["level"] == 60
+    assert fields["key_seb"] is True
+    assert fields["key_vp"] is None
+    assert fields["key_st"] is False
+    assert entries[0].park_zone_keys == ["veeshan"]
+    assert notified == [1]
 
 
 def test_ws_update_location_items_overrides_keys(client, monkeypatch):
@@ -362,23 +370,11 @@ def test_ws_update_location_items_overrides_keys(client, monkeypatch):
         "roboToald.api.server.sso_model.find_account_by_character", lambda g, n: acc if n == "Zed" else None
     )
     monkeypatch.setattr("roboToald.api.server.user_has_access_to_accounts", lambda *a, **k: [acc])
-    monkeypatch.setattr("roboToald.api.server.sso_model.update_last_login", lambda *a, **k: None)
-    monkeypatch.setattr("roboToald.api.server.sso_model.record_heartbeat_session", lambda *a, **k: None)
-    monkeypatch.setattr("roboToald.api.server.sso_model.expire_other_sessions", lambda *a, **k: None)
-
-    uac_calls: list[dict] = []
-
-    def fake_uac(**kw):
-        uac_calls.append(kw)
-        return True
-
-    monkeypatch.setattr("roboToald.api.server.sso_model.update_account_character", fake_uac)
-    monkeypatch.setattr("roboToald.api.server.sso_model.mark_key_from_park_zone", lambda *a, **k: False)
-
-    async def notify(gid, immediate=False):
-        pass
-
-    monkeypatch.setattr("roboToald.api.server.ws_manager.notify_guild_async", notify)
+    notified: list[int] = []
+    monkeypatch.setattr(
+        "roboToald.api.server.ws_manager.notify_guild", lambda gid, immediate=False: notified.append(gid)
+    )
+    batches = _capture_presence_flushes(monkeypatch)
 
     with client.websocket_connect("/ws/accounts") as ws:
         ws.send_json({"type": "auth", "access_key": "good", "client_version": "2.0.0"})
@@ -394,10 +390,14 @@ def test_ws_update_location_items_overrides_keys(client, monkeypatch):
         import time
 
         time.sleep(0.05)
-    assert len(uac_calls) == 1
-    assert uac_calls[0]["key_seb"] is True
-    assert uac_calls[0]["key_vp"] is True
-    assert uac_calls[0]["item_void"] is True
+        entries = _flushed(batches)
+    assert len(entries) == 1
+    fields = entries[0].character_fields
+    assert fields["key_seb"] is True
+    assert fields["key_vp"] is True
+    assert fields["item_void"] is True
+    # Nothing changed in the DB, so no delta push.
+    assert notified == []
 
 
 def test_ws_json_decode_error_in_message_loop_ignored(client, monkeypatch):
@@ -408,3 +408,14 @@ def test_ws_json_decode_error_in_message_loop_ignored(client, monkeypatch):
         ws.send_text("not-json")
         ws.send_json({"type": "ping"})
         assert ws.receive_json() == {"type": "pong"}
+
+
+def test_ws_auth_negotiates_character_patch_protocol(client, monkeypatch):
+    from roboToald import config
+
+    _patch_ws_auth_ok(monkeypatch)
+    monkeypatch.setattr(config, "WS_CHARACTER_PATCH_MIN_VERSION", "2.1.0")
+    for version, protocol in (("2.0.9", 1), ("2.1.0-rc1", 1), ("2.1.0", 2), ("3.0.0", 2)):
+        with client.websocket_connect("/ws/accounts") as ws:
+            ws.send_json({"type": "auth", "access_key": "good", "client_version": version})
+            assert ws.receive_json()["protocol"] == protocol